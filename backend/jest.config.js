@@ -5,6 +5,8 @@ module.exports = {
   collectCoverageFrom: [
     'src/**/*.js',
     '!src/server.js', // Exclude server startup file
+    '!src/scripts/**', // Exclude command-line scripts
+    '!src/database/readWorker.js', // Runs in worker threads, outside jest's coverage
     '!**/node_modules/**'
   ],
   coverageReporters: ['text', 'lcov', 'html'],
@@ -0,0 +1,138 @@
+const cluster = require('node:cluster');
+const { clusterSize, clusterProblem, isClusterLeader, broadcast, dispatch, runClustered } = require('../cluster');
+
+// Forks are event emitters the test makes "listen"
+jest.mock('node:cluster', () => {
+  const EventEmitter = require('events');
+  const mockCluster = new EventEmitter();
+  mockCluster.isWorker = false;
+  mockCluster.workers = {};
+  mockCluster.fork = jest.fn(() => {
+    const worker = new EventEmitter();
+    worker.process = { pid: 1000 + mockCluster.fork.mock.calls.length, kill: jest.fn() };
+    worker.isConnected = () => true;
+    worker.isDead = () => false;
+    return worker;
+  });
+  return mockCluster;
+});
+
+describe('Cluster', () => {
+  afterEach(() => {
+    delete process.env.CLUSTER_WORKERS;
+    delete process.env.DATABASE_PATH;
+    delete process.env.REPLICATION_TOKEN;
+    delete process.env.JWT_SECRET;
+  });
+
+  describe('clusterSize', () => {
+    test('should run a single process by default', () => {
+      expect(clusterSize()).toBe(1);
+    });
+
+    test('should read CLUSTER_WORKERS', () => {
+      process.env.CLUSTER_WORKERS = '4';
+      expect(clusterSize()).toBe(4);
+
+      process.env.CLUSTER_WORKERS = 'auto';
+      expect(clusterSize()).toBeGreaterThanOrEqual(1);
+    });
+  });
+
+  describe('clusterProblem', () => {
+    test('should need a file database', () => {
+      expect(clusterProblem()).toMatch(/needs a file database/);
+
+      process.env.DATABASE_PATH = ':memory:';
+      expect(clusterProblem()).toMatch(/needs a file database/);
+    });
+
+    test('should refuse replication', () => {
+      process.env.DATABASE_PATH = '/data/timesheet.db';
+      process.env.REPLICATION_TOKEN = 'secret';
+
+      expect(clusterProblem()).toMatch(/does not support replication/);
+    });
+
+    test('should accept a file database', () => {
+      process.env.DATABASE_PATH = '/data/timesheet.db';
+
+      expect(clusterProblem()).toBeNull();
+    });
+  });
+
+  describe('outside a cluster', () => {
+    test('should be its own leader and broadcast to no one', () => {
+      expect(isClusterLeader()).toBe(true);
+      expect(() => broadcast('archive.moved', 0)).not.toThrow();
+    });
+  });
+
+  describe('runClustered', () => {
+    const SIGNALS = ['SIGTERM', 'SIGINT', 'SIGHUP'];
+    let listenersBefore;
+
+    // Forks two workers, each listening once forked
+    async function startCluster() {
+      process.env.CLUSTER_WORKERS = '2';
+      process.env.DATABASE_PATH = '/data/timesheet.db';
+      const started = runClustered(jest.fn());
+      for (let i = 0; i < 2; i++) {
+        await new Promise(setImmediate);
+        cluster.fork.mock.results[i].value.emit('listening');
+      }
+      await started;
+      return cluster.fork.mock.calls.map(([env]) => env);
+    }
+
+    beforeEach(() => {
+      listenersBefore = Object.fromEntries(SIGNALS.map((signal) => [signal, process.listeners(signal)]));
+      jest.spyOn(console, 'log').mockImplementation(() => {});
+      jest.spyOn(console, 'warn').mockImplementation(() => {});
+    });
+
+    afterEach(() => {
+      for (const signal of SIGNALS) {
+        for (const listener of process.listeners(signal)) {
+          if (!listenersBefore[signal].includes(listener)) {
+            process.removeListener(signal, listener);
+          }
+        }
+      }
+      cluster.removeAllListeners();
+      cluster.fork.mockClear();
+      jest.restoreAllMocks();
+    });
+
+    test('should give every worker the same token key when JWT_SECRET is not set', async () => {
+      const [leader, other] = await startCluster();
+
+      expect(leader).toEqual({ JWT_SECRET: expect.stringMatching(/^[0-9a-f]{64}$/), CLUSTER_LEADER: '1' });
+      expect(other).toEqual({ JWT_SECRET: leader.JWT_SECRET, CLUSTER_LEADER: '0' });
+      expect(console.warn).toHaveBeenCalledWith(expect.stringMatching(/JWT_SECRET is not set/));
+    });
+
+    test('should let workers inherit a configured JWT_SECRET', async () => {
+      process.env.JWT_SECRET = 'configured-secret';
+
+      const [leader, other] = await startCluster();
+
+      expect(leader).toEqual({ CLUSTER_LEADER: '1' });
+      expect(other).toEqual({ CLUSTER_LEADER: '0' });
+    });
+  });
+
+  describe('dispatch', () => {
+    const services = { counter: { add: (a, b) => a + b } };
+
+    test('should reply with the service method\'s result', () => {
+      expect(dispatch(services, { cluster: 'call', id: 3, service: 'counter', method: 'add', args: [1, 2] }))
+        .toEqual({ cluster: 'reply', id: 3, result: 3 });
+    });
+
+    test('should reply with an error for unknown calls', () => {
+      expect(dispatch(services, { cluster: 'call', id: 4, service: 'counter', method: 'remove', args: [] }))
+        .toEqual({ cluster: 'reply', id: 4, error: 'Unknown cluster call counter.remove' });
+    });
+  });
+});
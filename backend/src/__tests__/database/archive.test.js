@@ -0,0 +1,89 @@
+// Moves entries into a real attached (in-memory) archive and checks that the
+// rollups and the archive-spanning statements see them afterwards.
+jest.unmock('sqlite3');
+
+process.env.DB_ARCHIVE_PATH = ':memory:';
+
+const { getDatabase, getArchive, initializeDatabase, closeDatabase } = require('../../database/init');
+const { STATEMENTS } = require('../../database/statements');
+const { entryQuery } = require('../../database/archive');
+const { toDayNumber, MAX_DAY } = require('../../database/days');
+const query = require('../../database/query');
+
+const NOW = new Date('2024-06-01');
+
+describe('Archive', () => {
+  let consoleLogSpy, db, archive, userId, clientId;
+
+  beforeAll(async () => {
+    consoleLogSpy = jest.spyOn(console, 'log').mockImplementation();
+    await initializeDatabase();
+    db = getDatabase();
+    archive = getArchive();
+
+    await db.write(async (tx) => {
+      await query.run(tx, STATEMENTS.insertUser, ['archive@example.com']);
+      ({ id: userId } = await query.get(tx, STATEMENTS.findUserId, ['archive@example.com']));
+      ([{ id: clientId }] = await query.all(tx, STATEMENTS.insertClient, ['Old Client', null, null, null, userId]));
+      for (const [hundredths, date] of [[100, '2022-01-03'], [250, '2022-01-04'], [300, '2024-05-20']]) {
+        await query.all(tx, STATEMENTS.insertWorkEntry, [hundredths, null, toDayNumber(date), clientId, userId]);
+      }
+    });
+  });
+
+  afterAll(async () => {
+    await closeDatabase();
+    delete process.env.DB_ARCHIVE_PATH;
+    consoleLogSpy.mockRestore();
+  });
+
+  test('should start out covering no days', () => {
+    expect(archive.covers(0)).toBe(false);
+  });
+
+  test('should move entries older than the cutoff and keep the rollups', async () => {
+    const totalsBefore = await query.get(db, STATEMENTS.findClientTotals, [clientId, userId]);
+
+    await expect(archive.run(NOW)).resolves.toBe(2);
+
+    const hot = await query.all(db, STATEMENTS.reportEntries, [clientId, userId, 0, MAX_DAY]);
+    expect(hot.map((entry) => entry.date)).toEqual(['2024-05-20']);
+    expect(await query.get(db, STATEMENTS.findClientTotals, [clientId, userId])).toEqual(totalsBefore);
+    expect(totalsBefore).toEqual(expect.objectContaining({
+      total_hours: 6.5,
+      entry_count: 3,
+      first_date: '2022-01-03'
+    }));
+  });
+
+  test('should report how far the archive reaches', () => {
+    expect(archive.covers(toDayNumber('2022-01-04'))).toBe(true);
+    expect(archive.covers(toDayNumber('2022-01-05'))).toBe(false);
+    expect(archive.getStats()).toEqual(expect.objectContaining({ runs: 1, moved: 2, newestDate: '2022-01-04' }));
+  });
+
+  test('should span both databases only when the range needs it', async () => {
+    const params = [clientId, userId, toDayNumber('2022-01-01'), MAX_DAY];
+    const [sql, bound] = entryQuery(archive, 'reportEntries', params, params[2]);
+    expect(sql).toBe(STATEMENTS.reportEntriesWithArchive);
+
+    const entries = await query.all(db, sql, bound);
+    expect(entries.map((entry) => entry.date)).toEqual(['2024-05-20', '2022-01-04', '2022-01-03']);
+
+    const recent = [clientId, userId, toDayNumber('2024-01-01'), MAX_DAY];
+    expect(entryQuery(archive, 'reportEntries', recent, recent[2])).toEqual([STATEMENTS.reportEntries, recent]);
+  });
+
+  test('should have nothing left to move on the next run', async () => {
+    await expect(archive.run(NOW)).resolves.toBe(0);
+  });
+
+  test('should delete archived entries with their client', async () => {
+    await db.write((tx) => query.run(tx, STATEMENTS.deleteClient, [clientId, userId]));
+    await db.write((tx) => query.run(tx, STATEMENTS.deleteArchivedEntriesForClient, [clientId, userId]));
+
+    const [sql, bound] = entryQuery(archive, 'reportEntries', [clientId, userId, 0, MAX_DAY], 0);
+    expect(await query.all(db, sql, bound)).toEqual([]);
+    expect(await query.get(db, STATEMENTS.reportSummary, [userId])).toEqual({ total_hours: 0, entry_count: 0 });
+  });
+});
@@ -0,0 +1,381 @@
+const sqlite3 = require('sqlite3');
+const { createConnectionManager } = require('../../database/connection');
+const query = require('../../database/query');
+
+// What the writer reports for PRAGMA journal_mode
+let mockJournalMode = 'wal';
+
+jest.mock('sqlite3', () => {
+  const createMockConnection = (filename, mode) => ({
+    filename,
+    mode,
+    serialize: jest.fn((callback) => callback()),
+    run: jest.fn(),
+    get: jest.fn((query, params, callback) => callback(null, query === 'PRAGMA journal_mode'
+      ? { journal_mode: mockJournalMode }
+      : { filename })),
+    // Never completes, so each pending read occupies its connection
+    all: jest.fn(),
+    close: jest.fn((callback) => callback(null))
+  });
+
+  const Database = jest.fn((filename, modeOrCallback, callback) => {
+    const mode = typeof modeOrCallback === 'function' ? undefined : modeOrCallback;
+    const cb = typeof modeOrCallback === 'function' ? modeOrCallback : callback;
+    cb(null);
+    return createMockConnection(filename, mode);
+  });
+
+  return {
+    verbose: jest.fn(() => ({ Database, OPEN_READONLY: 1 }))
+  };
+});
+
+describe('Connection Manager', () => {
+  const Database = sqlite3.verbose().Database;
+
+  afterEach(() => {
+    jest.clearAllMocks();
+  });
+
+  describe('in-memory database', () => {
+    test('should open a single connection and ignore the read pool', () => {
+      const manager = createConnectionManager({ filename: ':memory:', readPoolSize: 4 });
+
+      manager.get('SELECT 1', [], jest.fn());
+
+      expect(Database).toHaveBeenCalledTimes(1);
+      expect(manager.readPoolSize).toBe(0);
+      expect(manager.writer.get).toHaveBeenCalled();
+    });
+
+    test('should apply the configured pragmas to the writer in order', () => {
+      const manager = createConnectionManager({
+        filename: ':memory:',
+        pragmas: { synchronous: 'FULL', foreign_keys: 'ON' }
+      });
+
+      expect(manager.writer.serialize).toHaveBeenCalled();
+      expect(manager.writer.run.mock.calls.map((call) => call[0])).toEqual([
+        'PRAGMA synchronous = FULL',
+        'PRAGMA foreign_keys = ON'
+      ]);
+    });
+
+    test('should read back the effective pragma values', async () => {
+      const manager = createConnectionManager({ filename: ':memory:', pragmas: { journal_mode: 'WAL' } });
+      manager.writer.get.mockImplementation((sql, params, callback) => callback(null, { journal_mode: 'memory' }));
+
+      await expect(manager.readPragmas()).resolves.toEqual({ journal_mode: 'memory' });
+      expect(manager.writer.get).toHaveBeenCalledWith('PRAGMA journal_mode', [], expect.any(Function));
+    });
+
+    test('should not start worker threads for an in-memory database', () => {
+      const manager = createConnectionManager({ filename: ':memory:', workerThreads: 2 });
+
+      expect(manager.workerPoolStats()).toBeNull();
+    });
+
+    test('should encode rows as JSON without a worker pool', async () => {
+      const manager = createConnectionManager({ filename: ':memory:' });
+      manager.writer.all.mockImplementation((sql, params, callback) => callback(null, [{ id: 1 }]));
+
+      const json = await manager.allJson('SELECT id FROM clients');
+
+      expect(json.toString()).toBe('[{"id":1}]');
+    });
+
+    test('should time statements into the query log', () => {
+      const queryLog = { record: jest.fn() };
+      const manager = createConnectionManager({ filename: ':memory:', queryLog });
+      const callback = jest.fn();
+
+      manager.get('SELECT name FROM clients WHERE id = ?', [7], callback);
+
+      expect(callback).toHaveBeenCalledWith(null, { filename: ':memory:' });
+      expect(queryLog.record).toHaveBeenCalledWith(
+        'SELECT name FROM clients WHERE id = ?',
+        [7],
+        expect.any(Number),
+        { failed: false, explain: expect.any(Function) }
+      );
+    });
+
+    test('should hold reads until an open transaction finishes', async () => {
+      const manager = createConnectionManager({ filename: ':memory:' });
+      manager.writer.run.mockImplementation(function(sql, params, callback) {
+        if (typeof callback === 'function') callback.call({ lastID: 0, changes: 0 }, null);
+      });
+      const read = jest.fn();
+      let finishWork;
+
+      const transaction = manager.transaction(() => new Promise((resolve) => {
+        finishWork = resolve;
+      }));
+      await new Promise((resolve) => setImmediate(resolve));
+
+      manager.get('SELECT name FROM clients WHERE id = ?', [1], read);
+      expect(manager.writer.get).not.toHaveBeenCalled();
+
+      finishWork();
+      await transaction;
+
+      expect(read).toHaveBeenCalledWith(null, { filename: ':memory:' });
+    });
+
+    test('should not hold reads behind plain writes', () => {
+      const manager = createConnectionManager({ filename: ':memory:' });
+      // Never completes, so the write keeps the write lock
+      manager.writer.run.mockImplementation(() => {});
+
+      manager.run('UPDATE clients SET name = NULL', [], jest.fn());
+      manager.get('SELECT 1', [], jest.fn());
+      manager.get('SELECT 2', [], jest.fn());
+
+      expect(manager.writer.get.mock.calls.map((call) => call[0])).toEqual(['SELECT 1', 'SELECT 2']);
+    });
+
+    test('should start a transaction once running reads have called back', async () => {
+      const manager = createConnectionManager({ filename: ':memory:' });
+      manager.writer.run.mockImplementation(function(sql, params, callback) {
+        if (typeof callback === 'function') callback.call({ lastID: 0, changes: 0 }, null);
+      });
+      let finishRead;
+      manager.writer.get.mockImplementationOnce((sql, params, callback) => {
+        finishRead = () => callback(null, {});
+      });
+
+      manager.get('SELECT 1', [], jest.fn());
+      const transaction = manager.transaction(async () => 'done');
+      await new Promise((resolve) => setImmediate(resolve));
+      expect(manager.writer.run).not.toHaveBeenCalled();
+
+      finishRead();
+      await expect(transaction).resolves.toBe('done');
+      expect(manager.writer.run.mock.calls.map((call) => call[0])).toEqual(['BEGIN IMMEDIATE', 'COMMIT']);
+    });
+
+    test('should reject facade use inside a transaction instead of deadlocking', async () => {
+      const manager = createConnectionManager({ filename: ':memory:' });
+      manager.writer.run.mockImplementation(function(sql, params, callback) {
+        if (typeof callback === 'function') callback.call({ lastID: 0, changes: 0 }, null);
+      });
+
+      await expect(manager.transaction(() => query.get(manager, 'SELECT 1')))
+        .rejects.toThrow('use the tx handle or db.writer');
+      await expect(manager.runExclusive(() => manager.transaction(async () => {})))
+        .rejects.toThrow('use the tx handle or db.writer');
+      await expect(manager.transaction(() => manager.write(async () => {})))
+        .rejects.toThrow('use the tx handle or db.writer');
+
+      // The lock was released each time
+      await expect(manager.transaction(async () => 'done')).resolves.toBe('done');
+    });
+
+    test('should call onOpen once the writer is connected', () => {
+      const onOpen = jest.fn();
+      createConnectionManager({ filename: ':memory:', onOpen });
+
+      expect(onOpen).toHaveBeenCalledTimes(1);
+    });
+  });
+
+  describe('file database', () => {
+    test('should put the writer in WAL mode', () => {
+      const manager = createConnectionManager({
+        filename: '/tmp/test.db',
+        readPoolSize: 2,
+        pragmas: { journal_mode: 'WAL', busy_timeout: 5000 }
+      });
+
+      expect(manager.writer.run).toHaveBeenCalledWith('PRAGMA journal_mode = WAL');
+      expect(manager.writer.run).toHaveBeenCalledWith('PRAGMA busy_timeout = 5000');
+    });
+
+    test('should apply pragmas to readers except journal_mode', () => {
+      const manager = createConnectionManager({
+        filename: '/tmp/test.db',
+        readPoolSize: 1,
+        pragmas: { journal_mode: 'WAL', busy_timeout: 5000 }
+      });
+
+      manager.get('SELECT 1', [], jest.fn());
+
+      const reader = Database.mock.results[1].value;
+      expect(reader.run.mock.calls.map((call) => call[0])).toEqual(['PRAGMA busy_timeout = 5000']);
+    });
+
+    test('should route reads to read-only pool connections', (done) => {
+      const manager = createConnectionManager({ filename: '/tmp/test.db', readPoolSize: 2 });
+
+      manager.get('SELECT name FROM clients WHERE id = ?', [1], (err, row) => {
+        expect(err).toBeNull();
+        expect(row).toEqual({ filename: '/tmp/test.db' });
+        expect(manager.writer.get.mock.calls.map((call) => call[0])).toEqual(['PRAGMA journal_mode']);
+
+        const reader = Database.mock.results[1].value;
+        expect(Database.mock.calls[1][1]).toBe(1);
+        expect(reader.get).toHaveBeenCalled();
+        done();
+      });
+    });
+
+    test('should keep reads on the writer when the file is not in WAL mode', () => {
+      mockJournalMode = 'delete';
+      jest.spyOn(console, 'warn').mockImplementation(() => {});
+      try {
+        const manager = createConnectionManager({ filename: '/tmp/test.db', readPoolSize: 2 });
+
+        manager.get('SELECT 1', [], jest.fn());
+
+        expect(Database).toHaveBeenCalledTimes(1);
+        expect(manager.writer.get).toHaveBeenCalledWith('SELECT 1', [], expect.any(Function));
+        expect(console.warn).toHaveBeenCalledWith('/tmp/test.db is not in WAL mode; reads will run on the writer');
+      } finally {
+        mockJournalMode = 'wal';
+        console.warn.mockRestore();
+      }
+    });
+
+    test('should use readers in any journal mode for a read-only copy', () => {
+      mockJournalMode = 'delete';
+      try {
+        const manager = createConnectionManager({ filename: '/tmp/replica.db', readPoolSize: 1, readOnly: true });
+
+        manager.get('SELECT 1', [], jest.fn());
+
+        expect(Database).toHaveBeenCalledTimes(2);
+        expect(manager.writer.get).not.toHaveBeenCalled();
+      } finally {
+        mockJournalMode = 'wal';
+      }
+    });
+
+    test('should not open more readers than the pool size', () => {
+      const manager = createConnectionManager({ filename: '/tmp/test.db', readPoolSize: 2 });
+
+      for (let i = 0; i < 5; i++) {
+        manager.all('SELECT * FROM clients', [], jest.fn());
+      }
+
+      const readers = Database.mock.results.slice(1).map((result) => result.value);
+      expect(readers).toHaveLength(2);
+      expect(readers[0].all.mock.calls.length + readers[1].all.mock.calls.length).toBe(5);
+    });
+
+    test('should keep writes on the writer', () => {
+      const manager = createConnectionManager({ filename: '/tmp/test.db', readPoolSize: 2 });
+      const callback = jest.fn();
+
+      manager.run('UPDATE clients SET name = ? WHERE id = ?', ['Acme', 1], callback);
+
+      expect(manager.writer.run).toHaveBeenCalledWith(
+        'UPDATE clients SET name = ? WHERE id = ?',
+        ['Acme', 1],
+        expect.any(Function)
+      );
+    });
+
+    test('should commit a transaction on the writer', async () => {
+      const manager = createConnectionManager({ filename: '/tmp/test.db', readPoolSize: 2 });
+      manager.writer.run.mockImplementation(function(sql, params, callback) {
+        if (typeof callback === 'function') callback.call({ lastID: 0, changes: 0 }, null);
+      });
+
+      const result = await manager.transaction(async () => 'done');
+
+      const statements = manager.writer.run.mock.calls.map((call) => call[0]);
+      expect(result).toBe('done');
+      expect(statements).toEqual(['BEGIN IMMEDIATE', 'COMMIT']);
+    });
+
+    test('should roll back a failed transaction and reject', async () => {
+      const manager = createConnectionManager({ filename: '/tmp/test.db', readPoolSize: 2 });
+      manager.writer.run.mockImplementation(function(sql, params, callback) {
+        if (typeof callback === 'function') callback.call({ lastID: 0, changes: 0 }, null);
+      });
+
+      await expect(manager.transaction(async () => {
+        throw new Error('boom');
+      })).rejects.toThrow('boom');
+
+      const statements = manager.writer.run.mock.calls.map((call) => call[0]);
+      expect(statements).toContain('ROLLBACK');
+      expect(statements).not.toContain('COMMIT');
+    });
+
+    test('should group-commit queued writes with a savepoint per write', async () => {
+      const manager = createConnectionManager({ filename: '/tmp/test.db', groupCommit: { windowMs: 5 } });
+      manager.writer.run.mockImplementation(function(sql, params, callback) {
+        if (typeof callback === 'function') callback.call({ lastID: 0, changes: 0 }, null);
+      });
+
+      const first = manager.write(async () => 'first');
+      const failed = manager.write(async () => {
+        throw new Error('boom');
+      });
+
+      await expect(first).resolves.toBe('first');
+      await expect(failed).rejects.toThrow('boom');
+
+      const statements = manager.writer.run.mock.calls.map((call) => call[0]);
+      expect(statements).toEqual([
+        'BEGIN IMMEDIATE',
+        'SAVEPOINT queued_write',
+        'RELEASE queued_write',
+        'SAVEPOINT queued_write',
+        'ROLLBACK TO queued_write',
+        'RELEASE queued_write',
+        'COMMIT'
+      ]);
+      expect(manager.writeQueueStats()).toMatchObject({ batches: 1, writes: 2, windowMs: 5 });
+    });
+
+    test('should hold plain writes until an open transaction finishes', async () => {
+      const manager = createConnectionManager({ filename: '/tmp/test.db', readPoolSize: 2 });
+      manager.writer.run.mockImplementation(function(sql, params, callback) {
+        if (typeof callback === 'function') callback.call({ lastID: 0, changes: 0 }, null);
+      });
+      let finishWork;
+
+      const transaction = manager.transaction(() => new Promise((resolve) => {
+        finishWork = resolve;
+      }));
+      await new Promise((resolve) => setImmediate(resolve));
+
+      manager.run('UPDATE clients SET name = NULL WHERE user_email = ?', ['a@example.com'], jest.fn());
+      let statements = manager.writer.run.mock.calls.map((call) => call[0]);
+      expect(statements).not.toContain('UPDATE clients SET name = NULL WHERE user_email = ?');
+
+      finishWork();
+      await transaction;
+
+      statements = manager.writer.run.mock.calls.map((call) => call[0]);
+      expect(statements.slice(-2)).toEqual(['COMMIT', 'UPDATE clients SET name = NULL WHERE user_email = ?']);
+    });
+
+    test('should keep reads inside serialize() on the writer', () => {
+      const manager = createConnectionManager({ filename: '/tmp/test.db', readPoolSize: 2 });
+
+      manager.serialize(() => {
+        manager.get('SELECT 1', [], jest.fn());
+      });
+
+      expect(manager.writer.get).toHaveBeenCalled();
+    });
+
+    test('should close readers and the writer', (done) => {
+      const manager = createConnectionManager({ filename: '/tmp/test.db', readPoolSize: 1 });
+      manager.get('SELECT 1', [], () => {
+        const reader = Database.mock.results[1].value;
+
+        manager.close((err) => {
+          expect(err).toBeNull();
+          expect(reader.close).toHaveBeenCalled();
+          expect(manager.writer.close).toHaveBeenCalled();
+          done();
+        });
+      });
+    });
+  });
+});
@@ -5,9 +5,15 @@ const { getDatabase, initializeDatabase, closeDatabase } = require('../../databa
 jest.mock('sqlite3', () => {
   const mockDatabase = {
     serialize: jest.fn((callback) => callback()),
-    run: jest.fn((query, callback) => {
-      if (typeof callback === 'function') callback(null);
+    run: jest.fn((query, paramsOrCallback, callback) => {
+      const cb = typeof paramsOrCallback === 'function' ? paramsOrCallback : callback;
+      if (typeof cb === 'function') cb(null);
     }),
+    get: jest.fn((query, params, callback) => {
+      // Fresh database: version 0 and no indexes yet
+      callback(null, query.includes('user_version') ? { user_version: 0 } : undefined);
+    }),
+    all: jest.fn((query, params, callback) => callback(null, [])),
     close: jest.fn((callback) => callback(null))
   };
 
@@ -76,10 +82,9 @@ describe('Database Initialization', () => {
 
   describe('initializeDatabase', () => {
     test('should create all required tables', async () => {
-      const db = getDatabase();
+      const db = getDatabase().writer;
       await initializeDatabase();
 
-      expect(db.serialize).toHaveBeenCalled();
       expect(db.run).toHaveBeenCalled();
       
       // Check that run was called for each table and index
@@ -92,16 +97,44 @@ describe('Database Initialization', () => {
     });
 
     test('should create indexes for performance', async () => {
-      const db = getDatabase();
+      const db = getDatabase().writer;
       await initializeDatabase();
 
       const runCalls = db.run.mock.calls;
       const queries = runCalls.map(call => call[0]);
       
-      expect(queries.some(q => q.includes('CREATE INDEX IF NOT EXISTS idx_clients_user_email'))).toBe(true);
-      expect(queries.some(q => q.includes('CREATE INDEX IF NOT EXISTS idx_work_entries_client_id'))).toBe(true);
-      expect(queries.some(q => q.includes('CREATE INDEX IF NOT EXISTS idx_work_entries_user_email'))).toBe(true);
-      expect(queries.some(q => q.includes('CREATE INDEX IF NOT EXISTS idx_work_entries_date'))).toBe(true);
+      expect(queries).toContain('CREATE INDEX IF NOT EXISTS idx_clients_user_id_name ON clients (user_id, name)');
+      expect(queries).toContain('CREATE INDEX IF NOT EXISTS idx_work_entries_user_day ON work_entries (user_id, day, created_at)');
+      expect(queries).toContain(
+        'CREATE INDEX IF NOT EXISTS idx_work_entries_client_user_day ON work_entries (client_id, user_id, day, created_at)'
+      );
+      // Superseded single-column indexes are never built on a fresh database
+      expect(queries.some(q => q.includes('idx_work_entries_client_id ON'))).toBe(false);
+      expect(queries.some(q => q.includes('idx_work_entries_date ON'))).toBe(false);
+      expect(queries.some(q => q.includes('idx_work_entries_user_date ON'))).toBe(false);
+      expect(queries.some(q => q.includes('idx_work_entries_user_id_date ON'))).toBe(false);
+    });
+
+    test('should apply migrations in a transaction and record the version', async () => {
+      const db = getDatabase().writer;
+      await initializeDatabase();
+
+      const queries = db.run.mock.calls.map(call => call[0]);
+      
+      expect(queries).toContain('BEGIN IMMEDIATE');
+      expect(queries).toContain('COMMIT');
+      expect(queries).toContain('PRAGMA user_version = 10');
+      expect(queries.some(q => q.includes('CREATE TABLE IF NOT EXISTS schema_migrations'))).toBe(true);
+    });
+
+    test('should add missing client contact columns', async () => {
+      const db = getDatabase().writer;
+      await initializeDatabase();
+
+      const queries = db.run.mock.calls.map(call => call[0]);
+      
+      expect(queries).toContain('ALTER TABLE clients ADD COLUMN department TEXT');
+      expect(queries).toContain('ALTER TABLE clients ADD COLUMN email TEXT');
     });
 
     test('should log success message', async () => {
@@ -110,43 +143,86 @@ describe('Database Initialization', () => {
       expect(consoleLogSpy).toHaveBeenCalledWith('Database tables created successfully');
     });
 
+    test('should log the pragma profile and effective values', async () => {
+      await initializeDatabase();
+
+      expect(consoleLogSpy).toHaveBeenCalledWith(expect.stringMatching(/^SQLite pragmas \(profile durable\): journal_mode=/));
+    });
+
     test('should resolve promise on success', async () => {
       await expect(initializeDatabase()).resolves.toBeUndefined();
     });
   });
 
   describe('closeDatabase', () => {
-    test('should close database connection', () => {
-      const db = getDatabase();
-      closeDatabase();
+    test('should close database connection', async () => {
+      const db = getDatabase().writer;
+      await closeDatabase();
 
       expect(db.close).toHaveBeenCalled();
       expect(consoleLogSpy).toHaveBeenCalledWith('Database connection closed');
     });
 
-    test('should handle close error gracefully', () => {
-      const db = getDatabase();
+    test('should handle close error gracefully', async () => {
+      const db = getDatabase().writer;
       db.close.mockImplementation((callback) => callback(new Error('Close error')));
 
-      closeDatabase();
+      await closeDatabase();
 
       expect(consoleErrorSpy).toHaveBeenCalledWith('Error closing database:', expect.any(Error));
     });
 
-    test('should handle multiple close calls safely', () => {
-      const db = getDatabase();
+    test('should handle multiple close calls safely', async () => {
+      const db = getDatabase().writer;
       // Reset close mock to default behavior (no error)
       db.close.mockImplementation((callback) => callback(null));
-      closeDatabase();
-      closeDatabase(); // Second call should not throw
+      await Promise.all([closeDatabase(), closeDatabase()]); // Second call should not throw
 
       expect(consoleErrorSpy).not.toHaveBeenCalled();
     });
   });
 
+  describe('sharding', () => {
+    let init;
+
+    beforeEach(() => {
+      process.env.DB_SHARDS = '3';
+      init = require('../../database/init');
+    });
+
+    afterEach(async () => {
+      await init.closeDatabase();
+      delete process.env.DB_SHARDS;
+    });
+
+    test('should open one database per shard', () => {
+      expect(init.getShards()).toHaveLength(3);
+      expect(consoleLogSpy).toHaveBeenCalledWith('Connected to SQLite in-memory database (shard 2 of 3)');
+    });
+
+    test('should route a user to the same shard every time', () => {
+      const db = init.getDatabase('test@example.com');
+
+      expect(init.getShards()).toContain(db);
+      expect(init.getDatabase('test@example.com')).toBe(db);
+    });
+
+    test('should require a user email to pick a shard', () => {
+      expect(() => init.getDatabase()).toThrow('getDatabase() needs a user email when DB_SHARDS > 1');
+    });
+
+    test('should record the layout and migrate every shard', async () => {
+      await init.initializeDatabase();
+
+      const queries = init.getShards()[0].writer.run.mock.calls.map(call => call[0]);
+      expect(queries.filter(q => q.includes('INSERT INTO shard_layout'))).toHaveLength(3);
+      expect(queries.filter(q => q === 'PRAGMA user_version = 10')).toHaveLength(3);
+    });
+  });
+
   describe('Database Schema', () => {
     test('users table should have correct structure', async () => {
-      const db = getDatabase();
+      const db = getDatabase().writer;
       await initializeDatabase();
 
       const userTableQuery = db.run.mock.calls.find(call => 
@@ -159,7 +235,7 @@ describe('Database Initialization', () => {
     });
 
     test('clients table should have foreign key to users', async () => {
-      const db = getDatabase();
+      const db = getDatabase().writer;
       await initializeDatabase();
 
       const clientTableQuery = db.run.mock.calls.find(call => 
@@ -172,7 +248,7 @@ describe('Database Initialization', () => {
     });
 
     test('work_entries table should have foreign keys', async () => {
-      const db = getDatabase();
+      const db = getDatabase().writer;
       await initializeDatabase();
 
       const workEntriesQuery = db.run.mock.calls.find(call => 
@@ -183,5 +259,22 @@ describe('Database Initialization', () => {
       expect(workEntriesQuery[0]).toContain('FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE');
       expect(workEntriesQuery[0]).toContain('FOREIGN KEY (user_email) REFERENCES users (email) ON DELETE CASCADE');
     });
+
+    test('should rebuild the tables keyed by integer user ids', async () => {
+      const db = getDatabase().writer;
+      await initializeDatabase();
+
+      const queries = db.run.mock.calls.map(call => call[0]);
+      const users = queries.find(q => q.includes('CREATE TABLE users_new'));
+      const workEntries = queries.find(q => q.includes('CREATE TABLE work_entries_new'));
+
+      expect(users).toContain('id INTEGER PRIMARY KEY');
+      expect(users).toContain('email TEXT NOT NULL UNIQUE');
+      expect(workEntries).toContain('FOREIGN KEY (user_id) REFERENCES users_new (id) ON DELETE CASCADE');
+      expect(queries).toContain('ALTER TABLE work_entries_new RENAME TO work_entries');
+      expect(queries.indexOf('DROP TABLE IF EXISTS users')).toBeLessThan(
+        queries.indexOf('ALTER TABLE users_new RENAME TO users')
+      );
+    });
   });
 });
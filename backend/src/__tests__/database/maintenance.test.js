@@ -0,0 +1,142 @@
+// Runs the maintenance tasks against a real temporary file database, and the
+// scheduler with a short check interval.
+jest.unmock('sqlite3');
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { createConnectionManager } = require('../../database/connection');
+const { createMaintenance, createLoadMonitor } = require('../../database/maintenance');
+const query = require('../../database/query');
+
+function waitUntil(condition, timeoutMs = 2000) {
+  const deadline = Date.now() + timeoutMs;
+  return new Promise((resolve, reject) => {
+    const poll = () => {
+      if (condition()) return resolve();
+      if (Date.now() > deadline) return reject(new Error('Timed out'));
+      setTimeout(poll, 10);
+    };
+    poll();
+  });
+}
+
+describe('Maintenance', () => {
+  let dir, filename, db;
+
+  beforeAll(async () => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'maintenance-'));
+    filename = path.join(dir, 'test.db');
+    db = createConnectionManager({
+      filename,
+      pragmas: { journal_mode: 'WAL', auto_vacuum: 'INCREMENTAL', wal_autocheckpoint: 0 }
+    });
+
+    await query.run(db, 'CREATE TABLE items (id INTEGER PRIMARY KEY, label TEXT)');
+    await query.run(db, 'CREATE INDEX idx_items_label ON items (label)');
+    await query.run(db, `
+      WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5000)
+      INSERT INTO items SELECT i, hex(randomblob(200)) FROM n`);
+    await query.run(db, 'DELETE FROM items WHERE id % 2 = 0');
+  });
+
+  afterAll(async () => {
+    await new Promise((resolve) => db.close(resolve));
+    fs.rmSync(dir, { recursive: true, force: true });
+  });
+
+  const create = (options = {}) => createMaintenance({ databases: [{ db, files: { main: filename } }], ...options });
+
+  describe('tasks', () => {
+    test('should checkpoint and truncate the WAL', async () => {
+      const effect = await create().runTask('checkpoint');
+
+      expect(effect.frames).toBeGreaterThan(0);
+      expect(effect.walBytesBefore).toBeGreaterThan(0);
+      expect(effect).toEqual(expect.objectContaining({ walBytesAfter: 0, busy: false }));
+    });
+
+    test('should hand free pages back', async () => {
+      const { freelist_count: before } = await query.get(db, 'PRAGMA freelist_count');
+      const effect = await create({ budgetMs: 5000 }).runTask('incrementalVacuum');
+
+      expect(before).toBeGreaterThan(0);
+      expect(effect).toEqual(expect.objectContaining({ pagesFreed: before, freePagesLeft: 0 }));
+      expect(await query.get(db, 'PRAGMA freelist_count')).toEqual({ freelist_count: 0 });
+    });
+
+    test('should analyze every table with an index', async () => {
+      await expect(create().runTask('analyze')).resolves.toEqual({ tables: 1 });
+    });
+
+    test('should record each run', async () => {
+      const maintenance = create();
+      await maintenance.runTask('analyze');
+
+      expect(maintenance.getStats().tasks.analyze).toEqual(expect.objectContaining({
+        runs: 1,
+        failures: 0,
+        lastEffect: { tables: 1 }
+      }));
+    });
+
+    test('should reject unknown tasks', async () => {
+      await expect(create().runTask('vacuum')).rejects.toThrow('Unknown maintenance task "vacuum"');
+    });
+
+    test('should leave checkpoints out for in-memory databases and when told to', () => {
+      const memory = createMaintenance({ databases: [{ db, files: { main: ':memory:' } }] });
+      const shipped = create({ checkpoint: false });
+
+      expect(Object.keys(memory.getStats().tasks)).toEqual(['incrementalVacuum', 'optimize', 'analyze']);
+      expect(Object.keys(shipped.getStats().tasks)).not.toContain('checkpoint');
+    });
+  });
+
+  describe('scheduler', () => {
+    test('should defer tasks while requests keep coming', async () => {
+      const maintenance = create({ checkMs: 20, idleLagMs: 1000 });
+      maintenance.start();
+      const busy = setInterval(() => maintenance.noteRequest(), 1);
+
+      await waitUntil(() => maintenance.getStats().checks >= 2);
+      clearInterval(busy);
+      await maintenance.stop();
+
+      const { idleChecks, tasks } = maintenance.getStats();
+      expect(idleChecks).toBe(0);
+      expect(tasks.analyze).toEqual(expect.objectContaining({ runs: 0, deferred: expect.any(Number) }));
+      expect(tasks.analyze.deferred).toBeGreaterThan(0);
+    });
+
+    test('should run due tasks once the server is idle', async () => {
+      const maintenance = create({ checkMs: 20, idleLagMs: 1000 });
+      maintenance.start();
+
+      await waitUntil(() => maintenance.getStats().tasks.analyze.runs === 1);
+      await maintenance.stop();
+
+      expect(maintenance.getStats()).toEqual(expect.objectContaining({
+        load: expect.objectContaining({ idle: true }),
+        forced: 0
+      }));
+    });
+  });
+
+  describe('createLoadMonitor', () => {
+    test('should report the request rate since the last sample', async () => {
+      const load = createLoadMonitor();
+      load.start();
+      for (let i = 0; i < 10; i++) load.noteRequest();
+      await new Promise((resolve) => setTimeout(resolve, 100));
+
+      const { requestRate, lagMs } = load.sample();
+      load.stop();
+
+      expect(requestRate).toBeGreaterThan(0);
+      expect(requestRate).toBeLessThanOrEqual(100);
+      expect(lagMs).toBeGreaterThanOrEqual(0);
+      expect(load.sample().requestRate).toBe(0);
+    });
+  });
+});
@@ -0,0 +1,136 @@
+const { runMigrations, createIndexSql } = require('../../database/migrate');
+
+describe('Migration Runner', () => {
+  let consoleLogSpy, mockDb, executed, existingIndexes, userVersion;
+
+  beforeEach(() => {
+    consoleLogSpy = jest.spyOn(console, 'log').mockImplementation();
+    executed = [];
+    existingIndexes = new Set();
+    userVersion = 0;
+
+    const handle = {
+      run: jest.fn((sql, params, callback) => {
+        executed.push(sql);
+        callback.call({ lastID: 0, changes: 0 }, null);
+      }),
+      get: jest.fn((sql, params, callback) => {
+        if (sql.includes('user_version')) {
+          return callback(null, { user_version: userVersion });
+        }
+        callback(null, existingIndexes.has(params[0]) ? { name: params[0] } : undefined);
+      }),
+      all: jest.fn((sql, params, callback) => callback(null, []))
+    };
+
+    mockDb = {
+      ...handle,
+      transaction: jest.fn(async (work) => {
+        executed.push('BEGIN');
+        const result = await work(handle);
+        executed.push('COMMIT');
+        return result;
+      })
+    };
+  });
+
+  afterEach(() => {
+    consoleLogSpy.mockRestore();
+    jest.clearAllMocks();
+  });
+
+  const migration = (version, extra = {}) => ({
+    version,
+    name: `migration_${version}`,
+    up: jest.fn(async () => {}),
+    ...extra
+  });
+
+  test('should apply pending migrations in order, each in its own transaction', async () => {
+    const first = migration(1);
+    const second = migration(2);
+
+    const version = await runMigrations(mockDb, [second, first]);
+
+    expect(version).toBe(2);
+    expect(first.up).toHaveBeenCalled();
+    expect(second.up).toHaveBeenCalled();
+    expect(executed.filter((sql) => sql.startsWith('PRAGMA user_version'))).toEqual([
+      'PRAGMA user_version = 1',
+      'PRAGMA user_version = 2'
+    ]);
+  });
+
+  test('should skip migrations at or below the current version', async () => {
+    userVersion = 1;
+    const first = migration(1);
+    const second = migration(2);
+
+    await runMigrations(mockDb, [first, second]);
+
+    expect(first.up).not.toHaveBeenCalled();
+    expect(second.up).toHaveBeenCalled();
+  });
+
+  test('should record the migration with its duration', async () => {
+    await runMigrations(mockDb, [migration(1)]);
+
+    const insert = mockDb.run.mock.calls.find(([sql]) => sql.includes('INSERT OR REPLACE INTO schema_migrations'));
+    expect(insert[1]).toEqual([1, 'migration_1', expect.any(Number)]);
+    expect(consoleLogSpy).toHaveBeenCalledWith(expect.stringMatching(/^Migration 1 \(migration_1\) applied in [\d.]+ms$/));
+  });
+
+  test('should stop and reject when a migration fails', async () => {
+    const failing = migration(1, { up: jest.fn(async () => { throw new Error('bad migration'); }) });
+    const next = migration(2);
+
+    await expect(runMigrations(mockDb, [failing, next])).rejects.toThrow('bad migration');
+    expect(next.up).not.toHaveBeenCalled();
+    expect(executed).not.toContain('PRAGMA user_version = 1');
+  });
+
+  test('should build missing indexes in their own transactions', async () => {
+    existingIndexes.add('idx_a');
+
+    await runMigrations(mockDb, [migration(1, {
+      indexes: [
+        { name: 'idx_a', table: 'things', columns: ['a'] },
+        { name: 'idx_b', table: 'things', columns: ['b', 'c'] }
+      ]
+    })]);
+
+    const buildIndex = executed.indexOf('CREATE INDEX IF NOT EXISTS idx_b ON things (b, c)');
+    expect(buildIndex).toBeGreaterThan(-1);
+    expect(executed[buildIndex - 1]).toBe('BEGIN');
+    expect(executed[buildIndex + 1]).toBe('COMMIT');
+    expect(executed.some((sql) => sql.includes('idx_a ON'))).toBe(false);
+  });
+
+  test('should build a replacement index before dropping the old one', async () => {
+    existingIndexes.add('idx_old');
+
+    await runMigrations(mockDb, [
+      migration(1, { indexes: [{ name: 'idx_old', table: 'things', columns: ['a'] }] }),
+      migration(2, { indexes: [{ name: 'idx_new', table: 'things', columns: ['a', 'b'], replaces: ['idx_old'] }] })
+    ]);
+
+    const built = executed.indexOf('CREATE INDEX IF NOT EXISTS idx_new ON things (a, b)');
+    const dropped = executed.indexOf('DROP INDEX IF EXISTS idx_old');
+    expect(built).toBeGreaterThan(-1);
+    expect(dropped).toBeGreaterThan(built);
+  });
+
+  test('should not rebuild retired indexes', async () => {
+    await runMigrations(mockDb, [
+      migration(1, { indexes: [{ name: 'idx_old', table: 'things', columns: ['a'] }] }),
+      migration(2, { dropIndexes: ['idx_old'] })
+    ]);
+
+    expect(executed.some((sql) => sql.includes('idx_old ON'))).toBe(false);
+  });
+
+  test('createIndexSql should support unique and partial indexes', () => {
+    expect(createIndexSql({ name: 'idx_u', table: 't', columns: ['a'], unique: true, where: 'a IS NOT NULL' }))
+      .toBe('CREATE UNIQUE INDEX IF NOT EXISTS idx_u ON t (a) WHERE a IS NOT NULL');
+  });
+});
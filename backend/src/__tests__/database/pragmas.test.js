@@ -0,0 +1,82 @@
+const {
+  PROFILES,
+  DEFAULT_PROFILE,
+  resolvePragmas,
+  pragmaStatements,
+  describePragmas
+} = require('../../database/pragmas');
+
+describe('Pragma Profiles', () => {
+  describe('resolvePragmas', () => {
+    test('should default to the durable profile', () => {
+      const { profile, pragmas } = resolvePragmas({});
+
+      expect(profile).toBe(DEFAULT_PROFILE);
+      expect(profile).toBe('durable');
+      expect(pragmas.synchronous).toBe('FULL');
+    });
+
+    test('should select a profile by name', () => {
+      const { pragmas } = resolvePragmas({ DB_PRAGMA_PROFILE: 'throughput' });
+
+      expect(pragmas).toEqual(PROFILES.throughput);
+    });
+
+    test('should enable foreign keys and WAL in every profile', () => {
+      for (const pragmas of Object.values(PROFILES)) {
+        expect(pragmas.foreign_keys).toBe('ON');
+        expect(pragmas.journal_mode).toBe('WAL');
+      }
+    });
+
+    test('should apply per-pragma overrides on top of the profile', () => {
+      const { pragmas } = resolvePragmas({
+        DB_PRAGMA_PROFILE: 'throughput',
+        DB_PRAGMA_SYNCHRONOUS: 'NORMAL',
+        DB_PRAGMA_CACHE_SIZE: '-1000'
+      });
+
+      expect(pragmas.synchronous).toBe('NORMAL');
+      expect(pragmas.cache_size).toBe('-1000');
+      expect(pragmas.mmap_size).toBe(PROFILES.throughput.mmap_size);
+    });
+
+    test('should reject an unknown profile', () => {
+      expect(() => resolvePragmas({ DB_PRAGMA_PROFILE: 'fast' })).toThrow('Unknown DB_PRAGMA_PROFILE "fast"');
+    });
+
+    test('should reject override values that are not a keyword or integer', () => {
+      expect(() => resolvePragmas({ DB_PRAGMA_SYNCHRONOUS: 'OFF; DROP TABLE users' }))
+        .toThrow('Invalid value for DB_PRAGMA_SYNCHRONOUS');
+    });
+  });
+
+  describe('pragmaStatements', () => {
+    test('should build one statement per pragma', () => {
+      expect(pragmaStatements({ journal_mode: 'WAL', busy_timeout: 5000 })).toEqual([
+        'PRAGMA journal_mode = WAL',
+        'PRAGMA busy_timeout = 5000'
+      ]);
+    });
+
+    test('should set auto_vacuum before journal_mode', () => {
+      expect(pragmaStatements({ journal_mode: 'WAL', auto_vacuum: 'INCREMENTAL' })).toEqual([
+        'PRAGMA auto_vacuum = INCREMENTAL',
+        'PRAGMA journal_mode = WAL'
+      ]);
+    });
+
+    test('should leave journal_mode and auto_vacuum out for read-only connections', () => {
+      expect(pragmaStatements({ journal_mode: 'WAL', busy_timeout: 5000, auto_vacuum: 'INCREMENTAL' }, { readOnly: true })).toEqual([
+        'PRAGMA busy_timeout = 5000'
+      ]);
+    });
+  });
+
+  describe('describePragmas', () => {
+    test('should report integer settings by keyword', () => {
+      expect(describePragmas({ journal_mode: 'wal', synchronous: 1, temp_store: 2, foreign_keys: 1, cache_size: -64000 }))
+        .toBe('journal_mode=wal synchronous=NORMAL temp_store=MEMORY foreign_keys=ON cache_size=-64000');
+    });
+  });
+});
@@ -0,0 +1,128 @@
+const fs = require('fs');
+const { createQueryLog, normalizeSql, paramShape } = require('../../database/queryLog');
+
+describe('Query Log', () => {
+  let consoleWarnSpy;
+
+  beforeEach(() => {
+    consoleWarnSpy = jest.spyOn(console, 'warn').mockImplementation();
+  });
+
+  afterEach(() => {
+    consoleWarnSpy.mockRestore();
+    jest.restoreAllMocks();
+  });
+
+  describe('normalizeSql', () => {
+    test('should collapse whitespace and replace literals', () => {
+      expect(normalizeSql(`
+        SELECT id FROM clients
+        WHERE name = 'O''Brien' AND id > 10`)).toBe('SELECT id FROM clients WHERE name = ? AND id > ?');
+      expect(normalizeSql('PRAGMA user_version = 5')).toBe('PRAGMA user_version = ?');
+    });
+
+    test('should leave digits inside identifiers alone', () => {
+      expect(normalizeSql('SELECT * FROM shard_2')).toBe('SELECT * FROM shard_2');
+    });
+  });
+
+  describe('paramShape', () => {
+    test('should report types, never values', () => {
+      expect(paramShape(['a@example.com', 3, null, new Date(0)])).toEqual(['string', 'number', 'null', 'date']);
+      expect(paramShape({ $email: 'a@example.com' })).toEqual({ $email: 'string' });
+    });
+  });
+
+  describe('record', () => {
+    test('should bucket statements by normalised SQL with percentiles', () => {
+      const log = createQueryLog({ thresholdMs: 1000 });
+      for (let i = 1; i <= 100; i++) {
+        log.record(`SELECT * FROM clients WHERE id = ${i}`, [], i);
+      }
+
+      const [statement] = log.getReport().statements;
+      expect(statement).toMatchObject({
+        sql: 'SELECT * FROM clients WHERE id = ?',
+        count: 100,
+        slow: 0,
+        p50Ms: 50,
+        p95Ms: 95,
+        maxMs: 100
+      });
+    });
+
+    test('should order statements by total time', () => {
+      const log = createQueryLog();
+      log.record('SELECT 1 FROM users', [], 1);
+      log.record('SELECT 1 FROM clients', [], 5);
+
+      expect(log.getReport().statements.map((s) => s.sql)).toEqual([
+        'SELECT ? FROM clients',
+        'SELECT ? FROM users'
+      ]);
+    });
+
+    test('should count failed statements', () => {
+      const log = createQueryLog();
+      log.record('SELECT * FROM missing', [], 1, { failed: true });
+
+      expect(log.getReport().statements[0].errors).toBe(1);
+    });
+  });
+
+  describe('slow log', () => {
+    test('should log slow statements with their parameter shape and plan', async () => {
+      const log = createQueryLog({ thresholdMs: 10 });
+      const explain = jest.fn().mockResolvedValue([{ detail: 'SCAN work_entries' }]);
+
+      log.record('SELECT * FROM work_entries WHERE user_email = ?', ['a@example.com'], 25, { explain });
+      await new Promise((resolve) => setImmediate(resolve));
+
+      expect(explain).toHaveBeenCalledWith('SELECT * FROM work_entries WHERE user_email = ?', ['a@example.com']);
+      const { recentSlow, statements } = log.getReport();
+      expect(recentSlow).toEqual([expect.objectContaining({
+        sql: 'SELECT * FROM work_entries WHERE user_email = ?',
+        params: ['string'],
+        durationMs: 25,
+        plan: ['SCAN work_entries']
+      })]);
+      expect(statements[0].plan).toEqual(['SCAN work_entries']);
+      expect(consoleWarnSpy).toHaveBeenCalledWith(expect.stringContaining('Slow query (25ms)'));
+      expect(consoleWarnSpy.mock.calls[0][0]).not.toContain('a@example.com');
+    });
+
+    test('should explain a statement once and reuse the plan', async () => {
+      const log = createQueryLog({ thresholdMs: 10 });
+      const explain = jest.fn().mockResolvedValue([{ detail: 'SEARCH clients' }]);
+
+      log.record('SELECT * FROM clients WHERE id = ?', [1], 20, { explain });
+      await new Promise((resolve) => setImmediate(resolve));
+      log.record('SELECT * FROM clients WHERE id = ?', [2], 30, { explain });
+
+      expect(explain).toHaveBeenCalledTimes(1);
+      expect(log.getReport().recentSlow[1].plan).toEqual(['SEARCH clients']);
+    });
+
+    test('should not explain transaction control statements', () => {
+      const log = createQueryLog({ thresholdMs: 10 });
+      const explain = jest.fn();
+
+      log.record('COMMIT', [], 50, { explain });
+
+      expect(explain).not.toHaveBeenCalled();
+      expect(log.getReport().recentSlow[0]).toMatchObject({ sql: 'COMMIT', plan: null });
+    });
+
+    test('should append JSON lines to the log file when configured', () => {
+      const appendFile = jest.spyOn(fs, 'appendFile').mockImplementation((file, data, callback) => callback(null));
+      const log = createQueryLog({ thresholdMs: 10, logFile: '/var/log/slow.log' });
+
+      log.record('COMMIT', [], 50);
+
+      const [file, line] = appendFile.mock.calls[0];
+      expect(file).toBe('/var/log/slow.log');
+      expect(JSON.parse(line)).toMatchObject({ sql: 'COMMIT', durationMs: 50 });
+      expect(consoleWarnSpy).not.toHaveBeenCalled();
+    });
+  });
+});
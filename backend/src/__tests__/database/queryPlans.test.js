@@ -0,0 +1,75 @@
+// Runs EXPLAIN QUERY PLAN against a real in-memory database built by the
+// migrations, so a query that loses its index shows up here rather than as a
+// slow endpoint.
+jest.unmock('sqlite3');
+
+// Attach an archive so the ...WithArchive statements can be planned too
+process.env.DB_ARCHIVE_PATH = ':memory:';
+
+const { getDatabase, initializeDatabase, closeDatabase } = require('../../database/init');
+const { STATEMENTS } = require('../../database/statements');
+const query = require('../../database/query');
+
+// Dynamically built statements from the repositories, in their widest form
+const DYNAMIC_STATEMENTS = {
+  updateClient: `
+    UPDATE clients SET name = ?, description = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND user_id = ? RETURNING id, name`,
+  updateWorkEntry: `
+    UPDATE work_entries SET client_id = ?, hundredths = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ? AND user_id = ?
+      AND EXISTS (SELECT 1 FROM clients c WHERE c.id = ? AND c.user_id = ?)
+    RETURNING id`
+};
+
+// Full table scans and sorts that the indexes should have made unnecessary.
+// Reading back an already ordered subquery (the archive unions) is fine, and
+// so is an FTS5 MATCH, which EXPLAIN reports as a virtual table SCAN.
+const BAD_PLAN = /^SCAN (?!\(?subquery|\w+ VIRTUAL TABLE INDEX \d+:M)|USE TEMP B-TREE/i;
+
+function placeholders(sql) {
+  return (sql.match(/\?/g) || []).map(() => null);
+}
+
+describe('Query Plans', () => {
+  let consoleLogSpy;
+
+  beforeAll(async () => {
+    consoleLogSpy = jest.spyOn(console, 'log').mockImplementation();
+    await initializeDatabase();
+  });
+
+  afterAll(async () => {
+    await closeDatabase();
+    delete process.env.DB_ARCHIVE_PATH;
+    consoleLogSpy.mockRestore();
+  });
+
+  const statements = Object.entries({ ...STATEMENTS, ...DYNAMIC_STATEMENTS });
+
+  test.each(statements)('%s should use an index for every lookup', async (name, sql) => {
+    const plan = await query.all(getDatabase(), `EXPLAIN QUERY PLAN ${sql}`, placeholders(sql));
+    const details = plan.map((step) => step.detail);
+
+    expect(details.filter((detail) => BAD_PLAN.test(detail))).toEqual([]);
+  });
+
+  test('superseded indexes should not exist', async () => {
+    const rows = await query.all(getDatabase(), "SELECT name FROM sqlite_master WHERE type = 'index'");
+    const names = rows.map((row) => row.name);
+
+    expect(names).toEqual(expect.arrayContaining([
+      'idx_clients_user_id_name',
+      'idx_work_entries_user_day',
+      'idx_work_entries_client_user_day',
+      'idx_work_entry_daily_user_id_day_hundredths'
+    ]));
+    expect(names).not.toContain('idx_work_entries_user_id_date');
+    expect(names).not.toContain('idx_work_entries_client_user_id_date');
+    expect(names).not.toContain('idx_work_entry_daily_user_id_day');
+    expect(names).not.toContain('idx_work_entries_client_id');
+    expect(names).not.toContain('idx_work_entries_user_email');
+    expect(names).not.toContain('idx_work_entries_date');
+    expect(names).not.toContain('idx_work_entries_user_date');
+  });
+});
@@ -0,0 +1,147 @@
+// Ships a real primary's WAL to a replica over the replication routes and
+// checks the replica's reads, on temporary file databases.
+jest.unmock('sqlite3');
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const express = require('express');
+const request = require('supertest');
+const { createConnectionManager } = require('../../database/connection');
+const { createWalShipper, encodeBatches, decodeBatches } = require('../../database/walShipping');
+const { createReplica, READ_ONLY_REPLICA } = require('../../database/replica');
+const query = require('../../database/query');
+
+const shippers = [];
+jest.mock('../../database/init', () => ({
+  getShippers: () => shippers
+}));
+
+const replicationRoutes = require('../../routes/replication');
+
+describe('Replication', () => {
+  let dir, primary, shipper, server, replica, consoleLogSpy;
+
+  const count = async (db) => (await query.get(db, 'SELECT COUNT(*) AS n FROM items')).n;
+  const caughtUp = async () => {
+    await shipper.capture();
+    return replica.waitFor(shipper.position(), 2000);
+  };
+
+  beforeAll(async () => {
+    consoleLogSpy = jest.spyOn(console, 'log').mockImplementation();
+    process.env.REPLICATION_TOKEN = 'test-token';
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'replication-'));
+
+    primary = createConnectionManager({
+      filename: path.join(dir, 'primary.db'),
+      pragmas: { journal_mode: 'wal', wal_autocheckpoint: 0 }
+    });
+    await query.run(primary, 'CREATE TABLE items (id INTEGER PRIMARY KEY, label TEXT)');
+
+    shipper = createWalShipper({ db: primary, files: { main: path.join(dir, 'primary.db') }, checkpointFrames: 20 });
+    shippers.push(shipper);
+    await shipper.prepare();
+
+    const app = express();
+    app.use('/replication', replicationRoutes);
+    await new Promise((resolve) => {
+      server = app.listen(0, '127.0.0.1', resolve);
+    });
+
+    replica = createReplica({
+      primaryUrl: `http://127.0.0.1:${server.address().port}`,
+      token: 'test-token',
+      files: { main: path.join(dir, 'replica.db') },
+      id: 'test-replica',
+      pollTimeoutMs: 500,
+      retryMs: 50,
+      openDatabase: () => createConnectionManager({ filename: path.join(dir, 'replica.db'), readPoolSize: 1 })
+    });
+    await replica.start();
+  });
+
+  afterAll(async () => {
+    await replica.stop();
+    await shipper.stop();
+    await new Promise((resolve) => server.close(resolve));
+    await new Promise((resolve) => primary.close(resolve));
+    fs.rmSync(dir, { recursive: true, force: true });
+    delete process.env.REPLICATION_TOKEN;
+    consoleLogSpy.mockRestore();
+  });
+
+  test('should start from a snapshot of the primary', async () => {
+    expect(await count(replica.db)).toBe(0);
+    expect(replica.getStatus()).toEqual(expect.objectContaining({ role: 'replica', snapshots: 1, healthy: true }));
+  });
+
+  test('should apply committed writes', async () => {
+    await query.run(primary, "INSERT INTO items (label) VALUES ('first'), ('second')");
+
+    await expect(caughtUp()).resolves.toBe(true);
+    expect(await query.all(replica.db, 'SELECT label FROM items ORDER BY id')).toEqual([
+      { label: 'first' },
+      { label: 'second' }
+    ]);
+  });
+
+  test('should follow the primary across checkpoints and schema changes', async () => {
+    for (let i = 0; i < 30; i++) {
+      await query.run(primary, 'INSERT INTO items (label) SELECT hex(randomblob(400)) FROM items LIMIT 10');
+    }
+    await query.run(primary, 'CREATE INDEX idx_items_label ON items(label)');
+    await query.run(primary, 'DELETE FROM items WHERE id % 2 = 0');
+
+    await expect(caughtUp()).resolves.toBe(true);
+    expect(await count(replica.db)).toBe(await count(primary));
+    expect(await query.get(replica.db, 'PRAGMA integrity_check')).toEqual({ integrity_check: 'ok' });
+  });
+
+  test('should resync after a checkpoint it did not take', async () => {
+    const before = shipper.epoch;
+    await query.get(primary, 'PRAGMA wal_checkpoint(TRUNCATE)');
+    await query.run(primary, "INSERT INTO items (label) VALUES ('after')");
+    await shipper.capture();
+
+    expect(shipper.epoch).not.toBe(before);
+    await expect(replica.waitFor(shipper.position(), 2000)).resolves.toBe(true);
+    expect(await count(replica.db)).toBe(await count(primary));
+    expect(replica.getStatus().snapshots).toBe(2);
+  });
+
+  test('should reject writes', async () => {
+    await expect(query.run(replica.db, "INSERT INTO items (label) VALUES ('no')"))
+      .rejects.toEqual(expect.objectContaining({ code: READ_ONLY_REPLICA }));
+  });
+
+  test('should report the follower to the primary', () => {
+    expect(shipper.getStats().followers).toEqual([
+      expect.objectContaining({ id: 'test-replica' })
+    ]);
+  });
+
+  test('should not wait for a position from another epoch', async () => {
+    await expect(replica.waitFor('0000000000000000.1', 1000)).resolves.toBe(false);
+  });
+
+  test('should round-trip encoded batches', () => {
+    const batches = [{
+      seq: 3,
+      capturedAt: 1000,
+      files: { main: { pageSize: 4, dbSize: 2, pages: [[1, Buffer.from('abcd')], [2, Buffer.from('efgh')]] } }
+    }];
+
+    expect(decodeBatches(encodeBatches(batches))).toEqual([expect.objectContaining({
+      seq: 3,
+      capturedAt: 1000,
+      files: { main: { pageSize: 4, dbSize: 2, pages: [[1, Buffer.from('abcd')], [2, Buffer.from('efgh')]] } }
+    })]);
+  });
+
+  test('should refuse requests without the token', async () => {
+    const response = await request(server).get(`/replication/changes/0?epoch=${shipper.epoch}&after=0`);
+
+    expect(response.status).toBe(401);
+  });
+});
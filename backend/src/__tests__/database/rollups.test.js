@@ -0,0 +1,52 @@
+const { ROLLUPS, ROLLUPS_WITH_ARCHIVE, rebuildRollups } = require('../../database/rollups');
+
+describe('Rollups', () => {
+  let mockDb, tx;
+
+  beforeEach(() => {
+    tx = {
+      all: jest.fn((sql, params, callback) => callback(null, [{ seq: 0, name: 'main' }])),
+      run: jest.fn(function(sql, params, callback) {
+        callback.call({ changes: sql.startsWith('DELETE') ? 0 : 7 }, null);
+      })
+    };
+    mockDb = {
+      transaction: jest.fn((work) => work(tx))
+    };
+  });
+
+  test('should clear and backfill every rollup in one transaction', async () => {
+    const counts = await rebuildRollups(mockDb);
+
+    expect(mockDb.transaction).toHaveBeenCalledTimes(1);
+    expect(counts).toEqual({ client_hour_totals: 7, work_entry_daily: 7 });
+
+    const statements = tx.run.mock.calls.map(([sql]) => sql);
+    expect(statements).toEqual([
+      'DELETE FROM client_hour_totals',
+      ROLLUPS.client_hour_totals,
+      'DELETE FROM work_entry_daily',
+      ROLLUPS.work_entry_daily
+    ]);
+  });
+
+  test('should count archived entries when an archive is attached', async () => {
+    tx.all.mockImplementation((sql, params, callback) => callback(null, [
+      { seq: 0, name: 'main' },
+      { seq: 2, name: 'archive' }
+    ]));
+
+    await rebuildRollups(mockDb);
+
+    const statements = tx.run.mock.calls.map(([sql]) => sql);
+    expect(statements).toContain(ROLLUPS_WITH_ARCHIVE.client_hour_totals);
+    expect(statements).toContain(ROLLUPS_WITH_ARCHIVE.work_entry_daily);
+    expect(ROLLUPS_WITH_ARCHIVE.work_entry_daily).toContain('archive.work_entries');
+  });
+
+  test('should reject when a backfill fails', async () => {
+    tx.run.mockImplementation((sql, params, callback) => callback(new Error('Backfill failed')));
+
+    await expect(rebuildRollups(mockDb)).rejects.toThrow('Backfill failed');
+  });
+});
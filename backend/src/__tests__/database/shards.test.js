@@ -0,0 +1,102 @@
+const {
+  hashKey,
+  shardIndex,
+  shardFilename,
+  checkShardLayout,
+  mergeStatementStats
+} = require('../../database/shards');
+
+describe('Shards', () => {
+  describe('shardIndex', () => {
+    test('should hash with 32-bit FNV-1a', () => {
+      expect(hashKey('a')).toBe(0xe40c292c);
+    });
+
+    test('should always map a user to the same shard', () => {
+      const index = shardIndex('test@example.com', 4);
+
+      expect(index).toBeGreaterThanOrEqual(0);
+      expect(index).toBeLessThan(4);
+      expect(shardIndex('test@example.com', 4)).toBe(index);
+    });
+
+    test('should use shard 0 without sharding', () => {
+      expect(shardIndex('test@example.com', 1)).toBe(0);
+    });
+
+    test('should spread users evenly', () => {
+      const counts = [0, 0, 0, 0];
+      for (let i = 0; i < 4000; i++) {
+        counts[shardIndex(`user${i}@example.com`, 4)]++;
+      }
+
+      for (const count of counts) {
+        expect(count).toBeGreaterThan(800);
+        expect(count).toBeLessThan(1200);
+      }
+    });
+  });
+
+  describe('shardFilename', () => {
+    test('should number shard files before the extension', () => {
+      expect(shardFilename('/app/data/timesheet.db', 2, 4)).toBe('/app/data/timesheet.shard-2.db');
+    });
+
+    test('should keep the plain name for a single shard', () => {
+      expect(shardFilename('/app/data/timesheet.db', 0, 1)).toBe('/app/data/timesheet.db');
+    });
+
+    test('should leave in-memory databases alone', () => {
+      expect(shardFilename(':memory:', 1, 2)).toBe(':memory:');
+    });
+  });
+
+  describe('checkShardLayout', () => {
+    let tx, db;
+
+    beforeEach(() => {
+      tx = {
+        run: jest.fn((sql, params, callback) => callback.call({ lastID: 0, changes: 1 }, null)),
+        get: jest.fn()
+      };
+      db = { transaction: jest.fn((work) => work(tx)) };
+    });
+
+    test('should record the layout of a new shard', async () => {
+      tx.get.mockImplementation((sql, params, callback) => callback(null, undefined));
+
+      await checkShardLayout(db, 1, 4);
+
+      expect(tx.run).toHaveBeenCalledWith(
+        'INSERT INTO shard_layout (shard_index, shard_count) VALUES (?, ?)',
+        [1, 4],
+        expect.any(Function)
+      );
+    });
+
+    test('should accept a shard opened with its original layout', async () => {
+      tx.get.mockImplementation((sql, params, callback) => callback(null, { shard_index: 1, shard_count: 4 }));
+
+      await expect(checkShardLayout(db, 1, 4)).resolves.toBeUndefined();
+    });
+
+    test('should refuse a shard created for a different shard count', async () => {
+      tx.get.mockImplementation((sql, params, callback) => callback(null, { shard_index: 1, shard_count: 4 }));
+
+      await expect(checkShardLayout(db, 1, 2)).rejects.toThrow('Shard 1 of 2 was created as shard 1 of 4');
+    });
+  });
+
+  describe('mergeStatementStats', () => {
+    test('should add counters and keep the worst latency', () => {
+      const merged = mergeStatementStats([
+        { findUser: { hits: 2, prepares: 1, errors: 0, totalMs: 4, maxMs: 3 } },
+        { findUser: { hits: 2, prepares: 1, errors: 1, totalMs: 2, maxMs: 1 } }
+      ]);
+
+      expect(merged).toEqual({
+        findUser: { hits: 4, prepares: 2, errors: 1, totalMs: 6, maxMs: 3, avgMs: 1.5 }
+      });
+    });
+  });
+});
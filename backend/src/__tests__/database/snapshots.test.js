@@ -0,0 +1,126 @@
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { createSnapshotter } = require('../../database/snapshots');
+
+// Fake connection manager whose backup() copies a one-line "database"
+// between `contents` and the snapshot file
+function createFakeDb() {
+  const fake = {
+    contents: 'empty',
+    changes: 0,
+    drain: jest.fn(() => Promise.resolve()),
+    runExclusive: jest.fn((task) => Promise.resolve().then(task)),
+    writer: {
+      get: jest.fn((sql, params, callback) => callback(null, { changes: fake.changes })),
+      backup: jest.fn((filename, destName, sourceName, toFile, callback) => {
+        const backup = {
+          step: jest.fn((pages, cb) => {
+            if (toFile) {
+              fs.writeFileSync(filename, fake.contents);
+            } else {
+              fake.contents = fs.readFileSync(filename, 'utf8');
+            }
+            cb(null);
+          }),
+          finish: jest.fn((cb) => cb())
+        };
+        setImmediate(() => callback(null));
+        return backup;
+      })
+    }
+  };
+  return fake;
+}
+
+describe('Snapshots', () => {
+  let dir, filename, db, consoleLogSpy;
+
+  beforeEach(() => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'snapshots-'));
+    filename = path.join(dir, 'nested', 'timesheet.db');
+    db = createFakeDb();
+    consoleLogSpy = jest.spyOn(console, 'log').mockImplementation();
+  });
+
+  afterEach(() => {
+    consoleLogSpy.mockRestore();
+    fs.rmSync(dir, { recursive: true, force: true });
+  });
+
+  test('should start empty when there is no snapshot', async () => {
+    const snapshotter = createSnapshotter({ db, filename });
+
+    await expect(snapshotter.restore()).resolves.toBe(false);
+    expect(db.writer.backup).not.toHaveBeenCalled();
+  });
+
+  test('should restore the snapshot into memory under the write lock', async () => {
+    fs.mkdirSync(path.dirname(filename), { recursive: true });
+    fs.writeFileSync(filename, 'saved');
+    const snapshotter = createSnapshotter({ db, filename });
+
+    await expect(snapshotter.restore()).resolves.toBe(true);
+
+    expect(db.contents).toBe('saved');
+    expect(db.runExclusive).toHaveBeenCalledTimes(1);
+    expect(db.writer.backup).toHaveBeenCalledWith(filename, 'main', 'main', false, expect.any(Function));
+    expect(snapshotter.getStats().restore).toEqual({ sizeBytes: 5, durationMs: expect.any(Number) });
+  });
+
+  test('should write the snapshot through a temporary file', async () => {
+    const snapshotter = createSnapshotter({ db, filename });
+    snapshotter.start();
+    db.contents = 'data';
+
+    await expect(snapshotter.snapshot()).resolves.toBe(true);
+    await snapshotter.stop();
+
+    expect(db.writer.backup.mock.calls[0][0]).toBe(`${filename}.tmp`);
+    expect(fs.readFileSync(filename, 'utf8')).toBe('data');
+    expect(fs.existsSync(`${filename}.tmp`)).toBe(false);
+    expect(snapshotter.getStats()).toMatchObject({ snapshots: 1, skipped: 1, lastSizeBytes: 4, failures: 0 });
+  });
+
+  test('should skip the copy when nothing has changed', async () => {
+    const snapshotter = createSnapshotter({ db, filename });
+    snapshotter.start();
+
+    await snapshotter.snapshot();
+    await expect(snapshotter.snapshot()).resolves.toBe(false);
+    db.changes = 3;
+    await expect(snapshotter.snapshot()).resolves.toBe(true);
+    await snapshotter.stop();
+
+    expect(db.writer.backup).toHaveBeenCalledTimes(2);
+  });
+
+  test('should share an in-progress snapshot between callers', async () => {
+    const snapshotter = createSnapshotter({ db, filename });
+    snapshotter.start();
+
+    await Promise.all([snapshotter.snapshot(), snapshotter.snapshot()]);
+    await snapshotter.stop();
+
+    expect(snapshotter.getStats().snapshots).toBe(1);
+  });
+
+  test('should drain queued writes before the final snapshot', async () => {
+    const snapshotter = createSnapshotter({ db, filename });
+    snapshotter.start();
+
+    await snapshotter.stop();
+
+    expect(db.drain).toHaveBeenCalled();
+    expect(fs.existsSync(filename)).toBe(true);
+  });
+
+  test('should not overwrite a snapshot when start() never ran', async () => {
+    const snapshotter = createSnapshotter({ db, filename });
+
+    await snapshotter.stop();
+
+    expect(db.drain).not.toHaveBeenCalled();
+    expect(db.writer.backup).not.toHaveBeenCalled();
+  });
+});
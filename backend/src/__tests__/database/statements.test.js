@@ -0,0 +1,111 @@
+const { STATEMENTS, createStatementRegistry } = require('../../database/statements');
+
+describe('Statement Registry', () => {
+  let registry, connection, statement;
+
+  beforeEach(() => {
+    statement = {
+      get: jest.fn((params, callback) => callback(null, { email: 'test@example.com' })),
+      all: jest.fn((params, callback) => callback(null, [])),
+      run: jest.fn(function(params, callback) {
+        callback.call({ lastID: 7, changes: 1 }, null);
+      }),
+      reset: jest.fn(),
+      finalize: jest.fn((callback) => callback())
+    };
+    connection = {
+      prepare: jest.fn(() => statement)
+    };
+    registry = createStatementRegistry();
+  });
+
+  afterEach(() => {
+    jest.clearAllMocks();
+  });
+
+  test('should ignore SQL that is not a named statement', () => {
+    const handled = registry.execute(connection, 'get', 'SELECT 1', [jest.fn()]);
+
+    expect(handled).toBe(false);
+    expect(connection.prepare).not.toHaveBeenCalled();
+  });
+
+  test('should prepare a named statement once per connection', () => {
+    registry.execute(connection, 'get', STATEMENTS.findUserId, [['a@example.com'], jest.fn()]);
+    registry.execute(connection, 'get', STATEMENTS.findUserId, [['b@example.com'], jest.fn()]);
+
+    expect(connection.prepare).toHaveBeenCalledTimes(1);
+    expect(connection.prepare).toHaveBeenCalledWith(STATEMENTS.findUserId, expect.any(Function));
+    expect(statement.get).toHaveBeenCalledWith(['b@example.com'], expect.any(Function));
+  });
+
+  test('should prepare separately for each connection', () => {
+    const otherConnection = { prepare: jest.fn(() => statement) };
+
+    registry.execute(connection, 'all', STATEMENTS.listClients, [['a@example.com'], jest.fn()]);
+    registry.execute(otherConnection, 'all', STATEMENTS.listClients, [['a@example.com'], jest.fn()]);
+
+    expect(connection.prepare).toHaveBeenCalledTimes(1);
+    expect(otherConnection.prepare).toHaveBeenCalledTimes(1);
+  });
+
+  test('should accept spread parameters', () => {
+    registry.execute(connection, 'get', STATEMENTS.findClient, [1, 'a@example.com', jest.fn()]);
+
+    expect(statement.get).toHaveBeenCalledWith([1, 'a@example.com'], expect.any(Function));
+  });
+
+  test('should reset statements after get', () => {
+    registry.execute(connection, 'get', STATEMENTS.findUserId, [['a@example.com'], jest.fn()]);
+
+    expect(statement.reset).toHaveBeenCalled();
+  });
+
+  test('should preserve the run context for lastID and changes', (done) => {
+    registry.execute(connection, 'run', STATEMENTS.insertUser, [['a@example.com'], function(err) {
+      expect(err).toBeNull();
+      expect(this.lastID).toBe(7);
+      expect(this.changes).toBe(1);
+      done();
+    }]);
+  });
+
+  test('should count hits, prepares and errors per statement', () => {
+    statement.get.mockImplementationOnce((params, callback) => callback(new Error('boom')));
+
+    registry.execute(connection, 'get', STATEMENTS.findUserId, [['a@example.com'], jest.fn()]);
+    registry.execute(connection, 'get', STATEMENTS.findUserId, [['a@example.com'], jest.fn()]);
+
+    const stats = registry.getStats().findUserId;
+    expect(stats.hits).toBe(2);
+    expect(stats.prepares).toBe(1);
+    expect(stats.errors).toBe(1);
+    expect(stats.maxMs).toBeGreaterThanOrEqual(0);
+    expect(stats.avgMs).toBeGreaterThanOrEqual(0);
+  });
+
+  test('should re-prepare after a failed prepare', () => {
+    connection.prepare.mockImplementationOnce((sql, callback) => {
+      callback(new Error('no such table: users'));
+      return statement;
+    });
+
+    registry.execute(connection, 'get', STATEMENTS.findUserId, [['a@example.com'], jest.fn()]);
+    registry.execute(connection, 'get', STATEMENTS.findUserId, [['a@example.com'], jest.fn()]);
+
+    expect(connection.prepare).toHaveBeenCalledTimes(2);
+  });
+
+  test('should finalize every cached statement for a connection', async () => {
+    registry.execute(connection, 'get', STATEMENTS.findUserId, [['a@example.com'], jest.fn()]);
+    registry.execute(connection, 'all', STATEMENTS.listClients, [['a@example.com'], jest.fn()]);
+
+    await registry.finalize(connection);
+
+    expect(statement.finalize).toHaveBeenCalledTimes(2);
+
+    // A finalized connection starts with an empty cache
+    registry.execute(connection, 'get', STATEMENTS.findUserId, [['a@example.com'], jest.fn()]);
+    expect(connection.prepare).toHaveBeenCalledTimes(3);
+  });
+});
@@ -0,0 +1,82 @@
+// Runs reads on real worker threads against a temporary file database; the
+// workers load sqlite3 themselves, outside jest's module mocks.
+jest.unmock('sqlite3');
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const sqlite3 = require('sqlite3');
+const { createWorkerPool, toJsonArray } = require('../../database/workerPool');
+const { STATEMENTS } = require('../../database/statements');
+const query = require('../../database/query');
+
+describe('Worker Pool', () => {
+  let dir, filename, pool;
+
+  beforeAll(async () => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'worker-pool-'));
+    filename = path.join(dir, 'test.db');
+
+    const db = new sqlite3.Database(filename);
+    await query.run(db, 'CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT UNIQUE, created_at TEXT)');
+    await query.run(db, 'CREATE TABLE items (id INTEGER PRIMARY KEY, label TEXT)');
+    await query.run(db, "INSERT INTO users VALUES (1, 'a@example.com', '2024-01-01')");
+    await query.run(db, `
+      WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 2500)
+      INSERT INTO items SELECT i, 'item "' || i || '"' FROM n`);
+    await new Promise((resolve) => db.close(resolve));
+  });
+
+  afterAll(() => {
+    fs.rmSync(dir, { recursive: true, force: true });
+  });
+
+  beforeEach(() => {
+    pool = createWorkerPool({ filename, size: 2, pragmas: ['PRAGMA busy_timeout = 5000'], rowsPerBatch: 1000 });
+  });
+
+  afterEach(async () => {
+    await pool.close();
+  });
+
+  test('should return a single row from get()', async () => {
+    const row = await pool.get(STATEMENTS.findUser, ['a@example.com']);
+
+    expect(row).toEqual({ id: 1, email: 'a@example.com', created_at: '2024-01-01' });
+  });
+
+  test('should return all() rows as JSON batches', async () => {
+    const chunks = await pool.all('SELECT id, label FROM items ORDER BY id');
+    const rows = JSON.parse(toJsonArray(chunks).toString());
+
+    expect(chunks).toHaveLength(3);
+    expect(rows).toHaveLength(2500);
+    expect(rows[0]).toEqual({ id: 1, label: 'item "1"' });
+    expect(rows[2499].id).toBe(2500);
+  });
+
+  test('should encode an empty result as an empty array', async () => {
+    const chunks = await pool.all('SELECT id FROM items WHERE id < 0');
+
+    expect(toJsonArray(chunks).toString()).toBe('[]');
+  });
+
+  test('should reject with the SQLite error', async () => {
+    await expect(pool.all('SELECT * FROM missing')).rejects.toMatchObject({
+      message: expect.stringContaining('no such table'),
+      code: 'SQLITE_ERROR'
+    });
+  });
+
+  test('should refuse writes on the read-only connections', async () => {
+    await expect(pool.all("INSERT INTO users VALUES ('b@example.com', NULL)")).rejects.toMatchObject({
+      code: 'SQLITE_READONLY'
+    });
+  });
+
+  test('should spread concurrent reads over the threads and count them', async () => {
+    await Promise.all([1, 2, 3, 4].map(() => pool.all('SELECT id FROM items')));
+
+    expect(pool.getStats()).toMatchObject({ threads: 2, running: 2, tasks: 4, rows: 10000, errors: 0, pending: 0 });
+  });
+});
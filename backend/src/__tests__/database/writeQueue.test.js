@@ -0,0 +1,106 @@
+const { createWriteQueue } = require('../../database/writeQueue');
+
+describe('Write Queue', () => {
+  let commit;
+
+  beforeEach(() => {
+    // Runs each item's work with a fake tx and reports per-item outcomes
+    commit = jest.fn(async (items) => {
+      const outcomes = [];
+      for (const { work } of items) {
+        try {
+          outcomes.push({ result: await work('tx') });
+        } catch (error) {
+          outcomes.push({ error });
+        }
+      }
+      return outcomes;
+    });
+  });
+
+  test('should commit writes queued in the same window as one batch', async () => {
+    const queue = createWriteQueue({ windowMs: 5, commit });
+
+    const results = await Promise.all([
+      queue.enqueue(async () => ({ lastID: 1 })),
+      queue.enqueue(async () => ({ lastID: 2 })),
+      queue.enqueue(async () => ({ lastID: 3 }))
+    ]);
+
+    expect(commit).toHaveBeenCalledTimes(1);
+    expect(results).toEqual([{ lastID: 1 }, { lastID: 2 }, { lastID: 3 }]);
+    expect(queue.getStats()).toMatchObject({ batches: 1, writes: 3, lastBatchSize: 3, queueDepth: 0 });
+  });
+
+  test('should pass the transaction handle to each write', async () => {
+    const queue = createWriteQueue({ commit });
+    const work = jest.fn(async () => null);
+
+    await queue.enqueue(work);
+
+    expect(work).toHaveBeenCalledWith('tx');
+  });
+
+  test('should reject only the caller whose write failed', async () => {
+    const queue = createWriteQueue({ windowMs: 5, commit });
+
+    const ok = queue.enqueue(async () => 'ok');
+    const failed = queue.enqueue(async () => { throw new Error('Constraint failed'); });
+
+    await expect(ok).resolves.toBe('ok');
+    await expect(failed).rejects.toThrow('Constraint failed');
+    expect(commit).toHaveBeenCalledTimes(1);
+  });
+
+  test('should reject every caller when the batch fails to commit', async () => {
+    commit.mockRejectedValueOnce(new Error('Disk full'));
+    const queue = createWriteQueue({ windowMs: 5, commit });
+
+    const first = queue.enqueue(async () => 1);
+    const second = queue.enqueue(async () => 2);
+
+    await expect(first).rejects.toThrow('Disk full');
+    await expect(second).rejects.toThrow('Disk full');
+    expect(queue.getStats().failedBatches).toBe(1);
+  });
+
+  test('should split batches at maxBatch', async () => {
+    const queue = createWriteQueue({ windowMs: 1000, maxBatch: 2, commit });
+
+    await Promise.all([1, 2, 3, 4, 5].map((n) => queue.enqueue(async () => n)));
+
+    expect(commit.mock.calls.map(([items]) => items.length)).toEqual([2, 2, 1]);
+    expect(queue.getStats()).toMatchObject({ batches: 3, maxBatchSize: 2, maxQueueDepth: 5 });
+  });
+
+  test('should group writes that arrive during a commit into the next batch', async () => {
+    let finishFirst;
+    commit.mockImplementationOnce((items) => new Promise((resolve) => {
+      finishFirst = () => resolve(items.map(() => ({ result: 'first' })));
+    }));
+    const queue = createWriteQueue({ commit });
+
+    const first = queue.enqueue(async () => 'first');
+    await new Promise((resolve) => setImmediate(resolve));
+    expect(commit).toHaveBeenCalledTimes(1);
+
+    const later = [queue.enqueue(async () => 'a'), queue.enqueue(async () => 'b')];
+    expect(queue.getStats().queueDepth).toBe(2);
+
+    finishFirst();
+    await expect(first).resolves.toBe('first');
+    await expect(Promise.all(later)).resolves.toEqual(['a', 'b']);
+    expect(commit).toHaveBeenCalledTimes(2);
+    expect(commit.mock.calls[1][0]).toHaveLength(2);
+  });
+
+  test('drain should commit pending writes without waiting for the window', async () => {
+    const queue = createWriteQueue({ windowMs: 60000, commit });
+    const write = queue.enqueue(async () => 'done');
+
+    await queue.drain();
+
+    await expect(write).resolves.toBe('done');
+    expect(queue.getStats().queueDepth).toBe(0);
+  });
+});
@@ -1,10 +1,11 @@
-const { authenticateUser } = require('../../middleware/auth');
+const { authenticateUser, requireAdmin } = require('../../middleware/auth');
 const { getDatabase } = require('../../database/init');
+const { issueTokens } = require('../../tokens');
 
 jest.mock('../../database/init');
 
 describe('Authentication Middleware', () => {
-  let req, res, next, mockDb;
+  let req, res, next, mockDb, tx;
 
   beforeEach(() => {
     req = {
@@ -16,15 +17,21 @@ describe('Authentication Middleware', () => {
     };
     next = jest.fn();
     
+    tx = {
+      get: jest.fn((sql, params, callback) => callback(null, { id: 7 })),
+      run: jest.fn((sql, params, callback) => callback.call({ lastID: 7, changes: 1 }, null))
+    };
     mockDb = {
       get: jest.fn(),
-      run: jest.fn()
+      write: jest.fn((work) => work(tx))
     };
     
     getDatabase.mockReturnValue(mockDb);
+    process.env.AUTH_EMAIL_HEADER = 'on';
   });
 
   afterEach(() => {
+    delete process.env.AUTH_EMAIL_HEADER;
     jest.clearAllMocks();
   });
 
@@ -55,7 +62,7 @@ describe('Authentication Middleware', () => {
       req.headers['x-user-email'] = 'test@example.com';
       
       mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { email: 'test@example.com' });
+        callback(null, { id: 1 });
       });
 
       authenticateUser(req, res, next);
@@ -69,13 +76,20 @@ describe('Authentication Middleware', () => {
       req.headers['x-user-email'] = 'existing@example.com';
       
       mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { email: 'existing@example.com' });
+        callback(null, { id: 3 });
       });
 
       authenticateUser(req, res, next);
 
       setImmediate(() => {
         expect(req.userEmail).toBe('existing@example.com');
+        expect(req.userId).toBe(3);
+        expect(req.user).toEqual({ id: 3, email: 'existing@example.com' });
+        expect(mockDb.get).toHaveBeenCalledWith(
+          'SELECT id FROM users WHERE email = ?',
+          ['existing@example.com'],
+          expect.any(Function)
+        );
         expect(next).toHaveBeenCalled();
         expect(res.status).not.toHaveBeenCalled();
         done();
@@ -110,19 +124,35 @@ describe('Authentication Middleware', () => {
         callback(null, null); // User doesn't exist
       });
       
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
       authenticateUser(req, res, next);
 
       setImmediate(() => {
-        expect(mockDb.run).toHaveBeenCalledWith(
-          'INSERT INTO users (email) VALUES (?)',
+        expect(tx.run).toHaveBeenCalledWith(
+          'INSERT OR IGNORE INTO users (email) VALUES (?)',
           ['newuser@example.com'],
           expect.any(Function)
         );
+        expect(tx.get).not.toHaveBeenCalled();
         expect(req.userEmail).toBe('newuser@example.com');
+        expect(req.userId).toBe(7);
+        expect(next).toHaveBeenCalled();
+        done();
+      });
+    });
+
+    test('should read the id back when a concurrent request created the user', (done) => {
+      req.headers['x-user-email'] = 'newuser@example.com';
+
+      mockDb.get.mockImplementation((query, params, callback) => {
+        callback(null, null);
+      });
+      tx.run.mockImplementation((sql, params, callback) => callback.call({ lastID: 0, changes: 0 }, null));
+
+      authenticateUser(req, res, next);
+
+      setImmediate(() => {
+        expect(tx.get).toHaveBeenCalledWith('SELECT id FROM users WHERE email = ?', ['newuser@example.com'], expect.any(Function));
+        expect(req.userId).toBe(7);
         expect(next).toHaveBeenCalled();
         done();
       });
@@ -135,7 +165,7 @@ describe('Authentication Middleware', () => {
         callback(null, null);
       });
       
-      mockDb.run.mockImplementation((query, params, callback) => {
+      tx.run.mockImplementation((query, params, callback) => {
         callback(new Error('Insert failed'));
       });
 
@@ -175,11 +205,106 @@ describe('Authentication Middleware', () => {
       req.headers['x-user-email'] = 'test@mail.example.com';
       
       mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { email: 'test@mail.example.com' });
+        callback(null, { id: 1 });
       });
 
       authenticateUser(req, res, next);
       expect(mockDb.get).toHaveBeenCalled();
     });
   });
+
+  describe('Bearer Tokens', () => {
+    beforeAll(() => {
+      process.env.JWT_SECRET = 'test-secret';
+    });
+
+    afterAll(() => {
+      delete process.env.JWT_SECRET;
+    });
+
+    afterEach(() => {
+      delete process.env.JWT_ACCESS_TTL;
+    });
+
+    test('should authenticate a valid access token without the database', () => {
+      const { accessToken } = issueTokens({ id: 7, email: 'test@example.com' });
+      req.headers.authorization = `Bearer ${accessToken}`;
+
+      authenticateUser(req, res, next);
+
+      expect(next).toHaveBeenCalled();
+      expect(req.user).toEqual({ id: 7, email: 'test@example.com' });
+      expect(getDatabase).not.toHaveBeenCalled();
+    });
+
+    test('should return 401 with TOKEN_EXPIRED for an expired token', () => {
+      process.env.JWT_ACCESS_TTL = '-1s';
+      const { accessToken } = issueTokens({ id: 7, email: 'test@example.com' });
+      req.headers.authorization = `Bearer ${accessToken}`;
+
+      authenticateUser(req, res, next);
+
+      expect(res.status).toHaveBeenCalledWith(401);
+      expect(res.json).toHaveBeenCalledWith({ error: 'Token expired', code: 'TOKEN_EXPIRED' });
+      expect(next).not.toHaveBeenCalled();
+    });
+
+    test('should reject refresh tokens and tampered tokens', () => {
+      const { refreshToken, accessToken } = issueTokens({ id: 7, email: 'test@example.com' });
+
+      for (const token of [refreshToken, `${accessToken}x`]) {
+        req.headers.authorization = `Bearer ${token}`;
+        authenticateUser(req, res, next);
+      }
+
+      expect(res.status).toHaveBeenCalledTimes(2);
+      expect(res.json).toHaveBeenCalledWith({ error: 'Invalid token' });
+      expect(next).not.toHaveBeenCalled();
+    });
+
+    test('should require a token unless AUTH_EMAIL_HEADER is on', () => {
+      delete process.env.AUTH_EMAIL_HEADER;
+      req.headers['x-user-email'] = 'test@example.com';
+
+      authenticateUser(req, res, next);
+
+      expect(res.status).toHaveBeenCalledWith(401);
+      expect(res.json).toHaveBeenCalledWith({ error: 'Bearer token required' });
+      expect(mockDb.get).not.toHaveBeenCalled();
+    });
+  });
+
+  describe('requireAdmin', () => {
+    afterEach(() => {
+      delete process.env.ADMIN_EMAILS;
+    });
+
+    test('should allow users listed in ADMIN_EMAILS', () => {
+      process.env.ADMIN_EMAILS = 'ops@example.com, Admin@Example.com';
+      req.userEmail = 'admin@example.com';
+
+      requireAdmin(req, res, next);
+
+      expect(next).toHaveBeenCalled();
+    });
+
+    test('should return 403 for other users', () => {
+      process.env.ADMIN_EMAILS = 'admin@example.com';
+      req.userEmail = 'test@example.com';
+
+      requireAdmin(req, res, next);
+
+      expect(res.status).toHaveBeenCalledWith(403);
+      expect(res.json).toHaveBeenCalledWith({ error: 'Admin access required' });
+      expect(next).not.toHaveBeenCalled();
+    });
+
+    test('should return 403 when no admins are configured', () => {
+      req.userEmail = 'admin@example.com';
+
+      requireAdmin(req, res, next);
+
+      expect(res.status).toHaveBeenCalledWith(403);
+    });
+  });
 });
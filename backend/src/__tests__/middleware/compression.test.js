@@ -0,0 +1,86 @@
+const http = require('http');
+const zlib = require('zlib');
+const { Readable } = require('stream');
+const express = require('express');
+const { compression } = require('../../middleware/compression');
+
+// Raw bytes and headers, without the client decompressing anything
+function get(server, path, acceptEncoding) {
+  const headers = acceptEncoding ? { 'accept-encoding': acceptEncoding } : {};
+  return new Promise((resolve, reject) => {
+    http.get({ port: server.address().port, path, headers }, (res) => {
+      const chunks = [];
+      res.on('data', (chunk) => chunks.push(chunk));
+      res.on('end', () => resolve({ headers: res.headers, body: Buffer.concat(chunks) }));
+    }).on('error', reject);
+  });
+}
+
+describe('Compression Middleware', () => {
+  const entries = Array.from({ length: 500 }, (_, i) => ({ id: i, description: `Work entry ${i}` }));
+  let server;
+
+  beforeAll(async () => {
+    const app = express();
+    app.use(compression({ threshold: 1024 }));
+    app.get('/entries', (req, res) => res.json({ entries }));
+    app.get('/small', (req, res) => res.json({ ok: true }));
+    app.get('/pdf', (req, res) => res.type('pdf').send(Buffer.alloc(4096)));
+    app.get('/no-transform', (req, res) => res.set('Cache-Control', 'no-transform').json({ entries }));
+    app.get('/encoded', (req, res) => res.set('Content-Encoding', 'br').type('js').send(zlib.brotliCompressSync('x'.repeat(4096))));
+    app.get('/csv', (req, res) => {
+      res.type('csv');
+      Readable.from((function* () {
+        for (let i = 0; i < 20000; i++) yield `2024-01-01,${i},Entry ${i}\n`;
+      })()).pipe(res);
+    });
+    await new Promise((resolve) => {
+      server = app.listen(0, resolve);
+    });
+  });
+
+  afterAll(async () => {
+    await new Promise((resolve) => server.close(resolve));
+  });
+
+  test('should send brotli when the client accepts it', async () => {
+    const { headers, body } = await get(server, '/entries', 'gzip, deflate, br');
+
+    expect(headers['content-encoding']).toBe('br');
+    expect(headers['content-length']).toBeUndefined();
+    expect(headers.vary).toMatch(/Accept-Encoding/);
+    expect(JSON.parse(zlib.brotliDecompressSync(body))).toEqual({ entries });
+  });
+
+  test('should send gzip to clients without brotli', async () => {
+    const { headers, body } = await get(server, '/entries', 'gzip');
+
+    expect(headers['content-encoding']).toBe('gzip');
+    expect(JSON.parse(zlib.gunzipSync(body))).toEqual({ entries });
+  });
+
+  test('should leave small, incompressible and no-transform responses alone', async () => {
+    for (const path of ['/small', '/pdf', '/no-transform']) {
+      const { headers } = await get(server, path, 'br');
+      expect(headers['content-encoding']).toBeUndefined();
+    }
+    expect((await get(server, '/entries')).headers['content-encoding']).toBeUndefined();
+  });
+
+  test('should not encode a precompressed asset again', async () => {
+    const { headers, body } = await get(server, '/encoded', 'gzip, br');
+
+    expect(headers['content-encoding']).toBe('br');
+    expect(zlib.brotliDecompressSync(body).toString()).toBe('x'.repeat(4096));
+  });
+
+  test('should compress a streamed export as it streams', async () => {
+    const { headers, body } = await get(server, '/csv', 'gzip');
+    const lines = zlib.gunzipSync(body).toString().trim().split('\n');
+
+    expect(headers['content-encoding']).toBe('gzip');
+    expect(headers['transfer-encoding']).toBe('chunked');
+    expect(lines).toHaveLength(20000);
+    expect(lines[19999]).toBe('2024-01-01,19999,Entry 19999');
+  });
+});
@@ -0,0 +1,103 @@
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const http = require('http');
+const express = require('express');
+const { precompressed, findPrecompressed, negotiate } = require('../../middleware/precompressed');
+
+describe('Precompressed Static Assets', () => {
+  let dir, server;
+
+  // Raw bytes, since the sibling files here are not really compressed
+  const get = (urlPath, acceptEncoding) => new Promise((resolve, reject) => {
+    const headers = { 'accept-encoding': acceptEncoding };
+    http.get({ port: server.address().port, path: urlPath, headers }, (res) => {
+      const chunks = [];
+      res.on('data', (chunk) => chunks.push(chunk));
+      res.on('end', () => resolve({ status: res.statusCode, headers: res.headers, body: Buffer.concat(chunks).toString() }));
+    }).on('error', reject);
+  });
+
+  beforeAll(async () => {
+    dir = fs.mkdtempSync(path.join(os.tmpdir(), 'precompressed-'));
+    fs.mkdirSync(path.join(dir, 'assets'));
+    for (const [file, content] of Object.entries({
+      'index.html': '<html></html>',
+      'index.html.br': 'index brotli',
+      'assets/app.js': 'console.log(1)',
+      'assets/app.js.br': 'app brotli',
+      'assets/app.js.gz': 'app gzip',
+      'assets/logo.png': 'png',
+      'orphan.css.gz': 'no original'
+    })) {
+      fs.writeFileSync(path.join(dir, file), content);
+    }
+
+    const app = express();
+    app.use(precompressed(dir));
+    app.use(express.static(dir));
+    await new Promise((resolve) => {
+      server = app.listen(0, resolve);
+    });
+  });
+
+  afterAll(async () => {
+    await new Promise((resolve) => server.close(resolve));
+    fs.rmSync(dir, { recursive: true, force: true });
+  });
+
+  test('should find the siblings of each file once', () => {
+    expect(findPrecompressed(dir)).toEqual(new Map([
+      ['/index.html', { file: '/index.html', encodings: ['br'] }],
+      ['/', { file: '/index.html', encodings: ['br'] }],
+      ['/assets/app.js', { file: '/assets/app.js', encodings: ['br', 'gzip'] }]
+    ]));
+  });
+
+  test('should serve the brotli sibling with the original type', async () => {
+    const response = await get('/assets/app.js', 'gzip, br');
+
+    expect(response.status).toBe(200);
+    expect(response.headers['content-encoding']).toBe('br');
+    expect(response.headers['content-type']).toMatch(/javascript/);
+    expect(response.headers.vary).toBe('Accept-Encoding');
+    expect(response.body).toBe('app brotli');
+  });
+
+  test('should serve the gzip sibling to clients without brotli', async () => {
+    const response = await get('/assets/app.js', 'gzip');
+
+    expect(response.headers['content-encoding']).toBe('gzip');
+  });
+
+  test('should serve a directory\'s precompressed index.html', async () => {
+    const response = await get('/', 'br');
+
+    expect(response.headers['content-type']).toMatch(/html/);
+    expect(response.body).toBe('index brotli');
+  });
+
+  test('should fall back to the original file', async () => {
+    const plain = await get('/assets/app.js', 'identity');
+    const png = await get('/assets/logo.png', 'br');
+
+    expect(plain.headers['content-encoding']).toBeUndefined();
+    expect(plain.body).toBe('console.log(1)');
+    expect(png.headers['content-encoding']).toBeUndefined();
+  });
+
+  describe('negotiate', () => {
+    test('should prefer brotli, then gzip, by q-value', () => {
+      expect(negotiate('gzip, br')).toBe('br');
+      expect(negotiate('br;q=0.5, gzip')).toBe('gzip');
+      expect(negotiate('*')).toBe('br');
+      expect(negotiate('br', ['gzip'])).toBeNull();
+    });
+
+    test('should return null when nothing is acceptable', () => {
+      expect(negotiate(undefined)).toBeNull();
+      expect(negotiate('identity')).toBeNull();
+      expect(negotiate('gzip;q=0, br;q=0')).toBeNull();
+    });
+  });
+});
@@ -0,0 +1,208 @@
+const { createRateLimiter, requestClass, requestKey } = require('../../middleware/rateLimit');
+const { issueTokens } = require('../../tokens');
+
+describe('Rate Limit Middleware', () => {
+  let time, limiter, res, next;
+
+  let userToken;
+
+  const request = (overrides = {}) => ({
+    method: 'GET',
+    baseUrl: '',
+    path: '/api/clients',
+    headers: { authorization: `Bearer ${userToken}` },
+    ip: '10.0.0.1',
+    ...overrides
+  });
+
+  const tokenFor = (email) => `Bearer ${issueTokens({ id: 1, email }).accessToken}`;
+
+  beforeAll(() => {
+    process.env.JWT_SECRET = 'test-secret';
+    userToken = issueTokens({ id: 1, email: 'user@example.com' }).accessToken;
+  });
+
+  afterAll(() => {
+    delete process.env.JWT_SECRET;
+  });
+
+  const create = (options = {}) => createRateLimiter({
+    limits: {
+      read: { perMinute: 60, burst: 2 },
+      write: { perMinute: 6, burst: 1 },
+      export: { perMinute: 0, burst: 5 }
+    },
+    now: () => time,
+    ...options
+  });
+
+  beforeEach(() => {
+    time = 1000000;
+    res = { setHeader: jest.fn(), status: jest.fn().mockReturnThis(), json: jest.fn() };
+    next = jest.fn();
+    limiter = create();
+  });
+
+  afterEach(() => {
+    limiter.stop();
+  });
+
+  test('should allow a burst and then return 429', () => {
+    limiter(request(), res, next);
+    limiter(request(), res, next);
+    limiter(request(), res, next);
+
+    expect(next).toHaveBeenCalledTimes(2);
+    expect(res.status).toHaveBeenCalledWith(429);
+    expect(res.json).toHaveBeenCalledWith({ error: 'Too many requests', retryAfter: 1 });
+    expect(res.setHeader).toHaveBeenCalledWith('Retry-After', 1);
+  });
+
+  test('should refill the bucket over time', () => {
+    limiter(request(), res, next);
+    limiter(request(), res, next);
+    time += 1000;
+    limiter(request(), res, next);
+
+    expect(next).toHaveBeenCalledTimes(3);
+    expect(res.status).not.toHaveBeenCalled();
+  });
+
+  test('should show the remaining budget in headers', () => {
+    limiter(request(), res, next);
+
+    expect(res.setHeader).toHaveBeenCalledWith('RateLimit-Policy', '2;w=2');
+    expect(res.setHeader).toHaveBeenCalledWith('RateLimit-Limit', 2);
+    expect(res.setHeader).toHaveBeenCalledWith('RateLimit-Remaining', 1);
+    expect(res.setHeader).toHaveBeenCalledWith('RateLimit-Reset', 1);
+  });
+
+  test('should keep separate budgets per user and per class', () => {
+    limiter(request({ method: 'POST' }), res, next);
+    limiter(request({ method: 'POST', headers: { authorization: tokenFor('other@example.com') } }), res, next);
+    limiter(request(), res, next);
+    limiter(request({ method: 'POST' }), res, next);
+
+    expect(next).toHaveBeenCalledTimes(3);
+    expect(limiter.getStats().write).toEqual(expect.objectContaining({ buckets: 2, allowed: 2, limited: 1 }));
+  });
+
+  test('should not give a fresh bucket for each x-user-email header', () => {
+    for (const email of ['a@example.com', 'b@example.com', 'c@example.com']) {
+      limiter(request({ headers: { 'x-user-email': email } }), res, next);
+    }
+
+    expect(next).toHaveBeenCalledTimes(2);
+    expect(res.status).toHaveBeenCalledWith(429);
+    expect(limiter.getStats().read.buckets).toBe(1);
+  });
+
+  test('should not let a header spend a signed-in user\'s budget', () => {
+    limiter(request({ headers: { 'x-user-email': 'user@example.com' } }), res, next);
+    limiter(request({ headers: { 'x-user-email': 'user@example.com' } }), res, next);
+    limiter(request(), res, next);
+
+    expect(next).toHaveBeenCalledTimes(3);
+  });
+
+  test('should not let logins spend the address\'s write budget', () => {
+    limiter.stop();
+    limiter = create({ limits: { write: { perMinute: 6, burst: 1 }, auth: { perMinute: 60, burst: 3 } } });
+    const login = () => request({ method: 'POST', path: '/api/auth/login', headers: {} });
+
+    for (let i = 0; i < 3; i++) {
+      limiter(login(), res, next);
+    }
+    limiter(request({ method: 'POST', headers: {} }), res, next);
+
+    expect(next).toHaveBeenCalledTimes(4);
+    expect(res.status).not.toHaveBeenCalled();
+  });
+
+  test('should leave classes with no rate unlimited', () => {
+    expect(Object.keys(limiter.getStats())).toEqual(['read', 'write']);
+
+    for (let i = 0; i < 10; i++) {
+      limiter(request({ path: '/api/reports/export/csv/1' }), res, next);
+    }
+    expect(next).toHaveBeenCalledTimes(10);
+  });
+
+  test('should not count skipped requests', () => {
+    limiter.stop();
+    limiter = create({ skip: () => true });
+
+    limiter(request(), res, next);
+
+    expect(next).toHaveBeenCalled();
+    expect(res.setHeader).not.toHaveBeenCalled();
+  });
+
+  test('should evict buckets once they have refilled', () => {
+    limiter(request(), res, next);
+    limiter(request({ method: 'POST' }), res, next);
+
+    time += 1000;
+    limiter.sweep();
+    expect(limiter.getStats().read.buckets).toBe(0);
+    expect(limiter.getStats().write.buckets).toBe(1);
+
+    time += 9000;
+    limiter.sweep();
+    expect(limiter.getStats().write).toEqual(expect.objectContaining({ buckets: 0, evicted: 1 }));
+  });
+
+  test('should wait for a shared store', async () => {
+    limiter.stop();
+    const take = jest.fn().mockResolvedValue({
+      allowed: false, limit: 5, windowSeconds: 150, remaining: 0, retryAfterMs: 1500, fullInMs: 150000
+    });
+    limiter = create({ store: { take, sweep: jest.fn(), stop: jest.fn(), getStats: () => ({}) } });
+
+    await limiter(request({ path: '/api/reports/export/pdf/1' }), res, next);
+
+    expect(take).toHaveBeenCalledWith('export', 'user:user@example.com');
+    expect(res.status).toHaveBeenCalledWith(429);
+    expect(res.setHeader).toHaveBeenCalledWith('Retry-After', 2);
+    expect(limiter.getStats()).toEqual({ export: { allowed: 0, limited: 1, unchecked: 0 } });
+  });
+
+  test('should let requests through when the shared store fails', async () => {
+    limiter.stop();
+    const take = jest.fn().mockRejectedValue(new Error('Disconnected from the cluster primary'));
+    limiter = create({ store: { take, sweep: jest.fn(), stop: jest.fn(), getStats: () => ({}) } });
+
+    await limiter(request(), res, next);
+
+    expect(next).toHaveBeenCalled();
+    expect(limiter.getStats().read).toEqual(expect.objectContaining({ unchecked: 1 }));
+  });
+
+  describe('requestClass', () => {
+    test('should separate exports, writes and reads', () => {
+      expect(requestClass(request({ path: '/api/reports/export/pdf/3' }))).toBe('export');
+      expect(requestClass(request({ baseUrl: '/api/reports', path: '/export/csv/3' }))).toBe('export');
+      expect(requestClass(request({ method: 'DELETE' }))).toBe('write');
+      expect(requestClass(request({ method: 'HEAD' }))).toBe('read');
+    });
+
+    test('should give login and refresh their own class', () => {
+      expect(requestClass(request({ method: 'POST', baseUrl: '/api', path: '/auth/login' }))).toBe('auth');
+      expect(requestClass(request({ method: 'POST', path: '/api/auth/refresh' }))).toBe('auth');
+      expect(requestClass(request({ baseUrl: '/api', path: '/auth/me' }))).toBe('read');
+    });
+  });
+
+  describe('requestKey', () => {
+    test('should key by the user from a valid token', () => {
+      expect(requestKey(request({ headers: { authorization: tokenFor('Token@example.com') } }))).toBe('user:token@example.com');
+      expect(requestKey(request())).toBe('user:user@example.com');
+    });
+
+    test('should fall back to the client address', () => {
+      expect(requestKey(request({ headers: {} }))).toBe('ip:10.0.0.1');
+      expect(requestKey(request({ headers: { authorization: 'Bearer invalid' } }))).toBe('ip:10.0.0.1');
+      expect(requestKey(request({ headers: { 'x-user-email': 'user@example.com' } }))).toBe('ip:10.0.0.1');
+    });
+  });
+});
@@ -0,0 +1,125 @@
+const { getReplica, getShipper } = require('../../database/init');
+const {
+  isReplicationPeer,
+  replicaRouting,
+  replicationPosition,
+  forwardReadOnlyErrors
+} = require('../../middleware/replication');
+
+jest.mock('../../database/init');
+
+describe('Replication Middleware', () => {
+  let req, res, next;
+
+  beforeEach(() => {
+    req = { method: 'GET', headers: {} };
+    res = { headersSent: false, end: jest.fn(), setHeader: jest.fn() };
+    next = jest.fn();
+  });
+
+  afterEach(() => {
+    delete process.env.REPLICATION_TOKEN;
+    delete process.env.REPLICA_OF;
+    delete process.env.AUTH_EMAIL_HEADER;
+    jest.clearAllMocks();
+  });
+
+  describe('isReplicationPeer', () => {
+    test('should accept the replication token', () => {
+      process.env.REPLICATION_TOKEN = 'secret';
+      req.headers['x-replication-token'] = 'secret';
+
+      expect(isReplicationPeer(req)).toBe(true);
+    });
+
+    test('should reject a wrong or missing token', () => {
+      process.env.REPLICATION_TOKEN = 'secret';
+
+      expect(isReplicationPeer(req)).toBe(false);
+      req.headers['x-replication-token'] = 'secreT';
+      expect(isReplicationPeer(req)).toBe(false);
+    });
+
+    test('should reject everything when replication is off', () => {
+      req.headers['x-replication-token'] = '';
+
+      expect(isReplicationPeer(req)).toBe(false);
+    });
+  });
+
+  describe('replicaRouting', () => {
+    test('should pass requests through on a primary', () => {
+      req.method = 'POST';
+
+      replicaRouting(req, res, next);
+
+      expect(next).toHaveBeenCalled();
+    });
+
+    test('should serve reads without a position straight away', () => {
+      process.env.REPLICA_OF = 'http://primary:3001';
+      req.headers['x-user-email'] = 'user@example.com';
+
+      replicaRouting(req, res, next);
+
+      expect(next).toHaveBeenCalled();
+      expect(getReplica).not.toHaveBeenCalled();
+    });
+
+    test('should wait for the replica to reach the given position', async () => {
+      process.env.REPLICA_OF = 'http://primary:3001';
+      process.env.AUTH_EMAIL_HEADER = 'on';
+      req.headers['x-user-email'] = 'user@example.com';
+      req.headers['x-replication-position'] = 'abc.12';
+      const waitFor = jest.fn().mockResolvedValue(true);
+      getReplica.mockReturnValue({ waitFor });
+
+      replicaRouting(req, res, next);
+      await new Promise(setImmediate);
+
+      expect(getReplica).toHaveBeenCalledWith('user@example.com');
+      expect(waitFor).toHaveBeenCalledWith('abc.12', 1000);
+      expect(next).toHaveBeenCalled();
+    });
+  });
+
+  describe('replicationPosition', () => {
+    test('should add the position to write responses once captured', async () => {
+      process.env.REPLICATION_TOKEN = 'secret';
+      req.method = 'POST';
+      req.userEmail = 'user@example.com';
+      const shipper = { capture: jest.fn().mockResolvedValue(), position: jest.fn(() => 'abc.13') };
+      getShipper.mockReturnValue(shipper);
+      const end = res.end;
+
+      replicationPosition(req, res, next);
+      res.end('done');
+      await new Promise(setImmediate);
+
+      expect(next).toHaveBeenCalled();
+      expect(shipper.capture).toHaveBeenCalled();
+      expect(res.setHeader).toHaveBeenCalledWith('X-Replication-Position', 'abc.13');
+      expect(end).toHaveBeenCalledWith('done');
+    });
+
+    test('should leave reads alone', () => {
+      process.env.REPLICATION_TOKEN = 'secret';
+      const end = res.end;
+
+      replicationPosition(req, res, next);
+
+      expect(next).toHaveBeenCalled();
+      expect(res.end).toBe(end);
+    });
+  });
+
+  describe('forwardReadOnlyErrors', () => {
+    test('should pass other errors on', () => {
+      const error = new Error('Database error');
+
+      forwardReadOnlyErrors(error, req, res, next);
+
+      expect(next).toHaveBeenCalledWith(error);
+    });
+  });
+});
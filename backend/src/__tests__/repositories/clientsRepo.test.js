@@ -0,0 +1,123 @@
+const clientsRepo = require('../../repositories/clientsRepo');
+const { getDatabase, getArchive } = require('../../database/init');
+const { STATEMENTS } = require('../../database/statements');
+
+jest.mock('../../database/init');
+
+const USER = { id: 42, email: 'test@example.com' };
+
+describe('Clients Repository', () => {
+  let mockDb, tx;
+
+  beforeEach(() => {
+    tx = {
+      get: jest.fn(),
+      all: jest.fn(),
+      run: jest.fn()
+    };
+    mockDb = {
+      get: jest.fn(),
+      all: jest.fn(),
+      write: jest.fn((work) => work(tx))
+    };
+    getDatabase.mockReturnValue(mockDb);
+  });
+
+  afterEach(() => {
+    jest.clearAllMocks();
+  });
+
+  describe('reads', () => {
+    test('list should query clients for the user', async () => {
+      mockDb.all.mockImplementation((sql, params, callback) => callback(null, [{ id: 1 }]));
+
+      const clients = await clientsRepo.list(USER);
+
+      expect(clients).toEqual([{ id: 1 }]);
+      expect(mockDb.all).toHaveBeenCalledWith(STATEMENTS.listClients, [42], expect.any(Function));
+      expect(mockDb.write).not.toHaveBeenCalled();
+    });
+
+    test('findById should reject on database error', async () => {
+      mockDb.get.mockImplementation((sql, params, callback) => callback(new Error('Database error')));
+
+      await expect(clientsRepo.findById(1, USER)).rejects.toThrow('Database error');
+    });
+  });
+
+  describe('create', () => {
+    test('should insert and return the client in one statement', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, [{ id: 5, name: 'Acme' }]));
+
+      const client = await clientsRepo.create(USER, { name: 'Acme', description: '' });
+
+      expect(client).toEqual({ id: 5, name: 'Acme' });
+      expect(mockDb.write).toHaveBeenCalledTimes(1);
+      expect(tx.all).toHaveBeenCalledTimes(1);
+      expect(tx.all).toHaveBeenCalledWith(
+        STATEMENTS.insertClient,
+        ['Acme', null, null, null, 42],
+        expect.any(Function)
+      );
+    });
+  });
+
+  describe('update', () => {
+    test('should update with RETURNING and only the provided fields', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, [{ id: 1, name: 'New' }]));
+
+      const client = await clientsRepo.update(1, USER, { name: 'New', email: '' });
+
+      expect(client).toEqual({ id: 1, name: 'New' });
+      const [sql, params] = tx.all.mock.calls[0];
+      expect(sql).toContain('UPDATE clients SET name = ?, email = ?, updated_at = CURRENT_TIMESTAMP');
+      expect(sql).toContain('WHERE id = ? AND user_id = ? RETURNING');
+      expect(params).toEqual(['New', null, 1, 42]);
+    });
+
+    test('should resolve null when the client does not belong to the user', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, []));
+
+      await expect(clientsRepo.update(1, USER, { name: 'New' })).resolves.toBeNull();
+    });
+
+    test('should reject when the update fails', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(new Error('Update failed')));
+
+      await expect(clientsRepo.update(1, USER, { name: 'New' })).rejects.toThrow('Update failed');
+    });
+  });
+
+  describe('remove', () => {
+    test('should report whether a client was deleted', async () => {
+      tx.run.mockImplementationOnce(function(sql, params, callback) {
+        callback.call({ changes: 1 }, null);
+      });
+      tx.run.mockImplementationOnce(function(sql, params, callback) {
+        callback.call({ changes: 0 }, null);
+      });
+
+      await expect(clientsRepo.remove(1, USER)).resolves.toBe(true);
+      await expect(clientsRepo.remove(2, USER)).resolves.toBe(false);
+      expect(tx.run).toHaveBeenCalledWith(STATEMENTS.deleteClient, [1, 42], expect.any(Function));
+    });
+
+    test('removeAll should resolve the deleted count', async () => {
+      tx.run.mockImplementation(function(sql, params, callback) {
+        callback.call({ changes: 3 }, null);
+      });
+
+      await expect(clientsRepo.removeAll(USER)).resolves.toBe(3);
+    });
+
+    test('should delete archived entries along with the client', async () => {
+      getArchive.mockReturnValueOnce({ covers: jest.fn() });
+      tx.run.mockImplementation(function(sql, params, callback) {
+        callback.call({ changes: 1 }, null);
+      });
+
+      await expect(clientsRepo.remove(1, USER)).resolves.toBe(true);
+      expect(tx.run).toHaveBeenCalledWith(STATEMENTS.deleteArchivedEntriesForClient, [1, 42], expect.any(Function));
+    });
+  });
+});
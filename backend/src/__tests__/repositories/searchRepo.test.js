@@ -0,0 +1,117 @@
+// Searches a real in-memory database, so the FTS5 tables, their triggers and
+// the generated MATCH expressions are exercised together.
+jest.unmock('sqlite3');
+
+const { getDatabase, initializeDatabase, closeDatabase } = require('../../database/init');
+const { STATEMENTS } = require('../../database/statements');
+const { toDayNumber } = require('../../database/days');
+const query = require('../../database/query');
+const searchRepo = require('../../repositories/searchRepo');
+
+const { matchQuery } = searchRepo;
+
+describe('Search Repository', () => {
+  let consoleLogSpy, db, user, otherUser, clientId;
+
+  async function createUser(tx, email) {
+    await query.run(tx, STATEMENTS.insertUser, [email]);
+    const { id } = await query.get(tx, STATEMENTS.findUserId, [email]);
+    return { id, email };
+  }
+
+  async function addEntry(tx, owner, client, description) {
+    const [entry] = await query.all(tx, STATEMENTS.insertWorkEntry, [
+      100, description, toDayNumber('2024-03-01'), client, owner.id
+    ]);
+    return entry.id;
+  }
+
+  beforeAll(async () => {
+    consoleLogSpy = jest.spyOn(console, 'log').mockImplementation();
+    await initializeDatabase();
+    db = getDatabase();
+
+    await db.write(async (tx) => {
+      user = await createUser(tx, 'search@example.com');
+      otherUser = await createUser(tx, 'other@example.com');
+      ([{ id: clientId }] = await query.all(tx, STATEMENTS.insertClient, ['Café Acme', 'Database consulting', null, null, user.id]));
+      const [{ id: otherClientId }] = await query.all(tx, STATEMENTS.insertClient, ['Other', null, null, null, otherUser.id]);
+
+      await addEntry(tx, user, clientId, 'Database migration planning');
+      await addEntry(tx, user, clientId, 'Migration <b>rollout</b>, migration review');
+      await addEntry(tx, user, clientId, 'Weekly call');
+      await addEntry(tx, otherUser, otherClientId, 'Migration for someone else');
+    });
+  });
+
+  afterAll(async () => {
+    await closeDatabase();
+    consoleLogSpy.mockRestore();
+  });
+
+  describe('matchQuery', () => {
+    test('should quote every word and prefix-match the last one', () => {
+      expect(matchQuery(7, 'description', 'db migr')).toBe('owner : "u7" AND {description} : ("db" "migr"*)');
+    });
+
+    test('should drop query syntax from the text', () => {
+      expect(matchQuery(7, 'description', 'owner:u8 OR "x')).toBe('owner : "u7" AND {description} : ("owner" "u8" "OR" "x"*)');
+      expect(matchQuery(7, 'description', '*"()')).toBeNull();
+    });
+  });
+
+  describe('search', () => {
+    test('should rank the user\'s matching entries and mark the matches', async () => {
+      const { results, hasMore } = await searchRepo.search(user, { q: 'migration', limit: 10 });
+
+      expect(hasMore).toBe(false);
+      expect(results.map((entry) => entry.description)).toEqual([
+        '\x02Migration\x03 <b>rollout</b>, \x02migration\x03 review',
+        'Database \x02migration\x03 planning'
+      ]);
+      expect(results[0]).toEqual(expect.objectContaining({
+        client_id: clientId,
+        client_name: 'Café Acme',
+        hours: 1,
+        date: '2024-03-01'
+      }));
+    });
+
+    test('should page through the results', async () => {
+      const first = await searchRepo.search(user, { q: 'migr', limit: 1, offset: 0 });
+      const second = await searchRepo.search(user, { q: 'migr', limit: 1, offset: 1 });
+
+      expect(first.hasMore).toBe(true);
+      expect(second.hasMore).toBe(false);
+      expect(second.results[0].id).not.toBe(first.results[0].id);
+    });
+
+    test('should match clients by name regardless of accents', async () => {
+      const { results } = await searchRepo.search(user, { q: 'cafe', type: 'clients', limit: 10 });
+
+      expect(results).toEqual([expect.objectContaining({ id: clientId, name: '\x02Café\x03 Acme' })]);
+    });
+
+    test('should follow updates and deletes', async () => {
+      const id = await db.write((tx) => addEntry(tx, user, clientId, 'Quarterly audit'));
+      expect((await searchRepo.search(user, { q: 'audit', limit: 10 })).results).toHaveLength(1);
+
+      await db.write((tx) => query.run(tx, 'UPDATE work_entries SET description = ? WHERE id = ?', ['Annual review', id]));
+      expect((await searchRepo.search(user, { q: 'audit', limit: 10 })).results).toEqual([]);
+      expect((await searchRepo.search(user, { q: 'annual', limit: 10 })).results).toHaveLength(1);
+
+      await db.write((tx) => query.run(tx, STATEMENTS.deleteWorkEntry, [id, user.id]));
+      expect((await searchRepo.search(user, { q: 'annual', limit: 10 })).results).toEqual([]);
+    });
+
+    test('should not return other users\' rows', async () => {
+      const { results } = await searchRepo.search(otherUser, { q: 'database', limit: 10 });
+
+      expect(results).toEqual([]);
+    });
+
+    test('should return nothing for text without words', async () => {
+      await expect(searchRepo.search(user, { q: '***', limit: 10 })).resolves.toEqual({ results: [], hasMore: false });
+    });
+  });
+});
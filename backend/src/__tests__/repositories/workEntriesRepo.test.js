@@ -0,0 +1,254 @@
+const workEntriesRepo = require('../../repositories/workEntriesRepo');
+const { getDatabase, getArchive } = require('../../database/init');
+const { STATEMENTS } = require('../../database/statements');
+const { MIN_DAY, MAX_DAY } = require('../../database/days');
+
+jest.mock('../../database/init');
+
+const USER = { id: 42, email: 'test@example.com' };
+
+describe('Work Entries Repository', () => {
+  let mockDb, tx;
+
+  beforeEach(() => {
+    tx = {
+      get: jest.fn(),
+      all: jest.fn(),
+      run: jest.fn()
+    };
+    mockDb = {
+      get: jest.fn(),
+      all: jest.fn(),
+      write: jest.fn((work) => work(tx))
+    };
+    getDatabase.mockReturnValue(mockDb);
+  });
+
+  afterEach(() => {
+    jest.clearAllMocks();
+  });
+
+  describe('list', () => {
+    test('should use the unfiltered statement without a client', async () => {
+      mockDb.all.mockImplementation((sql, params, callback) => callback(null, []));
+
+      await workEntriesRepo.list(USER);
+
+      expect(mockDb.all).toHaveBeenCalledWith(STATEMENTS.listWorkEntries, [42, MIN_DAY, MAX_DAY], expect.any(Function));
+      expect(getDatabase).toHaveBeenCalledWith('test@example.com');
+    });
+
+    test('should use the client statement when filtering', async () => {
+      mockDb.all.mockImplementation((sql, params, callback) => callback(null, []));
+
+      await workEntriesRepo.list(USER, { clientId: 3 });
+
+      expect(mockDb.all).toHaveBeenCalledWith(
+        STATEMENTS.listWorkEntriesForClient,
+        [42, 3, MIN_DAY, MAX_DAY],
+        expect.any(Function)
+      );
+    });
+  });
+
+  describe('day range', () => {
+    test('should bound the list by from and to', async () => {
+      mockDb.all.mockImplementation((sql, params, callback) => callback(null, []));
+
+      await workEntriesRepo.list(USER, { from: new Date('2024-01-01'), to: '2024-01-31' });
+
+      expect(mockDb.all).toHaveBeenCalledWith(STATEMENTS.listWorkEntries, [42, 19723, 19753], expect.any(Function));
+    });
+
+    test('should leave a missing bound open', async () => {
+      mockDb.all.mockImplementation((sql, params, callback) => callback(null, []));
+
+      await workEntriesRepo.list(USER, { clientId: 3, from: '2024-01-01' });
+
+      expect(mockDb.all.mock.calls[0][1]).toEqual([42, 3, 19723, MAX_DAY]);
+    });
+  });
+
+  describe('archive', () => {
+    test('should list hot entries only unless archived is set', async () => {
+      mockDb.all.mockImplementation((sql, params, callback) => callback(null, []));
+
+      await workEntriesRepo.list(USER, { from: '2020-01-01' });
+
+      expect(getArchive).not.toHaveBeenCalled();
+      expect(mockDb.all.mock.calls[0][0]).toBe(STATEMENTS.listWorkEntries);
+    });
+
+    test('should span the archive when the range reaches it', async () => {
+      const archive = { covers: jest.fn(() => true) };
+      getArchive.mockReturnValueOnce(archive);
+      mockDb.all.mockImplementation((sql, params, callback) => callback(null, []));
+
+      await workEntriesRepo.list(USER, { from: '2020-01-01', archived: true });
+
+      expect(archive.covers).toHaveBeenCalledWith(18262);
+      expect(mockDb.all).toHaveBeenCalledWith(
+        STATEMENTS.listWorkEntriesWithArchive,
+        [42, 18262, MAX_DAY, 42, 18262, MAX_DAY],
+        expect.any(Function)
+      );
+    });
+
+    test('should stay on the hot statement when the range starts after the archive', async () => {
+      getArchive.mockReturnValueOnce({ covers: jest.fn(() => false) });
+      mockDb.all.mockImplementation((sql, params, callback) => callback(null, []));
+
+      await workEntriesRepo.list(USER, { clientId: 3, from: '2024-01-01', archived: true });
+
+      expect(mockDb.all.mock.calls[0][0]).toBe(STATEMENTS.listWorkEntriesForClient);
+    });
+  });
+
+  describe('listJson', () => {
+    test('should return the encoded rows from the connection manager', async () => {
+      mockDb.allJson = jest.fn().mockResolvedValue(Buffer.from('[{"id":1}]'));
+
+      const json = await workEntriesRepo.listJson(USER, { clientId: 3 });
+
+      expect(json.toString()).toBe('[{"id":1}]');
+      expect(mockDb.allJson).toHaveBeenCalledWith(STATEMENTS.listWorkEntriesForClient, [42, 3, MIN_DAY, MAX_DAY]);
+    });
+
+    test('should encode plain rows when the handle has no allJson', async () => {
+      mockDb.all.mockImplementation((sql, params, callback) => callback(null, [{ id: 1, hours: 2 }]));
+
+      const json = await workEntriesRepo.listJson(USER);
+
+      expect(JSON.parse(json.toString())).toEqual([{ id: 1, hours: 2 }]);
+    });
+  });
+
+  describe('create', () => {
+    test('should insert through the client ownership check in one statement', async () => {
+      const row = { id: 1, client_id: 2, hours: 4, client_name: 'Acme' };
+      tx.all.mockImplementation((sql, params, callback) => callback(null, [row]));
+
+      const entry = await workEntriesRepo.create(USER, {
+        clientId: 2, hours: 4, description: '', date: '2024-01-15'
+      });
+
+      expect(entry).toEqual(row);
+      expect(tx.all).toHaveBeenCalledTimes(1);
+      expect(tx.all).toHaveBeenCalledWith(
+        STATEMENTS.insertWorkEntry,
+        [400, null, 19737, 2, 42],
+        expect.any(Function)
+      );
+    });
+
+    test('should store Date values as a day number', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, [{ id: 1 }]));
+
+      await workEntriesRepo.create(USER, {
+        clientId: 2, hours: 4, date: new Date('2024-01-15')
+      });
+
+      expect(tx.all.mock.calls[0][1][2]).toBe(19737);
+    });
+
+    test('should reject with CLIENT_NOT_FOUND when nothing was inserted', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, []));
+
+      await expect(workEntriesRepo.create(USER, { clientId: 9, hours: 1, date: '2024-01-15' }))
+        .rejects.toMatchObject({ code: workEntriesRepo.CLIENT_NOT_FOUND });
+    });
+  });
+
+  describe('update', () => {
+    test('should update with RETURNING in one statement', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, [{ id: 1, hours: 8 }]));
+
+      const entry = await workEntriesRepo.update(1, USER, { hours: 8, description: '' });
+
+      expect(entry).toEqual({ id: 1, hours: 8 });
+      expect(tx.get).not.toHaveBeenCalled();
+      const [sql, params] = tx.all.mock.calls[0];
+      expect(sql).toContain('UPDATE work_entries SET hundredths = ?, description = ?, updated_at = CURRENT_TIMESTAMP');
+      expect(sql).toContain('RETURNING');
+      expect(sql).not.toContain('EXISTS');
+      expect(params).toEqual([800, null, 1, 42]);
+    });
+
+    test('should fold the client ownership check into the UPDATE', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, [{ id: 1, client_id: 2 }]));
+
+      await workEntriesRepo.update(1, USER, { clientId: 2 });
+
+      const [sql, params] = tx.all.mock.calls[0];
+      expect(sql).toContain('AND EXISTS (SELECT 1 FROM clients c WHERE c.id = ? AND c.user_id = ?)');
+      expect(params).toEqual([2, 1, 42, 2, 42]);
+    });
+
+    test('should resolve null when the entry does not exist', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, []));
+      tx.get.mockImplementation((sql, params, callback) => callback(null, undefined));
+
+      await expect(workEntriesRepo.update(1, USER, { clientId: 2 })).resolves.toBeNull();
+    });
+
+    test('should reject with CLIENT_NOT_FOUND when the entry exists but the client does not', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, []));
+      tx.get.mockImplementation((sql, params, callback) => callback(null, { id: 1 }));
+
+      await expect(workEntriesRepo.update(1, USER, { clientId: 2 }))
+        .rejects.toMatchObject({ code: workEntriesRepo.CLIENT_NOT_FOUND });
+      expect(tx.get).toHaveBeenCalledWith(STATEMENTS.findOwnedWorkEntryId, [1, 42], expect.any(Function));
+    });
+  });
+
+  describe('remove', () => {
+    test('should report whether an entry was deleted', async () => {
+      tx.run.mockImplementation(function(sql, params, callback) {
+        callback.call({ changes: 0 }, null);
+      });
+
+      await expect(workEntriesRepo.remove(1, USER)).resolves.toBe(false);
+    });
+  });
+
+  describe('archived entries', () => {
+    beforeEach(() => {
+      getArchive.mockReturnValue({ covers: () => true });
+    });
+
+    afterEach(() => {
+      getArchive.mockReset();
+    });
+
+    test('should reject reads of an archived id with ENTRY_ARCHIVED', async () => {
+      mockDb.get.mockImplementation((sql, params, callback) => {
+        callback(null, sql === STATEMENTS.findArchivedEntryId ? { id: 1 } : undefined);
+      });
+
+      await expect(workEntriesRepo.findById(1, USER))
+        .rejects.toMatchObject({ code: workEntriesRepo.ENTRY_ARCHIVED });
+      expect(mockDb.get).toHaveBeenCalledWith(STATEMENTS.findArchivedEntryId, [1, 42], expect.any(Function));
+    });
+
+    test('should reject updates and deletes of an archived id with ENTRY_ARCHIVED', async () => {
+      tx.all.mockImplementation((sql, params, callback) => callback(null, []));
+      tx.run.mockImplementation(function(sql, params, callback) {
+        callback.call({ changes: 0 }, null);
+      });
+      tx.get.mockImplementation((sql, params, callback) => {
+        callback(null, sql === STATEMENTS.findArchivedEntryId ? { id: 1 } : undefined);
+      });
+
+      await expect(workEntriesRepo.update(1, USER, { hours: 2 }))
+        .rejects.toMatchObject({ code: workEntriesRepo.ENTRY_ARCHIVED });
+      await expect(workEntriesRepo.remove(1, USER))
+        .rejects.toMatchObject({ code: workEntriesRepo.ENTRY_ARCHIVED });
+    });
+
+    test('should still resolve null for ids in neither table', async () => {
+      mockDb.get.mockImplementation((sql, params, callback) => callback(null, undefined));
+
+      await expect(workEntriesRepo.findById(1, USER)).resolves.toBeUndefined();
+    });
+  });
+});
@@ -0,0 +1,51 @@
+const request = require('supertest');
+const express = require('express');
+const { getQueryReport } = require('../../database/init');
+
+jest.mock('../../database/init');
+jest.mock('../../middleware/auth', () => ({
+  authenticateUser: (req, res, next) => {
+    req.userEmail = req.headers['x-user-email'];
+    next();
+  },
+  requireAdmin: (req, res, next) => {
+    if (req.userEmail !== 'admin@example.com') {
+      return res.status(403).json({ error: 'Admin access required' });
+    }
+    next();
+  }
+}));
+
+const adminRoutes = require('../../routes/admin');
+
+const app = express();
+app.use('/api/admin', adminRoutes);
+
+describe('Admin Routes', () => {
+  afterEach(() => {
+    jest.clearAllMocks();
+  });
+
+  describe('GET /api/admin/queries', () => {
+    test('should return the query report to admins', async () => {
+      const report = {
+        thresholdMs: 100,
+        statements: [{ sql: 'SELECT 1', count: 3, p50Ms: 0.1, p95Ms: 0.2, maxMs: 0.3 }],
+        recentSlow: []
+      };
+      getQueryReport.mockReturnValue(report);
+
+      const response = await request(app).get('/api/admin/queries').set('x-user-email', 'admin@example.com');
+
+      expect(response.status).toBe(200);
+      expect(response.body).toEqual(report);
+    });
+
+    test('should refuse other users', async () => {
+      const response = await request(app).get('/api/admin/queries').set('x-user-email', 'test@example.com');
+
+      expect(response.status).toBe(403);
+      expect(getQueryReport).not.toHaveBeenCalled();
+    });
+  });
+});
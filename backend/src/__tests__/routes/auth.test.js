@@ -2,6 +2,7 @@ const request = require('supertest');
 const express = require('express');
 const authRoutes = require('../../routes/auth');
 const { getDatabase } = require('../../database/init');
+const { ACCESS, REFRESH, issueTokens, verifyToken } = require('../../tokens');
 
 jest.mock('../../database/init');
 
@@ -19,10 +20,21 @@ app.use((err, req, res, next) => {
 describe('Auth Routes', () => {
   let mockDb;
 
+  beforeAll(() => {
+    process.env.JWT_SECRET = 'test-secret';
+    process.env.AUTH_EMAIL_HEADER = 'on';
+  });
+
+  afterAll(() => {
+    delete process.env.JWT_SECRET;
+    delete process.env.AUTH_EMAIL_HEADER;
+  });
+
   beforeEach(() => {
     mockDb = {
       get: jest.fn(),
-      run: jest.fn()
+      run: jest.fn(),
+      write: jest.fn((work) => work(mockDb))
     };
     getDatabase.mockReturnValue(mockDb);
   });
@@ -34,6 +46,7 @@ describe('Auth Routes', () => {
   describe('POST /api/auth/login', () => {
     test('should login existing user', async () => {
       const existingUser = {
+        id: 3,
         email: 'existing@example.com',
         created_at: '2024-01-01T00:00:00.000Z'
       };
@@ -49,15 +62,19 @@ describe('Auth Routes', () => {
       expect(response.status).toBe(200);
       expect(response.body.message).toBe('Login successful');
       expect(response.body.user.email).toBe('existing@example.com');
+      expect(verifyToken(response.body.accessToken, ACCESS)).toEqual({ id: 3, email: 'existing@example.com' });
+      expect(verifyToken(response.body.refreshToken, REFRESH)).toEqual({ id: 3, email: 'existing@example.com' });
+      expect(response.body.expiresIn).toBe(15 * 60);
     });
 
     test('should create new user on first login', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, null); // User doesn't exist
-      });
+      const newUser = { id: 9, email: 'newuser@example.com', created_at: '2024-01-01T00:00:00.000Z' };
+      mockDb.get
+        .mockImplementationOnce((query, params, callback) => callback(null, undefined)) // User doesn't exist
+        .mockImplementationOnce((query, params, callback) => callback(null, newUser));
 
-      mockDb.run.mockImplementation(function(query, params, callback) {
-        callback.call(this, null);
+      mockDb.run.mockImplementation((query, params, callback) => {
+        callback.call({ lastID: 9, changes: 1 }, null);
       });
 
       const response = await request(app)
@@ -66,14 +83,48 @@ describe('Auth Routes', () => {
 
       expect(response.status).toBe(201);
       expect(response.body.message).toBe('User created and logged in successfully');
-      expect(response.body.user.email).toBe('newuser@example.com');
+      expect(response.body.user).toEqual({ email: 'newuser@example.com', createdAt: '2024-01-01T00:00:00.000Z' });
+      expect(verifyToken(response.body.accessToken)).toEqual({ id: 9, email: 'newuser@example.com' });
+      expect(mockDb.write).toHaveBeenCalledTimes(1);
       expect(mockDb.run).toHaveBeenCalledWith(
-        'INSERT INTO users (email) VALUES (?)',
+        'INSERT OR IGNORE INTO users (email) VALUES (?)',
         ['newuser@example.com'],
         expect.any(Function)
       );
     });
 
+    test('should log in when a concurrent first login created the user', async () => {
+      const otherUser = { id: 9, email: 'newuser@example.com', created_at: '2024-01-01T00:00:00.000Z' };
+      mockDb.get
+        .mockImplementationOnce((query, params, callback) => callback(null, undefined))
+        .mockImplementationOnce((query, params, callback) => callback(null, otherUser));
+
+      // INSERT OR IGNORE found the row the other request inserted
+      mockDb.run.mockImplementation((query, params, callback) => {
+        callback.call({ lastID: 0, changes: 0 }, null);
+      });
+
+      const response = await request(app)
+        .post('/api/auth/login')
+        .send({ email: 'newuser@example.com' });
+
+      expect(response.status).toBe(200);
+      expect(response.body.message).toBe('Login successful');
+      expect(verifyToken(response.body.accessToken)).toEqual({ id: 9, email: 'newuser@example.com' });
+    });
+
+    test('should not write for an existing user', async () => {
+      mockDb.get.mockImplementation((query, params, callback) => {
+        callback(null, { id: 3, email: 'existing@example.com', created_at: '2024-01-01T00:00:00.000Z' });
+      });
+
+      await request(app)
+        .post('/api/auth/login')
+        .send({ email: 'existing@example.com' });
+
+      expect(mockDb.write).not.toHaveBeenCalled();
+    });
+
     test('should return 400 for invalid email', async () => {
       const response = await request(app)
         .post('/api/auth/login')
@@ -119,7 +170,7 @@ describe('Auth Routes', () => {
         .send({ email: 'newuser@example.com' });
 
       expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Failed to create user' });
+      expect(response.body).toEqual({ error: 'Internal server error' });
     });
 
     test('should handle unexpected errors in try-catch block', async () => {
@@ -136,6 +187,55 @@ describe('Auth Routes', () => {
     });
   });
 
+  describe('POST /api/auth/refresh', () => {
+    const user = { id: 3, email: 'test@example.com' };
+
+    test('should issue a new token pair for a valid refresh token', async () => {
+      mockDb.get.mockImplementation((query, params, callback) => {
+        callback(null, { id: 3 });
+      });
+
+      const response = await request(app)
+        .post('/api/auth/refresh')
+        .send({ refreshToken: issueTokens(user).refreshToken });
+
+      expect(response.status).toBe(200);
+      expect(verifyToken(response.body.accessToken)).toEqual(user);
+      expect(verifyToken(response.body.refreshToken, REFRESH)).toEqual(user);
+      expect(mockDb.get).toHaveBeenCalledWith('SELECT id FROM users WHERE email = ?', ['test@example.com'], expect.any(Function));
+    });
+
+    test('should return 401 for an access token', async () => {
+      const response = await request(app)
+        .post('/api/auth/refresh')
+        .send({ refreshToken: issueTokens(user).accessToken });
+
+      expect(response.status).toBe(401);
+      expect(response.body).toEqual({ error: 'Invalid or expired refresh token' });
+      expect(mockDb.get).not.toHaveBeenCalled();
+    });
+
+    test('should return 401 if the user no longer exists', async () => {
+      mockDb.get.mockImplementation((query, params, callback) => {
+        callback(null, undefined);
+      });
+
+      const response = await request(app)
+        .post('/api/auth/refresh')
+        .send({ refreshToken: issueTokens(user).refreshToken });
+
+      expect(response.status).toBe(401);
+    });
+
+    test('should return 400 without a refresh token', async () => {
+      const response = await request(app)
+        .post('/api/auth/refresh')
+        .send({});
+
+      expect(response.status).toBe(400);
+    });
+  });
+
   describe('GET /api/auth/me', () => {
     test('should return current user info', async () => {
       const user = {
@@ -165,9 +265,9 @@ describe('Auth Routes', () => {
 
     test('should return 404 if user not found', async () => {
       mockDb.get.mockImplementation((query, params, callback) => {
-        if (query.includes('SELECT email FROM users WHERE email = ?')) {
+        if (query.includes('SELECT id FROM users WHERE email = ?')) {
           // Auth middleware check
-          callback(null, { email: 'test@example.com' });
+          callback(null, { id: 1 });
         } else {
           // /me endpoint check
           callback(null, null);
@@ -184,8 +284,8 @@ describe('Auth Routes', () => {
 
     test('should handle database error', async () => {
       mockDb.get.mockImplementation((query, params, callback) => {
-        if (query.includes('SELECT email FROM users WHERE email = ?')) {
-          callback(null, { email: 'test@example.com' });
+        if (query.includes('SELECT id FROM users WHERE email = ?')) {
+          callback(null, { id: 1 });
         } else {
           callback(new Error('Database error'), null);
         }
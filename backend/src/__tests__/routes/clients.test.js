@@ -1,16 +1,27 @@
 const request = require('supertest');
 const express = require('express');
 const clientRoutes = require('../../routes/clients');
-const { getDatabase } = require('../../database/init');
-
-jest.mock('../../database/init');
+const clientsRepo = require('../../repositories/clientsRepo');
+
+jest.mock('../../repositories/clientsRepo', () => ({
+  list: jest.fn(),
+  findById: jest.fn(),
+  create: jest.fn(),
+  update: jest.fn(),
+  remove: jest.fn(),
+  removeAll: jest.fn()
+}));
 jest.mock('../../middleware/auth', () => ({
   authenticateUser: (req, res, next) => {
     req.userEmail = 'test@example.com';
+    req.userId = 42;
+    req.user = { id: 42, email: 'test@example.com' };
     next();
   }
 }));
 
+const USER = { id: 42, email: 'test@example.com' };
+
 const app = express();
 app.use(express.json());
 app.use('/api/clients', clientRoutes);
@@ -23,47 +34,34 @@ app.use((err, req, res, next) => {
 });
 
 describe('Client Routes', () => {
-  let mockDb;
+  let consoleErrorSpy;
 
   beforeEach(() => {
-    mockDb = {
-      all: jest.fn(),
-      get: jest.fn(),
-      run: jest.fn()
-    };
-    getDatabase.mockReturnValue(mockDb);
+    consoleErrorSpy = jest.spyOn(console, 'error').mockImplementation();
   });
 
   afterEach(() => {
+    consoleErrorSpy.mockRestore();
     jest.clearAllMocks();
   });
 
   describe('GET /api/clients', () => {
     test('should return all clients for authenticated user', async () => {
       const mockClients = [
-        { id: 1, name: 'Client A', description: 'Desc A', created_at: '2024-01-01', updated_at: '2024-01-01' },
-        { id: 2, name: 'Client B', description: 'Desc B', created_at: '2024-01-02', updated_at: '2024-01-02' }
+        { id: 1, name: 'Client A', description: 'Desc A' },
+        { id: 2, name: 'Client B', description: 'Desc B' }
       ];
-
-      mockDb.all.mockImplementation((query, params, callback) => {
-        callback(null, mockClients);
-      });
+      clientsRepo.list.mockResolvedValue(mockClients);
 
       const response = await request(app).get('/api/clients');
 
       expect(response.status).toBe(200);
       expect(response.body).toEqual({ clients: mockClients });
-      expect(mockDb.all).toHaveBeenCalledWith(
-        expect.stringContaining('SELECT id, name, description'),
-        ['test@example.com'],
-        expect.any(Function)
-      );
+      expect(clientsRepo.list).toHaveBeenCalledWith(USER);
     });
 
     test('should return empty array when no clients exist', async () => {
-      mockDb.all.mockImplementation((query, params, callback) => {
-        callback(null, []);
-      });
+      clientsRepo.list.mockResolvedValue([]);
 
       const response = await request(app).get('/api/clients');
 
@@ -72,9 +70,7 @@ describe('Client Routes', () => {
     });
 
     test('should handle database error', async () => {
-      mockDb.all.mockImplementation((query, params, callback) => {
-        callback(new Error('Database error'), null);
-      });
+      clientsRepo.list.mockRejectedValue(new Error('Database error'));
 
       const response = await request(app).get('/api/clients');
 
@@ -86,21 +82,17 @@ describe('Client Routes', () => {
   describe('GET /api/clients/:id', () => {
     test('should return specific client', async () => {
       const mockClient = { id: 1, name: 'Client A', description: 'Desc A' };
-
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, mockClient);
-      });
+      clientsRepo.findById.mockResolvedValue(mockClient);
 
       const response = await request(app).get('/api/clients/1');
 
       expect(response.status).toBe(200);
       expect(response.body).toEqual({ client: mockClient });
+      expect(clientsRepo.findById).toHaveBeenCalledWith(1, USER);
     });
 
     test('should return 404 if client not found', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, null);
-      });
+      clientsRepo.findById.mockResolvedValue(undefined);
 
       const response = await request(app).get('/api/clients/999');
 
@@ -113,12 +105,11 @@ describe('Client Routes', () => {
 
       expect(response.status).toBe(400);
       expect(response.body).toEqual({ error: 'Invalid client ID' });
+      expect(clientsRepo.findById).not.toHaveBeenCalled();
     });
 
     test('should handle database error', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(new Error('Database error'), null);
-      });
+      clientsRepo.findById.mockRejectedValue(new Error('Database error'));
 
       const response = await request(app).get('/api/clients/1');
 
@@ -130,16 +121,7 @@ describe('Client Routes', () => {
   describe('POST /api/clients', () => {
     test('should create new client with valid data', async () => {
       const newClient = { name: 'New Client', description: 'New Description' };
-      const createdClient = { id: 1, ...newClient, created_at: '2024-01-01', updated_at: '2024-01-01' };
-
-      mockDb.run.mockImplementation(function(query, params, callback) {
-        this.lastID = 1;
-        callback.call(this, null);
-      });
-
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, createdClient);
-      });
+      clientsRepo.create.mockResolvedValue({ id: 1, ...newClient });
 
       const response = await request(app)
         .post('/api/clients')
@@ -147,35 +129,28 @@ describe('Client Routes', () => {
 
       expect(response.status).toBe(201);
       expect(response.body.message).toBe('Client created successfully');
-      expect(response.body.client).toEqual(createdClient);
+      expect(response.body.client).toEqual({ id: 1, ...newClient });
+      expect(clientsRepo.create).toHaveBeenCalledWith(USER, newClient);
     });
 
     test('should create client without description', async () => {
-      const newClient = { name: 'Client Without Desc' };
-      const createdClient = { id: 1, name: 'Client Without Desc', description: null };
-
-      mockDb.run.mockImplementation(function(query, params, callback) {
-        this.lastID = 1;
-        callback.call(this, null);
-      });
-
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, createdClient);
-      });
+      clientsRepo.create.mockResolvedValue({ id: 1, name: 'New Client', description: null });
 
       const response = await request(app)
         .post('/api/clients')
-        .send(newClient);
+        .send({ name: 'New Client' });
 
       expect(response.status).toBe(201);
+      expect(response.body.client.description).toBeNull();
     });
 
     test('should return 400 for missing name', async () => {
       const response = await request(app)
         .post('/api/clients')
-        .send({ description: 'No name provided' });
+        .send({ description: 'No name' });
 
       expect(response.status).toBe(400);
+      expect(clientsRepo.create).not.toHaveBeenCalled();
     });
 
     test('should return 400 for empty name', async () => {
@@ -187,34 +162,20 @@ describe('Client Routes', () => {
     });
 
     test('should handle database insert error', async () => {
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(new Error('Insert failed'));
-      });
+      clientsRepo.create.mockRejectedValue(new Error('Insert failed'));
 
       const response = await request(app)
         .post('/api/clients')
-        .send({ name: 'Test Client' });
+        .send({ name: 'New Client' });
 
       expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Failed to create client' });
+      expect(response.body).toEqual({ error: 'Internal server error' });
     });
   });
 
   describe('PUT /api/clients/:id', () => {
     test('should update client name', async () => {
-      const updatedClient = { id: 1, name: 'Updated Name', description: 'Old Desc' };
-
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, { id: 1 }); // Client exists
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, updatedClient);
-      });
+      clientsRepo.update.mockResolvedValue({ id: 1, name: 'Updated Name', description: 'Desc' });
 
       const response = await request(app)
         .put('/api/clients/1')
@@ -222,37 +183,30 @@ describe('Client Routes', () => {
 
       expect(response.status).toBe(200);
       expect(response.body.message).toBe('Client updated successfully');
-      expect(response.body.client).toEqual(updatedClient);
+      expect(response.body.client.name).toBe('Updated Name');
+      expect(clientsRepo.update).toHaveBeenCalledWith(1, USER, { name: 'Updated Name' });
     });
 
-    test('should update client description', async () => {
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, { id: 1, name: 'Client', description: 'New Description' });
-      });
+    test('should update both name and description', async () => {
+      clientsRepo.update.mockResolvedValue({ id: 1, name: 'New Name', description: 'New Desc' });
 
       const response = await request(app)
         .put('/api/clients/1')
-        .send({ description: 'New Description' });
+        .send({ name: 'New Name', description: 'New Desc' });
 
       expect(response.status).toBe(200);
+      expect(clientsRepo.update).toHaveBeenCalledWith(1, USER, {
+        name: 'New Name',
+        description: 'New Desc'
+      });
     });
 
     test('should return 404 if client not found', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, null);
-      });
+      clientsRepo.update.mockResolvedValue(null);
 
       const response = await request(app)
         .put('/api/clients/999')
-        .send({ name: 'Updated' });
+        .send({ name: 'Updated Name' });
 
       expect(response.status).toBe(404);
       expect(response.body).toEqual({ error: 'Client not found' });
@@ -261,7 +215,7 @@ describe('Client Routes', () => {
     test('should return 400 for invalid client ID', async () => {
       const response = await request(app)
         .put('/api/clients/invalid')
-        .send({ name: 'Updated' });
+        .send({ name: 'Updated Name' });
 
       expect(response.status).toBe(400);
       expect(response.body).toEqual({ error: 'Invalid client ID' });
@@ -273,29 +227,57 @@ describe('Client Routes', () => {
         .send({});
 
       expect(response.status).toBe(400);
+      expect(clientsRepo.update).not.toHaveBeenCalled();
+    });
+
+    test('should handle database error during update', async () => {
+      clientsRepo.update.mockRejectedValue(new Error('Update failed'));
+
+      const response = await request(app)
+        .put('/api/clients/1')
+        .send({ name: 'Updated Name' });
+
+      expect(response.status).toBe(500);
+      expect(response.body).toEqual({ error: 'Internal server error' });
     });
   });
 
-  describe('DELETE /api/clients/:id', () => {
-    test('should delete existing client', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
+  describe('DELETE /api/clients', () => {
+    test('should delete all clients for user', async () => {
+      clientsRepo.removeAll.mockResolvedValue(3);
 
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
+      const response = await request(app).delete('/api/clients');
+
+      expect(response.status).toBe(200);
+      expect(response.body).toEqual({
+        message: 'All clients deleted successfully',
+        deletedCount: 3
       });
+    });
+
+    test('should handle database error', async () => {
+      clientsRepo.removeAll.mockRejectedValue(new Error('Delete failed'));
+
+      const response = await request(app).delete('/api/clients');
+
+      expect(response.status).toBe(500);
+      expect(response.body).toEqual({ error: 'Internal server error' });
+    });
+  });
+
+  describe('DELETE /api/clients/:id', () => {
+    test('should delete existing client', async () => {
+      clientsRepo.remove.mockResolvedValue(true);
 
       const response = await request(app).delete('/api/clients/1');
 
       expect(response.status).toBe(200);
       expect(response.body).toEqual({ message: 'Client deleted successfully' });
+      expect(clientsRepo.remove).toHaveBeenCalledWith(1, USER);
     });
 
     test('should return 404 if client not found', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, null);
-      });
+      clientsRepo.remove.mockResolvedValue(false);
 
       const response = await request(app).delete('/api/clients/999');
 
@@ -311,24 +293,7 @@ describe('Client Routes', () => {
     });
 
     test('should handle database delete error', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(new Error('Delete failed'));
-      });
-
-      const response = await request(app).delete('/api/clients/1');
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Failed to delete client' });
-    });
-
-    test('should handle database error when checking client existence', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(new Error('Database error'), null);
-      });
+      clientsRepo.remove.mockRejectedValue(new Error('Delete failed'));
 
       const response = await request(app).delete('/api/clients/1');
 
@@ -336,122 +301,4 @@ describe('Client Routes', () => {
       expect(response.body).toEqual({ error: 'Internal server error' });
     });
   });
-
-  describe('POST /api/clients - Error Handling', () => {
-    test('should handle error retrieving client after creation', async () => {
-      mockDb.run.mockImplementation(function(query, params, callback) {
-        this.lastID = 1;
-        callback.call(this, null);
-      });
-
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(new Error('Retrieval failed'), null);
-      });
-
-      const response = await request(app)
-        .post('/api/clients')
-        .send({ name: 'Test Client' });
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Client created but failed to retrieve' });
-    });
-  });
-
-  describe('PUT /api/clients/:id - Error Handling', () => {
-    test('should handle database error when checking client existence', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(new Error('Database error'), null);
-      });
-
-      const response = await request(app)
-        .put('/api/clients/1')
-        .send({ name: 'Updated Name' });
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Internal server error' });
-    });
-
-    test('should handle database error during update', async () => {
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(new Error('Update failed'));
-      });
-
-      const response = await request(app)
-        .put('/api/clients/1')
-        .send({ name: 'Updated Name' });
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Failed to update client' });
-    });
-
-    test('should handle error retrieving client after update', async () => {
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(new Error('Retrieval failed'), null);
-      });
-
-      const response = await request(app)
-        .put('/api/clients/1')
-        .send({ name: 'Updated Name' });
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Client updated but failed to retrieve' });
-    });
-
-    test('should update both name and description', async () => {
-      const updatedClient = { id: 1, name: 'New Name', description: 'New Description' };
-
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, updatedClient);
-      });
-
-      const response = await request(app)
-        .put('/api/clients/1')
-        .send({ name: 'New Name', description: 'New Description' });
-
-      expect(response.status).toBe(200);
-      expect(response.body.client).toEqual(updatedClient);
-    });
-
-    test('should update description to null when empty string provided', async () => {
-      const updatedClient = { id: 1, name: 'Client', description: null };
-
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      mockDb.get.mockImplementationOnce((query, params, callback) => {
-        callback(null, updatedClient);
-      });
-
-      const response = await request(app)
-        .put('/api/clients/1')
-        .send({ description: '' });
-
-      expect(response.status).toBe(200);
-    });
-  });
 });
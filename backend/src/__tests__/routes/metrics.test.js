@@ -0,0 +1,67 @@
+const request = require('supertest');
+const express = require('express');
+const { registerMetrics } = require('../../metrics');
+const { issueTokens } = require('../../tokens');
+
+jest.mock('../../database/init');
+
+const metricsRoutes = require('../../routes/metrics');
+
+const app = express();
+app.use('/metrics', metricsRoutes);
+
+describe('Metrics Routes', () => {
+  const tokenFor = (email) => issueTokens({ id: 1, email }).accessToken;
+
+  beforeAll(() => {
+    process.env.JWT_SECRET = 'test-secret';
+    process.env.ADMIN_EMAILS = 'admin@example.com';
+    process.env.METRICS_TOKEN = 'scraper-secret';
+    registerMetrics('test', () => ({ counted: 3 }));
+  });
+
+  afterAll(() => {
+    delete process.env.JWT_SECRET;
+    delete process.env.ADMIN_EMAILS;
+    delete process.env.METRICS_TOKEN;
+  });
+
+  describe('GET /metrics', () => {
+    test('should refuse anonymous requests', async () => {
+      const response = await request(app).get('/metrics');
+
+      expect(response.status).toBe(401);
+      expect(response.body.test).toBeUndefined();
+    });
+
+    test('should refuse users who are not admins', async () => {
+      const response = await request(app)
+        .get('/metrics')
+        .set('Authorization', `Bearer ${tokenFor('test@example.com')}`);
+
+      expect(response.status).toBe(403);
+    });
+
+    test('should return metrics to admins', async () => {
+      const response = await request(app)
+        .get('/metrics')
+        .set('Authorization', `Bearer ${tokenFor('admin@example.com')}`);
+
+      expect(response.status).toBe(200);
+      expect(response.body.test).toEqual({ counted: 3 });
+    });
+
+    test('should return metrics to the scraper with METRICS_TOKEN', async () => {
+      const response = await request(app).get('/metrics').set('Authorization', 'Bearer scraper-secret');
+
+      expect(response.status).toBe(200);
+      expect(response.body.test).toEqual({ counted: 3 });
+    });
+
+    test('should refuse a wrong metrics token', async () => {
+      const response = await request(app).get('/metrics').set('Authorization', 'Bearer scraper-secreT');
+
+      expect(response.status).toBe(401);
+    });
+  });
+});
@@ -1,16 +1,10 @@
 const request = require('supertest');
 const express = require('express');
-const { getDatabase } = require('../../database/init');
-const fs = require('fs');
-const path = require('path');
+const { getDatabase, getArchive } = require('../../database/init');
+const { STATEMENTS } = require('../../database/statements');
+const { MIN_DAY, MAX_DAY } = require('../../database/days');
 
 jest.mock('../../database/init');
-jest.mock('fs');
-jest.mock('csv-writer', () => ({
-  createObjectCsvWriter: jest.fn(() => ({
-    writeRecords: jest.fn().mockResolvedValue(undefined)
-  }))
-}));
 jest.mock('pdfkit', () => {
   return jest.fn().mockImplementation(() => ({
     fontSize: jest.fn().mockReturnThis(),
@@ -30,6 +24,7 @@ const reportRoutes = require('../../routes/reports');
 jest.mock('../../middleware/auth', () => ({
   authenticateUser: (req, res, next) => {
     req.userEmail = 'test@example.com';
+    req.userId = 42;
     next();
   }
 }));
@@ -37,6 +32,12 @@ jest.mock('../../middleware/auth', () => ({
 const app = express();
 app.use(express.json());
 app.use('/api/reports', reportRoutes);
+app.use((err, req, res, next) => {
+  if (err.isJoi) {
+    return res.status(400).json({ error: 'Validation error' });
+  }
+  res.status(500).json({ error: 'Internal server error' });
+});
 
 describe('Report Routes', () => {
   let mockDb;
@@ -47,11 +48,6 @@ describe('Report Routes', () => {
       get: jest.fn()
     };
     getDatabase.mockReturnValue(mockDb);
-    
-    // Mock fs methods
-    fs.existsSync = jest.fn().mockReturnValue(true);
-    fs.mkdirSync = jest.fn();
-    fs.unlink = jest.fn((path, callback) => callback(null));
   });
 
   afterEach(() => {
@@ -67,7 +63,13 @@ describe('Report Routes', () => {
       ];
 
       mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, mockClient);
+        callback(null, {
+          ...mockClient,
+          total_hours: 8.5,
+          entry_count: 2,
+          first_date: '2024-01-01',
+          last_date: '2024-01-02'
+        });
       });
 
       mockDb.all.mockImplementation((query, params, callback) => {
@@ -81,10 +83,12 @@ describe('Report Routes', () => {
       expect(response.body.workEntries).toEqual(mockWorkEntries);
       expect(response.body.totalHours).toBe(8.5);
       expect(response.body.entryCount).toBe(2);
+      expect(response.body.firstDate).toBe('2024-01-01');
+      expect(response.body.lastDate).toBe('2024-01-02');
     });
 
     test('should return report with zero hours for client with no entries', async () => {
-      const mockClient = { id: 1, name: 'Empty Client' };
+      const mockClient = { id: 1, name: 'Empty Client', total_hours: 0, entry_count: 0, first_date: null, last_date: null };
 
       mockDb.get.mockImplementation((query, params, callback) => {
         callback(null, mockClient);
@@ -145,24 +149,73 @@ describe('Report Routes', () => {
       expect(response.body).toEqual({ error: 'Internal server error' });
     });
 
-    test('should filter work entries by user email', async () => {
+    test('should filter work entries by user', async () => {
       mockDb.get.mockImplementation((query, params, callback) => {
         callback(null, { id: 1, name: 'Test Client' });
       });
 
       mockDb.all.mockImplementation((query, params, callback) => {
-        expect(params).toEqual([1, 'test@example.com']);
         callback(null, []);
       });
 
       await request(app).get('/api/reports/client/1');
 
       expect(mockDb.all).toHaveBeenCalledWith(
-        expect.stringContaining('WHERE client_id = ? AND user_email = ?'),
-        [1, 'test@example.com'],
+        expect.stringContaining('WHERE client_id = ? AND user_id = ? AND day BETWEEN ? AND ?'),
+        [1, 42, MIN_DAY, MAX_DAY],
+        expect.any(Function)
+      );
+    });
+
+    test('should limit the report to the requested days', async () => {
+      mockDb.get.mockImplementation((query, params, callback) => {
+        callback(null, { id: 1, name: 'Test Client', total_hours: 2, entry_count: 1 });
+      });
+
+      mockDb.all.mockImplementation((query, params, callback) => {
+        callback(null, []);
+      });
+
+      const response = await request(app).get('/api/reports/client/1?from=2024-01-01&to=2024-01-31');
+
+      expect(response.status).toBe(200);
+      expect(mockDb.get).toHaveBeenCalledWith(
+        expect.stringContaining('FROM work_entry_daily'),
+        [19723, 19753, 1, 42],
+        expect.any(Function)
+      );
+      expect(mockDb.all).toHaveBeenCalledWith(
+        expect.stringContaining('FROM work_entries'),
+        [1, 42, 19723, 19753],
+        expect.any(Function)
+      );
+    });
+
+    test('should read archived entries when the range reaches the archive', async () => {
+      getArchive.mockReturnValueOnce({ covers: jest.fn((fromDay) => fromDay <= 19000) });
+      mockDb.get.mockImplementation((query, params, callback) => {
+        callback(null, { id: 1, name: 'Test Client', total_hours: 2, entry_count: 1 });
+      });
+      mockDb.all.mockImplementation((query, params, callback) => {
+        callback(null, []);
+      });
+
+      const response = await request(app).get('/api/reports/client/1?from=2020-01-01');
+
+      expect(response.status).toBe(200);
+      expect(mockDb.all).toHaveBeenCalledWith(
+        STATEMENTS.reportEntriesWithArchive,
+        [1, 42, 18262, MAX_DAY, 1, 42, 18262, MAX_DAY],
         expect.any(Function)
       );
     });
+
+    test('should return 400 for a reversed range', async () => {
+      const response = await request(app).get('/api/reports/client/1?from=2024-02-01&to=2024-01-01');
+
+      expect(response.status).toBe(400);
+      expect(mockDb.get).not.toHaveBeenCalled();
+    });
   });
 
   describe('GET /api/reports/export/csv/:clientId', () => {
@@ -245,12 +298,12 @@ describe('Report Routes', () => {
   describe('Data Isolation', () => {
     test('should only return data for authenticated user', async () => {
       mockDb.get.mockImplementation((query, params, callback) => {
-        expect(params).toContain('test@example.com');
+        expect(params).toContain(42);
         callback(null, { id: 1, name: 'Test Client' });
       });
 
       mockDb.all.mockImplementation((query, params, callback) => {
-        expect(params).toContain('test@example.com');
+        expect(params).toContain(42);
         callback(null, []);
       });
 
@@ -258,16 +311,16 @@ describe('Report Routes', () => {
 
       expect(mockDb.get).toHaveBeenCalledWith(
         expect.any(String),
-        expect.arrayContaining(['test@example.com']),
+        expect.arrayContaining([42]),
         expect.any(Function)
       );
     });
   });
 
-  describe('Hours Calculation', () => {
-    test('should correctly sum decimal hours', async () => {
+  describe('Hours Totals', () => {
+    test('should read totals from client_hour_totals instead of summing entries', async () => {
       mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { id: 1, name: 'Test Client' });
+        callback(null, { id: 1, name: 'Test Client', total_hours: 7.5, entry_count: 3 });
       });
 
       mockDb.all.mockImplementation((query, params, callback) => {
@@ -281,125 +334,218 @@ describe('Report Routes', () => {
       const response = await request(app).get('/api/reports/client/1');
 
       expect(response.body.totalHours).toBe(7.5);
+      expect(response.body.entryCount).toBe(3);
+      expect(mockDb.get).toHaveBeenCalledWith(
+        expect.stringContaining('LEFT JOIN client_hour_totals'),
+        [1, 42],
+        expect.any(Function)
+      );
     });
+  });
 
-    test('should handle integer hours', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { id: 1, name: 'Test Client' });
+  describe('GET /api/reports/timeseries', () => {
+    test('should return a daily series with empty days filled in', async () => {
+      mockDb.all.mockImplementation((query, params, callback) => {
+        callback(null, [
+          { day: 19723, hundredths: 250, entries: 1 },
+          { day: 19725, hundredths: 400, entries: 2 }
+        ]);
       });
 
+      const response = await request(app).get('/api/reports/timeseries?from=2024-01-01&to=2024-01-03');
+
+      expect(response.status).toBe(200);
+      expect(response.body).toEqual({
+        interval: 'day',
+        from: '2024-01-01',
+        to: '2024-01-03',
+        clientId: null,
+        totalHours: 6.5,
+        entryCount: 3,
+        series: [
+          { period: '2024-01-01', hours: 2.5, entries: 1 },
+          { period: '2024-01-02', hours: 0, entries: 0 },
+          { period: '2024-01-03', hours: 4, entries: 2 }
+        ]
+      });
+      expect(mockDb.all).toHaveBeenCalledWith(
+        expect.stringContaining('FROM work_entry_daily'),
+        [42, 19723, 19725],
+        expect.any(Function)
+      );
+    });
+
+    test('should bucket a client series by week starting on Monday', async () => {
       mockDb.all.mockImplementation((query, params, callback) => {
         callback(null, [
-          { hours: 8 },
-          { hours: 4 }
+          { day: 19729, hundredths: 125, entries: 1 },
+          { day: 19730, hundredths: 300, entries: 1 },
+          { day: 19734, hundredths: 250, entries: 2 }
         ]);
       });
 
-      const response = await request(app).get('/api/reports/client/1');
+      const response = await request(app)
+        .get('/api/reports/timeseries?clientId=4&interval=week&from=2024-01-03&to=2024-01-14');
 
-      expect(response.body.totalHours).toBe(12);
+      expect(response.status).toBe(200);
+      expect(response.body.series).toEqual([
+        { period: '2024-01-01', hours: 1.25, entries: 1 },
+        { period: '2024-01-08', hours: 5.5, entries: 3 }
+      ]);
+      expect(mockDb.all).toHaveBeenCalledWith(
+        expect.stringContaining('AND client_id = ?'),
+        [42, 4, 19725, 19736],
+        expect.any(Function)
+      );
     });
-  });
-
-  describe('CSV Export Success Path', () => {
-    test('should handle CSV write error', async () => {
-      const mockClient = { id: 1, name: 'Test Client' };
-      const mockWorkEntries = [
-        { date: '2024-01-01', hours: 5, description: 'Work 1', created_at: '2024-01-01' }
-      ];
 
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, mockClient);
+    test('should bucket by month', async () => {
+      mockDb.all.mockImplementation((query, params, callback) => {
+        callback(null, [{ day: 19763, hundredths: 800, entries: 1 }]);
       });
 
+      const response = await request(app)
+        .get('/api/reports/timeseries?interval=month&from=2024-01-15&to=2024-03-01');
+
+      expect(response.body.series).toEqual([
+        { period: '2024-01-01', hours: 0, entries: 0 },
+        { period: '2024-02-01', hours: 8, entries: 1 },
+        { period: '2024-03-01', hours: 0, entries: 0 }
+      ]);
+    });
+
+    test('should add up hours exactly', async () => {
       mockDb.all.mockImplementation((query, params, callback) => {
-        callback(null, mockWorkEntries);
+        callback(null, [
+          { day: 19723, hundredths: 10, entries: 1 },
+          { day: 19724, hundredths: 20, entries: 1 }
+        ]);
       });
 
-      const csvWriter = require('csv-writer');
-      csvWriter.createObjectCsvWriter.mockReturnValue({
-        writeRecords: jest.fn().mockRejectedValue(new Error('Write failed'))
-      });
+      const response = await request(app)
+        .get('/api/reports/timeseries?interval=week&from=2024-01-01&to=2024-01-02');
 
-      const response = await request(app).get('/api/reports/export/csv/1');
+      expect(response.body.totalHours).toBe(0.3);
+      expect(response.body.series[0].hours).toBe(0.3);
+    });
 
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Failed to generate CSV report' });
+    test('should return 400 when the range is missing or reversed', async () => {
+      const missing = await request(app).get('/api/reports/timeseries?from=2024-01-01');
+      const reversed = await request(app).get('/api/reports/timeseries?from=2024-02-01&to=2024-01-01');
+
+      expect(missing.status).toBe(400);
+      expect(reversed.status).toBe(400);
+      expect(mockDb.all).not.toHaveBeenCalled();
     });
 
-    test('should verify CSV export calls correct database queries', async () => {
-      const mockClient = { id: 1, name: 'Test Client' };
+    test('should return 400 when the range is too large', async () => {
+      const response = await request(app).get('/api/reports/timeseries?from=2000-01-01&to=2024-01-01');
 
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, mockClient);
-      });
+      expect(response.status).toBe(400);
+      expect(response.body).toEqual({ error: 'Date range too large' });
+    });
 
+    test('should handle database error', async () => {
       mockDb.all.mockImplementation((query, params, callback) => {
-        callback(null, []);
+        callback(new Error('Database error'));
       });
 
-      const csvWriter = require('csv-writer');
-      csvWriter.createObjectCsvWriter.mockReturnValue({
-        writeRecords: jest.fn().mockRejectedValue(new Error('Write failed'))
+      const response = await request(app).get('/api/reports/timeseries?from=2024-01-01&to=2024-01-31');
+
+      expect(response.status).toBe(500);
+      expect(response.body).toEqual({ error: 'Internal server error' });
+    });
+  });
+
+  describe('GET /api/reports/summary', () => {
+    test('should return totals across all clients', async () => {
+      mockDb.get.mockImplementation((query, params, callback) => {
+        callback(null, { total_hours: 42.25, entry_count: 9 });
       });
 
-      await request(app).get('/api/reports/export/csv/1');
+      const response = await request(app).get('/api/reports/summary');
 
+      expect(response.status).toBe(200);
+      expect(response.body).toEqual({ totalHours: 42.25, entryCount: 9 });
       expect(mockDb.get).toHaveBeenCalledWith(
-        expect.stringContaining('SELECT id, name FROM clients'),
-        expect.arrayContaining([1, 'test@example.com']),
+        expect.stringContaining('FROM client_hour_totals'),
+        [42],
         expect.any(Function)
       );
     });
 
-    test('should create temp directory if it does not exist', async () => {
-      const mockClient = { id: 1, name: 'Test Client' };
-      const mockWorkEntries = [
-        { date: '2024-01-01', hours: 5, description: 'Work 1', created_at: '2024-01-01' }
-      ];
-
+    test('should handle database error', async () => {
       mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, mockClient);
+        callback(new Error('Database error'));
       });
 
-      mockDb.all.mockImplementation((query, params, callback) => {
-        callback(null, mockWorkEntries);
-      });
+      const response = await request(app).get('/api/reports/summary');
 
-      fs.existsSync.mockReturnValue(false);
+      expect(response.status).toBe(500);
+      expect(response.body).toEqual({ error: 'Internal server error' });
+    });
+  });
+
+  describe('CSV Export Success Path', () => {
+    test('should stream the entries as a CSV attachment', async () => {
+      mockDb.get.mockImplementation((query, params, callback) => {
+        callback(null, { id: 1, name: 'Test Client' });
+      });
 
-      const csvWriter = require('csv-writer');
-      csvWriter.createObjectCsvWriter.mockReturnValue({
-        writeRecords: jest.fn().mockRejectedValue(new Error('Write failed'))
+      mockDb.all.mockImplementation((query, params, callback) => {
+        callback(null, [
+          { date: '2024-01-02', hours: 5, description: 'Work, "quoted"', created_at: '2024-01-02 09:00:00' },
+          { date: '2024-01-01', hours: 1.25, description: null, created_at: '2024-01-01 09:00:00' }
+        ]);
       });
 
-      await request(app).get('/api/reports/export/csv/1');
+      const response = await request(app).get('/api/reports/export/csv/1');
 
-      expect(fs.mkdirSync).toHaveBeenCalledWith(expect.any(String), { recursive: true });
+      expect(response.status).toBe(200);
+      expect(response.headers['content-type']).toMatch(/^text\/csv/);
+      expect(response.headers['content-disposition']).toMatch(/^attachment; filename="Test_Client_report_.*\.csv"$/);
+      expect(response.text).toBe(
+        'Date,Hours,Description,Created At\n' +
+        '2024-01-02,5,"Work, ""quoted""",2024-01-02 09:00:00\n' +
+        '2024-01-01,1.25,,2024-01-01 09:00:00\n'
+      );
     });
 
-    test('should not create temp directory if it exists', async () => {
-      const mockClient = { id: 1, name: 'Test Client' };
-      const mockWorkEntries = [];
-
+    test('should write every entry of a large export', async () => {
       mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, mockClient);
+        callback(null, { id: 1, name: 'Test Client' });
       });
 
       mockDb.all.mockImplementation((query, params, callback) => {
-        callback(null, mockWorkEntries);
+        callback(null, Array.from({ length: 1234 }, (_, i) => ({
+          date: '2024-01-01', hours: 1, description: `Entry ${i}`, created_at: '2024-01-01'
+        })));
       });
 
-      fs.existsSync.mockReturnValue(true);
+      const response = await request(app).get('/api/reports/export/csv/1');
+      const lines = response.text.trim().split('\n');
+
+      expect(lines).toHaveLength(1235);
+      expect(lines[1234]).toBe('2024-01-01,1,Entry 1233,2024-01-01');
+    });
+
+    test('should verify CSV export calls correct database queries', async () => {
+      mockDb.get.mockImplementation((query, params, callback) => {
+        callback(null, { id: 1, name: 'Test Client' });
+      });
 
-      const csvWriter = require('csv-writer');
-      csvWriter.createObjectCsvWriter.mockReturnValue({
-        writeRecords: jest.fn().mockRejectedValue(new Error('Write failed'))
+      mockDb.all.mockImplementation((query, params, callback) => {
+        callback(null, []);
       });
 
-      await request(app).get('/api/reports/export/csv/1');
+      const response = await request(app).get('/api/reports/export/csv/1');
 
-      expect(fs.mkdirSync).not.toHaveBeenCalled();
+      expect(response.text).toBe('Date,Hours,Description,Created At\n');
+      expect(mockDb.get).toHaveBeenCalledWith(
+        expect.stringContaining('SELECT id, name FROM clients'),
+        expect.arrayContaining([1, 42]),
+        expect.any(Function)
+      );
     });
   });
 
@@ -432,8 +578,8 @@ describe('Report Routes', () => {
       await request(app).get('/api/reports/export/pdf/1');
 
       expect(mockDb.get).toHaveBeenCalledWith(
-        expect.stringContaining('SELECT id, name FROM clients'),
-        expect.arrayContaining([1, 'test@example.com']),
+        expect.stringContaining('LEFT JOIN client_hour_totals'),
+        expect.arrayContaining([1, 42]),
         expect.any(Function)
       );
     });
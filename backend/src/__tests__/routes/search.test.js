@@ -0,0 +1,108 @@
+const request = require('supertest');
+const express = require('express');
+const searchRoutes = require('../../routes/search');
+const searchRepo = require('../../repositories/searchRepo');
+
+jest.mock('../../repositories/searchRepo', () => ({
+  search: jest.fn()
+}));
+jest.mock('../../middleware/auth', () => ({
+  authenticateUser: (req, res, next) => {
+    req.userEmail = 'test@example.com';
+    req.userId = 42;
+    req.user = { id: 42, email: 'test@example.com' };
+    next();
+  }
+}));
+
+const USER = { id: 42, email: 'test@example.com' };
+
+const app = express();
+app.use(express.json());
+app.use('/api/search', searchRoutes);
+app.use((err, req, res, next) => {
+  if (err.isJoi) {
+    return res.status(400).json({ error: 'Validation error' });
+  }
+  res.status(500).json({ error: 'Internal server error' });
+});
+
+describe('Search Routes', () => {
+  let consoleErrorSpy;
+
+  beforeEach(() => {
+    consoleErrorSpy = jest.spyOn(console, 'error').mockImplementation();
+  });
+
+  afterEach(() => {
+    consoleErrorSpy.mockRestore();
+    jest.clearAllMocks();
+  });
+
+  describe('GET /api/search', () => {
+    test('should return a page of entries with escaped highlights', async () => {
+      searchRepo.search.mockResolvedValue({
+        results: [{ id: 1, client_name: 'Acme', description: 'Fix <b> \x02migration\x03' }],
+        hasMore: true
+      });
+
+      const response = await request(app).get('/api/search?q=migr');
+
+      expect(response.status).toBe(200);
+      expect(response.body).toEqual({
+        query: 'migr',
+        type: 'entries',
+        limit: 20,
+        offset: 0,
+        hasMore: true,
+        results: [{
+          id: 1,
+          client_name: 'Acme',
+          description: 'Fix <b> migration',
+          highlights: { description: 'Fix &lt;b&gt; <mark>migration</mark>' }
+        }]
+      });
+      expect(searchRepo.search).toHaveBeenCalledWith(USER, { q: 'migr', type: 'entries', limit: 20, offset: 0 });
+    });
+
+    test('should highlight client names and keep missing descriptions', async () => {
+      searchRepo.search.mockResolvedValue({
+        results: [{ id: 3, name: '\x02Acme\x03 Corp', description: null }],
+        hasMore: false
+      });
+
+      const response = await request(app).get('/api/search?q=acme&type=clients&limit=5&offset=10');
+
+      expect(response.status).toBe(200);
+      expect(response.body.results).toEqual([{
+        id: 3,
+        name: 'Acme Corp',
+        description: null,
+        highlights: { name: '<mark>Acme</mark> Corp', description: null }
+      }]);
+      expect(searchRepo.search).toHaveBeenCalledWith(USER, { q: 'acme', type: 'clients', limit: 5, offset: 10 });
+    });
+
+    test('should reject a missing query', async () => {
+      const response = await request(app).get('/api/search');
+
+      expect(response.status).toBe(400);
+      expect(searchRepo.search).not.toHaveBeenCalled();
+    });
+
+    test('should reject unknown result types', async () => {
+      const response = await request(app).get('/api/search?q=acme&type=users');
+
+      expect(response.status).toBe(400);
+    });
+
+    test('should handle database errors', async () => {
+      searchRepo.search.mockRejectedValue(new Error('Database error'));
+
+      const response = await request(app).get('/api/search?q=acme');
+
+      expect(response.status).toBe(500);
+      expect(response.body).toEqual({ error: 'Internal server error' });
+    });
+  });
+});
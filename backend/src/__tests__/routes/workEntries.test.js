@@ -1,16 +1,29 @@
 const request = require('supertest');
 const express = require('express');
 const workEntryRoutes = require('../../routes/workEntries');
-const { getDatabase } = require('../../database/init');
-
-jest.mock('../../database/init');
+const workEntriesRepo = require('../../repositories/workEntriesRepo');
+
+jest.mock('../../repositories/workEntriesRepo', () => ({
+  CLIENT_NOT_FOUND: 'CLIENT_NOT_FOUND',
+  ENTRY_ARCHIVED: 'ENTRY_ARCHIVED',
+  list: jest.fn(),
+  listJson: jest.fn(),
+  findById: jest.fn(),
+  create: jest.fn(),
+  update: jest.fn(),
+  remove: jest.fn()
+}));
 jest.mock('../../middleware/auth', () => ({
   authenticateUser: (req, res, next) => {
     req.userEmail = 'test@example.com';
+    req.userId = 42;
+    req.user = { id: 42, email: 'test@example.com' };
     next();
   }
 }));
 
+const USER = { id: 42, email: 'test@example.com' };
+
 const app = express();
 app.use(express.json());
 app.use('/api/work-entries', workEntryRoutes);
@@ -22,19 +35,27 @@ app.use((err, req, res, next) => {
   res.status(500).json({ error: 'Internal server error' });
 });
 
+function clientNotFound() {
+  const error = new Error('Client not found or does not belong to user');
+  error.code = 'CLIENT_NOT_FOUND';
+  return error;
+}
+
+function entryArchived() {
+  const error = new Error('Work entry is archived');
+  error.code = 'ENTRY_ARCHIVED';
+  return error;
+}
+
 describe('Work Entry Routes', () => {
-  let mockDb;
+  let consoleErrorSpy;
 
   beforeEach(() => {
-    mockDb = {
-      all: jest.fn(),
-      get: jest.fn(),
-      run: jest.fn()
-    };
-    getDatabase.mockReturnValue(mockDb);
+    consoleErrorSpy = jest.spyOn(console, 'error').mockImplementation();
   });
 
   afterEach(() => {
+    consoleErrorSpy.mockRestore();
     jest.clearAllMocks();
   });
 
@@ -44,30 +65,49 @@ describe('Work Entry Routes', () => {
         { id: 1, client_id: 1, hours: 5, description: 'Work 1', date: '2024-01-01', client_name: 'Client A' },
         { id: 2, client_id: 2, hours: 3, description: 'Work 2', date: '2024-01-02', client_name: 'Client B' }
       ];
-
-      mockDb.all.mockImplementation((query, params, callback) => {
-        callback(null, mockEntries);
-      });
+      workEntriesRepo.listJson.mockResolvedValue(Buffer.from(JSON.stringify(mockEntries)));
 
       const response = await request(app).get('/api/work-entries');
 
       expect(response.status).toBe(200);
+      expect(response.headers['content-type']).toMatch(/application\/json/);
       expect(response.body).toEqual({ workEntries: mockEntries });
+      expect(workEntriesRepo.listJson).toHaveBeenCalledWith(USER, { clientId: undefined });
     });
 
     test('should filter by client ID when provided', async () => {
-      mockDb.all.mockImplementation((query, params, callback) => {
-        expect(params).toEqual(['test@example.com', 1]);
-        callback(null, []);
-      });
+      workEntriesRepo.listJson.mockResolvedValue(Buffer.from('[]'));
 
       await request(app).get('/api/work-entries?clientId=1');
 
-      expect(mockDb.all).toHaveBeenCalledWith(
-        expect.stringContaining('AND we.client_id = ?'),
-        ['test@example.com', 1],
-        expect.any(Function)
-      );
+      expect(workEntriesRepo.listJson).toHaveBeenCalledWith(USER, { clientId: 1 });
+    });
+
+    test('should pass a from/to day range to the repository', async () => {
+      workEntriesRepo.listJson.mockResolvedValue(Buffer.from('[]'));
+
+      await request(app).get('/api/work-entries?from=2024-01-01&to=2024-01-31');
+
+      expect(workEntriesRepo.listJson).toHaveBeenCalledWith(USER, {
+        clientId: undefined,
+        from: new Date('2024-01-01'),
+        to: new Date('2024-01-31')
+      });
+    });
+
+    test('should pass archived=true through to the repository', async () => {
+      workEntriesRepo.listJson.mockResolvedValue(Buffer.from('[]'));
+
+      await request(app).get('/api/work-entries?archived=true');
+
+      expect(workEntriesRepo.listJson).toHaveBeenCalledWith(USER, { clientId: undefined, archived: true });
+    });
+
+    test('should return 400 when to is before from', async () => {
+      const response = await request(app).get('/api/work-entries?from=2024-02-01&to=2024-01-01');
+
+      expect(response.status).toBe(400);
+      expect(workEntriesRepo.listJson).not.toHaveBeenCalled();
     });
 
     test('should return 400 for invalid client ID filter', async () => {
@@ -75,12 +115,11 @@ describe('Work Entry Routes', () => {
 
       expect(response.status).toBe(400);
       expect(response.body).toEqual({ error: 'Invalid client ID' });
+      expect(workEntriesRepo.listJson).not.toHaveBeenCalled();
     });
 
     test('should handle database error', async () => {
-      mockDb.all.mockImplementation((query, params, callback) => {
-        callback(new Error('Database error'), null);
-      });
+      workEntriesRepo.listJson.mockRejectedValue(new Error('Database error'));
 
       const response = await request(app).get('/api/work-entries');
 
@@ -92,21 +131,17 @@ describe('Work Entry Routes', () => {
   describe('GET /api/work-entries/:id', () => {
     test('should return specific work entry', async () => {
       const mockEntry = { id: 1, client_id: 1, hours: 5, description: 'Work', client_name: 'Client A' };
-
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, mockEntry);
-      });
+      workEntriesRepo.findById.mockResolvedValue(mockEntry);
 
       const response = await request(app).get('/api/work-entries/1');
 
       expect(response.status).toBe(200);
       expect(response.body).toEqual({ workEntry: mockEntry });
+      expect(workEntriesRepo.findById).toHaveBeenCalledWith(1, USER);
     });
 
     test('should return 404 if work entry not found', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, null);
-      });
+      workEntriesRepo.findById.mockResolvedValue(undefined);
 
       const response = await request(app).get('/api/work-entries/999');
 
@@ -114,35 +149,42 @@ describe('Work Entry Routes', () => {
       expect(response.body).toEqual({ error: 'Work entry not found' });
     });
 
+    test('should return 409 for an archived work entry', async () => {
+      workEntriesRepo.findById.mockRejectedValue(entryArchived());
+
+      const response = await request(app).get('/api/work-entries/7');
+
+      expect(response.status).toBe(409);
+      expect(response.body).toEqual({ error: 'Work entry is archived' });
+    });
+
     test('should return 400 for invalid work entry ID', async () => {
       const response = await request(app).get('/api/work-entries/invalid');
 
       expect(response.status).toBe(400);
       expect(response.body).toEqual({ error: 'Invalid work entry ID' });
     });
+
+    test('should handle database error when fetching single work entry', async () => {
+      workEntriesRepo.findById.mockRejectedValue(new Error('Database error'));
+
+      const response = await request(app).get('/api/work-entries/1');
+
+      expect(response.status).toBe(500);
+      expect(response.body).toEqual({ error: 'Internal server error' });
+    });
   });
 
   describe('POST /api/work-entries', () => {
-    test('should create work entry with valid data', async () => {
-      const newEntry = {
-        clientId: 1,
-        hours: 5.5,
-        description: 'Development work',
-        date: '2024-01-15'
-      };
-
-      mockDb.get.mockImplementation((query, params, callback) => {
-        if (query.includes('clients')) {
-          callback(null, { id: 1 }); // Client exists
-        } else {
-          callback(null, { id: 1, ...newEntry, client_name: 'Client A' });
-        }
-      });
+    const newEntry = {
+      clientId: 1,
+      hours: 5.5,
+      description: 'Development work',
+      date: '2024-01-15'
+    };
 
-      mockDb.run.mockImplementation(function(query, params, callback) {
-        this.lastID = 1;
-        callback.call(this, null);
-      });
+    test('should create work entry with valid data', async () => {
+      workEntriesRepo.create.mockResolvedValue({ id: 1, client_id: 1, hours: 5.5, client_name: 'Client A' });
 
       const response = await request(app)
         .post('/api/work-entries')
@@ -150,12 +192,15 @@ describe('Work Entry Routes', () => {
 
       expect(response.status).toBe(201);
       expect(response.body.message).toBe('Work entry created successfully');
+      expect(response.body.workEntry.client_name).toBe('Client A');
+      expect(workEntriesRepo.create).toHaveBeenCalledWith(
+        USER,
+        expect.objectContaining({ clientId: 1, hours: 5.5, description: 'Development work' })
+      );
     });
 
     test('should return 400 if client not found', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, null); // Client doesn't exist
-      });
+      workEntriesRepo.create.mockRejectedValue(clientNotFound());
 
       const response = await request(app)
         .post('/api/work-entries')
@@ -175,6 +220,7 @@ describe('Work Entry Routes', () => {
         .send({ hours: 5 });
 
       expect(response.status).toBe(400);
+      expect(workEntriesRepo.create).not.toHaveBeenCalled();
     });
 
     test('should return 400 for invalid hours', async () => {
@@ -202,40 +248,20 @@ describe('Work Entry Routes', () => {
     });
 
     test('should handle database error on insert', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(new Error('Insert failed'));
-      });
+      workEntriesRepo.create.mockRejectedValue(new Error('Insert failed'));
 
       const response = await request(app)
         .post('/api/work-entries')
-        .send({
-          clientId: 1,
-          hours: 5,
-          date: '2024-01-15'
-        });
+        .send(newEntry);
 
       expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Failed to create work entry' });
+      expect(response.body).toEqual({ error: 'Internal server error' });
     });
   });
 
   describe('PUT /api/work-entries/:id', () => {
     test('should update work entry hours', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        if (query.includes('work_entries we')) {
-          callback(null, { id: 1, hours: 8, client_name: 'Client A' });
-        } else {
-          callback(null, { id: 1 });
-        }
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
+      workEntriesRepo.update.mockResolvedValue({ id: 1, hours: 8, client_name: 'Client A' });
 
       const response = await request(app)
         .put('/api/work-entries/1')
@@ -243,28 +269,38 @@ describe('Work Entry Routes', () => {
 
       expect(response.status).toBe(200);
       expect(response.body.message).toBe('Work entry updated successfully');
+      expect(response.body.workEntry.hours).toBe(8);
+      expect(workEntriesRepo.update).toHaveBeenCalledWith(1, USER, { hours: 8 });
     });
 
     test('should update work entry client', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
+      workEntriesRepo.update.mockResolvedValue({ id: 1, client_id: 2, client_name: 'Client B' });
 
       const response = await request(app)
         .put('/api/work-entries/1')
         .send({ clientId: 2 });
 
       expect(response.status).toBe(200);
+      expect(workEntriesRepo.update).toHaveBeenCalledWith(1, USER, { clientId: 2 });
+    });
+
+    test('should update multiple fields at once', async () => {
+      workEntriesRepo.update.mockResolvedValue({ id: 1, hours: 10, description: 'Updated', client_name: 'Client A' });
+
+      const response = await request(app)
+        .put('/api/work-entries/1')
+        .send({ hours: 10, description: 'Updated', date: '2024-03-01' });
+
+      expect(response.status).toBe(200);
+      expect(workEntriesRepo.update).toHaveBeenCalledWith(
+        1,
+        USER,
+        expect.objectContaining({ hours: 10, description: 'Updated' })
+      );
     });
 
     test('should return 404 if work entry not found', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, null);
-      });
+      workEntriesRepo.update.mockResolvedValue(null);
 
       const response = await request(app)
         .put('/api/work-entries/999')
@@ -274,6 +310,17 @@ describe('Work Entry Routes', () => {
       expect(response.body).toEqual({ error: 'Work entry not found' });
     });
 
+    test('should return 409 for an archived work entry', async () => {
+      workEntriesRepo.update.mockRejectedValue(entryArchived());
+
+      const response = await request(app)
+        .put('/api/work-entries/7')
+        .send({ hours: 8 });
+
+      expect(response.status).toBe(409);
+      expect(response.body).toEqual({ error: 'Work entry is archived' });
+    });
+
     test('should return 400 for invalid work entry ID', async () => {
       const response = await request(app)
         .put('/api/work-entries/invalid')
@@ -289,16 +336,11 @@ describe('Work Entry Routes', () => {
         .send({});
 
       expect(response.status).toBe(400);
+      expect(workEntriesRepo.update).not.toHaveBeenCalled();
     });
 
     test('should return 400 if new client not found', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        if (query.includes('work_entries')) {
-          callback(null, { id: 1 });
-        } else {
-          callback(null, null); // Client doesn't exist
-        }
-      });
+      workEntriesRepo.update.mockRejectedValue(clientNotFound());
 
       const response = await request(app)
         .put('/api/work-entries/1')
@@ -307,28 +349,32 @@ describe('Work Entry Routes', () => {
       expect(response.status).toBe(400);
       expect(response.body).toEqual({ error: 'Client not found or does not belong to user' });
     });
+
+    test('should handle database error during update', async () => {
+      workEntriesRepo.update.mockRejectedValue(new Error('Update failed'));
+
+      const response = await request(app)
+        .put('/api/work-entries/1')
+        .send({ hours: 8 });
+
+      expect(response.status).toBe(500);
+      expect(response.body).toEqual({ error: 'Internal server error' });
+    });
   });
 
   describe('DELETE /api/work-entries/:id', () => {
     test('should delete existing work entry', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
+      workEntriesRepo.remove.mockResolvedValue(true);
 
       const response = await request(app).delete('/api/work-entries/1');
 
       expect(response.status).toBe(200);
       expect(response.body).toEqual({ message: 'Work entry deleted successfully' });
+      expect(workEntriesRepo.remove).toHaveBeenCalledWith(1, USER);
     });
 
     test('should return 404 if work entry not found', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, null);
-      });
+      workEntriesRepo.remove.mockResolvedValue(false);
 
       const response = await request(app).delete('/api/work-entries/999');
 
@@ -336,6 +382,15 @@ describe('Work Entry Routes', () => {
       expect(response.body).toEqual({ error: 'Work entry not found' });
     });
 
+    test('should return 409 for an archived work entry', async () => {
+      workEntriesRepo.remove.mockRejectedValue(entryArchived());
+
+      const response = await request(app).delete('/api/work-entries/7');
+
+      expect(response.status).toBe(409);
+      expect(response.body).toEqual({ error: 'Work entry is archived' });
+    });
+
     test('should return 400 for invalid work entry ID', async () => {
       const response = await request(app).delete('/api/work-entries/invalid');
 
@@ -344,245 +399,12 @@ describe('Work Entry Routes', () => {
     });
 
     test('should handle database delete error', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(new Error('Delete failed'));
-      });
+      workEntriesRepo.remove.mockRejectedValue(new Error('Delete failed'));
 
       const response = await request(app).delete('/api/work-entries/1');
 
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Failed to delete work entry' });
-    });
-
-    test('should handle database error when checking work entry existence', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(new Error('Database error'), null);
-      });
-
-      const response = await request(app).delete('/api/work-entries/1');
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Internal server error' });
-    });
-  });
-
-  describe('GET /api/work-entries/:id - Error Handling', () => {
-    test('should handle database error when fetching single work entry', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(new Error('Database error'), null);
-      });
-
-      const response = await request(app).get('/api/work-entries/1');
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Internal server error' });
-    });
-  });
-
-  describe('POST /api/work-entries - Error Handling', () => {
-    test('should handle database error when verifying client', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(new Error('Database error'), null);
-      });
-
-      const response = await request(app)
-        .post('/api/work-entries')
-        .send({
-          clientId: 1,
-          hours: 5,
-          date: '2024-01-15'
-        });
-
       expect(response.status).toBe(500);
       expect(response.body).toEqual({ error: 'Internal server error' });
     });
-
-    test('should handle error retrieving work entry after creation', async () => {
-      let getCallCount = 0;
-      mockDb.get.mockImplementation((query, params, callback) => {
-        getCallCount++;
-        if (getCallCount === 1) {
-          callback(null, { id: 1 });
-        } else {
-          callback(new Error('Retrieval failed'), null);
-        }
-      });
-
-      mockDb.run.mockImplementation(function(query, params, callback) {
-        this.lastID = 1;
-        callback.call(this, null);
-      });
-
-      const response = await request(app)
-        .post('/api/work-entries')
-        .send({
-          clientId: 1,
-          hours: 5,
-          date: '2024-01-15'
-        });
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Work entry created but failed to retrieve' });
-    });
-  });
-
-  describe('PUT /api/work-entries/:id - Error Handling', () => {
-    test('should handle database error when checking work entry existence', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(new Error('Database error'), null);
-      });
-
-      const response = await request(app)
-        .put('/api/work-entries/1')
-        .send({ hours: 8 });
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Internal server error' });
-    });
-
-    test('should handle database error when verifying new client in update', async () => {
-      let callCount = 0;
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callCount++;
-        if (callCount === 1) {
-          callback(null, { id: 1 });
-        } else {
-          callback(new Error('Database error'), null);
-        }
-      });
-
-      const response = await request(app)
-        .put('/api/work-entries/1')
-        .send({ clientId: 2 });
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Internal server error' });
-    });
-
-    test('should handle database error during update', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        callback(null, { id: 1 });
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(new Error('Update failed'));
-      });
-
-      const response = await request(app)
-        .put('/api/work-entries/1')
-        .send({ hours: 8 });
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Failed to update work entry' });
-    });
-
-    test('should handle error retrieving work entry after update', async () => {
-      let getCallCount = 0;
-      mockDb.get.mockImplementation((query, params, callback) => {
-        getCallCount++;
-        if (getCallCount === 1) {
-          callback(null, { id: 1 });
-        } else {
-          callback(new Error('Retrieval failed'), null);
-        }
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      const response = await request(app)
-        .put('/api/work-entries/1')
-        .send({ hours: 8 });
-
-      expect(response.status).toBe(500);
-      expect(response.body).toEqual({ error: 'Work entry updated but failed to retrieve' });
-    });
-
-    test('should update work entry date', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        if (query.includes('work_entries we')) {
-          callback(null, { id: 1, date: '2024-02-01', client_name: 'Client A' });
-        } else {
-          callback(null, { id: 1 });
-        }
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      const response = await request(app)
-        .put('/api/work-entries/1')
-        .send({ date: '2024-02-01' });
-
-      expect(response.status).toBe(200);
-      expect(response.body.message).toBe('Work entry updated successfully');
-    });
-
-    test('should update work entry description', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        if (query.includes('work_entries we')) {
-          callback(null, { id: 1, description: 'New description', client_name: 'Client A' });
-        } else {
-          callback(null, { id: 1 });
-        }
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      const response = await request(app)
-        .put('/api/work-entries/1')
-        .send({ description: 'New description' });
-
-      expect(response.status).toBe(200);
-    });
-
-    test('should update description to null when empty string provided', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        if (query.includes('work_entries we')) {
-          callback(null, { id: 1, description: null, client_name: 'Client A' });
-        } else {
-          callback(null, { id: 1 });
-        }
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      const response = await request(app)
-        .put('/api/work-entries/1')
-        .send({ description: '' });
-
-      expect(response.status).toBe(200);
-    });
-
-    test('should update multiple fields at once', async () => {
-      mockDb.get.mockImplementation((query, params, callback) => {
-        if (query.includes('work_entries we')) {
-          callback(null, { id: 1, hours: 10, description: 'Updated', date: '2024-03-01', client_name: 'Client A' });
-        } else {
-          callback(null, { id: 1 });
-        }
-      });
-
-      mockDb.run.mockImplementation((query, params, callback) => {
-        callback(null);
-      });
-
-      const response = await request(app)
-        .put('/api/work-entries/1')
-        .send({ hours: 10, description: 'Updated', date: '2024-03-01' });
-
-      expect(response.status).toBe(200);
-      expect(response.body.message).toBe('Work entry updated successfully');
-    });
   });
 });
@@ -3,7 +3,11 @@ const {
   workEntrySchema,
   updateWorkEntrySchema,
   updateClientSchema,
-  emailSchema
+  timeSeriesQuerySchema,
+  searchQuerySchema,
+  replicationChangesQuerySchema,
+  emailSchema,
+  refreshTokenSchema
 } = require('../../validation/schemas');
 
 describe('Validation Schemas', () => {
@@ -290,6 +294,60 @@ describe('Validation Schemas', () => {
     });
   });
 
+  describe('timeSeriesQuerySchema', () => {
+    test('should default the interval to day', () => {
+      const { error, value } = timeSeriesQuerySchema.validate({ from: '2024-01-01', to: '2024-01-31' });
+      expect(error).toBeUndefined();
+      expect(value.interval).toBe('day');
+    });
+
+    test('should reject unknown intervals', () => {
+      const { error } = timeSeriesQuerySchema.validate({ from: '2024-01-01', to: '2024-01-31', interval: 'year' });
+      expect(error).toBeDefined();
+    });
+
+    test('should reject a range that ends before it starts', () => {
+      const { error } = timeSeriesQuerySchema.validate({ from: '2024-02-01', to: '2024-01-01' });
+      expect(error).toBeDefined();
+    });
+  });
+
+  describe('searchQuerySchema', () => {
+    test('should default to the first page of entries', () => {
+      const { error, value } = searchQuerySchema.validate({ q: ' migration ' });
+      expect(error).toBeUndefined();
+      expect(value).toEqual({ q: 'migration', type: 'entries', limit: 20, offset: 0 });
+    });
+
+    test('should reject a blank query', () => {
+      const { error } = searchQuerySchema.validate({ q: '   ' });
+      expect(error).toBeDefined();
+    });
+
+    test('should reject pages larger than 100 results', () => {
+      const { error } = searchQuerySchema.validate({ q: 'migration', limit: 101 });
+      expect(error).toBeDefined();
+    });
+  });
+
+  describe('replicationChangesQuerySchema', () => {
+    test('should default to not waiting', () => {
+      const { error, value } = replicationChangesQuerySchema.validate({ epoch: 'a1b2c3', after: '7' });
+      expect(error).toBeUndefined();
+      expect(value).toEqual({ epoch: 'a1b2c3', after: 7, wait: 0, follower: 'unknown' });
+    });
+
+    test('should require a hex epoch', () => {
+      const { error } = replicationChangesQuerySchema.validate({ epoch: 'not-hex', after: 0 });
+      expect(error).toBeDefined();
+    });
+
+    test('should cap the long-poll wait', () => {
+      const { error } = replicationChangesQuerySchema.validate({ epoch: 'a1', after: 0, wait: 60001 });
+      expect(error).toBeDefined();
+    });
+  });
+
   describe('emailSchema', () => {
     test('should validate valid email', () => {
       const data = {
@@ -325,4 +383,16 @@ describe('Validation Schemas', () => {
       expect(error).toBeUndefined();
     });
   });
+
+  describe('refreshTokenSchema', () => {
+    test('should validate a refresh token', () => {
+      const { error } = refreshTokenSchema.validate({ refreshToken: 'a.b.c' });
+      expect(error).toBeUndefined();
+    });
+
+    test('should reject a missing or empty refresh token', () => {
+      expect(refreshTokenSchema.validate({}).error).toBeDefined();
+      expect(refreshTokenSchema.validate({ refreshToken: '' }).error).toBeDefined();
+    });
+  });
 });
@@ -0,0 +1,306 @@
+// Cluster mode: CLUSTER_WORKERS > 1 runs that many copies of the server
+// behind one port with node:cluster. The primary process runs no app code;
+// it forks and restarts workers and holds state they share (rate-limit
+// buckets), which workers reach over IPC. One worker, the leader, runs the
+// background jobs (archiving, maintenance, snapshots) for all of them.
+const cluster = require('node:cluster');
+const crypto = require('crypto');
+const os = require('os');
+const { registerMetrics } = require('./metrics');
+
+const DEFAULT_RESPAWN_DELAY_MS = 1000;
+const DEFAULT_STOP_TIMEOUT_MS = 30000;
+
+// Worker side: calls waiting for the primary's reply, and broadcast handlers
+const pending = new Map();
+const subscribers = new Map();
+let nextCallId = 0;
+
+registerMetrics('cluster', () => (cluster.isWorker
+  ? { enabled: true, worker: cluster.worker.id, leader: isClusterLeader(), workers: clusterSize() }
+  : { enabled: false }));
+
+// CLUSTER_WORKERS: the number of server processes, or `auto` for one per
+// core. 1 (the default) runs a single process without a primary.
+function clusterSize() {
+  const setting = process.env.CLUSTER_WORKERS || '1';
+  if (setting === 'auto') {
+    return os.availableParallelism();
+  }
+  return Math.max(1, parseInt(setting, 10) || 1);
+}
+
+function isClusterWorker() {
+  return cluster.isWorker;
+}
+
+// A single process is its own leader
+function isClusterLeader() {
+  return !cluster.isWorker || process.env.CLUSTER_LEADER === '1';
+}
+
+// Why this configuration cannot run as a cluster, or null. Every worker
+// opens the same database, so it must be a file; WAL shipping and replicas
+// keep their position in one process.
+function clusterProblem() {
+  const dbPath = process.env.DATABASE_PATH || ':memory:';
+  if (dbPath === ':memory:') {
+    return 'Cluster mode needs a file database (DATABASE_PATH); each worker would get its own in-memory one';
+  }
+  if (process.env.REPLICATION_TOKEN || process.env.REPLICA_OF) {
+    return 'Cluster mode does not support replication (REPLICATION_TOKEN, REPLICA_OF)';
+  }
+  return null;
+}
+
+// Calls `method` on one of the primary's services (see startPrimary).
+// Resolves to its return value.
+function callPrimary(service, method, ...args) {
+  return new Promise((resolve, reject) => {
+    const id = ++nextCallId;
+    pending.set(id, { resolve, reject });
+    process.send({ cluster: 'call', id, service, method, args }, (err) => {
+      if (err) {
+        pending.delete(id);
+        reject(err);
+      }
+    });
+  });
+}
+
+// Sends `payload` to every other worker's `channel` handlers; does nothing
+// outside a cluster
+function broadcast(channel, payload) {
+  if (cluster.isWorker && process.connected) {
+    process.send({ cluster: 'broadcast', channel, payload });
+  }
+}
+
+function onBroadcast(channel, handler) {
+  if (!subscribers.has(channel)) {
+    subscribers.set(channel, []);
+  }
+  subscribers.get(channel).push(handler);
+}
+
+function handleWorkerMessage(message) {
+  if (!message || typeof message.cluster !== 'string') {
+    return;
+  }
+  if (message.cluster === 'reply') {
+    const call = pending.get(message.id);
+    if (call) {
+      pending.delete(message.id);
+      if (message.error) {
+        call.reject(new Error(message.error));
+      } else {
+        call.resolve(message.result);
+      }
+    }
+  } else if (message.cluster === 'broadcast') {
+    for (const handler of subscribers.get(message.channel) || []) {
+      handler(message.payload);
+    }
+  }
+}
+
+if (cluster.isWorker) {
+  process.on('message', handleWorkerMessage);
+  // The worker exits once the primary is gone; nothing will answer these
+  process.on('disconnect', () => {
+    for (const call of pending.values()) {
+      call.reject(new Error('Disconnected from the cluster primary'));
+    }
+    pending.clear();
+  });
+}
+
+// Answers a worker's call with the service's (synchronous) return value
+function dispatch(services, message) {
+  const service = services[message.service];
+  try {
+    if (!service || typeof service[message.method] !== 'function') {
+      throw new Error(`Unknown cluster call ${message.service}.${message.method}`);
+    }
+    return { cluster: 'reply', id: message.id, result: service[message.method](...message.args) };
+  } catch (err) {
+    return { cluster: 'reply', id: message.id, error: err.message };
+  }
+}
+
+// Environment every worker shares. Workers check each other's tokens, so
+// without a JWT_SECRET the primary picks one random key for all of them;
+// it survives rolling restarts, but not a restart of the primary.
+function sharedWorkerEnv() {
+  if (process.env.JWT_SECRET) {
+    return {};
+  }
+  console.warn('JWT_SECRET is not set; the cluster signs tokens with a random key until it restarts');
+  return { JWT_SECRET: crypto.randomBytes(32).toString('hex') };
+}
+
+function startPrimary({
+  size,
+  services = {},
+  respawnDelayMs = DEFAULT_RESPAWN_DELAY_MS,
+  stopTimeoutMs = DEFAULT_STOP_TIMEOUT_MS
+}) {
+  // Services are created here, so single-process servers never build them
+  const instances = Object.fromEntries(Object.entries(services).map(([name, create]) => [name, create()]));
+  const env = sharedWorkerEnv();
+  const retiring = new Set();
+  let leader = null;
+  let stopping = false;
+  let restarting = false;
+
+  function fork(lead) {
+    const worker = cluster.fork({ ...env, CLUSTER_LEADER: lead ? '1' : '0' });
+    if (lead) {
+      leader = worker;
+    }
+    worker.on('message', (message) => {
+      if (!message || typeof message.cluster !== 'string') {
+        return;
+      }
+      if (message.cluster === 'call') {
+        if (worker.isConnected()) {
+          worker.send(dispatch(instances, message));
+        }
+      } else if (message.cluster === 'broadcast') {
+        for (const other of Object.values(cluster.workers)) {
+          if (other !== worker && other.isConnected()) {
+            other.send(message);
+          }
+        }
+      }
+    });
+    worker.once('listening', () => {
+      worker.listened = true;
+    });
+    return worker;
+  }
+
+  function listening(worker) {
+    return new Promise((resolve, reject) => {
+      const onExit = () => reject(new Error(`Worker ${worker.process.pid} exited before it was listening`));
+      worker.once('exit', onExit);
+      worker.once('listening', () => {
+        worker.removeListener('exit', onExit);
+        resolve(worker);
+      });
+    });
+  }
+
+  // SIGTERM runs the worker's own graceful shutdown: finish requests, close
+  // the database
+  function stopWorker(worker) {
+    retiring.add(worker);
+    if (worker.isDead()) {
+      return Promise.resolve();
+    }
+    return new Promise((resolve) => {
+      const timer = setTimeout(() => worker.process.kill('SIGKILL'), stopTimeoutMs);
+      worker.once('exit', () => {
+        clearTimeout(timer);
+        resolve();
+      });
+      worker.process.kill('SIGTERM');
+    });
+  }
+
+  // A worker that dies while serving is replaced; one that never got as far
+  // as listening is not, so a broken build does not restart in a loop
+  cluster.on('exit', (worker, code, signal) => {
+    if (stopping || retiring.delete(worker)) {
+      return;
+    }
+    if (!worker.listened) {
+      console.error(`Worker ${worker.process.pid} failed to start (${signal || code})`);
+      return;
+    }
+    console.error(`Worker ${worker.process.pid} exited (${signal || code}); starting a replacement`);
+    const lead = worker === leader;
+    setTimeout(() => {
+      if (!stopping) {
+        fork(lead);
+      }
+    }, respawnDelayMs);
+  });
+
+  // SIGHUP replaces the workers one at a time, each only once its
+  // replacement is listening, so the port never goes unserved. The new
+  // leader overlaps the old one until the old one has stopped.
+  async function rollingRestart() {
+    if (restarting || stopping) {
+      return;
+    }
+    restarting = true;
+    const workers = Object.values(cluster.workers);
+    console.log(`Restarting ${workers.length} workers`);
+    try {
+      for (const old of workers) {
+        if (stopping) break;
+        await listening(fork(old === leader));
+        await stopWorker(old);
+      }
+      console.log('Rolling restart complete');
+    } catch (err) {
+      console.error('Rolling restart stopped:', err.message);
+    } finally {
+      restarting = false;
+    }
+  }
+
+  async function shutdown() {
+    if (stopping) {
+      return;
+    }
+    stopping = true;
+    console.log('Shutting down workers...');
+    await Promise.all(Object.values(cluster.workers).map(stopWorker));
+    process.exit(0);
+  }
+
+  process.once('SIGTERM', shutdown);
+  process.once('SIGINT', shutdown);
+  process.on('SIGHUP', rollingRestart);
+
+  // The leader starts (and migrates the database) alone before the rest
+  return listening(fork(true))
+    .then(() => Promise.all(Array.from({ length: size - 1 }, () => listening(fork(false)))))
+    .then(() => console.log(`Cluster primary ${process.pid} running ${size} workers`))
+    .catch((err) => {
+      console.error('Failed to start cluster:', err.message);
+      stopping = true;
+      return Promise.all(Object.values(cluster.workers).map(stopWorker)).then(() => process.exit(1));
+    });
+}
+
+// Runs `startWorker` in this process, or forks CLUSTER_WORKERS processes
+// that each run it. `services` maps names to factories for objects that
+// live in the primary and that workers reach with callPrimary().
+function runClustered(startWorker, { services } = {}) {
+  const size = clusterSize();
+  if (size <= 1 || cluster.isWorker) {
+    return startWorker();
+  }
+
+  const problem = clusterProblem();
+  if (problem) {
+    console.error(problem);
+    process.exit(1);
+  }
+  return startPrimary({ size, services });
+}
+
+module.exports = {
+  clusterSize,
+  clusterProblem,
+  isClusterWorker,
+  isClusterLeader,
+  callPrimary,
+  broadcast,
+  onBroadcast,
+  dispatch,
+  runClustered
+};
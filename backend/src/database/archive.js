@@ -0,0 +1,229 @@
+const query = require('./query');
+const { STATEMENTS } = require('./statements');
+const { toDayNumber, fromDayNumber } = require('./days');
+
+const DEFAULT_AFTER_DAYS = 365;
+const DEFAULT_BATCH_SIZE = 1000;
+const DEFAULT_INTERVAL_MS = 60 * 60 * 1000;
+
+// Cold partition of work_entries, in a database ATTACHed as `archive` on
+// every connection (see the `attach` option in connection.js). Rows keep
+// their ids; main's AUTOINCREMENT never hands them out again. The rollups
+// still count archived entries (migration 9), so summaries and time series
+// never need to read this database.
+const ARCHIVE_SCHEMA = [
+  `CREATE TABLE IF NOT EXISTS archive.work_entries (
+    id INTEGER PRIMARY KEY,
+    client_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    hundredths INTEGER NOT NULL,
+    description TEXT,
+    day INTEGER NOT NULL,
+    created_at DATETIME,
+    updated_at DATETIME,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+  )`,
+  'CREATE INDEX IF NOT EXISTS archive.idx_archived_entries_user_day ON work_entries (user_id, day, created_at)',
+  'CREATE INDEX IF NOT EXISTS archive.idx_archived_entries_client_user_day ON work_entries (client_id, user_id, day, created_at)',
+  // Newest archived day, read at boot and after every run
+  'CREATE INDEX IF NOT EXISTS archive.idx_archived_entries_day ON work_entries (day)'
+];
+
+// Lowest ids first, so the scan stops as soon as it has a batch (old
+// entries are mostly the oldest rows). OR REPLACE refreshes a copy left
+// behind by an interrupted move.
+const COPY_BATCH = `
+  INSERT OR REPLACE INTO archive.work_entries
+    (id, client_id, user_id, hundredths, description, day, created_at, updated_at)
+  SELECT id, client_id, user_id, hundredths, description, day, created_at, updated_at
+  FROM main.work_entries
+  WHERE day < ?
+  ORDER BY id
+  LIMIT ?`;
+
+// The same rows, and only once the archive holds them
+const DELETE_BATCH = `
+  DELETE FROM main.work_entries WHERE id IN (
+    SELECT we.id FROM main.work_entries we
+    JOIN archive.work_entries ae ON ae.id = we.id
+    WHERE we.day < ?
+    ORDER BY we.id
+    LIMIT ?
+  )`;
+
+const NEWEST_DAY = 'SELECT MAX(day) AS day FROM archive.work_entries';
+
+function elapsedMs(started) {
+  return Math.round(Number(process.hrtime.bigint() - started) / 1e4) / 100;
+}
+
+async function inTransaction(connection, work) {
+  await query.run(connection, 'BEGIN IMMEDIATE');
+  try {
+    const result = await work();
+    await query.run(connection, 'COMMIT');
+    return result;
+  } catch (err) {
+    await query.run(connection, 'ROLLBACK').catch(() => {});
+    throw err;
+  }
+}
+
+// Moves work entries dated more than `afterDays` days ago from `db` into its
+// attached archive, `batchSize` rows per step, every `intervalMs`. Each
+// step holds the writer only for its own two short transactions, so request
+// writes queue behind one batch at most. `onArchived` hears about runs that
+// moved entries.
+function createArchiver({
+  db,
+  filename,
+  afterDays = DEFAULT_AFTER_DAYS,
+  batchSize = DEFAULT_BATCH_SIZE,
+  intervalMs = DEFAULT_INTERVAL_MS,
+  onArchived = () => {}
+}) {
+  let timer = null;
+  let running = null;
+  let newestDay = null;
+
+  const stats = {
+    path: filename,
+    afterDays,
+    intervalMs,
+    runs: 0,
+    failures: 0,
+    moved: 0,
+    lastMoved: 0,
+    lastDurationMs: 0,
+    lastRunAt: null
+  };
+
+  async function refreshNewestDay() {
+    const row = await query.get(db, NEWEST_DAY);
+    newestDay = row && row.day !== null ? row.day : null;
+  }
+
+  // Creates the archive's table on first use and reads how far it reaches
+  async function prepare() {
+    await db.transaction(async (tx) => {
+      for (const sql of ARCHIVE_SCHEMA) {
+        await query.run(tx, sql);
+      }
+    });
+    await refreshNewestDay();
+  }
+
+  // The copy commits before the delete: WAL gives no atomic commit across
+  // attached databases, and a crash between the two must leave the rows in
+  // both (readers skip the copies, the next run deletes them) rather than
+  // in neither. The delete runs with work_entries_archiving set so the
+  // rollup triggers leave the moved hours in place.
+  function moveBatch(cutoff) {
+    return db.runExclusive(async () => {
+      const writer = db.writer;
+      await inTransaction(writer, () => query.run(writer, COPY_BATCH, [cutoff, batchSize]));
+      return inTransaction(writer, async () => {
+        await query.run(writer, 'INSERT INTO work_entries_archiving DEFAULT VALUES');
+        const { changes } = await query.run(writer, DELETE_BATCH, [cutoff, batchSize]);
+        await query.run(writer, 'DELETE FROM work_entries_archiving');
+        return changes;
+      });
+    });
+  }
+
+  async function archiveOldEntries(now) {
+    const started = process.hrtime.bigint();
+    const cutoff = toDayNumber(now) - afterDays;
+
+    let moved = 0;
+    for (;;) {
+      const changes = await moveBatch(cutoff);
+      moved += changes;
+      if (changes < batchSize) break;
+    }
+    await refreshNewestDay();
+    if (moved) {
+      onArchived(moved);
+    }
+
+    stats.runs++;
+    stats.moved += moved;
+    stats.lastMoved = moved;
+    stats.lastDurationMs = elapsedMs(started);
+    stats.lastRunAt = new Date().toISOString();
+    return moved;
+  }
+
+  // Resolves to the number of entries moved. Overlapping calls share the
+  // run already in progress.
+  function run(now = new Date()) {
+    if (!running) {
+      running = archiveOldEntries(now)
+        .catch((err) => {
+          stats.failures++;
+          throw err;
+        })
+        .finally(() => {
+          running = null;
+        });
+    }
+    return running;
+  }
+
+  function start() {
+    timer = setInterval(() => {
+      run().catch((err) => console.error('Error archiving work entries:', err));
+    }, intervalMs);
+    timer.unref();
+  }
+
+  // Lets a run in progress finish its current batches
+  async function stop() {
+    if (timer) {
+      clearInterval(timer);
+      timer = null;
+    }
+    if (running) {
+      await running.catch(() => {});
+    }
+  }
+
+  // Whether a day range starting at `fromDay` reaches archived entries
+  function covers(fromDay) {
+    return newestDay !== null && fromDay <= newestDay;
+  }
+
+  function getStats() {
+    return { ...stats, newestDate: newestDay === null ? null : fromDayNumber(newestDay) };
+  }
+
+  return {
+    prepare,
+    run,
+    start,
+    stop,
+    covers,
+    // Re-reads how far the archive reaches, after another process moved
+    // entries into it
+    refresh: refreshNewestDay,
+    getStats
+  };
+}
+
+// [sql, params] for the named entry statement over a day range starting at
+// `fromDay`: STATEMENTS[name] itself, or its `WithArchive` variant when the
+// range reaches archived days. That variant's second arm takes the same
+// parameters again.
+function entryQuery(archive, name, params, fromDay) {
+  if (archive && archive.covers(fromDay)) {
+    return [STATEMENTS[`${name}WithArchive`], [...params, ...params]];
+  }
+  return [STATEMENTS[name], params];
+}
+
+module.exports = {
+  DEFAULT_AFTER_DAYS,
+  ARCHIVE_SCHEMA,
+  createArchiver,
+  entryQuery
+};
@@ -0,0 +1,498 @@
+const { AsyncLocalStorage } = require('async_hooks');
+const sqlite3 = require('sqlite3').verbose();
+const { createStatementRegistry } = require('./statements');
+const { createWriteQueue } = require('./writeQueue');
+const { pragmaStatements } = require('./pragmas');
+const { createWorkerPool, toJsonArray } = require('./workerPool');
+const query = require('./query');
+
+function openConnection(filename, mode, onOpen) {
+  const callback = (err) => {
+    if (err) {
+      console.error('Error opening database:', err);
+      throw err;
+    }
+    if (onOpen) onOpen();
+  };
+
+  return mode === undefined
+    ? new sqlite3.Database(filename, callback)
+    : new sqlite3.Database(filename, mode, callback);
+}
+
+// ATTACH statements for `attach` ({ schema: filename }). They are queued with
+// the pragmas, so the file name is quoted rather than bound.
+function attachStatements(attach) {
+  return Object.entries(attach)
+    .map(([schema, file]) => `ATTACH DATABASE '${String(file).replace(/'/g, "''")}' AS ${schema}`);
+}
+
+// Queued in order ahead of anything else issued on the connection
+function applyPragmas(connection, statements) {
+  connection.serialize(() => {
+    for (const sql of statements) {
+      connection.run(sql);
+    }
+  });
+}
+
+// Owns the connections for one database file: a single writer plus an
+// optional pool of read-only connections. Reads only go to the pool once the
+// writer reports WAL mode, so readers never block on (or block) the writer.
+// In-memory databases cannot share state across connections, so they always
+// run with a pool size of zero. Reads that run on the writer wait only for an
+// open transaction or exclusive task, never for plain writes or each other.
+// Inside a transaction or runExclusive() task, statements go through `tx` or
+// db.writer; using the facade there throws instead of deadlocking.
+//
+// `readOnly` is for a copy nothing writes to with SQL (a follower's, see
+// replica.js): with no writer to block, readers are used in any journal mode.
+//
+// `pragmas` ({ name: value }, see pragmas.js) is applied to every connection
+// as it opens; `groupCommit` ({ windowMs, maxBatch }) configures the queue
+// behind write().
+//
+// With `workerThreads` > 0 (file databases only) reads run on a pool of
+// worker threads instead of the read-only connections, so decoding large
+// result sets happens off the event loop. Writes stay on the writer.
+//
+// `queryLog` (see queryLog.js), when given, times every statement issued
+// with a callback and can EXPLAIN slow ones on the writer.
+//
+// `attach` ({ schema: filename }) ATTACHes further databases to every
+// connection, readers and worker threads included, before the pragmas run
+// (e.g. the work entry archive, see archive.js).
+function createConnectionManager({
+  filename,
+  readPoolSize = 0,
+  workerThreads = 0,
+  onOpen,
+  pragmas = {},
+  groupCommit = {},
+  queryLog = null,
+  attach = {},
+  readOnly = false
+}) {
+  const isMemory = filename === ':memory:';
+  const attached = attachStatements(attach);
+  const readerSetup = [...attached, ...pragmaStatements(pragmas, { readOnly: true })];
+  const workerPool = !isMemory && workerThreads > 0
+    ? createWorkerPool({ filename, size: workerThreads, pragmas: readerSetup })
+    : null;
+  const poolSize = isMemory || workerPool ? 0 : Math.max(0, readPoolSize);
+  const readers = [];
+  const statements = createStatementRegistry();
+  let serializeDepth = 0;
+
+  const writer = openConnection(filename, undefined, onOpen);
+  applyPragmas(writer, [...attached, ...pragmaStatements(pragmas)]);
+
+  // Until (unless) the writer reports WAL, reads stay on the writer
+  let readersSafe = readOnly;
+  if (!readOnly && (poolSize > 0 || workerPool)) {
+    writer.serialize(() => {
+      writer.get('PRAGMA journal_mode', [], (err, row) => {
+        readersSafe = !err && Boolean(row) && String(row.journal_mode).toLowerCase() === 'wal';
+        if (!readersSafe) {
+          console.warn(`${filename} is not in WAL mode; reads will run on the writer`);
+        }
+      });
+    });
+  }
+
+  function acquireReader() {
+    if (readers.length < poolSize) {
+      const connection = openConnection(filename, sqlite3.OPEN_READONLY);
+      applyPragmas(connection, readerSetup);
+      const reader = { connection, pending: 0 };
+      readers.push(reader);
+      return reader;
+    }
+
+    let least = readers[0];
+    for (const reader of readers) {
+      if (reader.pending < least.pending) least = reader;
+    }
+    return least;
+  }
+
+  function splitArgs(args) {
+    const last = args.length - 1;
+    const callback = typeof args[last] === 'function' ? args[last] : null;
+    const params = callback ? args.slice(0, last) : args;
+    return { callback, params };
+  }
+
+  // Straight to the writer, so explaining a statement is not itself logged
+  function explain(sql, params) {
+    return query.all(writer, `EXPLAIN QUERY PLAN ${sql}`, params);
+  }
+
+  function bindings(params) {
+    return params.length === 1 && typeof params[0] === 'object' && params[0] !== null ? params[0] : params;
+  }
+
+  // Wraps the callback so the query log sees the statement's duration.
+  // Statements without a callback are left alone: adding one would swallow
+  // the error event sqlite3 raises for them.
+  function timed(sql, params, callback) {
+    if (!queryLog || !callback) {
+      return callback;
+    }
+    const started = process.hrtime.bigint();
+    return function(err, result) {
+      const elapsedMs = Number(process.hrtime.bigint() - started) / 1e6;
+      queryLog.record(sql, bindings(params), elapsedMs, { failed: Boolean(err), explain });
+      callback.call(this, err, result);
+    };
+  }
+
+  // Named statements go through the prepared-statement cache
+  function execute(connection, method, args) {
+    const [sql, ...rest] = args;
+    const { callback, params } = splitArgs(rest);
+    const callArgs = callback ? [sql, ...params, timed(sql, params, callback)] : args;
+
+    if (!statements.execute(connection, method, sql, callArgs.slice(1))) {
+      connection[method](...callArgs);
+    }
+    return facade;
+  }
+
+  // Same callback contract as sqlite3; all() parses the worker's JSON here
+  function dispatchToWorker(method, [sql, ...args]) {
+    const { callback: given, params } = splitArgs(args);
+    const callback = timed(sql, params, given);
+    const bound = bindings(params);
+
+    const task = method === 'get'
+      ? workerPool.get(sql, bound)
+      : workerPool.all(sql, bound).then((chunks) => JSON.parse(toJsonArray(chunks).toString()));
+
+    task.then(
+      (result) => callback && callback(null, result),
+      (err) => callback && callback(err)
+    );
+    return facade;
+  }
+
+  // Runs straight away unless a transaction or maintenance task (which may
+  // interrupt the writer) holds the writer; then it waits for that to end,
+  // so it never sees uncommitted rows. Plain writes do not hold it back.
+  function readOnWriter(method, args) {
+    if (section) {
+      assertOutsideSection();
+      heldReads.push(() => readOnWriter(method, args));
+      return facade;
+    }
+
+    const { callback, params } = splitArgs(args);
+    writerReads++;
+    return execute(writer, method, [...params, function(err, result) {
+      writerReads--;
+      if (writerReads === 0 && readsDrained) {
+        const start = readsDrained;
+        readsDrained = null;
+        start();
+      }
+      if (callback) callback.call(this, err, result);
+    }]);
+  }
+
+  function dispatchRead(method, args) {
+    // Statements issued inside serialize() must stay ordered on the writer
+    if (serializeDepth > 0) {
+      return execute(writer, method, args);
+    }
+    if (!readersSafe) {
+      return readOnWriter(method, args);
+    }
+    if (workerPool) {
+      return dispatchToWorker(method, args);
+    }
+    if (poolSize === 0) {
+      return readOnWriter(method, args);
+    }
+
+    const reader = acquireReader();
+    const { callback, params } = splitArgs(args);
+
+    reader.pending++;
+    return execute(reader.connection, method, [...params, function(err, result) {
+      reader.pending--;
+      if (callback) callback.call(this, err, result);
+    }]);
+  }
+
+  // Plain writes and transactions take turns on the writer, so a concurrent
+  // run() can never land inside another request's BEGIN ... COMMIT
+  let writeLocked = false;
+  const writeWaiters = [];
+
+  function withWriteLock(task) {
+    assertOutsideSection();
+    if (writeLocked) {
+      writeWaiters.push(task);
+      return;
+    }
+    writeLocked = true;
+    task(releaseWriteLock);
+  }
+
+  function releaseWriteLock() {
+    const next = writeWaiters.shift();
+    if (next) {
+      next(releaseWriteLock);
+    } else {
+      writeLocked = false;
+    }
+  }
+
+  // A section is a transaction or runExclusive() task holding the write
+  // lock. Reads on the writer that arrive while one is open wait for it;
+  // it starts once the reads already running have called back.
+  const sectionContext = new AsyncLocalStorage();
+  let section = null;
+  let writerReads = 0;
+  let readsDrained = null;
+  const heldReads = [];
+
+  // `task(end)` runs inside the section and calls end() when done
+  function withSection(task) {
+    withWriteLock((release) => {
+      const current = {};
+      section = current;
+      const start = () => sectionContext.run(current, () => task(() => {
+        section = null;
+        for (const read of heldReads.splice(0)) read();
+        release();
+      }));
+      if (writerReads === 0) {
+        start();
+      } else {
+        readsDrained = start;
+      }
+    });
+  }
+
+  // The facade waits for the section its caller is running in, which would
+  // never end: inside one, statements go through `tx` (or db.writer)
+  function assertOutsideSection() {
+    if (section && sectionContext.getStore() === section) {
+      throw new Error('Database facade used inside its own transaction or exclusive task; use the tx handle or db.writer');
+    }
+  }
+
+  // Callback-style handle bound to the writer, used inside transactions
+  const writerHandle = {
+    get: (...args) => execute(writer, 'get', args),
+    all: (...args) => execute(writer, 'all', args),
+    run: (...args) => execute(writer, 'run', args)
+  };
+
+  // Commits a batch of queued writes in one transaction. Each write runs in
+  // its own savepoint, so a failing write is rolled back and reported to its
+  // caller alone while the rest of the batch still commits.
+  function commitBatch(items) {
+    return new Promise((resolve, reject) => {
+      withSection(async (release) => {
+        try {
+          const outcomes = [];
+          await query.run(writerHandle, 'BEGIN IMMEDIATE');
+          for (const { work } of items) {
+            await query.run(writerHandle, 'SAVEPOINT queued_write');
+            try {
+              const result = await work(writerHandle);
+              await query.run(writerHandle, 'RELEASE queued_write');
+              outcomes.push({ result });
+            } catch (error) {
+              await query.run(writerHandle, 'ROLLBACK TO queued_write');
+              await query.run(writerHandle, 'RELEASE queued_write');
+              outcomes.push({ error });
+            }
+          }
+          await query.run(writerHandle, 'COMMIT');
+          resolve(outcomes);
+        } catch (err) {
+          await query.run(writerHandle, 'ROLLBACK').catch(() => {});
+          reject(err);
+        } finally {
+          release();
+        }
+      });
+    });
+  }
+
+  const writeQueue = createWriteQueue({ ...groupCommit, commit: commitBatch });
+
+  function closeConnection(connection) {
+    return statements.finalize(connection).then(() => new Promise((resolve) => {
+      connection.close((err) => resolve(err || null));
+    }));
+  }
+
+  const facade = {
+    get(...args) {
+      return dispatchRead('get', args);
+    },
+
+    all(...args) {
+      return dispatchRead('all', args);
+    },
+
+    // Resolves to the rows as a JSON array in a Buffer. On the worker pool
+    // the rows are never materialised on this thread, so a route can splice
+    // the result straight into its response body.
+    allJson(sql, params = []) {
+      if (workerPool && readersSafe && serializeDepth === 0) {
+        return new Promise((resolve, reject) => {
+          const done = timed(sql, [params], (err, chunks) => (err ? reject(err) : resolve(toJsonArray(chunks))));
+          workerPool.all(sql, params).then((chunks) => done(null, chunks), done);
+        });
+      }
+      return query.all(facade, sql, params).then((rows) => Buffer.from(JSON.stringify(rows)));
+    },
+
+    each(...args) {
+      return writer.each(...args);
+    },
+
+    run(...args) {
+      // Boot-time schema statements rely on serialize() ordering
+      if (serializeDepth > 0) {
+        return execute(writer, 'run', args);
+      }
+
+      const { callback, params } = splitArgs(args);
+
+      withWriteLock((release) => {
+        execute(writer, 'run', [...params, function(err) {
+          release();
+          if (callback) callback.call(this, err);
+        }]);
+      });
+      return facade;
+    },
+
+    // Runs `work(tx)` inside BEGIN IMMEDIATE ... COMMIT on the writer. `tx`
+    // exposes get/all/run for use with the query helpers; any rejection
+    // rolls the transaction back and is re-thrown to the caller.
+    transaction(work) {
+      return new Promise((resolve, reject) => {
+        withSection(async (release) => {
+          try {
+            await query.run(writerHandle, 'BEGIN IMMEDIATE');
+            const result = await work(writerHandle);
+            await query.run(writerHandle, 'COMMIT');
+            resolve(result);
+          } catch (err) {
+            await query.run(writerHandle, 'ROLLBACK').catch(() => {});
+            reject(err);
+          } finally {
+            release();
+          }
+        });
+      });
+    },
+
+    // Like transaction(), but queued for group commit: `work(tx)` shares a
+    // transaction with other writes queued in the same window and resolves
+    // once that transaction commits. Use for short request-path writes;
+    // work that must not be held back (migrations) uses transaction().
+    write(work) {
+      try {
+        assertOutsideSection();
+      } catch (err) {
+        return Promise.reject(err);
+      }
+      return writeQueue.enqueue(work);
+    },
+
+    // Commits everything queued through write() so far
+    drain() {
+      return writeQueue.drain();
+    },
+
+    // Runs `task()` (which returns a promise) while no transaction or write
+    // is open on the writer, e.g. to copy a consistent snapshot of it
+    runExclusive(task) {
+      return new Promise((resolve, reject) => {
+        withSection((release) => {
+          Promise.resolve()
+            .then(task)
+            .then(resolve, reject)
+            .finally(release);
+        });
+      });
+    },
+
+    exec(...args) {
+      return writer.exec(...args);
+    },
+
+    prepare(...args) {
+      return writer.prepare(...args);
+    },
+
+    serialize(callback) {
+      serializeDepth++;
+      try {
+        return writer.serialize(callback);
+      } finally {
+        serializeDepth--;
+      }
+    },
+
+    // Readers first so the writer's close performs the final WAL checkpoint
+    close(callback) {
+      const pool = readers.splice(0);
+      writeQueue.drain()
+        .catch(() => {})
+        .then(() => workerPool && workerPool.close())
+        .then(() => Promise.all(pool.map((reader) => closeConnection(reader.connection))))
+        .then((readerErrors) => closeConnection(writer).then((writerError) => {
+          const err = writerError || readerErrors.find(Boolean) || null;
+          if (callback) callback(err);
+        }));
+    },
+
+    // Resolves to the values SQLite actually uses for the configured pragmas
+    // (e.g. journal_mode stays "memory" for an in-memory database)
+    async readPragmas() {
+      const effective = {};
+      for (const name of Object.keys(pragmas)) {
+        const row = await query.get(writer, `PRAGMA ${name}`);
+        effective[name] = row ? Object.values(row)[0] : null;
+      }
+      return effective;
+    },
+
+    statementStats() {
+      return statements.getStats();
+    },
+
+    writeQueueStats() {
+      return writeQueue.getStats();
+    },
+
+    workerPoolStats() {
+      return workerPool ? workerPool.getStats() : null;
+    },
+
+    get readPoolSize() {
+      return poolSize;
+    },
+
+    get writer() {
+      return writer;
+    }
+  };
+
+  return facade;
+}
+
+module.exports = {
+  createConnectionManager,
+  openConnection,
+  attachStatements
+};
@@ -0,0 +1,35 @@
+// Work entry dates are stored as whole days since 1970-01-01 (UTC) in
+// INTEGER columns, so ranges compare integers and stay index-backed.
+// Statements return them as YYYY-MM-DD; these helpers convert at the edges.
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+// Bounds for an open-ended range; int32 so sqlite3 binds them as integers
+const MIN_DAY = -2147483648;
+const MAX_DAY = 2147483647;
+
+// Accepts a Date (what Joi produces) or a YYYY-MM-DD string
+function toDayNumber(date) {
+  const time = date instanceof Date ? date.getTime() : Date.parse(date);
+  return Math.floor(time / DAY_MS);
+}
+
+function fromDayNumber(day) {
+  return new Date(day * DAY_MS).toISOString().slice(0, 10);
+}
+
+// [from, to] as day numbers for BETWEEN, open-ended where a bound is missing
+function dayRange({ from, to } = {}) {
+  return [
+    from === undefined ? MIN_DAY : toDayNumber(from),
+    to === undefined ? MAX_DAY : toDayNumber(to)
+  ];
+}
+
+module.exports = {
+  DAY_MS,
+  MIN_DAY,
+  MAX_DAY,
+  toDayNumber,
+  fromDayNumber,
+  dayRange
+};
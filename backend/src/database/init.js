@@ -1,81 +1,361 @@
-const sqlite3 = require('sqlite3').verbose();
+const os = require('os');
 const path = require('path');
+const fs = require('fs');
+const { createConnectionManager } = require('./connection');
+const { runMigrations, getMigrationStatus } = require('./migrate');
+const { resolvePragmas, describePragmas } = require('./pragmas');
+const { createSnapshotter } = require('./snapshots');
+const { shardIndex, shardFilename, checkShardLayout, mergeStatementStats } = require('./shards');
+const { createQueryLog } = require('./queryLog');
+const { createArchiver, DEFAULT_AFTER_DAYS } = require('./archive');
+const { createWalShipper } = require('./walShipping');
+const { createReplica } = require('./replica');
+const { createMaintenance } = require('./maintenance');
+const { registerMetrics } = require('../metrics');
+const { isClusterLeader, clusterSize, broadcast, onBroadcast } = require('../cluster');
 
-let db = null;
+// No fsync to amortise in memory, so only coalesce writes from the same tick
+const DEFAULT_GROUP_COMMIT_WINDOW_MS = 0;
+const DEFAULT_GROUP_COMMIT_MAX_BATCH = 64;
+// Statements at least this slow go to the slow-query log
+const DEFAULT_SLOW_QUERY_MS = 100;
+const DEFAULT_ARCHIVE_INTERVAL_MS = 60 * 60 * 1000;
+const DEFAULT_SNAPSHOT_INTERVAL_MS = 60000;
+const DEFAULT_READ_POOL_SIZE = 4;
+const DEFAULT_REPLICATION_POLL_MS = 20;
+const DEFAULT_REPLICATION_BUFFER_MB = 64;
+const DEFAULT_REPLICA_MAX_LAG_MS = 5000;
+const DEFAULT_MAINTENANCE_CHECK_MS = 10000;
+const DEFAULT_MAINTENANCE_IDLE_RPS = 1;
+const DEFAULT_MAINTENANCE_IDLE_LAG_MS = 10;
+const DEFAULT_MAINTENANCE_BUDGET_MS = 500;
+
+// One connection manager per shard; a single entry unless DB_SHARDS > 1
+let shards = [];
+let pragmaProfile = null;
+let queryLog = null;
+let archivers = [];
+let snapshotters = [];
+// WAL shippers (primary) or replicas (follower), one per shard
+let shippers = [];
+let replicas = [];
+// Idle-time ANALYZE/optimize/checkpoint/vacuum over every shard
+let maintenance = null;
 let isClosing = false;
 let isClosed = false;
 
-function getDatabase() {
-  if (!db) {
+registerMetrics('statements', () => getStatementStats());
+registerMetrics('migrations', () => getMigrationStatus());
+registerMetrics('writeQueue', () => getWriteQueueStats());
+registerMetrics('workerPool', () => getWorkerPoolStats());
+registerMetrics('archive', () => (archivers.length ? perShard(archivers.map((a) => a.getStats())) : { enabled: false }));
+registerMetrics('snapshots', () => (snapshotters.length ? perShard(snapshotters.map((s) => s.getStats())) : { enabled: false }));
+registerMetrics('replication', () => getReplicationStatus());
+registerMetrics('maintenance', () => (maintenance ? maintenance.getStats() : { enabled: false }));
+
+// In cluster mode only the leader runs the archiver; the other workers
+// re-read how far the archive reaches after each of its runs
+onBroadcast('archive.moved', (index) => {
+  if (archivers[index]) {
+    archivers[index].refresh().catch((err) => console.error('Error refreshing archive:', err));
+  }
+});
+
+function openShards() {
+  // DB_PRAGMA_PROFILE (durable | balanced | throughput) plus any
+  // DB_PRAGMA_<NAME> overrides, applied to every connection
+  const { profile, pragmas } = resolvePragmas();
+  pragmaProfile = profile;
+
+  // Use in-memory database as specified in requirements; DATABASE_PATH
+  // switches to a file (e.g. for benchmarks or the rollup rebuild script)
+  const dbPath = process.env.DATABASE_PATH || ':memory:';
+  if (dbPath !== ':memory:') {
+    fs.mkdirSync(path.dirname(dbPath), { recursive: true });
+  }
+
+  // DB_SHARDS spreads users over that many databases, each with its own
+  // writer, so writes for different users no longer queue on one lock
+  const count = Math.max(1, parseInt(process.env.DB_SHARDS || 1, 10));
+  const opened = [];
+
+  // DB_ARCHIVE_PATH attaches a cold archive database (one per shard) that
+  // entries older than DB_ARCHIVE_AFTER_DAYS are moved to
+  const archivePath = process.env.DB_ARCHIVE_PATH || null;
+  if (archivePath === ':memory:' && dbPath !== ':memory:') {
+    throw new Error('DB_ARCHIVE_PATH must be a file when DATABASE_PATH is one');
+  }
+  if (archivePath && archivePath !== ':memory:') {
+    fs.mkdirSync(path.dirname(archivePath), { recursive: true });
+  }
+
+  // REPLICATION_TOKEN makes this process a primary that ships its WAL to
+  // followers; with REPLICA_OF as well it is a read-only follower of that
+  // primary instead (see walShipping.js and replica.js)
+  const replicaOf = process.env.REPLICA_OF || null;
+  const shipping = Boolean(process.env.REPLICATION_TOKEN) && !replicaOf;
+  if (replicaOf && !process.env.REPLICATION_TOKEN) {
+    throw new Error('REPLICA_OF needs REPLICATION_TOKEN (the primary\'s)');
+  }
+  if ((replicaOf || shipping) && dbPath === ':memory:') {
+    throw new Error('Replication needs a file database (DATABASE_PATH)');
+  }
+  // Only the shipper may checkpoint, after it has read the frames
+  if (shipping) {
+    pragmas.wal_autocheckpoint = 0;
+  }
+  // Followers write pages into their files directly: no WAL, no mmap
+  const replicaPragmas = Object.fromEntries(Object.entries({ ...pragmas, mmap_size: 0 })
+    .filter(([name]) => name !== 'journal_mode'));
+  const replicaId = process.env.DB_REPLICA_ID || `${os.hostname()}-${process.pid}`;
+
+  // Shared by every shard, so GET /api/admin/queries covers them all
+  queryLog = createQueryLog({
+    thresholdMs: parseInt(process.env.DB_SLOW_QUERY_MS || DEFAULT_SLOW_QUERY_MS, 10),
+    logFile: process.env.DB_SLOW_QUERY_LOG || null
+  });
+
+  const layout = [];
+  replicas = [];
+
+  for (let index = 0; index < count; index++) {
+    const filename = shardFilename(dbPath, index, count);
+    const files = archivePath
+      ? { main: filename, archive: shardFilename(archivePath, index, count) }
+      : { main: filename };
+    const label = count > 1 ? ` (shard ${index} of ${count})` : '';
+    layout.push(files);
+
+    const open = ({ attach, pragmas: connectionPragmas, readOnly = false }) => createConnectionManager({
+      filename,
+      readPoolSize: parseInt(process.env.DB_READ_POOL_SIZE || DEFAULT_READ_POOL_SIZE, 10),
+      // Reads on worker threads instead of the read pool (file databases only)
+      workerThreads: parseInt(process.env.DB_WORKER_THREADS || 0, 10),
+      onOpen: () => console.log(filename === ':memory:'
+        ? `Connected to SQLite in-memory database${label}`
+        : `Connected to SQLite database (file: ${filename})${label}`),
+      pragmas: connectionPragmas,
+      queryLog,
+      attach,
+      readOnly,
+      groupCommit: {
+        windowMs: parseInt(process.env.DB_GROUP_COMMIT_WINDOW_MS || DEFAULT_GROUP_COMMIT_WINDOW_MS, 10),
+        maxBatch: parseInt(process.env.DB_GROUP_COMMIT_MAX_BATCH || DEFAULT_GROUP_COMMIT_MAX_BATCH, 10)
+      }
+    });
+
+    if (replicaOf) {
+      const replica = createReplica({
+        primaryUrl: replicaOf,
+        token: process.env.REPLICATION_TOKEN,
+        shard: index,
+        shards: count,
+        files,
+        id: count > 1 ? `${replicaId}/${index}` : replicaId,
+        maxLagMs: parseInt(process.env.DB_REPLICA_MAX_LAG_MS || DEFAULT_REPLICA_MAX_LAG_MS, 10),
+        openDatabase: ({ attach }) => open({ attach, pragmas: replicaPragmas, readOnly: true })
+      });
+      replicas.push(replica);
+      opened.push(replica.db);
+    } else {
+      opened.push(open({ attach: archivePath ? { archive: files.archive } : {}, pragmas }));
+    }
+  }
+
+  // Optional persistence: DB_SNAPSHOT_PATH keeps the in-memory database
+  // across restarts by snapshotting it (one file per shard); the cluster
+  // leader's are the only ones
+  snapshotters = process.env.DB_SNAPSHOT_PATH && isClusterLeader()
+    ? opened.map((db, index) => createSnapshotter({
+      db,
+      filename: shardFilename(process.env.DB_SNAPSHOT_PATH, index, count),
+      intervalMs: parseInt(process.env.DB_SNAPSHOT_INTERVAL_MS || DEFAULT_SNAPSHOT_INTERVAL_MS, 10)
+    }))
+    : [];
+
+  archivers = archivePath && !replicaOf
+    ? opened.map((db, index) => createArchiver({
+      db,
+      filename: shardFilename(archivePath, index, count),
+      afterDays: parseInt(process.env.DB_ARCHIVE_AFTER_DAYS || DEFAULT_AFTER_DAYS, 10),
+      intervalMs: parseInt(process.env.DB_ARCHIVE_INTERVAL_MS || DEFAULT_ARCHIVE_INTERVAL_MS, 10),
+      onArchived: () => broadcast('archive.moved', index)
+    }))
+    : [];
+
+  shippers = shipping
+    ? opened.map((db, index) => createWalShipper({
+      db,
+      files: layout[index],
+      pollMs: parseInt(process.env.DB_REPLICATION_POLL_MS || DEFAULT_REPLICATION_POLL_MS, 10),
+      bufferBytes: parseInt(process.env.DB_REPLICATION_BUFFER_MB || DEFAULT_REPLICATION_BUFFER_MB, 10) * 1024 * 1024
+    }))
+    : [];
+
+  // DB_MAINTENANCE=off turns it off; followers get theirs from the primary,
+  // and cluster workers from the leader
+  maintenance = process.env.DB_MAINTENANCE !== 'off' && !replicaOf && isClusterLeader()
+    ? createMaintenance({
+      databases: opened.map((db, index) => ({ db, files: layout[index] })),
+      checkMs: parseInt(process.env.DB_MAINTENANCE_CHECK_MS || DEFAULT_MAINTENANCE_CHECK_MS, 10),
+      // The leader sees its share of the requests in a cluster
+      idleRequestsPerSec: parseFloat(process.env.DB_MAINTENANCE_IDLE_RPS || DEFAULT_MAINTENANCE_IDLE_RPS) / clusterSize(),
+      idleLagMs: parseInt(process.env.DB_MAINTENANCE_IDLE_LAG_MS || DEFAULT_MAINTENANCE_IDLE_LAG_MS, 10),
+      budgetMs: parseInt(process.env.DB_MAINTENANCE_BUDGET_MS || DEFAULT_MAINTENANCE_BUDGET_MS, 10),
+      // The WAL shipper checkpoints only once it has read the frames
+      checkpoint: !shipping
+    })
+    : null;
+
+  shards = opened;
+}
+
+function ensureOpen() {
+  if (!shards.length) {
     // Reset state when creating a new database connection
     isClosing = false;
     isClosed = false;
-    // Use in-memory database as specified in requirements
-    db = new sqlite3.Database(':memory:', (err) => {
-      if (err) {
-        console.error('Error opening database:', err);
-        throw err;
-      }
-      console.log('Connected to SQLite in-memory database');
-    });
+    openShards();
+  }
+  return shards;
+}
+
+// Returns the database holding `userEmail`'s data. Without sharding every
+// user shares one database and the argument may be omitted; work that spans
+// users (migrations, maintenance) goes through getShards() instead.
+function getDatabase(userEmail) {
+  ensureOpen();
+
+  if (shards.length === 1) {
+    return shards[0];
+  }
+  if (userEmail === undefined) {
+    throw new Error('getDatabase() needs a user email when DB_SHARDS > 1; use getShards() for work across users');
+  }
+  return shards[shardIndex(userEmail, shards.length)];
+}
+
+// Every shard's connection manager, in shard order
+function getShards() {
+  return ensureOpen();
+}
+
+// The archiver for the shard holding `userEmail`'s data (see archive.js), or
+// null when DB_ARCHIVE_PATH is not set
+function getArchive(userEmail) {
+  const database = getDatabase(userEmail);
+  if (replicas.length) {
+    return replicas[shards.indexOf(database)].archive;
+  }
+  return archivers.length ? archivers[shards.indexOf(database)] : null;
+}
+
+// Every shard's archiver, in shard order (empty without DB_ARCHIVE_PATH)
+function getArchives() {
+  ensureOpen();
+  return archivers;
+}
+
+// The WAL shipper for `userEmail`'s shard on a primary, or null
+function getShipper(userEmail) {
+  const database = getDatabase(userEmail);
+  return shippers.length ? shippers[shards.indexOf(database)] : null;
+}
+
+// Every shard's WAL shipper, in shard order (empty unless shipping)
+function getShippers() {
+  ensureOpen();
+  return shippers;
+}
+
+// The replica of `userEmail`'s shard on a follower, or null
+function getReplica(userEmail) {
+  const database = getDatabase(userEmail);
+  return replicas.length ? replicas[shards.indexOf(database)] : null;
+}
+
+// Counts a request towards the rate that decides when maintenance may run
+function noteRequest() {
+  if (maintenance) {
+    maintenance.noteRequest();
   }
-  return db;
+}
+
+// Role, position and lag, per shard
+function getReplicationStatus() {
+  if (replicas.length) {
+    return perShard(replicas.map((replica) => replica.getStatus()));
+  }
+  if (shippers.length) {
+    return perShard(shippers.map((shipper) => shipper.getStats()));
+  }
+  return { enabled: false };
 }
 
 async function initializeDatabase() {
-  const database = getDatabase();
-  
-  return new Promise((resolve, reject) => {
-    database.serialize(() => {
-      // Create users table
-      database.run(`
-        CREATE TABLE IF NOT EXISTS users (
-          email TEXT PRIMARY KEY,
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-      `);
-
-      // Create clients table
-      database.run(`
-        CREATE TABLE IF NOT EXISTS clients (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          name TEXT NOT NULL,
-          description TEXT,
-          department TEXT,
-          email TEXT,
-          user_email TEXT NOT NULL,
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY (user_email) REFERENCES users (email) ON DELETE CASCADE
-        )
-      `);
-
-      // Create work_entries table
-      database.run(`
-        CREATE TABLE IF NOT EXISTS work_entries (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          client_id INTEGER NOT NULL,
-          user_email TEXT NOT NULL,
-          hours DECIMAL(5,2) NOT NULL,
-          description TEXT,
-          date DATE NOT NULL,
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE,
-          FOREIGN KEY (user_email) REFERENCES users (email) ON DELETE CASCADE
-        )
-      `);
-
-      // Create indexes for better performance
-      database.run(`CREATE INDEX IF NOT EXISTS idx_clients_user_email ON clients (user_email)`);
-      database.run(`CREATE INDEX IF NOT EXISTS idx_work_entries_client_id ON work_entries (client_id)`);
-      database.run(`CREATE INDEX IF NOT EXISTS idx_work_entries_user_email ON work_entries (user_email)`);
-      database.run(`CREATE INDEX IF NOT EXISTS idx_work_entries_date ON work_entries (date)`);
-
-      console.log('Database tables created successfully');
-      resolve();
+  const all = getShards();
+
+  // Followers take their schema and data from the primary
+  if (replicas.length) {
+    for (const replica of replicas) {
+      await replica.start();
+    }
+    const effective = await all[0].readPragmas();
+    console.log(`Replicating from ${process.env.REPLICA_OF}; SQLite pragmas: ${describePragmas(effective)}`);
+    return;
+  }
+
+  // Restore before migrating, so an older snapshot is brought up to date
+  for (const snapshotter of snapshotters) {
+    await snapshotter.restore();
+  }
+
+  const effective = await all[0].readPragmas();
+  console.log(`SQLite pragmas (profile ${pragmaProfile}): ${describePragmas(effective)}`);
+
+  // Apply pending schema migrations (tracked with PRAGMA user_version)
+  for (const [index, database] of all.entries()) {
+    if (all.length > 1) {
+      await checkShardLayout(database, index, all.length);
+    }
+    await runMigrations(database);
+  }
+  console.log('Database tables created successfully');
+
+  for (const archiver of archivers) {
+    await archiver.prepare();
+    if (isClusterLeader()) {
+      archiver.start();
+    }
+  }
+
+  for (const snapshotter of snapshotters) {
+    snapshotter.start();
+  }
+
+  for (const shipper of shippers) {
+    await shipper.prepare();
+    shipper.start();
+  }
+
+  if (maintenance) {
+    maintenance.start();
+  }
+}
+
+function closeShard(database, snapshotter) {
+  const finalSnapshot = snapshotter
+    ? snapshotter.stop().catch((err) => console.error('Error taking final snapshot:', err))
+    : Promise.resolve();
+
+  return finalSnapshot.then(() => new Promise((resolve) => {
+    database.close((err) => {
+      if (err) {
+        console.error('Error closing database:', err);
+      }
+      resolve(err);
     });
-  });
+  }));
 }
 
 function closeDatabase() {
@@ -85,7 +365,7 @@ function closeDatabase() {
       resolve();
       return;
     }
-    
+
     if (isClosing) {
       // Currently closing, wait for it to complete
       const checkClosed = setInterval(() => {
@@ -96,21 +376,29 @@ function closeDatabase() {
       }, 10);
       return;
     }
-    
-    if (!db) {
+
+    if (!shards.length) {
       // No database connection, resolve immediately
       resolve();
       return;
     }
-    
+
     isClosing = true;
-    db.close((err) => {
+    // An archive run, WAL capture or maintenance task in progress finishes
+    // before anything closes
+    const closing = Promise.all([...archivers, ...shippers, maintenance].filter(Boolean).map((worker) => worker.stop()))
+      .then(() => Promise.all(shards.map((database, index) => closeShard(database, snapshotters[index]))));
+
+    closing.then((errors) => {
       isClosed = true;
       isClosing = false;
-      db = null;
-      if (err) {
-        console.error('Error closing database:', err);
-      } else {
+      shards = [];
+      archivers = [];
+      snapshotters = [];
+      shippers = [];
+      replicas = [];
+      maintenance = null;
+      if (!errors.some(Boolean)) {
         console.log('Database connection closed');
       }
       resolve();
@@ -118,8 +406,47 @@ function closeDatabase() {
   });
 }
 
+// One value per shard, or the plain value when there is only one
+function perShard(values) {
+  return values.length === 1 ? values[0] : { shards: values };
+}
+
+// Per-statement prepare/hit counts and latency for the named statements
+function getStatementStats() {
+  return mergeStatementStats(shards.map((database) => database.statementStats()));
+}
+
+// Queue depth and batch sizes for group-committed writes
+function getWriteQueueStats() {
+  return shards.length ? perShard(shards.map((database) => database.writeQueueStats())) : {};
+}
+
+// Task counts and latency for reads on worker threads, when enabled
+function getWorkerPoolStats() {
+  return (shards.length && shards[0].workerPoolStats())
+    ? perShard(shards.map((database) => database.workerPoolStats()))
+    : { enabled: false };
+}
+
+// Per-statement timings (p50/p95/max) and recent slow queries
+function getQueryReport() {
+  return queryLog ? queryLog.getReport() : { thresholdMs: null, statements: [], recentSlow: [] };
+}
+
 module.exports = {
   getDatabase,
+  getShards,
+  getArchive,
+  getArchives,
+  getShipper,
+  getShippers,
+  getReplica,
+  getReplicationStatus,
+  noteRequest,
   initializeDatabase,
-  closeDatabase
+  closeDatabase,
+  getStatementStats,
+  getWriteQueueStats,
+  getWorkerPoolStats,
+  getQueryReport
 };
@@ -0,0 +1,387 @@
+const fs = require('fs');
+const { monitorEventLoopDelay } = require('perf_hooks');
+const query = require('./query');
+
+const DEFAULT_CHECK_MS = 10000;
+const DEFAULT_IDLE_REQUESTS_PER_SEC = 1;
+const DEFAULT_IDLE_LAG_MS = 10;
+const DEFAULT_BUDGET_MS = 500;
+const LAG_RESOLUTION_MS = 10;
+// Rows ANALYZE samples per index: enough for the planner, bounded on any
+// table size
+const ANALYSIS_LIMIT = 1000;
+// Below this a WAL file is not worth truncating
+const MIN_WAL_BYTES = 1024 * 1024;
+const MIN_FREE_PAGES = 256;
+const VACUUM_STEP_PAGES = 128;
+// A task this many intervals late runs even while the server is busy
+const OVERDUE_FACTOR = 6;
+
+const MINUTE = 60 * 1000;
+const HOUR = 60 * MINUTE;
+
+// Checked in this order; one task runs per check
+const TASKS = {
+  checkpoint: { intervalMs: MINUTE },
+  incrementalVacuum: { intervalMs: 10 * MINUTE },
+  optimize: { intervalMs: HOUR },
+  analyze: { intervalMs: 24 * HOUR }
+};
+
+function elapsedMs(started) {
+  return Math.round(Number(process.hrtime.bigint() - started) / 1e4) / 100;
+}
+
+async function fileSize(filename) {
+  try {
+    return (await fs.promises.stat(filename)).size;
+  } catch (err) {
+    if (err.code === 'ENOENT') return 0;
+    throw err;
+  }
+}
+
+// Interrupts whatever `connection` is running once `ms` have passed: SQLite
+// rolls the statement back and it fails with SQLITE_INTERRUPT
+async function withinBudget(connection, ms, work) {
+  const timer = setTimeout(() => connection.interrupt(), Math.max(0, ms));
+  try {
+    return await work();
+  } finally {
+    clearTimeout(timer);
+  }
+}
+
+// Requests per second (counted by the caller) and event-loop lag since the
+// last sample
+function createLoadMonitor() {
+  let histogram = null;
+  let requests = 0;
+  let since = Date.now();
+
+  return {
+    noteRequest() {
+      requests++;
+    },
+
+    start() {
+      if (histogram) return;
+      histogram = monitorEventLoopDelay({ resolution: LAG_RESOLUTION_MS });
+      histogram.enable();
+      requests = 0;
+      since = Date.now();
+    },
+
+    stop() {
+      if (histogram) {
+        histogram.disable();
+        histogram = null;
+      }
+    },
+
+    sample() {
+      const now = Date.now();
+      const requestRate = (requests * 1000) / Math.max(1, now - since);
+      // Each recorded delay includes the timer's own resolution
+      const lagMs = histogram && histogram.count
+        ? Math.max(0, histogram.percentile(99) / 1e6 - LAG_RESOLUTION_MS)
+        : 0;
+      requests = 0;
+      since = now;
+      if (histogram) histogram.reset();
+      return { requestRate: Math.round(requestRate * 100) / 100, lagMs: Math.round(lagMs * 100) / 100 };
+    }
+  };
+}
+
+// Each task takes the shard's write lock (so no request write is half-way
+// through) and resolves to its effect, or null when there was nothing to do
+const RUNNERS = {
+  // Truncates the WAL once every frame in it is in the database. PASSIVE
+  // first, which never waits for readers and is interrupted at the budget;
+  // TRUNCATE then waits for readers still on the old frames for at most
+  // the rest of it.
+  async checkpoint({ db, files, budgetMs }) {
+    const deadline = Date.now() + budgetMs;
+    const effect = { frames: 0, walBytesBefore: 0, walBytesAfter: 0, busy: false };
+
+    await db.runExclusive(async () => {
+      const writer = db.writer;
+      const { timeout } = await query.get(writer, 'PRAGMA busy_timeout');
+      try {
+        for (const [schema, filename] of Object.entries(files)) {
+          effect.walBytesBefore += await fileSize(`${filename}-wal`);
+          const passive = await withinBudget(writer, deadline - Date.now(),
+            () => query.get(writer, `PRAGMA ${schema}.wal_checkpoint(PASSIVE)`));
+          effect.frames += Math.max(0, passive.checkpointed);
+
+          if (passive.log === passive.checkpointed && Date.now() < deadline) {
+            await query.run(writer, `PRAGMA busy_timeout = ${Math.max(0, deadline - Date.now())}`);
+            const truncate = await query.get(writer, `PRAGMA ${schema}.wal_checkpoint(TRUNCATE)`);
+            effect.busy = effect.busy || truncate.busy === 1;
+          } else {
+            effect.busy = true;
+          }
+          effect.walBytesAfter += await fileSize(`${filename}-wal`);
+        }
+      } finally {
+        await query.run(writer, `PRAGMA busy_timeout = ${timeout}`);
+      }
+    });
+    return effect;
+  },
+
+  // Hands free pages back to the file system in small steps, releasing the
+  // write lock between them; only databases created with
+  // auto_vacuum = INCREMENTAL can do this
+  async incrementalVacuum({ db, files, budgetMs }) {
+    const deadline = Date.now() + budgetMs;
+    const effect = { pagesFreed: 0, bytesFreed: 0, freePagesLeft: 0 };
+
+    for (const schema of Object.keys(files)) {
+      const { auto_vacuum: mode } = await query.get(db, `PRAGMA ${schema}.auto_vacuum`);
+      if (mode !== 2) continue;
+      const { page_size: pageSize } = await query.get(db, `PRAGMA ${schema}.page_size`);
+
+      let free = (await query.get(db, `PRAGMA ${schema}.freelist_count`)).freelist_count;
+      while (free > 0 && Date.now() < deadline) {
+        // all(), not run(): each freed page is one step of the statement
+        const left = await db.runExclusive(async () => {
+          await query.all(db.writer, `PRAGMA ${schema}.incremental_vacuum(${VACUUM_STEP_PAGES})`);
+          return (await query.get(db.writer, `PRAGMA ${schema}.freelist_count`)).freelist_count;
+        });
+        const freed = Math.max(0, free - left);
+        effect.pagesFreed += freed;
+        effect.bytesFreed += freed * pageSize;
+        free = left;
+      }
+      effect.freePagesLeft += free;
+    }
+    return effect.pagesFreed || effect.freePagesLeft ? effect : null;
+  },
+
+  // Re-analyzes only the tables whose statistics SQLite considers stale.
+  // 0x10000 checks every table, not just those this connection queried;
+  // 0x1 only lists them, so the effect can be recorded before acting.
+  async optimize({ db, budgetMs }) {
+    return db.runExclusive(async () => {
+      const writer = db.writer;
+      await query.run(writer, `PRAGMA analysis_limit = ${ANALYSIS_LIMIT}`);
+      const stale = await query.all(writer, 'PRAGMA optimize(0x10003)');
+      if (!stale.length) return null;
+      await withinBudget(writer, budgetMs, () => query.all(writer, 'PRAGMA optimize(0x10002)'));
+      return { analyzed: stale.length };
+    });
+  },
+
+  // Full statistics refresh, sampled (analysis_limit) so it stays bounded
+  async analyze({ db, files, budgetMs }) {
+    return db.runExclusive(async () => {
+      const writer = db.writer;
+      await query.run(writer, `PRAGMA analysis_limit = ${ANALYSIS_LIMIT}`);
+      await withinBudget(writer, budgetMs, () => query.run(writer, 'ANALYZE'));
+
+      let tables = 0;
+      for (const schema of Object.keys(files)) {
+        const exists = await query.get(writer, `SELECT 1 FROM ${schema}.sqlite_master WHERE name = 'sqlite_stat1'`);
+        if (exists) {
+          tables += (await query.get(writer, `SELECT COUNT(DISTINCT tbl) AS tables FROM ${schema}.sqlite_stat1`)).tables;
+        }
+      }
+      return { tables };
+    });
+  }
+};
+
+// Needed only when there is something for the task to act on
+async function hasWork(name, { db, files }) {
+  if (name === 'checkpoint') {
+    for (const filename of Object.values(files)) {
+      if (await fileSize(`${filename}-wal`) >= MIN_WAL_BYTES) return true;
+    }
+    return false;
+  }
+  if (name === 'incrementalVacuum') {
+    for (const schema of Object.keys(files)) {
+      const { auto_vacuum: mode } = await query.get(db, `PRAGMA ${schema}.auto_vacuum`);
+      const { freelist_count: free } = await query.get(db, `PRAGMA ${schema}.freelist_count`);
+      if (mode === 2 && free >= MIN_FREE_PAGES) return true;
+    }
+    return false;
+  }
+  return true;
+}
+
+// Runs ANALYZE, PRAGMA optimize, WAL checkpoints and incremental vacuum on
+// every shard (`databases`: [{ db, files: { schema: filename } }]) while the
+// server is quiet: every `checkMs` it samples the request rate (fed by
+// noteRequest()) and event-loop lag, and when both are below the limits
+// runs the next due task. Each task stops after `budgetMs`, holding the
+// shard's write lock no longer than that. `checkpoint: false` leaves
+// checkpoints to someone else (the WAL shipper).
+function createMaintenance({
+  databases,
+  checkMs = DEFAULT_CHECK_MS,
+  idleRequestsPerSec = DEFAULT_IDLE_REQUESTS_PER_SEC,
+  idleLagMs = DEFAULT_IDLE_LAG_MS,
+  budgetMs = DEFAULT_BUDGET_MS,
+  checkpoint = true
+}) {
+  const load = createLoadMonitor();
+  let timer = null;
+  let running = null;
+  let startedAt = Date.now();
+  let lastLoad = { requestRate: 0, lagMs: 0, idle: false };
+
+  const stats = {
+    checks: 0,
+    idleChecks: 0,
+    forced: 0
+  };
+
+  // Tasks that apply to each shard: in-memory databases have no WAL
+  const shardTasks = databases.map(({ files }) => {
+    const onDisk = !Object.values(files).includes(':memory:');
+    const tasks = {};
+    for (const name of Object.keys(TASKS)) {
+      if (name === 'checkpoint' && (!checkpoint || !onDisk)) continue;
+      tasks[name] = {
+        runs: 0,
+        skipped: 0,
+        interrupted: 0,
+        failures: 0,
+        deferred: 0,
+        lastDurationMs: 0,
+        totalDurationMs: 0,
+        lastRunAt: null,
+        lastEffect: null,
+        nextDueAt: 0
+      };
+    }
+    return tasks;
+  });
+
+  async function execute(name, index) {
+    const task = shardTasks[index][name];
+    const started = process.hrtime.bigint();
+
+    try {
+      const effect = await RUNNERS[name]({ ...databases[index], budgetMs });
+      task.runs++;
+      task.lastEffect = effect;
+      return effect;
+    } catch (err) {
+      if (err.code !== 'SQLITE_INTERRUPT') {
+        task.failures++;
+        throw err;
+      }
+      task.interrupted++;
+      return null;
+    } finally {
+      const durationMs = elapsedMs(started);
+      task.lastDurationMs = durationMs;
+      task.totalDurationMs = Math.round((task.totalDurationMs + durationMs) * 100) / 100;
+      task.lastRunAt = new Date().toISOString();
+      task.nextDueAt = Date.now() + TASKS[name].intervalMs;
+    }
+  }
+
+  // The first due task, across shards, that the current load allows
+  async function check() {
+    const sample = load.sample();
+    const idle = sample.requestRate <= idleRequestsPerSec && sample.lagMs <= idleLagMs;
+    lastLoad = { ...sample, idle };
+    stats.checks++;
+    if (idle) stats.idleChecks++;
+
+    const now = Date.now();
+    for (const [index, tasks] of shardTasks.entries()) {
+      for (const [name, task] of Object.entries(tasks)) {
+        if (now < task.nextDueAt) continue;
+
+        const lateBy = now - (task.lastRunAt ? Date.parse(task.lastRunAt) : startedAt);
+        const overdue = lateBy > OVERDUE_FACTOR * TASKS[name].intervalMs;
+        if (!idle && !overdue) {
+          task.deferred++;
+          continue;
+        }
+        if (!(await hasWork(name, databases[index]))) {
+          task.skipped++;
+          task.nextDueAt = now + TASKS[name].intervalMs;
+          continue;
+        }
+
+        if (!idle) stats.forced++;
+        await execute(name, index);
+        return;
+      }
+    }
+  }
+
+  // Runs `name` on shard `index` now, whatever the load; resolves to its
+  // effect (e.g. for scripts and tests)
+  function runTask(name, index = 0) {
+    if (!shardTasks[index] || !shardTasks[index][name]) {
+      return Promise.reject(new Error(`Unknown maintenance task "${name}"`));
+    }
+    return execute(name, index);
+  }
+
+  function start() {
+    if (timer) return;
+    startedAt = Date.now();
+    load.start();
+    timer = setInterval(() => {
+      if (running) return;
+      running = check()
+        .catch((err) => console.error('Error running database maintenance:', err))
+        .finally(() => {
+          running = null;
+        });
+    }, checkMs);
+    timer.unref();
+  }
+
+  // Lets a task in progress finish (within its budget)
+  async function stop() {
+    if (timer) {
+      clearInterval(timer);
+      timer = null;
+    }
+    load.stop();
+    if (running) {
+      await running;
+    }
+  }
+
+  function getStats() {
+    const tasks = shardTasks.map((shard) => Object.fromEntries(Object.entries(shard)
+      .map(([name, task]) => [name, {
+        ...task,
+        nextDueAt: task.nextDueAt ? new Date(task.nextDueAt).toISOString() : null
+      }])));
+    return {
+      checkMs,
+      budgetMs,
+      idleRequestsPerSec,
+      idleLagMs,
+      load: lastLoad,
+      ...stats,
+      tasks: tasks.length === 1 ? tasks[0] : { shards: tasks }
+    };
+  }
+
+  return {
+    noteRequest: load.noteRequest,
+    runTask,
+    start,
+    stop,
+    getStats
+  };
+}
+
+module.exports = {
+  TASKS,
+  createLoadMonitor,
+  createMaintenance
+};
@@ -0,0 +1,136 @@
+const query = require('./query');
+const MIGRATIONS = require('./migrations');
+
+// Let SQLite's sorter use helper threads while building large indexes
+const INDEX_BUILD_THREADS = 4;
+
+const status = {
+  version: null,
+  applied: [],
+  indexBuilds: []
+};
+
+function elapsedMs(started) {
+  return Math.round(Number(process.hrtime.bigint() - started) / 1e4) / 100;
+}
+
+function createIndexSql({ name, table, columns, unique, where }) {
+  let sql = `CREATE ${unique ? 'UNIQUE ' : ''}INDEX IF NOT EXISTS ${name} ON ${table} (${columns.join(', ')})`;
+  if (where) {
+    sql += ` WHERE ${where}`;
+  }
+  return sql;
+}
+
+async function indexExists(db, name) {
+  const row = await query.get(db, "SELECT name FROM sqlite_master WHERE type = 'index' AND name = ?", [name]);
+  return Boolean(row);
+}
+
+async function readVersion(db) {
+  return db.transaction(async (tx) => {
+    await query.run(tx, `
+      CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        duration_ms REAL NOT NULL,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+      )
+    `);
+    const row = await query.get(tx, 'PRAGMA user_version');
+    return row.user_version;
+  });
+}
+
+// Schema changes, the history row and the user_version bump commit together,
+// so a failed migration leaves the database at the previous version. A
+// migration that rebuilds a table (6-8) holds the write lock for the whole
+// copy; see Migrations in the README.
+async function applyMigration(db, migration) {
+  const started = process.hrtime.bigint();
+
+  await db.transaction(async (tx) => {
+    await migration.up(tx);
+    await query.run(
+      tx,
+      'INSERT OR REPLACE INTO schema_migrations (version, name, duration_ms) VALUES (?, ?, ?)',
+      [migration.version, migration.name, elapsedMs(started)]
+    );
+    await query.run(tx, `PRAGMA user_version = ${migration.version}`);
+  });
+
+  const durationMs = elapsedMs(started);
+  status.applied.push({ version: migration.version, name: migration.name, durationMs });
+  console.log(`Migration ${migration.version} (${migration.name}) applied in ${durationMs}ms`);
+}
+
+// Indexes are declared rather than created inside migrations. Each missing
+// index is built in its own short transaction after the schema changes have
+// committed: in WAL mode readers keep going during the build and writers
+// wait for one index at a time instead of the whole migration. Replacing an
+// index builds the new one first and only then drops the old, so queries
+// always have an index to use.
+async function ensureIndexes(db, migrations) {
+  const declared = migrations.flatMap((migration) => migration.indexes || []);
+  const retired = new Set([
+    ...migrations.flatMap((migration) => migration.dropIndexes || []),
+    ...declared.flatMap((index) => index.replaces || [])
+  ]);
+
+  let threadsRaised = false;
+
+  for (const index of declared) {
+    if (retired.has(index.name) || await indexExists(db, index.name)) {
+      continue;
+    }
+
+    if (!threadsRaised) {
+      await query.run(db, `PRAGMA threads = ${INDEX_BUILD_THREADS}`);
+      threadsRaised = true;
+    }
+
+    const started = process.hrtime.bigint();
+    await db.transaction((tx) => query.run(tx, createIndexSql(index)));
+
+    const durationMs = elapsedMs(started);
+    status.indexBuilds.push({ name: index.name, durationMs });
+    console.log(`Index ${index.name} built in ${durationMs}ms`);
+  }
+
+  if (threadsRaised) {
+    await query.run(db, 'PRAGMA threads = 0');
+  }
+
+  for (const name of retired) {
+    if (await indexExists(db, name)) {
+      await db.transaction((tx) => query.run(tx, `DROP INDEX IF EXISTS ${name}`));
+      console.log(`Index ${name} dropped`);
+    }
+  }
+}
+
+async function runMigrations(db, migrations = MIGRATIONS) {
+  const current = await readVersion(db);
+  const pending = migrations
+    .filter((migration) => migration.version > current)
+    .sort((a, b) => a.version - b.version);
+
+  for (const migration of pending) {
+    await applyMigration(db, migration);
+  }
+
+  await ensureIndexes(db, migrations);
+
+  status.version = pending.length ? pending[pending.length - 1].version : current;
+  return status.version;
+}
+
+function getMigrationStatus() {
+  return status;
+}
+
+module.exports = {
+  runMigrations,
+  getMigrationStatus,
+  createIndexSql
+};
@@ -0,0 +1,52 @@
+const query = require('../query');
+
+module.exports = {
+  version: 1,
+  name: 'initial_schema',
+
+  // IF NOT EXISTS so databases created before versioning adopt this baseline
+  async up(tx) {
+    await query.run(tx, `
+      CREATE TABLE IF NOT EXISTS users (
+        email TEXT PRIMARY KEY,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+      )
+    `);
+
+    await query.run(tx, `
+      CREATE TABLE IF NOT EXISTS clients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT,
+        department TEXT,
+        email TEXT,
+        user_email TEXT NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_email) REFERENCES users (email) ON DELETE CASCADE
+      )
+    `);
+
+    await query.run(tx, `
+      CREATE TABLE IF NOT EXISTS work_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER NOT NULL,
+        user_email TEXT NOT NULL,
+        hours DECIMAL(5,2) NOT NULL,
+        description TEXT,
+        date DATE NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE,
+        FOREIGN KEY (user_email) REFERENCES users (email) ON DELETE CASCADE
+      )
+    `);
+  },
+
+  indexes: [
+    { name: 'idx_clients_user_email', table: 'clients', columns: ['user_email'] },
+    { name: 'idx_work_entries_client_id', table: 'work_entries', columns: ['client_id'] },
+    { name: 'idx_work_entries_user_email', table: 'work_entries', columns: ['user_email'] },
+    { name: 'idx_work_entries_date', table: 'work_entries', columns: ['date'] }
+  ]
+};
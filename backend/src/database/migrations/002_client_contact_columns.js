@@ -0,0 +1,19 @@
+const query = require('../query');
+
+// The docker schema was created without clients.department/email; add them
+// wherever they are missing so every deployment converges on one schema.
+module.exports = {
+  version: 2,
+  name: 'client_contact_columns',
+
+  async up(tx) {
+    const columns = await query.all(tx, 'PRAGMA table_info(clients)');
+    const existing = new Set(columns.map((column) => column.name));
+
+    for (const column of ['department', 'email']) {
+      if (!existing.has(column)) {
+        await query.run(tx, `ALTER TABLE clients ADD COLUMN ${column} TEXT`);
+      }
+    }
+  }
+};
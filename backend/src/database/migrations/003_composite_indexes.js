@@ -0,0 +1,34 @@
+// Composite indexes matching each access path's filter and ORDER BY, so
+// SQLite walks the index in order instead of sorting with a temp B-tree.
+// Their leading columns also serve the ON DELETE CASCADE lookups that the
+// single-column indexes used to cover.
+module.exports = {
+  version: 3,
+  name: 'composite_indexes',
+
+  async up() {},
+
+  indexes: [
+    // listClients, deleteAllClients
+    {
+      name: 'idx_clients_user_email_name',
+      table: 'clients',
+      columns: ['user_email', 'name'],
+      replaces: ['idx_clients_user_email']
+    },
+    // listWorkEntries (ORDER BY date DESC, created_at DESC)
+    {
+      name: 'idx_work_entries_user_date',
+      table: 'work_entries',
+      columns: ['user_email', 'date', 'created_at'],
+      replaces: ['idx_work_entries_user_email', 'idx_work_entries_date']
+    },
+    // listWorkEntriesForClient, reportEntries, exportEntries
+    {
+      name: 'idx_work_entries_client_user_date',
+      table: 'work_entries',
+      columns: ['client_id', 'user_email', 'date', 'created_at'],
+      replaces: ['idx_work_entries_client_id']
+    }
+  ]
+};
@@ -0,0 +1,81 @@
+const query = require('../query');
+
+// Per-client running totals kept exact by triggers on work_entries, so report
+// totals are a primary-key lookup instead of a scan over every entry.
+// Hours carry at most two decimals; rounding after each step stops REAL
+// arithmetic from drifting as totals are added to and subtracted from.
+const ADD_ENTRY = `
+  INSERT INTO client_hour_totals (user_email, client_id, total_hours, entry_count, first_date, last_date)
+  VALUES (NEW.user_email, NEW.client_id, ROUND(NEW.hours, 2), 1, NEW.date, NEW.date)
+  ON CONFLICT (user_email, client_id) DO UPDATE SET
+    total_hours = ROUND(total_hours + excluded.total_hours, 2),
+    entry_count = entry_count + 1,
+    first_date = MIN(first_date, excluded.first_date),
+    last_date = MAX(last_date, excluded.last_date);`;
+
+// first_date/last_date only need a fresh (indexed) MIN/MAX when the removed
+// entry was on the boundary
+const REMOVE_ENTRY = `
+  UPDATE client_hour_totals SET
+    total_hours = ROUND(total_hours - OLD.hours, 2),
+    entry_count = entry_count - 1,
+    first_date = CASE WHEN OLD.date = first_date THEN (
+      SELECT MIN(date) FROM work_entries WHERE client_id = OLD.client_id AND user_email = OLD.user_email
+    ) ELSE first_date END,
+    last_date = CASE WHEN OLD.date = last_date THEN (
+      SELECT MAX(date) FROM work_entries WHERE client_id = OLD.client_id AND user_email = OLD.user_email
+    ) ELSE last_date END
+  WHERE user_email = OLD.user_email AND client_id = OLD.client_id;
+  DELETE FROM client_hour_totals
+  WHERE user_email = OLD.user_email AND client_id = OLD.client_id AND entry_count <= 0;`;
+
+module.exports = {
+  version: 4,
+  name: 'client_hour_totals',
+
+  async up(tx) {
+    await query.run(tx, `
+      CREATE TABLE IF NOT EXISTS client_hour_totals (
+        user_email TEXT NOT NULL,
+        client_id INTEGER NOT NULL,
+        total_hours REAL NOT NULL DEFAULT 0,
+        entry_count INTEGER NOT NULL DEFAULT 0,
+        first_date DATE,
+        last_date DATE,
+        PRIMARY KEY (user_email, client_id)
+      ) WITHOUT ROWID
+    `);
+
+    await query.run(tx, `
+      CREATE TRIGGER IF NOT EXISTS work_entries_totals_insert
+      AFTER INSERT ON work_entries
+      BEGIN ${ADD_ENTRY}
+      END
+    `);
+
+    // Client deletes cascade row by row through this trigger, so the totals
+    // row goes away with the client's last entry
+    await query.run(tx, `
+      CREATE TRIGGER IF NOT EXISTS work_entries_totals_delete
+      AFTER DELETE ON work_entries
+      BEGIN ${REMOVE_ENTRY}
+      END
+    `);
+
+    await query.run(tx, `
+      CREATE TRIGGER IF NOT EXISTS work_entries_totals_update
+      AFTER UPDATE OF client_id, user_email, hours, date ON work_entries
+      BEGIN ${REMOVE_ENTRY} ${ADD_ENTRY}
+      END
+    `);
+
+    // Backfill from existing entries
+    await query.run(tx, 'DELETE FROM client_hour_totals');
+    await query.run(tx, `
+      INSERT INTO client_hour_totals (user_email, client_id, total_hours, entry_count, first_date, last_date)
+      SELECT user_email, client_id, ROUND(SUM(hours), 2), COUNT(*), MIN(date), MAX(date)
+      FROM work_entries
+      GROUP BY user_email, client_id
+    `);
+  }
+};
@@ -0,0 +1,83 @@
+const query = require('../query');
+
+// Per-user, per-client, per-day hour rollup so period charts read one row per
+// day instead of every entry in the period. Kept current by triggers on
+// work_entries, the same way as client_hour_totals.
+const ADD_ENTRY = `
+  INSERT INTO work_entry_daily (user_email, client_id, day, hours, entries)
+  VALUES (NEW.user_email, NEW.client_id, NEW.date, ROUND(NEW.hours, 2), 1)
+  ON CONFLICT (user_email, client_id, day) DO UPDATE SET
+    hours = ROUND(hours + excluded.hours, 2),
+    entries = entries + 1;`;
+
+const REMOVE_ENTRY = `
+  UPDATE work_entry_daily SET
+    hours = ROUND(hours - OLD.hours, 2),
+    entries = entries - 1
+  WHERE user_email = OLD.user_email AND client_id = OLD.client_id AND day = OLD.date;
+  DELETE FROM work_entry_daily
+  WHERE user_email = OLD.user_email AND client_id = OLD.client_id AND day = OLD.date AND entries <= 0;`;
+
+module.exports = {
+  version: 5,
+  name: 'work_entry_daily',
+
+  async up(tx) {
+    // Dates validated by Joi used to be bound as Date objects, which sqlite3
+    // stores as epoch milliseconds; rollups group by calendar day, so convert
+    // those rows to YYYY-MM-DD like every other date in the schema
+    await query.run(tx, `
+      UPDATE work_entries SET date = date(date / 1000, 'unixepoch')
+      WHERE typeof(date) IN ('integer', 'real')
+    `);
+
+    await query.run(tx, `
+      CREATE TABLE IF NOT EXISTS work_entry_daily (
+        user_email TEXT NOT NULL,
+        client_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        hours REAL NOT NULL DEFAULT 0,
+        entries INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_email, client_id, day)
+      ) WITHOUT ROWID
+    `);
+
+    await query.run(tx, `
+      CREATE TRIGGER IF NOT EXISTS work_entries_daily_insert
+      AFTER INSERT ON work_entries
+      BEGIN ${ADD_ENTRY}
+      END
+    `);
+
+    await query.run(tx, `
+      CREATE TRIGGER IF NOT EXISTS work_entries_daily_delete
+      AFTER DELETE ON work_entries
+      BEGIN ${REMOVE_ENTRY}
+      END
+    `);
+
+    await query.run(tx, `
+      CREATE TRIGGER IF NOT EXISTS work_entries_daily_update
+      AFTER UPDATE OF client_id, user_email, hours, date ON work_entries
+      BEGIN ${REMOVE_ENTRY} ${ADD_ENTRY}
+      END
+    `);
+
+    await query.run(tx, 'DELETE FROM work_entry_daily');
+    await query.run(tx, `
+      INSERT INTO work_entry_daily (user_email, client_id, day, hours, entries)
+      SELECT user_email, client_id, date, ROUND(SUM(hours), 2), COUNT(*)
+      FROM work_entries
+      GROUP BY user_email, client_id, date
+    `);
+  },
+
+  indexes: [
+    // All-client series: covering, so a period reads only the index
+    {
+      name: 'idx_work_entry_daily_user_day',
+      table: 'work_entry_daily',
+      columns: ['user_email', 'day', 'hours', 'entries']
+    }
+  ]
+};
@@ -0,0 +1,206 @@
+const query = require('../query');
+
+// Users get an INTEGER PRIMARY KEY and clients, work entries and both rollups
+// reference it instead of the email: every ownership check and index then
+// compares 8-byte integers rather than strings, and an email is resolved to
+// its id once per request by the auth middleware.
+//
+// SQLite cannot change a primary key in place, so each table is rebuilt and
+// its rows copied across with their ids. foreign_keys stays ON (it cannot be
+// switched inside a transaction), so old tables are dropped children first
+// and the new ones are renamed into place, which also rewrites their
+// REFERENCES clauses to the final names.
+const TOTALS_ADD_ENTRY = `
+  INSERT INTO client_hour_totals (user_id, client_id, total_hours, entry_count, first_date, last_date)
+  VALUES (NEW.user_id, NEW.client_id, ROUND(NEW.hours, 2), 1, NEW.date, NEW.date)
+  ON CONFLICT (user_id, client_id) DO UPDATE SET
+    total_hours = ROUND(total_hours + excluded.total_hours, 2),
+    entry_count = entry_count + 1,
+    first_date = MIN(first_date, excluded.first_date),
+    last_date = MAX(last_date, excluded.last_date);`;
+
+const TOTALS_REMOVE_ENTRY = `
+  UPDATE client_hour_totals SET
+    total_hours = ROUND(total_hours - OLD.hours, 2),
+    entry_count = entry_count - 1,
+    first_date = CASE WHEN OLD.date = first_date THEN (
+      SELECT MIN(date) FROM work_entries WHERE client_id = OLD.client_id AND user_id = OLD.user_id
+    ) ELSE first_date END,
+    last_date = CASE WHEN OLD.date = last_date THEN (
+      SELECT MAX(date) FROM work_entries WHERE client_id = OLD.client_id AND user_id = OLD.user_id
+    ) ELSE last_date END
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id;
+  DELETE FROM client_hour_totals
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND entry_count <= 0;`;
+
+const DAILY_ADD_ENTRY = `
+  INSERT INTO work_entry_daily (user_id, client_id, day, hours, entries)
+  VALUES (NEW.user_id, NEW.client_id, NEW.date, ROUND(NEW.hours, 2), 1)
+  ON CONFLICT (user_id, client_id, day) DO UPDATE SET
+    hours = ROUND(hours + excluded.hours, 2),
+    entries = entries + 1;`;
+
+const DAILY_REMOVE_ENTRY = `
+  UPDATE work_entry_daily SET
+    hours = ROUND(hours - OLD.hours, 2),
+    entries = entries - 1
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND day = OLD.date;
+  DELETE FROM work_entry_daily
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND day = OLD.date AND entries <= 0;`;
+
+module.exports = {
+  version: 6,
+  name: 'integer_user_ids',
+
+  async up(tx) {
+    await query.run(tx, `
+      CREATE TABLE users_new (
+        id INTEGER PRIMARY KEY,
+        email TEXT NOT NULL UNIQUE,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+      )
+    `);
+    await query.run(tx, `
+      INSERT INTO users_new (email, created_at)
+      SELECT email, created_at FROM users ORDER BY created_at, rowid
+    `);
+
+    await query.run(tx, `
+      CREATE TABLE clients_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT,
+        department TEXT,
+        email TEXT,
+        user_id INTEGER NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users_new (id) ON DELETE CASCADE
+      )
+    `);
+    await query.run(tx, `
+      INSERT INTO clients_new (id, name, description, department, email, user_id, created_at, updated_at)
+      SELECT c.id, c.name, c.description, c.department, c.email, u.id, c.created_at, c.updated_at
+      FROM clients c
+      JOIN users_new u ON u.email = c.user_email
+    `);
+
+    await query.run(tx, `
+      CREATE TABLE work_entries_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        hours DECIMAL(5,2) NOT NULL,
+        description TEXT,
+        date DATE NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (client_id) REFERENCES clients_new (id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users_new (id) ON DELETE CASCADE
+      )
+    `);
+    await query.run(tx, `
+      INSERT INTO work_entries_new (id, client_id, user_id, hours, description, date, created_at, updated_at)
+      SELECT we.id, we.client_id, u.id, we.hours, we.description, we.date, we.created_at, we.updated_at
+      FROM work_entries we
+      JOIN users_new u ON u.email = we.user_email
+    `);
+
+    // Carry the AUTOINCREMENT high-water marks over, so ids of deleted rows
+    // are still never reused
+    await query.run(tx, "DELETE FROM sqlite_sequence WHERE name IN ('clients_new', 'work_entries_new')");
+    await query.run(tx, "UPDATE sqlite_sequence SET name = name || '_new' WHERE name IN ('clients', 'work_entries')");
+
+    // Dropping work_entries takes its rollup triggers and indexes with it
+    for (const table of ['client_hour_totals', 'work_entry_daily', 'work_entries', 'clients', 'users']) {
+      await query.run(tx, `DROP TABLE IF EXISTS ${table}`);
+    }
+    for (const table of ['users', 'clients', 'work_entries']) {
+      await query.run(tx, `ALTER TABLE ${table}_new RENAME TO ${table}`);
+    }
+
+    await query.run(tx, `
+      CREATE TABLE client_hour_totals (
+        user_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        total_hours REAL NOT NULL DEFAULT 0,
+        entry_count INTEGER NOT NULL DEFAULT 0,
+        first_date DATE,
+        last_date DATE,
+        PRIMARY KEY (user_id, client_id)
+      ) WITHOUT ROWID
+    `);
+    await query.run(tx, `
+      CREATE TABLE work_entry_daily (
+        user_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        hours REAL NOT NULL DEFAULT 0,
+        entries INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, client_id, day)
+      ) WITHOUT ROWID
+    `);
+
+    const triggers = {
+      work_entries_totals_insert: `AFTER INSERT ON work_entries BEGIN ${TOTALS_ADD_ENTRY}`,
+      work_entries_totals_delete: `AFTER DELETE ON work_entries BEGIN ${TOTALS_REMOVE_ENTRY}`,
+      work_entries_totals_update: `AFTER UPDATE OF client_id, user_id, hours, date ON work_entries
+        BEGIN ${TOTALS_REMOVE_ENTRY} ${TOTALS_ADD_ENTRY}`,
+      work_entries_daily_insert: `AFTER INSERT ON work_entries BEGIN ${DAILY_ADD_ENTRY}`,
+      work_entries_daily_delete: `AFTER DELETE ON work_entries BEGIN ${DAILY_REMOVE_ENTRY}`,
+      work_entries_daily_update: `AFTER UPDATE OF client_id, user_id, hours, date ON work_entries
+        BEGIN ${DAILY_REMOVE_ENTRY} ${DAILY_ADD_ENTRY}`
+    };
+    for (const [name, body] of Object.entries(triggers)) {
+      await query.run(tx, `CREATE TRIGGER ${name} ${body}\n      END`);
+    }
+
+    await query.run(tx, `
+      INSERT INTO client_hour_totals (user_id, client_id, total_hours, entry_count, first_date, last_date)
+      SELECT user_id, client_id, ROUND(SUM(hours), 2), COUNT(*), MIN(date), MAX(date)
+      FROM work_entries
+      GROUP BY user_id, client_id
+    `);
+    await query.run(tx, `
+      INSERT INTO work_entry_daily (user_id, client_id, day, hours, entries)
+      SELECT user_id, client_id, date, ROUND(SUM(hours), 2), COUNT(*)
+      FROM work_entries
+      GROUP BY user_id, client_id, date
+    `);
+  },
+
+  indexes: [
+    // listClients, deleteAllClients
+    {
+      name: 'idx_clients_user_id_name',
+      table: 'clients',
+      columns: ['user_id', 'name']
+    },
+    // listWorkEntries (ORDER BY date DESC, created_at DESC)
+    {
+      name: 'idx_work_entries_user_id_date',
+      table: 'work_entries',
+      columns: ['user_id', 'date', 'created_at']
+    },
+    // listWorkEntriesForClient, reportEntries, exportEntries
+    {
+      name: 'idx_work_entries_client_user_id_date',
+      table: 'work_entries',
+      columns: ['client_id', 'user_id', 'date', 'created_at']
+    },
+    // All-client series: covering, so a period reads only the index
+    {
+      name: 'idx_work_entry_daily_user_id_day',
+      table: 'work_entry_daily',
+      columns: ['user_id', 'day', 'hours', 'entries']
+    }
+  ],
+
+  // The email-keyed indexes went with the old tables; never build them again
+  dropIndexes: [
+    'idx_clients_user_email_name',
+    'idx_work_entries_user_date',
+    'idx_work_entries_client_user_date',
+    'idx_work_entry_daily_user_day'
+  ]
+};
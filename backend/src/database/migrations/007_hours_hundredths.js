@@ -0,0 +1,135 @@
+const query = require('../query');
+
+// DECIMAL(5,2) has REAL affinity, so hours were binary floats and every sum
+// needed ROUND(..., 2) to hide the drift. Store whole hundredths of an hour
+// instead: sums are exact integer arithmetic, and statements divide by 100.0
+// only in the columns they return.
+//
+// The rollup tables are derived data, so they are recreated with integer
+// columns and backfilled rather than converted in place.
+const TOTALS_ADD_ENTRY = `
+  INSERT INTO client_hour_totals (user_id, client_id, total_hundredths, entry_count, first_date, last_date)
+  VALUES (NEW.user_id, NEW.client_id, NEW.hundredths, 1, NEW.date, NEW.date)
+  ON CONFLICT (user_id, client_id) DO UPDATE SET
+    total_hundredths = total_hundredths + excluded.total_hundredths,
+    entry_count = entry_count + 1,
+    first_date = MIN(first_date, excluded.first_date),
+    last_date = MAX(last_date, excluded.last_date);`;
+
+const TOTALS_REMOVE_ENTRY = `
+  UPDATE client_hour_totals SET
+    total_hundredths = total_hundredths - OLD.hundredths,
+    entry_count = entry_count - 1,
+    first_date = CASE WHEN OLD.date = first_date THEN (
+      SELECT MIN(date) FROM work_entries WHERE client_id = OLD.client_id AND user_id = OLD.user_id
+    ) ELSE first_date END,
+    last_date = CASE WHEN OLD.date = last_date THEN (
+      SELECT MAX(date) FROM work_entries WHERE client_id = OLD.client_id AND user_id = OLD.user_id
+    ) ELSE last_date END
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id;
+  DELETE FROM client_hour_totals
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND entry_count <= 0;`;
+
+const DAILY_ADD_ENTRY = `
+  INSERT INTO work_entry_daily (user_id, client_id, day, hundredths, entries)
+  VALUES (NEW.user_id, NEW.client_id, NEW.date, NEW.hundredths, 1)
+  ON CONFLICT (user_id, client_id, day) DO UPDATE SET
+    hundredths = hundredths + excluded.hundredths,
+    entries = entries + 1;`;
+
+const DAILY_REMOVE_ENTRY = `
+  UPDATE work_entry_daily SET
+    hundredths = hundredths - OLD.hundredths,
+    entries = entries - 1
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND day = OLD.date;
+  DELETE FROM work_entry_daily
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND day = OLD.date AND entries <= 0;`;
+
+const TRIGGERS = [
+  'work_entries_totals_insert',
+  'work_entries_totals_delete',
+  'work_entries_totals_update',
+  'work_entries_daily_insert',
+  'work_entries_daily_delete',
+  'work_entries_daily_update'
+];
+
+module.exports = {
+  version: 7,
+  name: 'hours_hundredths',
+
+  async up(tx) {
+    // The triggers read work_entries.hours, which cannot be dropped while
+    // anything still refers to it
+    for (const name of TRIGGERS) {
+      await query.run(tx, `DROP TRIGGER IF EXISTS ${name}`);
+    }
+    await query.run(tx, 'DROP TABLE IF EXISTS client_hour_totals');
+    await query.run(tx, 'DROP TABLE IF EXISTS work_entry_daily');
+
+    await query.run(tx, 'ALTER TABLE work_entries ADD COLUMN hundredths INTEGER NOT NULL DEFAULT 0');
+    await query.run(tx, 'UPDATE work_entries SET hundredths = CAST(ROUND(hours * 100) AS INTEGER)');
+    await query.run(tx, 'ALTER TABLE work_entries DROP COLUMN hours');
+
+    await query.run(tx, `
+      CREATE TABLE client_hour_totals (
+        user_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        total_hundredths INTEGER NOT NULL DEFAULT 0,
+        entry_count INTEGER NOT NULL DEFAULT 0,
+        first_date DATE,
+        last_date DATE,
+        PRIMARY KEY (user_id, client_id)
+      ) WITHOUT ROWID
+    `);
+    await query.run(tx, `
+      CREATE TABLE work_entry_daily (
+        user_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        hundredths INTEGER NOT NULL DEFAULT 0,
+        entries INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, client_id, day)
+      ) WITHOUT ROWID
+    `);
+
+    const bodies = [
+      `AFTER INSERT ON work_entries BEGIN ${TOTALS_ADD_ENTRY}`,
+      `AFTER DELETE ON work_entries BEGIN ${TOTALS_REMOVE_ENTRY}`,
+      `AFTER UPDATE OF client_id, user_id, hundredths, date ON work_entries
+        BEGIN ${TOTALS_REMOVE_ENTRY} ${TOTALS_ADD_ENTRY}`,
+      `AFTER INSERT ON work_entries BEGIN ${DAILY_ADD_ENTRY}`,
+      `AFTER DELETE ON work_entries BEGIN ${DAILY_REMOVE_ENTRY}`,
+      `AFTER UPDATE OF client_id, user_id, hundredths, date ON work_entries
+        BEGIN ${DAILY_REMOVE_ENTRY} ${DAILY_ADD_ENTRY}`
+    ];
+    for (const [index, name] of TRIGGERS.entries()) {
+      await query.run(tx, `CREATE TRIGGER ${name} ${bodies[index]}\n      END`);
+    }
+
+    await query.run(tx, `
+      INSERT INTO client_hour_totals (user_id, client_id, total_hundredths, entry_count, first_date, last_date)
+      SELECT user_id, client_id, SUM(hundredths), COUNT(*), MIN(date), MAX(date)
+      FROM work_entries
+      GROUP BY user_id, client_id
+    `);
+    await query.run(tx, `
+      INSERT INTO work_entry_daily (user_id, client_id, day, hundredths, entries)
+      SELECT user_id, client_id, date, SUM(hundredths), COUNT(*)
+      FROM work_entries
+      GROUP BY user_id, client_id, date
+    `);
+  },
+
+  indexes: [
+    // All-client series: covering, so a period reads only the index
+    {
+      name: 'idx_work_entry_daily_user_id_day_hundredths',
+      table: 'work_entry_daily',
+      columns: ['user_id', 'day', 'hundredths', 'entries']
+    }
+  ],
+
+  // Covered work_entry_daily.hours, which no longer exists
+  dropIndexes: ['idx_work_entry_daily_user_id_day']
+};
@@ -0,0 +1,144 @@
+const query = require('../query');
+
+// work_entries.date was a DATE column (text or, before migration 5, epoch
+// milliseconds), so its indexes compared strings and range filters could
+// not lean on them cleanly. Replace it with `day`, whole days since
+// 1970-01-01, and key the rollups on the same integer. Statements format it
+// back to YYYY-MM-DD in the columns they return.
+const TOTALS_ADD_ENTRY = `
+  INSERT INTO client_hour_totals (user_id, client_id, total_hundredths, entry_count, first_day, last_day)
+  VALUES (NEW.user_id, NEW.client_id, NEW.hundredths, 1, NEW.day, NEW.day)
+  ON CONFLICT (user_id, client_id) DO UPDATE SET
+    total_hundredths = total_hundredths + excluded.total_hundredths,
+    entry_count = entry_count + 1,
+    first_day = MIN(first_day, excluded.first_day),
+    last_day = MAX(last_day, excluded.last_day);`;
+
+const TOTALS_REMOVE_ENTRY = `
+  UPDATE client_hour_totals SET
+    total_hundredths = total_hundredths - OLD.hundredths,
+    entry_count = entry_count - 1,
+    first_day = CASE WHEN OLD.day = first_day THEN (
+      SELECT MIN(day) FROM work_entries WHERE client_id = OLD.client_id AND user_id = OLD.user_id
+    ) ELSE first_day END,
+    last_day = CASE WHEN OLD.day = last_day THEN (
+      SELECT MAX(day) FROM work_entries WHERE client_id = OLD.client_id AND user_id = OLD.user_id
+    ) ELSE last_day END
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id;
+  DELETE FROM client_hour_totals
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND entry_count <= 0;`;
+
+const DAILY_ADD_ENTRY = `
+  INSERT INTO work_entry_daily (user_id, client_id, day, hundredths, entries)
+  VALUES (NEW.user_id, NEW.client_id, NEW.day, NEW.hundredths, 1)
+  ON CONFLICT (user_id, client_id, day) DO UPDATE SET
+    hundredths = hundredths + excluded.hundredths,
+    entries = entries + 1;`;
+
+const DAILY_REMOVE_ENTRY = `
+  UPDATE work_entry_daily SET
+    hundredths = hundredths - OLD.hundredths,
+    entries = entries - 1
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND day = OLD.day;
+  DELETE FROM work_entry_daily
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND day = OLD.day AND entries <= 0;`;
+
+const TRIGGERS = [
+  'work_entries_totals_insert',
+  'work_entries_totals_delete',
+  'work_entries_totals_update',
+  'work_entries_daily_insert',
+  'work_entries_daily_delete',
+  'work_entries_daily_update'
+];
+
+module.exports = {
+  version: 8,
+  name: 'integer_days',
+
+  async up(tx) {
+    // Nothing may refer to work_entries.date when it is dropped
+    for (const name of TRIGGERS) {
+      await query.run(tx, `DROP TRIGGER IF EXISTS ${name}`);
+    }
+    await query.run(tx, 'DROP INDEX IF EXISTS idx_work_entries_user_id_date');
+    await query.run(tx, 'DROP INDEX IF EXISTS idx_work_entries_client_user_id_date');
+    await query.run(tx, 'DROP TABLE IF EXISTS client_hour_totals');
+    await query.run(tx, 'DROP TABLE IF EXISTS work_entry_daily');
+
+    await query.run(tx, 'ALTER TABLE work_entries ADD COLUMN day INTEGER NOT NULL DEFAULT 0');
+    await query.run(tx, 'UPDATE work_entries SET day = CAST(julianday(date(date)) - 2440587.5 AS INTEGER)');
+    await query.run(tx, 'ALTER TABLE work_entries DROP COLUMN date');
+
+    await query.run(tx, `
+      CREATE TABLE client_hour_totals (
+        user_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        total_hundredths INTEGER NOT NULL DEFAULT 0,
+        entry_count INTEGER NOT NULL DEFAULT 0,
+        first_day INTEGER,
+        last_day INTEGER,
+        PRIMARY KEY (user_id, client_id)
+      ) WITHOUT ROWID
+    `);
+    await query.run(tx, `
+      CREATE TABLE work_entry_daily (
+        user_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        hundredths INTEGER NOT NULL DEFAULT 0,
+        entries INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, client_id, day)
+      ) WITHOUT ROWID
+    `);
+
+    const bodies = [
+      `AFTER INSERT ON work_entries BEGIN ${TOTALS_ADD_ENTRY}`,
+      `AFTER DELETE ON work_entries BEGIN ${TOTALS_REMOVE_ENTRY}`,
+      `AFTER UPDATE OF client_id, user_id, hundredths, day ON work_entries
+        BEGIN ${TOTALS_REMOVE_ENTRY} ${TOTALS_ADD_ENTRY}`,
+      `AFTER INSERT ON work_entries BEGIN ${DAILY_ADD_ENTRY}`,
+      `AFTER DELETE ON work_entries BEGIN ${DAILY_REMOVE_ENTRY}`,
+      `AFTER UPDATE OF client_id, user_id, hundredths, day ON work_entries
+        BEGIN ${DAILY_REMOVE_ENTRY} ${DAILY_ADD_ENTRY}`
+    ];
+    for (const [index, name] of TRIGGERS.entries()) {
+      await query.run(tx, `CREATE TRIGGER ${name} ${bodies[index]}\n      END`);
+    }
+
+    await query.run(tx, `
+      INSERT INTO client_hour_totals (user_id, client_id, total_hundredths, entry_count, first_day, last_day)
+      SELECT user_id, client_id, SUM(hundredths), COUNT(*), MIN(day), MAX(day)
+      FROM work_entries
+      GROUP BY user_id, client_id
+    `);
+    await query.run(tx, `
+      INSERT INTO work_entry_daily (user_id, client_id, day, hundredths, entries)
+      SELECT user_id, client_id, day, SUM(hundredths), COUNT(*)
+      FROM work_entries
+      GROUP BY user_id, client_id, day
+    `);
+  },
+
+  indexes: [
+    // listWorkEntries (day range, ORDER BY day DESC, created_at DESC)
+    {
+      name: 'idx_work_entries_user_day',
+      table: 'work_entries',
+      columns: ['user_id', 'day', 'created_at']
+    },
+    // listWorkEntriesForClient, reportEntries, exportEntries
+    {
+      name: 'idx_work_entries_client_user_day',
+      table: 'work_entries',
+      columns: ['client_id', 'user_id', 'day', 'created_at']
+    }
+  ],
+
+  // Built on the dropped date column. The daily rollup's covering index
+  // (migration 7) is rebuilt on the recreated table as it is.
+  dropIndexes: [
+    'idx_work_entries_user_id_date',
+    'idx_work_entries_client_user_id_date'
+  ]
+};
@@ -0,0 +1,68 @@
+const query = require('../query');
+
+// Prepares the rollups for an attached archive database (see archive.js).
+// Moving an entry to the archive deletes it from work_entries, but its hours
+// must stay in the rollups, so the delete triggers skip rows deleted while
+// work_entries_archiving holds a row (only ever inside the archive job's own
+// transaction). client_hour_totals drops first_day/last_day: they could only
+// be recomputed from the hot entries, and are now read from work_entry_daily,
+// which keeps every day. Deleting a client clears its rollup rows outright,
+// since archived entries are not removed by the ON DELETE CASCADE.
+const TOTALS_ADD_ENTRY = `
+  INSERT INTO client_hour_totals (user_id, client_id, total_hundredths, entry_count)
+  VALUES (NEW.user_id, NEW.client_id, NEW.hundredths, 1)
+  ON CONFLICT (user_id, client_id) DO UPDATE SET
+    total_hundredths = total_hundredths + excluded.total_hundredths,
+    entry_count = entry_count + 1;`;
+
+const TOTALS_REMOVE_ENTRY = `
+  UPDATE client_hour_totals SET
+    total_hundredths = total_hundredths - OLD.hundredths,
+    entry_count = entry_count - 1
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id;
+  DELETE FROM client_hour_totals
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND entry_count <= 0;`;
+
+const DAILY_REMOVE_ENTRY = `
+  UPDATE work_entry_daily SET
+    hundredths = hundredths - OLD.hundredths,
+    entries = entries - 1
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND day = OLD.day;
+  DELETE FROM work_entry_daily
+  WHERE user_id = OLD.user_id AND client_id = OLD.client_id AND day = OLD.day AND entries <= 0;`;
+
+const NOT_ARCHIVING = 'WHEN NOT EXISTS (SELECT 1 FROM work_entries_archiving)';
+
+const TRIGGERS = {
+  work_entries_totals_insert: `AFTER INSERT ON work_entries BEGIN ${TOTALS_ADD_ENTRY}`,
+  work_entries_totals_delete: `AFTER DELETE ON work_entries ${NOT_ARCHIVING} BEGIN ${TOTALS_REMOVE_ENTRY}`,
+  work_entries_totals_update: `AFTER UPDATE OF client_id, user_id, hundredths ON work_entries
+    BEGIN ${TOTALS_REMOVE_ENTRY} ${TOTALS_ADD_ENTRY}`,
+  work_entries_daily_delete: `AFTER DELETE ON work_entries ${NOT_ARCHIVING} BEGIN ${DAILY_REMOVE_ENTRY}`,
+  clients_rollups_delete: `AFTER DELETE ON clients BEGIN
+    DELETE FROM client_hour_totals WHERE user_id = OLD.user_id AND client_id = OLD.id;
+    DELETE FROM work_entry_daily WHERE user_id = OLD.user_id AND client_id = OLD.id;`
+};
+
+module.exports = {
+  version: 9,
+  name: 'archive_moves',
+
+  async up(tx) {
+    await query.run(tx, `
+      CREATE TABLE IF NOT EXISTS work_entries_archiving (
+        started_at DATETIME DEFAULT CURRENT_TIMESTAMP
+      )
+    `);
+
+    for (const name of Object.keys(TRIGGERS)) {
+      await query.run(tx, `DROP TRIGGER IF EXISTS ${name}`);
+    }
+    await query.run(tx, 'ALTER TABLE client_hour_totals DROP COLUMN first_day');
+    await query.run(tx, 'ALTER TABLE client_hour_totals DROP COLUMN last_day');
+
+    for (const [name, body] of Object.entries(TRIGGERS)) {
+      await query.run(tx, `CREATE TRIGGER ${name} ${body}\n      END`);
+    }
+  }
+};
@@ -0,0 +1,81 @@
+const query = require('../query');
+
+// FTS5 indexes over entry descriptions and client names/descriptions. They
+// are external-content tables: the text lives only in work_entries and
+// clients, read back through a view that adds an `owner` token ('u' || user
+// id). Searches AND that token into the match, so FTS5 intersects doclists
+// and only ranks the user's own rows. Triggers keep the indexes in sync;
+// moving an entry to the archive deletes it from work_entries, and so from
+// the index too.
+const VIEWS = {
+  work_entries_search: "SELECT id, description, 'u' || user_id AS owner FROM work_entries",
+  clients_search: "SELECT id, name, description, 'u' || user_id AS owner FROM clients"
+};
+
+const TABLES = {
+  work_entries_fts: {
+    columns: ['description', 'owner'],
+    content: 'work_entries_search',
+    // Matches on the owner token must not affect the ranking
+    rank: 'bm25(1.0, 0.0)'
+  },
+  clients_fts: {
+    columns: ['name', 'description', 'owner'],
+    content: 'clients_search',
+    rank: 'bm25(10.0, 1.0, 0.0)'
+  }
+};
+
+const TRIGGERS = {
+  work_entries_fts_insert: `AFTER INSERT ON work_entries BEGIN
+    INSERT INTO work_entries_fts (rowid, description, owner)
+    VALUES (NEW.id, NEW.description, 'u' || NEW.user_id);`,
+  work_entries_fts_delete: `AFTER DELETE ON work_entries BEGIN
+    INSERT INTO work_entries_fts (work_entries_fts, rowid, description, owner)
+    VALUES ('delete', OLD.id, OLD.description, 'u' || OLD.user_id);`,
+  work_entries_fts_update: `AFTER UPDATE OF description, user_id ON work_entries BEGIN
+    INSERT INTO work_entries_fts (work_entries_fts, rowid, description, owner)
+    VALUES ('delete', OLD.id, OLD.description, 'u' || OLD.user_id);
+    INSERT INTO work_entries_fts (rowid, description, owner)
+    VALUES (NEW.id, NEW.description, 'u' || NEW.user_id);`,
+  clients_fts_insert: `AFTER INSERT ON clients BEGIN
+    INSERT INTO clients_fts (rowid, name, description, owner)
+    VALUES (NEW.id, NEW.name, NEW.description, 'u' || NEW.user_id);`,
+  clients_fts_delete: `AFTER DELETE ON clients BEGIN
+    INSERT INTO clients_fts (clients_fts, rowid, name, description, owner)
+    VALUES ('delete', OLD.id, OLD.name, OLD.description, 'u' || OLD.user_id);`,
+  clients_fts_update: `AFTER UPDATE OF name, description, user_id ON clients BEGIN
+    INSERT INTO clients_fts (clients_fts, rowid, name, description, owner)
+    VALUES ('delete', OLD.id, OLD.name, OLD.description, 'u' || OLD.user_id);
+    INSERT INTO clients_fts (rowid, name, description, owner)
+    VALUES (NEW.id, NEW.name, NEW.description, 'u' || NEW.user_id);`
+};
+
+module.exports = {
+  version: 10,
+  name: 'full_text_search',
+
+  async up(tx) {
+    for (const [name, select] of Object.entries(VIEWS)) {
+      await query.run(tx, `CREATE VIEW ${name} AS ${select}`);
+    }
+
+    for (const [name, { columns, content, rank }] of Object.entries(TABLES)) {
+      await query.run(tx, `
+        CREATE VIRTUAL TABLE ${name} USING fts5(
+          ${columns.join(', ')},
+          content = '${content}',
+          content_rowid = 'id',
+          tokenize = 'unicode61 remove_diacritics 2'
+        )
+      `);
+      await query.run(tx, `INSERT INTO ${name} (${name}, rank) VALUES ('rank', '${rank}')`);
+      // Index the rows that already exist
+      await query.run(tx, `INSERT INTO ${name} (${name}) VALUES ('rebuild')`);
+    }
+
+    for (const [name, body] of Object.entries(TRIGGERS)) {
+      await query.run(tx, `CREATE TRIGGER ${name} ${body}\n      END`);
+    }
+  }
+};
@@ -0,0 +1,14 @@
+// Ordered list of schema migrations. Add new files with the next version
+// number; never edit a migration once it has shipped.
+module.exports = [
+  require('./001_initial_schema'),
+  require('./002_client_contact_columns'),
+  require('./003_composite_indexes'),
+  require('./004_client_hour_totals'),
+  require('./005_work_entry_daily'),
+  require('./006_integer_user_ids'),
+  require('./007_hours_hundredths'),
+  require('./008_integer_days'),
+  require('./009_archive_moves'),
+  require('./010_full_text_search')
+];
@@ -0,0 +1,114 @@
+// Named PRAGMA profiles applied to every connection at open. They differ in
+// how much durability is given up for write throughput:
+//   durable    - every COMMIT is fsynced (synchronous = FULL)
+//   balanced   - WAL + synchronous = NORMAL: a crash of the process loses
+//                nothing, a power loss can drop the last few commits
+//   throughput - synchronous = OFF: the OS decides when data reaches disk
+// Any single pragma can be overridden with DB_PRAGMA_<NAME>, e.g.
+// DB_PRAGMA_SYNCHRONOUS=FULL on top of DB_PRAGMA_PROFILE=throughput.
+// New databases get auto_vacuum = INCREMENTAL so that idle-time maintenance
+// (maintenance.js) can return free pages; an existing file keeps its mode
+// until it is VACUUMed.
+const PROFILES = {
+  durable: {
+    journal_mode: 'WAL',
+    synchronous: 'FULL',
+    cache_size: -32000,
+    mmap_size: 0,
+    temp_store: 'DEFAULT',
+    busy_timeout: 5000,
+    foreign_keys: 'ON',
+    auto_vacuum: 'INCREMENTAL'
+  },
+  balanced: {
+    journal_mode: 'WAL',
+    synchronous: 'NORMAL',
+    cache_size: -64000,
+    mmap_size: 268435456,
+    temp_store: 'MEMORY',
+    busy_timeout: 5000,
+    foreign_keys: 'ON',
+    auto_vacuum: 'INCREMENTAL'
+  },
+  throughput: {
+    journal_mode: 'WAL',
+    synchronous: 'OFF',
+    cache_size: -256000,
+    mmap_size: 1073741824,
+    temp_store: 'MEMORY',
+    busy_timeout: 5000,
+    foreign_keys: 'ON',
+    auto_vacuum: 'INCREMENTAL'
+  }
+};
+
+const DEFAULT_PROFILE = 'durable';
+const PRAGMA_NAMES = Object.keys(PROFILES[DEFAULT_PROFILE]);
+
+// Read-only pool connections cannot change the journal mode or vacuum mode
+// (properties of the database file, set by the writer)
+const WRITER_ONLY = new Set(['journal_mode', 'auto_vacuum']);
+
+// Set before anything else: auto_vacuum only takes effect on an empty
+// file, and switching the file to WAL writes its first page
+const FIRST = ['auto_vacuum'];
+
+// PRAGMA values cannot be bound as parameters, so only plain keywords and
+// integers are accepted from the environment
+const VALUE_PATTERN = /^(-?\d+|[A-Za-z]+)$/;
+
+// SQLite reports these as integers; map them back to their keywords
+const KEYWORDS = {
+  synchronous: ['OFF', 'NORMAL', 'FULL', 'EXTRA'],
+  temp_store: ['DEFAULT', 'FILE', 'MEMORY'],
+  foreign_keys: ['OFF', 'ON'],
+  auto_vacuum: ['NONE', 'FULL', 'INCREMENTAL']
+};
+
+function resolvePragmas(env = process.env) {
+  const profile = env.DB_PRAGMA_PROFILE || DEFAULT_PROFILE;
+  if (!PROFILES[profile]) {
+    throw new Error(
+      `Unknown DB_PRAGMA_PROFILE "${profile}" (expected ${Object.keys(PROFILES).join(', ')})`
+    );
+  }
+
+  const pragmas = { ...PROFILES[profile] };
+  for (const name of PRAGMA_NAMES) {
+    const override = env[`DB_PRAGMA_${name.toUpperCase()}`];
+    if (override === undefined || override === '') {
+      continue;
+    }
+    if (!VALUE_PATTERN.test(override)) {
+      throw new Error(`Invalid value for DB_PRAGMA_${name.toUpperCase()}: "${override}"`);
+    }
+    pragmas[name] = override;
+  }
+
+  return { profile, pragmas };
+}
+
+function pragmaStatements(pragmas, { readOnly = false } = {}) {
+  return Object.entries(pragmas)
+    .filter(([name]) => !(readOnly && WRITER_ONLY.has(name)))
+    .sort(([a], [b]) => FIRST.indexOf(b) - FIRST.indexOf(a))
+    .map(([name, value]) => `PRAGMA ${name} = ${value}`);
+}
+
+// Effective values as reported by SQLite, e.g. "synchronous=FULL"
+function describePragmas(effective) {
+  return Object.entries(effective)
+    .map(([name, value]) => {
+      const keyword = KEYWORDS[name] && KEYWORDS[name][value];
+      return `${name}=${keyword || value}`;
+    })
+    .join(' ');
+}
+
+module.exports = {
+  PROFILES,
+  DEFAULT_PROFILE,
+  resolvePragmas,
+  pragmaStatements,
+  describePragmas
+};
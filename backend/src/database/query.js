@@ -0,0 +1,50 @@
+// Promise wrappers around the callback-style sqlite3 API. They work with any
+// object exposing get/all/run: a raw connection, the connection manager or a
+// transaction handle.
+function get(db, sql, params = []) {
+  return new Promise((resolve, reject) => {
+    db.get(sql, params, (err, row) => (err ? reject(err) : resolve(row)));
+  });
+}
+
+function all(db, sql, params = []) {
+  return new Promise((resolve, reject) => {
+    db.all(sql, params, (err, rows) => (err ? reject(err) : resolve(rows)));
+  });
+}
+
+function run(db, sql, params = []) {
+  return new Promise((resolve, reject) => {
+    db.run(sql, params, function(err) {
+      if (err) {
+        return reject(err);
+      }
+      resolve({ lastID: this.lastID, changes: this.changes });
+    });
+  });
+}
+
+// Rows as a JSON array in a Buffer. Connection managers on the worker pool
+// hand back the workers' encoding untouched; anything else is stringified.
+function allJson(db, sql, params = []) {
+  if (typeof db.allJson === 'function') {
+    return db.allJson(sql, params);
+  }
+  return all(db, sql, params).then((rows) => Buffer.from(JSON.stringify(rows)));
+}
+
+// JSON object body made of `fields` plus `key` set to the pre-encoded
+// `json`, e.g. withJson({}, 'workEntries', rows) -> {"workEntries":[...]}
+function withJson(fields, key, json) {
+  const head = JSON.stringify(fields).slice(0, -1);
+  const separator = head.length > 1 ? ',' : '';
+  return Buffer.concat([Buffer.from(`${head}${separator}${JSON.stringify(key)}:`), json, Buffer.from('}')]);
+}
+
+module.exports = {
+  get,
+  all,
+  allJson,
+  withJson,
+  run
+};
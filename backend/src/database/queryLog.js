@@ -0,0 +1,176 @@
+const fs = require('fs');
+
+const DEFAULT_THRESHOLD_MS = 100;
+// Percentiles are computed over each statement's most recent samples
+const SAMPLES_PER_STATEMENT = 512;
+// Dynamic SQL should normalise to a handful of shapes; anything past this
+// many distinct statements is counted under OTHER
+const MAX_STATEMENTS = 500;
+const OTHER = '(other)';
+const RECENT_SLOW_ENTRIES = 50;
+// A plan rarely changes, so a statement that is slow every time is only
+// explained again after this long
+const EXPLAIN_INTERVAL_MS = 60000;
+const EXPLAINABLE = /^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b/i;
+
+// Collapses whitespace and replaces literals with ?, so the same statement
+// with different values (e.g. PRAGMA user_version = 5) lands in one bucket
+function normalizeSql(sql) {
+  return String(sql)
+    .replace(/'(?:[^']|'')*'/g, '?')
+    .replace(/\b\d+(?:\.\d+)?\b/g, '?')
+    .replace(/\s+/g, ' ')
+    .trim();
+}
+
+function typeOf(value) {
+  if (value === null || value === undefined) return 'null';
+  if (value instanceof Date) return 'date';
+  if (Buffer.isBuffer(value)) return 'blob';
+  return typeof value;
+}
+
+// Types of the bound parameters, never their values
+function paramShape(params) {
+  if (Array.isArray(params)) {
+    return params.map(typeOf);
+  }
+  if (params && typeof params === 'object') {
+    return Object.fromEntries(Object.entries(params).map(([name, value]) => [name, typeOf(value)]));
+  }
+  return [];
+}
+
+function percentile(sorted, p) {
+  if (!sorted.length) return 0;
+  return sorted[Math.min(sorted.length - 1, Math.ceil(sorted.length * p) - 1)];
+}
+
+function round(ms) {
+  return Math.round(ms * 100) / 100;
+}
+
+// Times every statement, bucketed by normalised SQL, and writes statements
+// slower than `thresholdMs` to the slow log (JSON lines appended to
+// `logFile`, or console.warn without one) with their parameter shape and
+// EXPLAIN QUERY PLAN output.
+function createQueryLog({ thresholdMs = DEFAULT_THRESHOLD_MS, logFile = null } = {}) {
+  const buckets = new Map();
+  const recentSlow = [];
+
+  function bucketFor(sql) {
+    let key = normalizeSql(sql);
+    if (!buckets.has(key) && buckets.size >= MAX_STATEMENTS) {
+      key = OTHER;
+    }
+
+    let bucket = buckets.get(key);
+    if (!bucket) {
+      bucket = {
+        sql: key,
+        count: 0,
+        errors: 0,
+        slow: 0,
+        totalMs: 0,
+        maxMs: 0,
+        samples: new Float64Array(SAMPLES_PER_STATEMENT),
+        next: 0,
+        plan: null,
+        explainedAt: 0
+      };
+      buckets.set(key, bucket);
+    }
+    return bucket;
+  }
+
+  function writeSlowEntry(entry) {
+    recentSlow.push(entry);
+    if (recentSlow.length > RECENT_SLOW_ENTRIES) recentSlow.shift();
+
+    if (logFile) {
+      fs.appendFile(logFile, `${JSON.stringify(entry)}\n`, (err) => {
+        if (err) console.error('Error writing slow query log:', err);
+      });
+    } else {
+      const plan = entry.plan ? ` | plan: ${entry.plan.join('; ')}` : '';
+      console.warn(`Slow query (${entry.durationMs}ms): ${entry.sql} | params: ${JSON.stringify(entry.params)}${plan}`);
+    }
+  }
+
+  // `explain(sql, params)` resolves to EXPLAIN QUERY PLAN rows for the
+  // statement; it runs at most once per statement per EXPLAIN_INTERVAL_MS
+  function logSlow(bucket, sql, params, durationMs, explain) {
+    const entry = {
+      at: new Date().toISOString(),
+      sql: bucket.sql,
+      params: paramShape(params),
+      durationMs
+    };
+
+    const now = Date.now();
+    if (!explain || !EXPLAINABLE.test(sql) || now - bucket.explainedAt < EXPLAIN_INTERVAL_MS) {
+      writeSlowEntry({ ...entry, plan: bucket.plan });
+      return;
+    }
+
+    bucket.explainedAt = now;
+    explain(sql, params)
+      .then((rows) => {
+        bucket.plan = rows.map((row) => row.detail);
+      })
+      .catch(() => {})
+      .then(() => writeSlowEntry({ ...entry, plan: bucket.plan }));
+  }
+
+  return {
+    thresholdMs,
+
+    record(sql, params, durationMs, { failed = false, explain } = {}) {
+      const bucket = bucketFor(sql);
+      bucket.count++;
+      bucket.totalMs += durationMs;
+      if (durationMs > bucket.maxMs) bucket.maxMs = durationMs;
+      if (failed) bucket.errors++;
+      bucket.samples[bucket.next] = durationMs;
+      bucket.next = (bucket.next + 1) % SAMPLES_PER_STATEMENT;
+
+      if (durationMs >= thresholdMs) {
+        bucket.slow++;
+        logSlow(bucket, sql, params, round(durationMs), explain);
+      }
+    },
+
+    // Statements by total time spent, slowest first
+    getReport() {
+      const statements = [...buckets.values()].map((bucket) => {
+        const filled = Math.min(bucket.count, SAMPLES_PER_STATEMENT);
+        const sorted = Array.from(bucket.samples.subarray(0, filled)).sort((a, b) => a - b);
+        return {
+          sql: bucket.sql,
+          count: bucket.count,
+          errors: bucket.errors,
+          slow: bucket.slow,
+          totalMs: round(bucket.totalMs),
+          p50Ms: round(percentile(sorted, 0.5)),
+          p95Ms: round(percentile(sorted, 0.95)),
+          maxMs: round(bucket.maxMs),
+          plan: bucket.plan
+        };
+      });
+      statements.sort((a, b) => b.totalMs - a.totalMs);
+
+      return { thresholdMs, statements, recentSlow: [...recentSlow] };
+    },
+
+    reset() {
+      buckets.clear();
+      recentSlow.length = 0;
+    }
+  };
+}
+
+module.exports = {
+  createQueryLog,
+  normalizeSql,
+  paramShape
+};
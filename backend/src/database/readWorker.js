@@ -0,0 +1,63 @@
+// Runs inside a worker thread started by workerPool.js. Holds one read-only
+// connection and answers { id, method, sql, params } messages. get() replies
+// with the row; all() replies with the rows JSON-encoded in batches, each
+// posted as a transferable buffer so the main thread never builds the rows.
+const { parentPort, workerData } = require('worker_threads');
+const sqlite3 = require('sqlite3').verbose();
+const { createStatementRegistry } = require('./statements');
+
+const { filename, pragmas, rowsPerBatch } = workerData;
+const encoder = new TextEncoder();
+const statements = createStatementRegistry();
+
+const connection = new sqlite3.Database(filename, sqlite3.OPEN_READONLY, (err) => {
+  if (err) {
+    // Surfaces as the worker's 'error' event, which fails pending reads
+    throw err;
+  }
+});
+
+connection.serialize(() => {
+  for (const sql of pragmas) {
+    connection.run(sql);
+  }
+});
+
+function serializeError(err) {
+  return { message: err.message, code: err.code, errno: err.errno };
+}
+
+// Named statements reuse this thread's prepared-statement cache
+function execute(method, sql, params, callback) {
+  if (!statements.execute(connection, method, sql, [params, callback])) {
+    connection[method](sql, params, callback);
+  }
+}
+
+function postRows(id, rows) {
+  for (let start = 0; start < rows.length; start += rowsPerBatch) {
+    // Elements only; the pool adds the brackets and separators
+    const json = JSON.stringify(rows.slice(start, start + rowsPerBatch)).slice(1, -1);
+    const chunk = encoder.encode(json);
+    parentPort.postMessage({ id, chunk }, [chunk.buffer]);
+  }
+  parentPort.postMessage({ id, done: true, rows: rows.length });
+}
+
+parentPort.on('message', ({ id, method, sql, params }) => {
+  if (method === 'close') {
+    statements.finalize(connection)
+      .then(() => connection.close(() => parentPort.close()));
+    return;
+  }
+
+  execute(method, sql, params, (err, result) => {
+    if (err) {
+      parentPort.postMessage({ id, error: serializeError(err) });
+    } else if (method === 'get') {
+      parentPort.postMessage({ id, row: result, done: true, rows: result ? 1 : 0 });
+    } else {
+      postRows(id, result);
+    }
+  });
+});
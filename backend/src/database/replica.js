@@ -0,0 +1,477 @@
+const fs = require('fs');
+const http = require('http');
+const https = require('https');
+const { decodeBatches } = require('./walShipping');
+
+const DEFAULT_POLL_TIMEOUT_MS = 25000;
+const DEFAULT_RETRY_MS = 1000;
+const DEFAULT_MAX_LAG_MS = 5000;
+const READ_ONLY_REPLICA = 'READ_ONLY_REPLICA';
+
+// The archive arm is always read on a replica: it has no archiver to say
+// how far the archive reaches (see archive.js entryQuery)
+const ARCHIVE_VIEW = { covers: () => true };
+
+function readOnlyError() {
+  const error = new Error('This server is a read-only replica');
+  error.code = READ_ONLY_REPLICA;
+  return error;
+}
+
+function delay(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+function readBody(res) {
+  return new Promise((resolve, reject) => {
+    const chunks = [];
+    res.on('data', (chunk) => chunks.push(chunk));
+    res.on('end', () => resolve(Buffer.concat(chunks)));
+    res.on('error', reject);
+    res.on('aborted', () => reject(new Error('Response aborted')));
+  });
+}
+
+// Lets any number of reads run together, or one exclusive task (applying
+// pages, swapping in a new snapshot) with no read in flight. Reads that
+// arrive while a task waits or runs are held until it is done.
+function createGate() {
+  let active = 0;
+  let blocked = true;
+  let drained = null;
+  let exclusive = Promise.resolve();
+  const held = [];
+
+  function enter(read) {
+    if (blocked) {
+      held.push(read);
+      return;
+    }
+    active++;
+    read();
+  }
+
+  function leave() {
+    active--;
+    if (active === 0 && drained) {
+      drained();
+      drained = null;
+    }
+  }
+
+  function open() {
+    blocked = false;
+    for (const read of held.splice(0)) {
+      active++;
+      read();
+    }
+  }
+
+  function run(task) {
+    const result = exclusive.then(async () => {
+      blocked = true;
+      if (active > 0) {
+        await new Promise((resolve) => {
+          drained = resolve;
+        });
+      }
+      try {
+        return await task();
+      } finally {
+        open();
+      }
+    });
+    exclusive = result.catch(() => {});
+    return result;
+  }
+
+  return { enter, leave, run };
+}
+
+// A follower's page writes go straight into its copy of each file, so the
+// copy is switched to the rollback journal (header bytes 18-19) and its
+// change counter bumped after every batch: SQLite checks that counter when a
+// read starts and drops cached pages when it moved. The in-header size is
+// kept valid for the same counter.
+async function markReplica(handle, counter, dbSize) {
+  const header = Buffer.alloc(4);
+  await handle.write(Buffer.from([1, 1]), 0, 2, 18);
+  header.writeUInt32BE(counter);
+  await handle.write(header, 0, 4, 24);
+  await handle.write(header, 0, 4, 92);
+  header.writeUInt32BE(dbSize);
+  await handle.write(header, 0, 4, 28);
+}
+
+async function readCounter(filename) {
+  const handle = await fs.promises.open(filename, 'r');
+  try {
+    const header = Buffer.alloc(4);
+    await handle.read(header, 0, 4, 24);
+    return header.readUInt32BE(0);
+  } finally {
+    await handle.close();
+  }
+}
+
+// Writes one batch's pages for a file and trims it to the committed size
+async function applyFile(filename, { pageSize, dbSize, pages }, counter) {
+  const handle = await fs.promises.open(filename, 'r+');
+  try {
+    for (const [pgno, page] of pages) {
+      await handle.write(page, 0, pageSize, (pgno - 1) * pageSize);
+    }
+    await handle.truncate(dbSize * pageSize);
+    await markReplica(handle, counter, dbSize);
+  } finally {
+    await handle.close();
+  }
+}
+
+// Streams a snapshot body (the files back to back, sizes in `parts`) into
+// the given paths
+async function writeParts(res, parts) {
+  let index = 0;
+  let written = 0;
+  let handle = parts.length ? await fs.promises.open(parts[0].path, 'w') : null;
+
+  for await (let chunk of res) {
+    while (chunk.length > 0 && handle) {
+      const take = Math.min(chunk.length, parts[index].size - written);
+      await handle.write(chunk, 0, take);
+      written += take;
+      chunk = chunk.subarray(take);
+      if (written === parts[index].size) {
+        await handle.close();
+        index++;
+        written = 0;
+        handle = index < parts.length ? await fs.promises.open(parts[index].path, 'w') : null;
+      }
+    }
+  }
+  if (handle) {
+    await handle.close();
+    throw new Error('Snapshot ended early');
+  }
+}
+
+// Follows the primary at `primaryUrl` for one shard: takes a snapshot of
+// its files into `files` ({ schema: filename }), then long-polls for
+// batches of changed pages (walShipping.js) and applies them. `db` answers
+// reads like a connection manager (opened with `openDatabase({ attach })`
+// over the local copies) and rejects writes with READ_ONLY_REPLICA. The
+// replica reports itself unhealthy while disconnected or more than
+// `maxLagMs` behind (measured against the primary's clock).
+function createReplica({
+  primaryUrl,
+  token,
+  shard = 0,
+  shards = 1,
+  files,
+  id,
+  openDatabase,
+  pollTimeoutMs = DEFAULT_POLL_TIMEOUT_MS,
+  retryMs = DEFAULT_RETRY_MS,
+  maxLagMs = DEFAULT_MAX_LAG_MS
+}) {
+  const gate = createGate();
+  const counters = {};
+  const waiters = new Set();
+  let database = null;
+  let attached = [];
+  let epoch = null;
+  let seq = 0;
+  let stopped = false;
+  let following = null;
+  let pending = null;
+
+  const status = {
+    connected: false,
+    primarySeq: 0,
+    lagMs: null,
+    snapshots: 0,
+    batches: 0,
+    failures: 0,
+    lastAppliedAt: null,
+    lastContactAt: null
+  };
+
+  function request(path) {
+    const url = new URL(path, primaryUrl);
+    const client = url.protocol === 'https:' ? https : http;
+    return new Promise((resolve, reject) => {
+      pending = client.get(url, { headers: { 'x-replication-token': token } }, resolve);
+      pending.on('error', reject);
+    });
+  }
+
+  function notify() {
+    for (const check of waiters) check();
+  }
+
+  async function closeLocal() {
+    if (!database) return;
+    const closing = database;
+    database = null;
+    await new Promise((resolve) => closing.close(() => resolve()));
+  }
+
+  // Replaces the local files with a fresh snapshot of the primary's
+  async function sync() {
+    const res = await request(`/replication/snapshot/${shard}`);
+    if (res.statusCode !== 200) {
+      await readBody(res);
+      throw new Error(`Snapshot request failed with status ${res.statusCode}`);
+    }
+    if (Number(res.headers['x-replication-shards']) !== shards) {
+      res.destroy();
+      throw new Error(`Primary has ${res.headers['x-replication-shards']} shards, this replica ${shards}`);
+    }
+
+    const parts = res.headers['x-replication-files'].split(',').map((part) => {
+      const [schema, size] = part.split('=');
+      if (!files[schema]) {
+        throw new Error(`Primary ships a "${schema}" database with no local path configured`);
+      }
+      return { schema, path: `${files[schema]}.sync`, size: Number(size) };
+    });
+
+    // Downloaded next to the current files, which keep serving reads until
+    // the copies are swapped in
+    await writeParts(res, parts);
+
+    await gate.run(async () => {
+      await closeLocal();
+      for (const part of parts) {
+        const filename = files[part.schema];
+        for (const suffix of ['-wal', '-shm', '-journal']) {
+          await fs.promises.rm(`${filename}${suffix}`, { force: true });
+        }
+        await fs.promises.rename(part.path, filename);
+
+        const handle = await fs.promises.open(filename, 'r+');
+        try {
+          const header = Buffer.alloc(2);
+          await handle.read(header, 0, 2, 16);
+          const pageSize = header.readUInt16BE(0) === 1 ? 65536 : header.readUInt16BE(0);
+          counters[part.schema] = (await readCounter(filename)) + 1;
+          await markReplica(handle, counters[part.schema], part.size / pageSize);
+        } finally {
+          await handle.close();
+        }
+      }
+
+      attached = parts.map((part) => part.schema).filter((schema) => schema !== 'main');
+      database = openDatabase({
+        attach: Object.fromEntries(attached.map((schema) => [schema, files[schema]]))
+      });
+      epoch = res.headers['x-replication-epoch'];
+      seq = Number(res.headers['x-replication-seq']);
+    });
+
+    status.primarySeq = seq;
+    status.lagMs = 0;
+    status.snapshots++;
+    notify();
+  }
+
+  async function apply(batches) {
+    await gate.run(async () => {
+      for (const batch of batches) {
+        for (const [schema, file] of Object.entries(batch.files)) {
+          counters[schema]++;
+          await applyFile(files[schema], file, counters[schema]);
+        }
+        seq = batch.seq;
+      }
+    });
+
+    const last = batches[batches.length - 1];
+    status.batches += batches.length;
+    status.lagMs = Date.now() - last.capturedAt;
+    status.lastAppliedAt = new Date().toISOString();
+    notify();
+  }
+
+  async function follow() {
+    while (!stopped) {
+      try {
+        const res = await request(
+          `/replication/changes/${shard}?epoch=${epoch}&after=${seq}&wait=${pollTimeoutMs}&follower=${encodeURIComponent(id)}`
+        );
+        status.connected = true;
+        status.lastContactAt = new Date().toISOString();
+
+        if (res.statusCode === 409) {
+          await readBody(res);
+          await sync();
+          continue;
+        }
+        const body = await readBody(res);
+        if (res.statusCode !== 200) {
+          throw new Error(`Changes request failed with status ${res.statusCode}`);
+        }
+
+        status.primarySeq = Number(res.headers['x-replication-seq']);
+        const batches = decodeBatches(body);
+        if (batches.length) {
+          await apply(batches);
+        } else if (seq >= status.primarySeq) {
+          status.lagMs = 0;
+        }
+      } catch (err) {
+        if (stopped) break;
+        status.connected = false;
+        status.failures++;
+        console.error(`Replication from ${primaryUrl} (shard ${shard}) failed:`, err.message);
+        await delay(retryMs);
+      }
+    }
+  }
+
+  // Resolves once the first snapshot is in place; changes are then
+  // followed in the background
+  async function start() {
+    await sync();
+    status.connected = true;
+    following = follow();
+  }
+
+  async function stop() {
+    stopped = true;
+    if (pending) pending.destroy();
+    notify();
+    await following;
+    await gate.run(closeLocal);
+  }
+
+  // Resolves to true once this replica has applied `position` (as set by
+  // the primary, `<epoch>.<seq>`), or false after `timeoutMs` or when the
+  // position belongs to another epoch
+  function waitFor(position, timeoutMs) {
+    const [positionEpoch, positionSeq] = String(position).split('.');
+    const target = Number(positionSeq);
+    const reached = () => epoch === positionEpoch && seq >= target;
+
+    if (reached()) return Promise.resolve(true);
+    if (!Number.isInteger(target) || epoch !== positionEpoch) return Promise.resolve(false);
+
+    return new Promise((resolve) => {
+      const done = (result) => {
+        clearTimeout(timeout);
+        waiters.delete(check);
+        resolve(result);
+      };
+      const check = () => {
+        if (reached()) done(true);
+        else if (stopped || epoch !== positionEpoch) done(false);
+      };
+      const timeout = setTimeout(() => done(false), timeoutMs);
+      waiters.add(check);
+    });
+  }
+
+  function getStatus() {
+    return {
+      role: 'replica',
+      primary: primaryUrl,
+      shard,
+      epoch,
+      seq,
+      behind: Math.max(0, status.primarySeq - seq),
+      ...status,
+      healthy: status.connected && status.lagMs !== null && status.lagMs <= maxLagMs
+    };
+  }
+
+  function splitArgs(args) {
+    const last = args.length - 1;
+    const callback = typeof args[last] === 'function' ? args[last] : null;
+    return { callback, params: callback ? args.slice(0, last) : args };
+  }
+
+  function gatedRead(method) {
+    return (...args) => {
+      const { callback, params } = splitArgs(args);
+      gate.enter(() => {
+        if (!database) {
+          gate.leave();
+          if (callback) callback(new Error('Replica is not open'));
+          return;
+        }
+        database[method](...params, (err, result) => {
+          gate.leave();
+          if (callback) callback(err, result);
+        });
+      });
+      return db;
+    };
+  }
+
+  const rejectWrite = () => Promise.reject(readOnlyError());
+
+  // Stands in for the shard's connection manager
+  const db = {
+    get: gatedRead('get'),
+    all: gatedRead('all'),
+
+    allJson(sql, params = []) {
+      return new Promise((resolve, reject) => {
+        gate.enter(() => {
+          const reading = database ? database.allJson(sql, params) : Promise.reject(new Error('Replica is not open'));
+          reading.then(resolve, reject).finally(() => gate.leave());
+        });
+      });
+    },
+
+    run(...args) {
+      const { callback } = splitArgs(args);
+      if (callback) process.nextTick(callback, readOnlyError());
+      return db;
+    },
+
+    write: rejectWrite,
+    transaction: rejectWrite,
+    runExclusive: rejectWrite,
+
+    readPragmas() {
+      return database.readPragmas();
+    },
+
+    statementStats() {
+      return database ? database.statementStats() : {};
+    },
+
+    writeQueueStats() {
+      return database ? database.writeQueueStats() : {};
+    },
+
+    workerPoolStats() {
+      return database ? database.workerPoolStats() : null;
+    },
+
+    close(callback) {
+      stop().then(() => callback && callback(null), (err) => callback && callback(err));
+    },
+
+    get readPoolSize() {
+      return database ? database.readPoolSize : 0;
+    }
+  };
+
+  return {
+    db,
+    start,
+    stop,
+    waitFor,
+    getStatus,
+    get archive() {
+      return attached.includes('archive') ? ARCHIVE_VIEW : null;
+    }
+  };
+}
+
+module.exports = {
+  READ_ONLY_REPLICA,
+  createReplica
+};
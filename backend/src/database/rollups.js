@@ -0,0 +1,59 @@
+const query = require('./query');
+
+// Every entry, hot or archived (see archive.js); a row caught mid-move in
+// both databases counts once
+const ALL_ENTRIES = `(
+  SELECT user_id, client_id, hundredths, day FROM main.work_entries
+  UNION ALL
+  SELECT user_id, client_id, hundredths, day FROM archive.work_entries ae
+  WHERE NOT EXISTS (SELECT 1 FROM main.work_entries WHERE id = ae.id)
+)`;
+
+function rollupsFrom(source) {
+  return {
+    client_hour_totals: `
+    INSERT INTO client_hour_totals (user_id, client_id, total_hundredths, entry_count)
+    SELECT user_id, client_id, SUM(hundredths), COUNT(*)
+    FROM ${source}
+    GROUP BY user_id, client_id`,
+    work_entry_daily: `
+    INSERT INTO work_entry_daily (user_id, client_id, day, hundredths, entries)
+    SELECT user_id, client_id, day, SUM(hundredths), COUNT(*)
+    FROM ${source}
+    GROUP BY user_id, client_id, day`
+  };
+}
+
+// Trigger-maintained summary tables and how to recompute each one from
+// work_entries. Triggers keep them exact on every write; a rebuild is only
+// needed after bulk changes made with the triggers bypassed (restores,
+// manual SQL) or to verify a suspect table. With an archive attached the
+// rollups cover its entries too.
+const ROLLUPS = rollupsFrom('work_entries');
+const ROLLUPS_WITH_ARCHIVE = rollupsFrom(ALL_ENTRIES);
+
+async function hasArchive(tx) {
+  const databases = await query.all(tx, 'PRAGMA database_list');
+  return databases.some((database) => database.name === 'archive');
+}
+
+// Rebuilds every rollup in one transaction, so readers see either the old
+// or the new contents. Resolves to the row count written per table.
+async function rebuildRollups(db) {
+  return db.transaction(async (tx) => {
+    const rollups = await hasArchive(tx) ? ROLLUPS_WITH_ARCHIVE : ROLLUPS;
+    const counts = {};
+    for (const [table, backfill] of Object.entries(rollups)) {
+      await query.run(tx, `DELETE FROM ${table}`);
+      const { changes } = await query.run(tx, backfill);
+      counts[table] = changes;
+    }
+    return counts;
+  });
+}
+
+module.exports = {
+  ROLLUPS,
+  ROLLUPS_WITH_ARCHIVE,
+  rebuildRollups
+};
@@ -0,0 +1,82 @@
+const path = require('path');
+const query = require('./query');
+
+// FNV-1a (32-bit): cheap, and stable across processes and Node versions, so
+// a user always maps to the same shard
+function hashKey(key) {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < key.length; i++) {
+    hash ^= key.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193);
+  }
+  return hash >>> 0;
+}
+
+// Every row belongs to exactly one user (clients and work entries are keyed
+// by user_email), so a user's data lives entirely in one shard
+function shardIndex(userEmail, count) {
+  return count > 1 ? hashKey(String(userEmail)) % count : 0;
+}
+
+// timesheet.db -> timesheet.shard-2.db. A single shard keeps the plain name;
+// in-memory shards are separate connections and need no name.
+function shardFilename(filename, index, count) {
+  if (count <= 1 || filename === ':memory:') {
+    return filename;
+  }
+  const extension = path.extname(filename);
+  return `${filename.slice(0, filename.length - extension.length)}.shard-${index}${extension}`;
+}
+
+// Records which slot a shard file was created for. Opening the files with a
+// different DB_SHARDS would silently route users to shards that do not hold
+// their data, so that is refused instead.
+async function checkShardLayout(db, index, count) {
+  await db.transaction(async (tx) => {
+    await query.run(tx, `
+      CREATE TABLE IF NOT EXISTS shard_layout (
+        shard_index INTEGER NOT NULL,
+        shard_count INTEGER NOT NULL
+      )
+    `);
+    const row = await query.get(tx, 'SELECT shard_index, shard_count FROM shard_layout');
+    if (!row) {
+      await query.run(tx, 'INSERT INTO shard_layout (shard_index, shard_count) VALUES (?, ?)', [index, count]);
+      return;
+    }
+    if (row.shard_index !== index || row.shard_count !== count) {
+      throw new Error(
+        `Shard ${index} of ${count} was created as shard ${row.shard_index} of ${row.shard_count}; ` +
+        'changing DB_SHARDS requires moving the data'
+      );
+    }
+  });
+}
+
+// Sums per-statement counters from every shard's registry
+function mergeStatementStats(allStats) {
+  const merged = {};
+  for (const stats of allStats) {
+    for (const [name, entry] of Object.entries(stats)) {
+      const total = merged[name] || { hits: 0, prepares: 0, errors: 0, totalMs: 0, maxMs: 0 };
+      total.hits += entry.hits;
+      total.prepares += entry.prepares;
+      total.errors += entry.errors;
+      total.totalMs += entry.totalMs;
+      total.maxMs = Math.max(total.maxMs, entry.maxMs);
+      merged[name] = total;
+    }
+  }
+  for (const entry of Object.values(merged)) {
+    entry.avgMs = entry.hits ? entry.totalMs / entry.hits : 0;
+  }
+  return merged;
+}
+
+module.exports = {
+  hashKey,
+  shardIndex,
+  shardFilename,
+  checkShardLayout,
+  mergeStatementStats
+};
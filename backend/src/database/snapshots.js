@@ -0,0 +1,149 @@
+const fs = require('fs');
+const path = require('path');
+const query = require('./query');
+
+const DEFAULT_INTERVAL_MS = 60000;
+
+function elapsedMs(started) {
+  return Math.round(Number(process.hrtime.bigint() - started) / 1e4) / 100;
+}
+
+// Copies every page between `connection`'s main database and `filename`
+// with SQLite's online backup API, in one step. `toFile` picks the direction.
+function copyPages(connection, filename, toFile) {
+  return new Promise((resolve, reject) => {
+    const backup = connection.backup(filename, 'main', 'main', toFile, (err) => {
+      if (err) {
+        reject(err);
+        return;
+      }
+      backup.step(-1, (stepErr) => {
+        backup.finish(() => (stepErr ? reject(stepErr) : resolve()));
+      });
+    });
+  });
+}
+
+// Persistence for an in-memory database: restores the last snapshot at
+// boot, then periodically (and once more at shutdown) copies the live
+// database to `filename`. Snapshots are written to a temporary file and
+// renamed into place, so a crash mid-snapshot leaves the previous one intact.
+function createSnapshotter({ db, filename, intervalMs = DEFAULT_INTERVAL_MS }) {
+  const tempFilename = `${filename}.tmp`;
+  let timer = null;
+  let running = null;
+  let lastChanges = null;
+
+  const stats = {
+    path: filename,
+    intervalMs,
+    snapshots: 0,
+    skipped: 0,
+    failures: 0,
+    lastDurationMs: 0,
+    maxDurationMs: 0,
+    lastSizeBytes: 0,
+    lastSnapshotAt: null,
+    restore: null
+  };
+
+  async function restore() {
+    if (!fs.existsSync(filename)) {
+      console.log(`No snapshot at ${filename}; starting with an empty database`);
+      return false;
+    }
+
+    const started = process.hrtime.bigint();
+    await db.runExclusive(() => copyPages(db.writer, filename, false));
+
+    const { size } = await fs.promises.stat(filename);
+    stats.restore = { sizeBytes: size, durationMs: elapsedMs(started) };
+    console.log(`Restored database from snapshot ${filename} (${size} bytes) in ${stats.restore.durationMs}ms`);
+    return true;
+  }
+
+  async function takeSnapshot() {
+    const started = process.hrtime.bigint();
+
+    const copied = await db.runExclusive(async () => {
+      // total_changes() only moves when this connection writes, so an idle
+      // database is not copied again
+      const { changes } = await query.get(db.writer, 'SELECT total_changes() AS changes');
+      if (changes === lastChanges && fs.existsSync(filename)) {
+        return false;
+      }
+      await copyPages(db.writer, tempFilename, true);
+      lastChanges = changes;
+      return true;
+    });
+
+    if (!copied) {
+      stats.skipped++;
+      return false;
+    }
+
+    await fs.promises.rename(tempFilename, filename);
+    const { size } = await fs.promises.stat(filename);
+
+    const durationMs = elapsedMs(started);
+    stats.snapshots++;
+    stats.lastDurationMs = durationMs;
+    if (durationMs > stats.maxDurationMs) stats.maxDurationMs = durationMs;
+    stats.lastSizeBytes = size;
+    stats.lastSnapshotAt = new Date().toISOString();
+    return true;
+  }
+
+  // Overlapping calls share the snapshot already in progress
+  function snapshot() {
+    if (!running) {
+      running = takeSnapshot()
+        .catch((err) => {
+          stats.failures++;
+          throw err;
+        })
+        .finally(() => {
+          running = null;
+        });
+    }
+    return running;
+  }
+
+  function start() {
+    fs.mkdirSync(path.dirname(filename), { recursive: true });
+    timer = setInterval(() => {
+      snapshot().catch((err) => console.error('Error taking snapshot:', err));
+    }, intervalMs);
+    timer.unref();
+  }
+
+  // Final snapshot at shutdown, after queued writes have committed. Skipped
+  // when start() never ran (e.g. boot failed before the restore finished),
+  // so an empty database never overwrites a good snapshot.
+  async function stop() {
+    if (!timer) {
+      return;
+    }
+    clearInterval(timer);
+    timer = null;
+    await db.drain();
+    await snapshot();
+    console.log(`Snapshot written to ${filename} (${stats.lastSizeBytes} bytes)`);
+  }
+
+  function getStats() {
+    return { ...stats };
+  }
+
+  return {
+    restore,
+    snapshot,
+    start,
+    stop,
+    getStats
+  };
+}
+
+module.exports = {
+  createSnapshotter
+};
@@ -0,0 +1,320 @@
+// Named SQL used by the routes and middleware. Any statement listed here is
+// prepared once per connection and reused for every later call with the same
+// text; anything else (e.g. dynamically built UPDATEs) is passed straight
+// through to sqlite3.
+//
+// Hours are stored as whole hundredths and dates as whole days since
+// 1970-01-01 (see days.js). Statements return them as `hours` (divided by
+// 100.0) and YYYY-MM-DD `date`s; the daily series returns the raw integers
+// so periods can be bucketed and summed exactly before converting.
+// Entry lists take a day range (BETWEEN ? AND ?); pass dayRange() bounds
+// for an open-ended one.
+//
+// `...WithArchive` statements also read the archive database (archive.js)
+// and are only prepared when it is attached; pick between the two with
+// entryQuery(). Their archive arm skips rows still present in work_entries
+// (a move in progress) and repeats the hot arm's parameters. They sort in
+// the outer SELECT: SQLite does not promise to keep a subquery's order.
+const STATEMENTS = {
+  // Users
+  findUserId: 'SELECT id FROM users WHERE email = ?',
+  findUser: 'SELECT id, email, created_at FROM users WHERE email = ?',
+  insertUser: 'INSERT INTO users (email) VALUES (?)',
+  // A concurrent request may have created the user first; read the user back
+  // (findUserId, findUser) afterwards
+  ensureUser: 'INSERT OR IGNORE INTO users (email) VALUES (?)',
+
+  // Clients
+  listClients: 'SELECT id, name, description, department, email, created_at, updated_at FROM clients WHERE user_id = ? ORDER BY name',
+  findClient: 'SELECT id, name, description, department, email, created_at, updated_at FROM clients WHERE id = ? AND user_id = ?',
+  findClientName: 'SELECT id, name FROM clients WHERE id = ? AND user_id = ?',
+  insertClient: `
+    INSERT INTO clients (name, description, department, email, user_id) VALUES (?, ?, ?, ?, ?)
+    RETURNING id, name, description, department, email, created_at, updated_at`,
+  deleteClient: 'DELETE FROM clients WHERE id = ? AND user_id = ?',
+  deleteAllClients: 'DELETE FROM clients WHERE user_id = ?',
+
+  // Work entries
+  listWorkEntries: `
+    SELECT we.id, we.client_id, we.hundredths / 100.0 AS hours, we.description,
+           date(we.day * 86400, 'unixepoch') AS date,
+           we.created_at, we.updated_at, c.name as client_name
+    FROM work_entries we
+    JOIN clients c ON we.client_id = c.id
+    WHERE we.user_id = ? AND we.day BETWEEN ? AND ?
+    ORDER BY we.day DESC, we.created_at DESC`,
+  listWorkEntriesForClient: `
+    SELECT we.id, we.client_id, we.hundredths / 100.0 AS hours, we.description,
+           date(we.day * 86400, 'unixepoch') AS date,
+           we.created_at, we.updated_at, c.name as client_name
+    FROM work_entries we
+    JOIN clients c ON we.client_id = c.id
+    WHERE we.user_id = ? AND we.client_id = ? AND we.day BETWEEN ? AND ?
+    ORDER BY we.day DESC, we.created_at DESC`,
+  listWorkEntriesWithArchive: `
+    SELECT id, client_id, hours, description, date(day * 86400, 'unixepoch') AS date,
+           created_at, updated_at, client_name
+    FROM (
+      SELECT we.id, we.client_id, we.hundredths / 100.0 AS hours, we.description, we.day AS day,
+             we.created_at AS created_at, we.updated_at, c.name AS client_name
+      FROM main.work_entries we
+      JOIN clients c ON we.client_id = c.id
+      WHERE we.user_id = ? AND we.day BETWEEN ? AND ?
+      UNION ALL
+      SELECT ae.id, ae.client_id, ae.hundredths / 100.0, ae.description, ae.day,
+             ae.created_at, ae.updated_at, c.name
+      FROM archive.work_entries ae
+      JOIN clients c ON ae.client_id = c.id
+      WHERE ae.user_id = ? AND ae.day BETWEEN ? AND ?
+        AND NOT EXISTS (SELECT 1 FROM main.work_entries WHERE id = ae.id)
+    )
+    ORDER BY day DESC, created_at DESC`,
+  listWorkEntriesForClientWithArchive: `
+    SELECT id, client_id, hours, description, date(day * 86400, 'unixepoch') AS date,
+           created_at, updated_at, client_name
+    FROM (
+      SELECT we.id, we.client_id, we.hundredths / 100.0 AS hours, we.description, we.day AS day,
+             we.created_at AS created_at, we.updated_at, c.name AS client_name
+      FROM main.work_entries we
+      JOIN clients c ON we.client_id = c.id
+      WHERE we.user_id = ? AND we.client_id = ? AND we.day BETWEEN ? AND ?
+      UNION ALL
+      SELECT ae.id, ae.client_id, ae.hundredths / 100.0, ae.description, ae.day,
+             ae.created_at, ae.updated_at, c.name
+      FROM archive.work_entries ae
+      JOIN clients c ON ae.client_id = c.id
+      WHERE ae.user_id = ? AND ae.client_id = ? AND ae.day BETWEEN ? AND ?
+        AND NOT EXISTS (SELECT 1 FROM main.work_entries WHERE id = ae.id)
+    )
+    ORDER BY day DESC, created_at DESC`,
+  findWorkEntry: `
+    SELECT we.id, we.client_id, we.hundredths / 100.0 AS hours, we.description,
+           date(we.day * 86400, 'unixepoch') AS date,
+           we.created_at, we.updated_at, c.name as client_name
+    FROM work_entries we
+    JOIN clients c ON we.client_id = c.id
+    WHERE we.id = ? AND we.user_id = ?`,
+  findOwnedWorkEntryId: 'SELECT id FROM work_entries WHERE id = ? AND user_id = ?',
+  findArchivedEntryId: 'SELECT id FROM archive.work_entries WHERE id = ? AND user_id = ?',
+  // Inserts only when the client belongs to the user; no row means it doesn't
+  insertWorkEntry: `
+    INSERT INTO work_entries (client_id, user_id, hundredths, description, day)
+    SELECT c.id, c.user_id, ?, ?, ? FROM clients c WHERE c.id = ? AND c.user_id = ?
+    RETURNING id, client_id, hundredths / 100.0 AS hours, description,
+              date(day * 86400, 'unixepoch') AS date, created_at, updated_at,
+              (SELECT name FROM clients WHERE clients.id = work_entries.client_id) AS client_name`,
+  deleteWorkEntry: 'DELETE FROM work_entries WHERE id = ? AND user_id = ?',
+  // Archived entries have no foreign key to their client
+  deleteArchivedEntriesForClient: 'DELETE FROM archive.work_entries WHERE client_id = ? AND user_id = ?',
+  deleteAllArchivedEntries: 'DELETE FROM archive.work_entries WHERE user_id = ?',
+
+  // Reports
+  findClientTotals: `
+    SELECT c.id, c.name,
+           COALESCE(t.total_hundredths, 0) / 100.0 AS total_hours,
+           COALESCE(t.entry_count, 0) AS entry_count,
+           (SELECT date(MIN(day) * 86400, 'unixepoch') FROM work_entry_daily
+            WHERE user_id = c.user_id AND client_id = c.id) AS first_date,
+           (SELECT date(MAX(day) * 86400, 'unixepoch') FROM work_entry_daily
+            WHERE user_id = c.user_id AND client_id = c.id) AS last_date
+    FROM clients c
+    LEFT JOIN client_hour_totals t ON t.user_id = c.user_id AND t.client_id = c.id
+    WHERE c.id = ? AND c.user_id = ?`,
+  // Same shape as findClientTotals for part of the client's history, summed
+  // from the daily rollup
+  findClientTotalsInRange: `
+    SELECT c.id, c.name,
+           COALESCE(SUM(d.hundredths), 0) / 100.0 AS total_hours,
+           COALESCE(SUM(d.entries), 0) AS entry_count,
+           date(MIN(d.day) * 86400, 'unixepoch') AS first_date,
+           date(MAX(d.day) * 86400, 'unixepoch') AS last_date
+    FROM clients c
+    LEFT JOIN work_entry_daily d ON d.user_id = c.user_id AND d.client_id = c.id AND d.day BETWEEN ? AND ?
+    WHERE c.id = ? AND c.user_id = ?
+    GROUP BY c.id`,
+  reportSummary: `
+    SELECT COALESCE(SUM(total_hundredths), 0) / 100.0 AS total_hours,
+           COALESCE(SUM(entry_count), 0) AS entry_count
+    FROM client_hour_totals
+    WHERE user_id = ?`,
+  dailyHours: `
+    SELECT day, SUM(hundredths) AS hundredths, SUM(entries) AS entries
+    FROM work_entry_daily
+    WHERE user_id = ? AND day BETWEEN ? AND ?
+    GROUP BY day
+    ORDER BY day`,
+  dailyHoursForClient: `
+    SELECT day, hundredths, entries
+    FROM work_entry_daily
+    WHERE user_id = ? AND client_id = ? AND day BETWEEN ? AND ?
+    ORDER BY day`,
+  reportEntries: `
+    SELECT id, hundredths / 100.0 AS hours, description,
+           date(day * 86400, 'unixepoch') AS date, created_at, updated_at
+    FROM work_entries
+    WHERE client_id = ? AND user_id = ? AND day BETWEEN ? AND ?
+    ORDER BY day DESC`,
+  reportEntriesWithArchive: `
+    SELECT id, hours, description, date(day * 86400, 'unixepoch') AS date, created_at, updated_at
+    FROM (
+      SELECT id, hundredths / 100.0 AS hours, description, day, created_at, updated_at
+      FROM main.work_entries
+      WHERE client_id = ? AND user_id = ? AND day BETWEEN ? AND ?
+      UNION ALL
+      SELECT id, hundredths / 100.0, description, day, created_at, updated_at
+      FROM archive.work_entries ae
+      WHERE client_id = ? AND user_id = ? AND day BETWEEN ? AND ?
+        AND NOT EXISTS (SELECT 1 FROM main.work_entries WHERE id = ae.id)
+    )
+    ORDER BY day DESC`,
+  exportEntries: `
+    SELECT hundredths / 100.0 AS hours, description,
+           date(day * 86400, 'unixepoch') AS date, created_at
+    FROM work_entries
+    WHERE client_id = ? AND user_id = ? AND day BETWEEN ? AND ?
+    ORDER BY day DESC`,
+  exportEntriesWithArchive: `
+    SELECT hours, description, date(day * 86400, 'unixepoch') AS date, created_at
+    FROM (
+      SELECT hundredths / 100.0 AS hours, description, day, created_at
+      FROM main.work_entries
+      WHERE client_id = ? AND user_id = ? AND day BETWEEN ? AND ?
+      UNION ALL
+      SELECT hundredths / 100.0, description, day, created_at
+      FROM archive.work_entries ae
+      WHERE client_id = ? AND user_id = ? AND day BETWEEN ? AND ?
+        AND NOT EXISTS (SELECT 1 FROM main.work_entries WHERE id = ae.id)
+    )
+    ORDER BY day DESC`,
+
+  // Search (migration 10). The MATCH expression comes from searchRepo and
+  // already restricts rows to the user; highlights are wrapped in \x02 and
+  // \x03 so the route can escape the text before marking it up.
+  searchWorkEntries: `
+    SELECT we.id, we.client_id, c.name AS client_name, we.hundredths / 100.0 AS hours,
+           date(we.day * 86400, 'unixepoch') AS date,
+           highlight(work_entries_fts, 0, char(2), char(3)) AS description
+    FROM work_entries_fts
+    JOIN work_entries we ON we.id = work_entries_fts.rowid
+    JOIN clients c ON c.id = we.client_id
+    WHERE work_entries_fts MATCH ? AND we.user_id = ?
+    ORDER BY rank
+    LIMIT ? OFFSET ?`,
+  searchClients: `
+    SELECT c.id, highlight(clients_fts, 0, char(2), char(3)) AS name,
+           highlight(clients_fts, 1, char(2), char(3)) AS description,
+           c.department, c.email
+    FROM clients_fts
+    JOIN clients c ON c.id = clients_fts.rowid
+    WHERE clients_fts MATCH ? AND c.user_id = ?
+    ORDER BY rank
+    LIMIT ? OFFSET ?`
+};
+
+const namesBySql = new Map(Object.entries(STATEMENTS).map(([name, sql]) => [sql, name]));
+
+function createStatementRegistry() {
+  // connection -> Map(name -> sqlite3.Statement)
+  const prepared = new Map();
+  const stats = {};
+
+  function statsFor(name) {
+    if (!stats[name]) {
+      stats[name] = { hits: 0, prepares: 0, errors: 0, totalMs: 0, maxMs: 0 };
+    }
+    return stats[name];
+  }
+
+  function statementFor(connection, name) {
+    let cache = prepared.get(connection);
+    if (!cache) {
+      cache = new Map();
+      prepared.set(connection, cache);
+    }
+
+    let statement = cache.get(name);
+    if (!statement) {
+      // A failed prepare finalizes the statement, so drop it and let the
+      // next call try again (the queued call receives the error)
+      let failed = false;
+      statement = connection.prepare(STATEMENTS[name], (err) => {
+        if (!err) return;
+        failed = true;
+        if (cache.get(name) === statement) cache.delete(name);
+      });
+      if (!failed) cache.set(name, statement);
+      statsFor(name).prepares++;
+    }
+    return statement;
+  }
+
+  // Runs `method` through the cached statement when `sql` is a named
+  // statement. Returns false for unregistered SQL so the caller can fall back
+  // to the plain connection method.
+  function execute(connection, method, sql, args) {
+    const name = namesBySql.get(sql);
+    if (!name) {
+      return false;
+    }
+
+    const last = args.length - 1;
+    const callback = typeof args[last] === 'function' ? args[last] : null;
+    const params = callback ? args.slice(0, last) : args;
+    const bound = params.length === 1 && Array.isArray(params[0]) ? params[0] : params;
+
+    const statement = statementFor(connection, name);
+    const entry = statsFor(name);
+    const started = process.hrtime.bigint();
+
+    statement[method](bound, function(err, result) {
+      const elapsedMs = Number(process.hrtime.bigint() - started) / 1e6;
+      entry.hits++;
+      entry.totalMs += elapsedMs;
+      if (elapsedMs > entry.maxMs) entry.maxMs = elapsedMs;
+      if (err) entry.errors++;
+
+      if (callback) callback.call(this, err, result);
+    });
+
+    // get() stops after the first row; reset so the statement does not keep
+    // its read transaction open (which would block WAL checkpoints)
+    if (method === 'get') {
+      statement.reset();
+    }
+    return true;
+  }
+
+  function finalize(connection) {
+    const cache = prepared.get(connection);
+    prepared.delete(connection);
+    if (!cache) {
+      return Promise.resolve();
+    }
+
+    return Promise.all([...cache.values()].map((statement) => new Promise((resolve) => {
+      statement.finalize(() => resolve());
+    })));
+  }
+
+  function getStats() {
+    const result = {};
+    for (const [name, entry] of Object.entries(stats)) {
+      result[name] = {
+        ...entry,
+        avgMs: entry.hits ? entry.totalMs / entry.hits : 0
+      };
+    }
+    return result;
+  }
+
+  return {
+    execute,
+    finalize,
+    getStats
+  };
+}
+
+module.exports = {
+  STATEMENTS,
+  createStatementRegistry
+};
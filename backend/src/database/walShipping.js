@@ -0,0 +1,450 @@
+const crypto = require('crypto');
+const fs = require('fs');
+const query = require('./query');
+
+const WAL_MAGIC = [0x377f0682, 0x377f0683];
+const WAL_HEADER_BYTES = 32;
+const FRAME_HEADER_BYTES = 24;
+
+const DEFAULT_POLL_MS = 20;
+const DEFAULT_BUFFER_BYTES = 64 * 1024 * 1024;
+// Same as SQLite's wal_autocheckpoint default, which shipping turns off
+const DEFAULT_CHECKPOINT_FRAMES = 1000;
+// Most a single changes response carries; a follower that is further
+// behind gets the rest on its next request
+const MAX_RESPONSE_BYTES = 8 * 1024 * 1024;
+
+function newEpoch() {
+  return crypto.randomBytes(8).toString('hex');
+}
+
+// Committed frames appended to the WAL at `walPath` after `cursor` ({ offset,
+// salt }). Resolves to the pages they write (last version of each page
+// wins), the database size in pages after the last commit and the cursor to
+// read from next. `restarted` is set when SQLite has started the WAL over
+// (new salt) since `cursor`; frames left over from before the restart fail
+// the salt check, as do frames of a transaction still being written.
+async function readWal(walPath, cursor) {
+  let handle;
+  try {
+    handle = await fs.promises.open(walPath, 'r');
+  } catch (err) {
+    if (err.code === 'ENOENT') return { cursor, frames: 0, pages: new Map() };
+    throw err;
+  }
+
+  try {
+    const { size } = await handle.stat();
+    if (size < WAL_HEADER_BYTES) {
+      return { cursor, frames: 0, pages: new Map() };
+    }
+
+    const header = Buffer.alloc(WAL_HEADER_BYTES);
+    await handle.read(header, 0, WAL_HEADER_BYTES, 0);
+    if (!WAL_MAGIC.includes(header.readUInt32BE(0))) {
+      throw new Error(`${walPath} is not a WAL file`);
+    }
+    const pageSize = header.readUInt32BE(8);
+    const salt = `${header.readUInt32BE(16)}:${header.readUInt32BE(20)}`;
+    const restarted = salt !== cursor.salt;
+    const start = restarted ? WAL_HEADER_BYTES : cursor.offset;
+
+    const frameBytes = FRAME_HEADER_BYTES + pageSize;
+    const length = Math.floor((size - start) / frameBytes) * frameBytes;
+    const data = Buffer.alloc(Math.max(0, length));
+    if (length > 0) {
+      await handle.read(data, 0, length, start);
+    }
+
+    const pages = new Map();
+    let pending = [];
+    let committed = 0;
+    let frames = 0;
+    let dbSize = null;
+    for (let at = 0; at + frameBytes <= data.length; at += frameBytes) {
+      if (`${data.readUInt32BE(at + 8)}:${data.readUInt32BE(at + 12)}` !== salt) break;
+      pending.push([data.readUInt32BE(at), data.subarray(at + FRAME_HEADER_BYTES, at + frameBytes)]);
+      // Non-zero only on the last frame of a transaction
+      const commitSize = data.readUInt32BE(at + 4);
+      if (commitSize !== 0) {
+        for (const [pgno, page] of pending) pages.set(pgno, page);
+        frames += pending.length;
+        pending = [];
+        committed = at + frameBytes;
+        dbSize = commitSize;
+      }
+    }
+
+    return {
+      cursor: { offset: start + committed, salt },
+      restarted,
+      frames,
+      pageSize,
+      dbSize,
+      pages
+    };
+  } finally {
+    await handle.close();
+  }
+}
+
+// Ships committed WAL frames of `db`'s database files (`files`, { schema:
+// filename }, e.g. main plus the attached archive) to follower processes.
+// Every capture reads what was committed since the last one, under the write
+// lock, into one numbered batch of pages per file; followers fetch the
+// batches after the sequence number they have applied (changesSince) and
+// write the pages into their copy of each file (replica.js).
+//
+// SQLite may only start a WAL over once its frames are in the database
+// file, so automatic checkpoints must be off (wal_autocheckpoint = 0) and
+// this shipper checkpoints itself, after capturing, every
+// `checkpointFrames`. Any restart it did not cause means frames were
+// missed: the shipper then starts a new epoch and followers take a fresh
+// snapshot. The last `bufferBytes` of batches are kept for followers that
+// fall behind; one further back needs a snapshot too.
+function createWalShipper({
+  db,
+  files,
+  pollMs = DEFAULT_POLL_MS,
+  bufferBytes = DEFAULT_BUFFER_BYTES,
+  checkpointFrames = DEFAULT_CHECKPOINT_FRAMES
+}) {
+  const cursors = {};
+  const batches = [];
+  const waiters = new Set();
+  const followers = new Map();
+  const lastSeen = {};
+  let epoch = newEpoch();
+  let seq = 0;
+  let bufferedBytes = 0;
+  let capturing = null;
+  let queued = null;
+  let timer = null;
+  let snapshots = 0;
+
+  const stats = {
+    captures: 0,
+    batches: 0,
+    pages: 0,
+    checkpoints: 0,
+    resets: 0,
+    snapshots: 0,
+    lastCaptureMs: 0
+  };
+
+  function resetCursors() {
+    for (const schema of Object.keys(files)) {
+      cursors[schema] = { offset: 0, salt: null, frames: 0, checkpointed: true };
+    }
+  }
+
+  function wake() {
+    for (const resolve of waiters) resolve();
+    waiters.clear();
+  }
+
+  // Followers can no longer continue from what they applied
+  function startEpoch() {
+    epoch = newEpoch();
+    batches.length = 0;
+    bufferedBytes = 0;
+    stats.resets++;
+    wake();
+  }
+
+  function record(changed) {
+    const batch = { seq: ++seq, capturedAt: Date.now(), files: changed, bytes: 0 };
+    for (const file of Object.values(changed)) {
+      batch.bytes += file.pages.length * file.pageSize;
+      stats.pages += file.pages.length;
+    }
+    batches.push(batch);
+    bufferedBytes += batch.bytes;
+    while (batches.length > 1 && bufferedBytes > bufferBytes) {
+      bufferedBytes -= batches.shift().bytes;
+    }
+    stats.batches++;
+    wake();
+  }
+
+  // Runs with the write lock held, so no transaction is half-written
+  async function readChanges() {
+    const started = process.hrtime.bigint();
+    const changed = {};
+
+    for (const [schema, filename] of Object.entries(files)) {
+      const cursor = cursors[schema];
+      const wal = await readWal(`${filename}-wal`, cursor);
+
+      if (wal.restarted && cursor.salt !== null && !cursor.checkpointed) {
+        startEpoch();
+      }
+      if (wal.restarted) {
+        cursor.checkpointed = false;
+      }
+      cursor.offset = wal.cursor.offset;
+      cursor.salt = wal.cursor.salt;
+
+      if (wal.frames > 0) {
+        changed[schema] = {
+          pageSize: wal.pageSize,
+          dbSize: wal.dbSize,
+          pages: [...wal.pages.entries()].sort((a, b) => a[0] - b[0])
+        };
+        cursor.frames += wal.frames;
+      }
+
+      // The next write after a complete checkpoint starts the WAL over
+      if (cursor.frames >= checkpointFrames) {
+        await query.get(db.writer, `PRAGMA ${schema}.wal_checkpoint(PASSIVE)`);
+        cursor.frames = 0;
+        cursor.checkpointed = true;
+        stats.checkpoints++;
+      }
+    }
+
+    if (Object.keys(changed).length > 0) {
+      record(changed);
+    }
+    stats.captures++;
+    stats.lastCaptureMs = Number(process.hrtime.bigint() - started) / 1e6;
+  }
+
+  // Resolves once everything committed before the call has been captured.
+  // Calls made during a capture share one follow-up capture.
+  function capture() {
+    if (capturing) {
+      if (!queued) {
+        queued = capturing.catch(() => {}).then(() => {
+          queued = null;
+          return capture();
+        });
+      }
+      return queued;
+    }
+    capturing = db.runExclusive(readChanges).finally(() => {
+      capturing = null;
+    });
+    return capturing;
+  }
+
+  // Empties every WAL into its database file; followers start from here
+  async function checkpointAll() {
+    for (const schema of Object.keys(files)) {
+      const result = await query.get(db.writer, `PRAGMA ${schema}.wal_checkpoint(TRUNCATE)`);
+      if (result && result.busy) {
+        throw new Error(`Could not checkpoint ${schema}: readers still hold the WAL`);
+      }
+    }
+    stats.checkpoints++;
+    resetCursors();
+  }
+
+  // Run once after migrations, before the first capture
+  async function prepare() {
+    const { journal_mode: mode } = await query.get(db.writer, 'PRAGMA journal_mode');
+    if (mode !== 'wal') {
+      throw new Error(`WAL shipping needs journal_mode=WAL (got ${mode})`);
+    }
+    await db.runExclusive(checkpointAll);
+  }
+
+  // Copies every file, consistent with each other, as of sequence number
+  // `seq`: pending frames are captured first, then checkpointed into the
+  // files, which are copied before the lock is released. Resolves to
+  // { epoch, seq, files: { schema: { path, size } } }; the caller deletes
+  // the copies once sent.
+  function snapshot() {
+    const id = `${process.pid}-${++snapshots}`;
+    return db.runExclusive(async () => {
+      await readChanges();
+      await checkpointAll();
+
+      const copies = {};
+      for (const [schema, filename] of Object.entries(files)) {
+        const copy = `${filename}.snapshot-${id}`;
+        await fs.promises.copyFile(filename, copy);
+        copies[schema] = { path: copy, size: (await fs.promises.stat(copy)).size };
+      }
+      stats.snapshots++;
+      return { epoch, seq, files: copies };
+    });
+  }
+
+  // Batches after `after` in `followerEpoch`, up to MAX_RESPONSE_BYTES (at
+  // least one); an empty list when there are none yet, or null when the
+  // follower needs a snapshot first
+  function changesSince(followerEpoch, after) {
+    if (followerEpoch !== epoch || after > seq) {
+      return null;
+    }
+    if (after === seq) {
+      return [];
+    }
+    if (!batches.length || batches[0].seq > after + 1) {
+      return null;
+    }
+
+    const result = [];
+    let bytes = 0;
+    for (const batch of batches) {
+      if (batch.seq <= after) continue;
+      if (result.length && bytes + batch.bytes > MAX_RESPONSE_BYTES) break;
+      result.push(batch);
+      bytes += batch.bytes;
+    }
+    return result;
+  }
+
+  // Resolves when a batch after `after` exists, the epoch changes, or
+  // `timeoutMs` passes
+  function waitForChanges(after, timeoutMs) {
+    if (seq > after) {
+      return Promise.resolve();
+    }
+    return new Promise((resolve) => {
+      const done = () => {
+        clearTimeout(timeout);
+        waiters.delete(done);
+        resolve();
+      };
+      const timeout = setTimeout(done, timeoutMs);
+      waiters.add(done);
+    });
+  }
+
+  // `<epoch>.<seq>`: a follower that has applied this much has every write
+  // captured so far
+  function position() {
+    return `${epoch}.${seq}`;
+  }
+
+  function noteFollower(id, applied) {
+    followers.set(id, { seq: applied, seenAt: Date.now() });
+  }
+
+  // Captures whenever a WAL file changes size or modification time, so
+  // followers see commits within about `pollMs` even when nothing asks
+  function start() {
+    timer = setInterval(() => {
+      if (capturing) return;
+      const changed = Object.values(files).some((filename) => {
+        let signature = null;
+        try {
+          const { size, mtimeMs } = fs.statSync(`${filename}-wal`);
+          signature = `${size}:${mtimeMs}`;
+        } catch (err) {
+          if (err.code !== 'ENOENT') throw err;
+        }
+        const different = signature !== lastSeen[filename];
+        lastSeen[filename] = signature;
+        return different;
+      });
+      if (changed) {
+        capture().catch((err) => console.error('Error capturing WAL frames:', err));
+      }
+    }, pollMs);
+    timer.unref();
+  }
+
+  async function stop() {
+    if (timer) {
+      clearInterval(timer);
+      timer = null;
+    }
+    wake();
+    if (capturing) {
+      await capturing.catch(() => {});
+    }
+  }
+
+  function getStats() {
+    const now = Date.now();
+    return {
+      role: 'primary',
+      epoch,
+      seq,
+      bufferedBatches: batches.length,
+      bufferedBytes,
+      ...stats,
+      followers: [...followers.entries()].map(([id, follower]) => {
+        const next = batches.find((batch) => batch.seq > follower.seq);
+        return {
+          id,
+          seq: follower.seq,
+          behind: Math.max(0, seq - follower.seq),
+          lagMs: next ? now - next.capturedAt : 0,
+          lastSeenAt: new Date(follower.seenAt).toISOString()
+        };
+      })
+    };
+  }
+
+  resetCursors();
+
+  return {
+    prepare,
+    capture,
+    snapshot,
+    changesSince,
+    waitForChanges,
+    position,
+    noteFollower,
+    start,
+    stop,
+    getStats,
+    get epoch() {
+      return epoch;
+    },
+    get seq() {
+      return seq;
+    }
+  };
+}
+
+// Wire format of a changes response: one line of JSON describing the
+// batches (page numbers per file), then every page in that order
+function encodeBatches(batches) {
+  const pages = [];
+  const header = batches.map((batch) => {
+    const described = {};
+    for (const [schema, file] of Object.entries(batch.files)) {
+      described[schema] = {
+        pageSize: file.pageSize,
+        dbSize: file.dbSize,
+        pages: file.pages.map(([pgno]) => pgno)
+      };
+      for (const [, page] of file.pages) pages.push(page);
+    }
+    return { seq: batch.seq, capturedAt: batch.capturedAt, files: described };
+  });
+  return Buffer.concat([Buffer.from(`${JSON.stringify(header)}\n`), ...pages]);
+}
+
+function decodeBatches(buffer) {
+  const newline = buffer.indexOf(10);
+  const header = JSON.parse(buffer.subarray(0, newline).toString());
+  let at = newline + 1;
+  return header.map((batch) => {
+    const decoded = {};
+    for (const [schema, file] of Object.entries(batch.files)) {
+      decoded[schema] = {
+        pageSize: file.pageSize,
+        dbSize: file.dbSize,
+        pages: file.pages.map((pgno) => {
+          const page = buffer.subarray(at, at + file.pageSize);
+          at += file.pageSize;
+          return [pgno, page];
+        })
+      };
+    }
+    return { seq: batch.seq, capturedAt: batch.capturedAt, files: decoded };
+  });
+}
+
+module.exports = {
+  readWal,
+  createWalShipper,
+  encodeBatches,
+  decodeBatches
+};
@@ -0,0 +1,180 @@
+const path = require('path');
+const { Worker } = require('worker_threads');
+
+const WORKER_SCRIPT = path.join(__dirname, 'readWorker.js');
+const DEFAULT_ROWS_PER_BATCH = 1000;
+
+const OPEN_BRACKET = Buffer.from('[');
+const CLOSE_BRACKET = Buffer.from(']');
+const COMMA = Buffer.from(',');
+
+// Joins the batches a worker posted for one all() into a JSON array
+function toJsonArray(chunks) {
+  const parts = [OPEN_BRACKET];
+  chunks.forEach((chunk, index) => {
+    if (index > 0) parts.push(COMMA);
+    parts.push(chunk);
+  });
+  parts.push(CLOSE_BRACKET);
+  return Buffer.concat(parts);
+}
+
+function toError({ message, code, errno }) {
+  const error = new Error(message);
+  if (code !== undefined) error.code = code;
+  if (errno !== undefined) error.errno = errno;
+  return error;
+}
+
+// Runs reads against a file database on `size` worker threads, each with its
+// own read-only connection (see readWorker.js). Workers start on first use.
+// all() resolves to the JSON-encoded batches, not row objects, so large
+// result sets cost the main thread a buffer copy rather than a parse.
+function createWorkerPool({ filename, size, pragmas = [], rowsPerBatch = DEFAULT_ROWS_PER_BATCH }) {
+  const workers = [];
+  const tasks = new Map();
+  let nextId = 1;
+  let closed = false;
+
+  const stats = {
+    threads: size,
+    tasks: 0,
+    errors: 0,
+    rows: 0,
+    bytes: 0,
+    totalMs: 0,
+    maxMs: 0,
+    maxPending: 0,
+    respawns: 0
+  };
+
+  function settle(task, err, result) {
+    tasks.delete(task.id);
+    task.slot.pending--;
+
+    const elapsedMs = Number(process.hrtime.bigint() - task.started) / 1e6;
+    stats.totalMs += elapsedMs;
+    if (elapsedMs > stats.maxMs) stats.maxMs = elapsedMs;
+
+    if (err) {
+      stats.errors++;
+      task.reject(err);
+    } else {
+      task.resolve(result);
+    }
+  }
+
+  function onMessage(message) {
+    const task = tasks.get(message.id);
+    if (!task) {
+      return;
+    }
+
+    if (message.error) {
+      settle(task, toError(message.error));
+      return;
+    }
+
+    if (message.chunk) {
+      const chunk = Buffer.from(message.chunk.buffer, message.chunk.byteOffset, message.chunk.byteLength);
+      stats.bytes += chunk.length;
+      task.chunks.push(chunk);
+      return;
+    }
+
+    stats.rows += message.rows;
+    settle(task, null, task.method === 'get' ? message.row : task.chunks);
+  }
+
+  function spawn() {
+    const worker = new Worker(WORKER_SCRIPT, { workerData: { filename, pragmas, rowsPerBatch } });
+    const slot = { worker, pending: 0 };
+
+    worker.on('message', onMessage);
+
+    // A crashed worker fails its own reads and is replaced on next use
+    const fail = (err) => {
+      const index = workers.indexOf(slot);
+      if (index === -1) {
+        return;
+      }
+      workers.splice(index, 1);
+      if (!closed) stats.respawns++;
+
+      for (const task of [...tasks.values()]) {
+        if (task.slot === slot) {
+          settle(task, err || new Error('Database worker exited'));
+        }
+      }
+    };
+    worker.on('error', fail);
+    worker.on('exit', () => fail(null));
+
+    workers.push(slot);
+    return slot;
+  }
+
+  function acquire() {
+    if (workers.length < size) {
+      return spawn();
+    }
+
+    let least = workers[0];
+    for (const slot of workers) {
+      if (slot.pending < least.pending) least = slot;
+    }
+    return least;
+  }
+
+  function submit(method, sql, params) {
+    if (closed) {
+      return Promise.reject(new Error('Database worker pool is closed'));
+    }
+
+    return new Promise((resolve, reject) => {
+      const slot = acquire();
+      const id = nextId++;
+      tasks.set(id, { id, method, slot, resolve, reject, chunks: [], started: process.hrtime.bigint() });
+
+      slot.pending++;
+      stats.tasks++;
+      if (tasks.size > stats.maxPending) stats.maxPending = tasks.size;
+
+      slot.worker.postMessage({ id, method, sql, params });
+    });
+  }
+
+  return {
+    get(sql, params = []) {
+      return submit('get', sql, params);
+    },
+
+    // Resolves to an array of Buffers, each a comma-separated run of
+    // JSON-encoded rows; toJsonArray() turns them into one JSON array
+    all(sql, params = []) {
+      return submit('all', sql, params);
+    },
+
+    close() {
+      closed = true;
+      return Promise.all(workers.map(({ worker }) => new Promise((resolve) => {
+        worker.once('exit', () => resolve());
+        worker.postMessage({ method: 'close' });
+      })));
+    },
+
+    getStats() {
+      return {
+        ...stats,
+        running: workers.length,
+        pending: tasks.size,
+        avgMs: stats.tasks ? stats.totalMs / stats.tasks : 0
+      };
+    }
+  };
+}
+
+module.exports = {
+  createWorkerPool,
+  toJsonArray
+};
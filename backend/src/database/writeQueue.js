@@ -0,0 +1,123 @@
+const DEFAULT_MAX_BATCH = 64;
+
+// Group commit: writes queued within `windowMs` of each other (or until
+// `maxBatch` are waiting) are handed to `commit` together, so one COMMIT and
+// one fsync cover the whole batch. Only one batch is in flight at a time;
+// writes arriving meanwhile form the next batch, which starts as soon as the
+// current one finishes, so batches grow with load.
+//
+// `commit(items)` receives [{ work }] and resolves to one { result } or
+// { error } outcome per item, or rejects when the batch as a whole failed.
+function createWriteQueue({ windowMs = 0, maxBatch = DEFAULT_MAX_BATCH, commit }) {
+  const pending = [];
+  let timer = null;
+  let inFlight = null;
+
+  const stats = {
+    writes: 0,
+    batches: 0,
+    failedBatches: 0,
+    lastBatchSize: 0,
+    maxBatchSize: 0,
+    maxQueueDepth: 0
+  };
+
+  // `timer` holds the function that cancels the scheduled flush
+  function schedule() {
+    if (timer || inFlight) {
+      return;
+    }
+    if (pending.length >= maxBatch || windowMs === 0) {
+      const immediate = setImmediate(flush);
+      timer = () => clearImmediate(immediate);
+    } else {
+      const timeout = setTimeout(flush, windowMs);
+      timer = () => clearTimeout(timeout);
+    }
+  }
+
+  function cancelTimer() {
+    if (timer) {
+      timer();
+      timer = null;
+    }
+  }
+
+  function flush() {
+    cancelTimer();
+    if (inFlight || pending.length === 0) {
+      return inFlight || Promise.resolve();
+    }
+
+    const batch = pending.splice(0, maxBatch);
+    stats.batches++;
+    stats.writes += batch.length;
+    stats.lastBatchSize = batch.length;
+    if (batch.length > stats.maxBatchSize) stats.maxBatchSize = batch.length;
+
+    inFlight = Promise.resolve()
+      .then(() => commit(batch.map(({ work }) => ({ work }))))
+      .then(
+        (outcomes) => batch.forEach((item, index) => {
+          const { result, error } = outcomes[index];
+          if (error) {
+            item.reject(error);
+          } else {
+            item.resolve(result);
+          }
+        }),
+        (err) => {
+          stats.failedBatches++;
+          batch.forEach((item) => item.reject(err));
+        }
+      )
+      .finally(() => {
+        inFlight = null;
+        // Writes that queued behind this batch have already waited a commit
+        if (pending.length > 0) {
+          flush();
+        }
+      });
+
+    return inFlight;
+  }
+
+  // Resolves with work(tx)'s result once the batch containing it commits
+  function enqueue(work) {
+    return new Promise((resolve, reject) => {
+      pending.push({ work, resolve, reject });
+      if (pending.length > stats.maxQueueDepth) stats.maxQueueDepth = pending.length;
+      if (pending.length >= maxBatch) {
+        cancelTimer();
+      }
+      schedule();
+    });
+  }
+
+  // Commits everything queued so far (used before closing the database)
+  async function drain() {
+    while (pending.length > 0 || inFlight) {
+      await (inFlight || flush());
+    }
+  }
+
+  function getStats() {
+    return {
+      ...stats,
+      queueDepth: pending.length,
+      avgBatchSize: stats.batches ? stats.writes / stats.batches : 0,
+      windowMs,
+      maxBatch
+    };
+  }
+
+  return {
+    enqueue,
+    drain,
+    getStats
+  };
+}
+
+module.exports = {
+  createWriteQueue
+};
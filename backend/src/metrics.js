@@ -0,0 +1,20 @@
+// Process-wide registry of metric collectors. Modules register a function
+// that returns their current counters; /metrics serves all of them as JSON.
+const collectors = new Map();
+
+function registerMetrics(name, collect) {
+  collectors.set(name, collect);
+}
+
+function collectMetrics() {
+  const metrics = {};
+  for (const [name, collect] of collectors) {
+    metrics[name] = collect();
+  }
+  return metrics;
+}
+
+module.exports = {
+  registerMetrics,
+  collectMetrics
+};
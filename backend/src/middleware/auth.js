@@ -1,7 +1,40 @@
 const { getDatabase } = require('../database/init');
+const { STATEMENTS } = require('../database/statements');
+const query = require('../database/query');
+const { READ_ONLY_REPLICA } = require('../database/replica');
+const { bearerToken, emailHeaderEnabled, verifyToken } = require('../tokens');
 
-// Simple email-based authentication middleware
+// Repositories take req.user: the id for queries, the email to find the
+// user's shard
+function authenticated(req, email, id) {
+  req.userEmail = email;
+  req.userId = id;
+  req.user = { id, email };
+}
+
+// Authenticates a signed access token (Authorization: Bearer, issued by
+// POST /api/auth/login) without touching the database, or else the plain
+// x-user-email header when AUTH_EMAIL_HEADER=on
 function authenticateUser(req, res, next) {
+  const token = bearerToken(req);
+  if (token) {
+    let user;
+    try {
+      user = verifyToken(token);
+    } catch (err) {
+      // The client refreshes its token on TOKEN_EXPIRED and retries
+      return res.status(401).json(err.name === 'TokenExpiredError'
+        ? { error: 'Token expired', code: 'TOKEN_EXPIRED' }
+        : { error: 'Invalid token' });
+    }
+    authenticated(req, user.email, user.id);
+    return next();
+  }
+
+  if (!emailHeaderEnabled()) {
+    return res.status(401).json({ error: 'Bearer token required' });
+  }
+
   const userEmail = req.headers['x-user-email'];
   
   if (!userEmail) {
@@ -14,10 +47,11 @@ function authenticateUser(req, res, next) {
     return res.status(400).json({ error: 'Invalid email format' });
   }
 
-  const db = getDatabase();
-  
-  // Check if user exists, create if not
-  db.get('SELECT email FROM users WHERE email = ?', [userEmail], (err, row) => {
+  const db = getDatabase(userEmail);
+
+  // Resolve the email to its user id once; routes and repositories key
+  // every query on req.userId
+  db.get(STATEMENTS.findUserId, [userEmail], (err, row) => {
     if (err) {
       console.error('Database error:', err);
       return res.status(500).json({ error: 'Internal server error' });
@@ -25,22 +59,43 @@ function authenticateUser(req, res, next) {
     
     if (!row) {
       // Create new user
-      db.run('INSERT INTO users (email) VALUES (?)', [userEmail], (err) => {
-        if (err) {
-          console.error('Error creating user:', err);
-          return res.status(500).json({ error: 'Failed to create user' });
-        }
-        
-        req.userEmail = userEmail;
+      db.write(async (tx) => {
+        const { lastID, changes } = await query.run(tx, STATEMENTS.ensureUser, [userEmail]);
+        // Ignored when a concurrent request created the user first
+        return changes ? { id: lastID } : query.get(tx, STATEMENTS.findUserId, [userEmail]);
+      }).then((created) => {
+        authenticated(req, userEmail, created.id);
         next();
+      }, (err) => {
+        // A follower cannot create users; see forwardReadOnlyErrors
+        if (err.code === READ_ONLY_REPLICA) {
+          return next(err);
+        }
+        console.error('Error creating user:', err);
+        res.status(500).json({ error: 'Failed to create user' });
       });
     } else {
-      req.userEmail = userEmail;
+      authenticated(req, userEmail, row.id);
       next();
     }
   });
 }
 
+// Admin endpoints are limited to the comma-separated ADMIN_EMAILS; use after
+// authenticateUser
+function requireAdmin(req, res, next) {
+  const admins = (process.env.ADMIN_EMAILS || '')
+    .split(',')
+    .map((email) => email.trim().toLowerCase())
+    .filter(Boolean);
+
+  if (!req.userEmail || !admins.includes(req.userEmail.toLowerCase())) {
+    return res.status(403).json({ error: 'Admin access required' });
+  }
+  next();
+}
+
 module.exports = {
-  authenticateUser
+  authenticateUser,
+  requireAdmin
 };
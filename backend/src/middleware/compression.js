@@ -0,0 +1,41 @@
+const zlib = require('zlib');
+const compress = require('compression');
+
+// Responses smaller than this go out as they are; the encoding overhead and
+// CPU are not worth it
+const DEFAULT_THRESHOLD = 1024;
+// Quality 4 compresses better than gzip at about the same speed; 11 is for
+// build-time compression only
+const BROTLI_QUALITY = 4;
+const COMPRESSIBLE = /^(text\/|application\/(json|javascript|xml|x-ndjson)\b|image\/svg\+xml)|\+(json|xml)\b/i;
+
+// Text types only: PDFs and images are compressed already
+function isCompressible(req, res) {
+  const type = res.getHeader('Content-Type');
+  return Boolean(type) && COMPRESSIBLE.test(type);
+}
+
+// Negotiated brotli/gzip (the `compression` package) for responses of
+// compressible types above `threshold` bytes. Streamed responses are
+// compressed as they stream; HEAD requests and Cache-Control: no-transform
+// responses are sent as they are.
+function compression({ threshold = parseInt(process.env.COMPRESSION_THRESHOLD || DEFAULT_THRESHOLD, 10) } = {}) {
+  if (process.env.COMPRESSION === 'off') {
+    return (req, res, next) => next();
+  }
+
+  return compress({
+    threshold,
+    filter: isCompressible,
+    brotli: {
+      params: {
+        [zlib.constants.BROTLI_PARAM_QUALITY]: BROTLI_QUALITY
+      }
+    }
+  });
+}
+
+module.exports = {
+  compression,
+  COMPRESSIBLE
+};
@@ -0,0 +1,100 @@
+const fs = require('fs');
+const path = require('path');
+const SIBLINGS = { br: '.br', gzip: '.gz' };
+
+// The best of `supported` (br before gzip) that an Accept-Encoding header
+// allows, going by its q-values; null for none
+function negotiate(acceptEncoding, supported = Object.keys(SIBLINGS)) {
+  const accepted = new Map();
+  for (const part of String(acceptEncoding || '').split(',')) {
+    const [name, ...params] = part.trim().toLowerCase().split(';');
+    if (!name) continue;
+    const q = params.map((param) => param.trim().match(/^q=([0-9.]+)$/)).find(Boolean);
+    accepted.set(name, q ? parseFloat(q[1]) : 1);
+  }
+
+  let best = null;
+  let bestQ = 0;
+  for (const encoding of supported) {
+    const q = accepted.has(encoding) ? accepted.get(encoding) : (accepted.get('*') || 0);
+    if (q > bestQ) {
+      best = encoding;
+      bestQ = q;
+    }
+  }
+  return best;
+}
+
+// URL path -> the file it serves and the encodings with a sibling file, e.g.
+// '/assets/index-3f2a.js' -> ['br', 'gzip'] for index-3f2a.js.br and
+// index-3f2a.js.gz. A directory maps to its index.html.
+function findPrecompressed(root) {
+  const found = new Map();
+  const visit = (dir) => {
+    for (const entry of fs.readdirSync(dir, { withFileTypes: true })) {
+      const file = path.join(dir, entry.name);
+      if (entry.isDirectory()) {
+        visit(file);
+        continue;
+      }
+      for (const [encoding, extension] of Object.entries(SIBLINGS)) {
+        const original = file.slice(0, -extension.length);
+        if (file.endsWith(extension) && fs.existsSync(original)) {
+          const urlPath = '/' + path.relative(root, original).split(path.sep).join('/');
+          if (!found.has(urlPath)) {
+            found.set(urlPath, { file: urlPath, encodings: [] });
+          }
+          found.get(urlPath).encodings.push(encoding);
+          if (path.basename(urlPath) === 'index.html') {
+            found.set(urlPath.slice(0, -'index.html'.length), found.get(urlPath));
+          }
+        }
+      }
+    }
+  };
+  if (fs.existsSync(root)) {
+    visit(root);
+  }
+  // br first, whatever order the directory listed them in
+  const order = Object.keys(SIBLINGS);
+  for (const asset of found.values()) {
+    asset.encodings.sort((a, b) => order.indexOf(a) - order.indexOf(b));
+  }
+  return found;
+}
+
+// Serves the .br or .gz sibling the frontend build wrote next to each asset
+// (see frontend/vite.config.ts) in place of the asset itself. The directory
+// is scanned once here, so a request costs a map lookup and no compression.
+// Mount before express.static(root), which then sends the sibling file.
+function precompressed(root) {
+  const available = findPrecompressed(root);
+
+  return function servePrecompressed(req, res, next) {
+    if (req.method !== 'GET' && req.method !== 'HEAD') {
+      return next();
+    }
+    const asset = available.get(req.path);
+    if (!asset) {
+      return next();
+    }
+
+    res.vary('Accept-Encoding');
+    const encoding = negotiate(req.headers['accept-encoding'], asset.encodings);
+    if (!encoding) {
+      return next();
+    }
+
+    // The original's type, not that of a .br/.gz file
+    res.type(path.extname(asset.file));
+    res.setHeader('Content-Encoding', encoding);
+    req.url = asset.file + SIBLINGS[encoding] + req.url.slice(req.path.length);
+    next();
+  };
+}
+
+module.exports = {
+  precompressed,
+  findPrecompressed,
+  negotiate
+};
@@ -0,0 +1,236 @@
+const { bearerToken, verifyToken } = require('../tokens');
+const { isClusterWorker, callPrimary } = require('../cluster');
+
+// Each user gets one token bucket per class: `burst` requests at once, then
+// `perMinute` as the bucket refills
+const DEFAULT_LIMITS = {
+  read: { perMinute: 120, burst: 120 },
+  write: { perMinute: 60, burst: 30 },
+  export: { perMinute: 2, burst: 5 },
+  // Login and refresh carry no valid access token, so they are keyed by
+  // client address; their own bucket keeps an office behind one NAT address
+  // from sharing the write budget
+  auth: { perMinute: 60, burst: 60 }
+};
+const DEFAULT_SWEEP_MS = 60 * 1000;
+const SAFE_METHODS = new Set(['GET', 'HEAD', 'OPTIONS']);
+const AUTH_PATHS = new Set(['/api/auth/login', '/api/auth/refresh']);
+
+// RATE_LIMIT_<CLASS>_PER_MINUTE and RATE_LIMIT_<CLASS>_BURST override the
+// defaults; a rate of 0 leaves the class unlimited
+function limitsFromEnv() {
+  const limits = {};
+  for (const [name, defaults] of Object.entries(DEFAULT_LIMITS)) {
+    const prefix = `RATE_LIMIT_${name.toUpperCase()}`;
+    limits[name] = {
+      perMinute: parseFloat(process.env[`${prefix}_PER_MINUTE`] || defaults.perMinute),
+      burst: parseInt(process.env[`${prefix}_BURST`] || defaults.burst, 10)
+    };
+  }
+  return limits;
+}
+
+function requestClass(req) {
+  const path = req.baseUrl + req.path;
+  if (path.startsWith('/api/reports/export/')) {
+    return 'export';
+  }
+  if (AUTH_PATHS.has(path) && req.method === 'POST') {
+    return 'auth';
+  }
+  return SAFE_METHODS.has(req.method) ? 'read' : 'write';
+}
+
+// Users with a valid access token by email, so people behind one NAT
+// address do not share a budget; everything else (login, health checks,
+// the unverified x-user-email header) by client address, so a client cannot
+// get a fresh bucket, or spend someone else's, by changing a header
+function requestKey(req) {
+  const token = bearerToken(req);
+  if (token) {
+    try {
+      return `user:${verifyToken(token).email.toLowerCase()}`;
+    } catch (err) {
+      // An invalid or expired token counts against the address
+    }
+  }
+  return `ip:${req.ip}`;
+}
+
+// Token buckets for every (class, key); `take` spends one token. Buckets
+// refill lazily from the time of their last request, so a request costs one
+// map lookup and no timers run per bucket.
+function createBucketStore({ limits = limitsFromEnv(), sweepMs = DEFAULT_SWEEP_MS, now = Date.now } = {}) {
+  const classes = new Map();
+  for (const [name, { perMinute, burst }] of Object.entries(limits)) {
+    if (perMinute > 0 && burst >= 1) {
+      classes.set(name, {
+        perMinute,
+        burst,
+        perMs: perMinute / 60000,
+        windowSeconds: Math.ceil((burst * 60) / perMinute),
+        buckets: new Map(),
+        evicted: 0
+      });
+    }
+  }
+
+  // Resolves the outcome for one request, or null for an unlimited class
+  function take(className, key) {
+    const limit = classes.get(className);
+    if (!limit) {
+      return null;
+    }
+
+    const time = now();
+    let bucket = limit.buckets.get(key);
+    if (bucket) {
+      bucket.tokens = Math.min(limit.burst, bucket.tokens + (time - bucket.updatedAt) * limit.perMs);
+      bucket.updatedAt = time;
+    } else {
+      bucket = { tokens: limit.burst, updatedAt: time };
+      limit.buckets.set(key, bucket);
+    }
+
+    const allowed = bucket.tokens >= 1;
+    if (allowed) {
+      bucket.tokens -= 1;
+    }
+    return {
+      allowed,
+      limit: limit.burst,
+      windowSeconds: limit.windowSeconds,
+      remaining: Math.floor(bucket.tokens),
+      retryAfterMs: allowed ? 0 : (1 - bucket.tokens) / limit.perMs,
+      fullInMs: (limit.burst - bucket.tokens) / limit.perMs
+    };
+  }
+
+  // A bucket that would have refilled completely is the same as no bucket
+  function sweep() {
+    const time = now();
+    for (const limit of classes.values()) {
+      for (const [key, bucket] of limit.buckets) {
+        if (bucket.tokens + (time - bucket.updatedAt) * limit.perMs >= limit.burst) {
+          limit.buckets.delete(key);
+          limit.evicted++;
+        }
+      }
+    }
+  }
+
+  const timer = setInterval(sweep, sweepMs);
+  timer.unref();
+
+  function getStats() {
+    const stats = {};
+    for (const [name, limit] of classes) {
+      stats[name] = {
+        perMinute: limit.perMinute,
+        burst: limit.burst,
+        buckets: limit.buckets.size,
+        evicted: limit.evicted
+      };
+    }
+    return stats;
+  }
+
+  return {
+    take,
+    sweep,
+    stop: () => clearInterval(timer),
+    getStats
+  };
+}
+
+// In a cluster worker the buckets live in the primary (see cluster.js), so
+// every worker draws on the same budgets
+function createSharedStore() {
+  return {
+    take: (className, key) => callPrimary('rateLimit', 'take', className, key),
+    sweep: () => {},
+    stop: () => {},
+    getStats: () => ({})
+  };
+}
+
+function createRateLimiter({
+  limits,
+  sweepMs,
+  now,
+  classOf = requestClass,
+  keyOf = requestKey,
+  skip = () => false,
+  store = isClusterWorker() ? createSharedStore() : createBucketStore({ limits, sweepMs, now })
+} = {}) {
+  // Allowed and limited requests, counted where they were served
+  const counts = {};
+  for (const name of Object.keys(store.getStats())) {
+    counts[name] = { allowed: 0, limited: 0, unchecked: 0 };
+  }
+  const countsFor = (className) => {
+    if (!counts[className]) {
+      counts[className] = { allowed: 0, limited: 0, unchecked: 0 };
+    }
+    return counts[className];
+  };
+
+  function apply(className, outcome, res, next) {
+    if (!outcome) {
+      return next();
+    }
+
+    const { allowed, limit, windowSeconds, remaining, retryAfterMs, fullInMs } = outcome;
+    res.setHeader('RateLimit-Policy', `${limit};w=${windowSeconds}`);
+    res.setHeader('RateLimit-Limit', limit);
+    res.setHeader('RateLimit-Remaining', remaining);
+    res.setHeader('RateLimit-Reset', Math.ceil(fullInMs / 1000));
+
+    if (!allowed) {
+      countsFor(className).limited++;
+      const retryAfter = Math.ceil(retryAfterMs / 1000);
+      res.setHeader('Retry-After', retryAfter);
+      return res.status(429).json({ error: 'Too many requests', retryAfter });
+    }
+    countsFor(className).allowed++;
+    next();
+  }
+
+  function rateLimiter(req, res, next) {
+    if (skip(req)) {
+      return next();
+    }
+
+    const className = classOf(req);
+    const outcome = store.take(className, keyOf(req));
+    if (outcome && typeof outcome.then === 'function') {
+      // Requests go through unchecked if the primary cannot answer
+      return outcome.then(
+        (shared) => apply(className, shared, res, next),
+        () => {
+          countsFor(className).unchecked++;
+          next();
+        }
+      );
+    }
+    apply(className, outcome, res, next);
+  }
+
+  rateLimiter.sweep = store.sweep;
+  rateLimiter.stop = store.stop;
+  rateLimiter.getStats = () => {
+    const stats = store.getStats();
+    for (const [name, count] of Object.entries(counts)) {
+      stats[name] = { ...stats[name], ...count };
+    }
+    return stats;
+  };
+  return rateLimiter;
+}
+
+module.exports = {
+  createRateLimiter,
+  createBucketStore,
+  requestClass,
+  requestKey
+};
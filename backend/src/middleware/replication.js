@@ -0,0 +1,151 @@
+const crypto = require('crypto');
+const http = require('http');
+const https = require('https');
+const { getReplica, getShipper } = require('../database/init');
+const { READ_ONLY_REPLICA } = require('../database/replica');
+const { requestEmail } = require('../tokens');
+
+const POSITION_HEADER = 'x-replication-position';
+// How long a read on a follower may wait for the reader's own last write
+// before it is sent to the primary instead
+const DEFAULT_READ_WAIT_MS = 1000;
+const POSITION_TTL_MS = 60000;
+const MAX_TRACKED_USERS = 10000;
+
+// Primary position after each user's last write forwarded by this follower
+const lastWrites = new Map();
+
+// Requests from followers (and writes they forward) carry REPLICATION_TOKEN
+function isReplicationPeer(req) {
+  const token = process.env.REPLICATION_TOKEN;
+  const given = req.headers['x-replication-token'];
+  if (!token || typeof given !== 'string') {
+    return false;
+  }
+  const expected = Buffer.from(token);
+  const actual = Buffer.from(given);
+  return actual.length === expected.length && crypto.timingSafeEqual(actual, expected);
+}
+
+function rememberWrite(email, position) {
+  lastWrites.delete(email);
+  lastWrites.set(email, { position, expiresAt: Date.now() + POSITION_TTL_MS });
+  if (lastWrites.size > MAX_TRACKED_USERS) {
+    lastWrites.delete(lastWrites.keys().next().value);
+  }
+}
+
+function lastWrite(email) {
+  const entry = lastWrites.get(email);
+  if (entry && entry.expiresAt < Date.now()) {
+    lastWrites.delete(email);
+    return null;
+  }
+  return entry ? entry.position : null;
+}
+
+// Sends the request on to the primary (REPLICA_OF) and streams its response
+// back, noting the position a write left the primary at
+function forwardToPrimary(req, res) {
+  const target = new URL(req.originalUrl, process.env.REPLICA_OF);
+  const client = target.protocol === 'https:' ? https : http;
+  const headers = {
+    ...req.headers,
+    host: target.host,
+    'x-forwarded-for': [req.headers['x-forwarded-for'], req.socket.remoteAddress].filter(Boolean).join(', '),
+    'x-replication-token': process.env.REPLICATION_TOKEN
+  };
+
+  const upstream = client.request(target, { method: req.method, headers }, (primaryRes) => {
+    const position = primaryRes.headers[POSITION_HEADER];
+    const email = requestEmail(req);
+    if (position && email) {
+      rememberWrite(email, position);
+    }
+    res.writeHead(primaryRes.statusCode, primaryRes.headers);
+    primaryRes.pipe(res);
+  });
+
+  upstream.on('error', (err) => {
+    console.error('Error forwarding request to primary:', err);
+    if (res.headersSent) {
+      res.destroy();
+    } else {
+      res.status(502).json({ error: 'Primary unavailable' });
+    }
+  });
+
+  if (req.readableEnded) {
+    upstream.end();
+  } else {
+    req.pipe(upstream);
+  }
+}
+
+// On a follower: writes go to the primary; reads are served here, but a
+// user's read waits until this replica has caught up with their last write
+// (X-Replication-Position from the client, or the last write this follower
+// forwarded for them). Mount before the body parsers so bodies stream on.
+function replicaRouting(req, res, next) {
+  if (!process.env.REPLICA_OF) {
+    return next();
+  }
+  if (req.method !== 'GET' && req.method !== 'HEAD') {
+    return forwardToPrimary(req, res);
+  }
+
+  const email = requestEmail(req);
+  const position = req.headers[POSITION_HEADER] || (email && lastWrite(email));
+  if (!email || !position) {
+    return next();
+  }
+
+  const waitMs = parseInt(process.env.DB_REPLICA_READ_WAIT_MS || DEFAULT_READ_WAIT_MS, 10);
+  getReplica(email).waitFor(position, waitMs).then((caughtUp) => {
+    if (caughtUp) {
+      next();
+    } else {
+      forwardToPrimary(req, res);
+    }
+  });
+}
+
+// On a primary: a write's response carries the position that includes it,
+// once the shipper has captured it, for followers and clients to wait on
+function replicationPosition(req, res, next) {
+  if (req.method === 'GET' || req.method === 'HEAD' || !process.env.REPLICATION_TOKEN || process.env.REPLICA_OF) {
+    return next();
+  }
+
+  const end = res.end;
+  res.end = function(...args) {
+    res.end = end;
+    const shipper = req.userEmail ? getShipper(req.userEmail) : null;
+    if (!shipper || res.headersSent) {
+      return end.apply(res, args);
+    }
+
+    shipper.capture()
+      .then(() => res.setHeader('X-Replication-Position', shipper.position()))
+      .catch((err) => console.error('Error capturing WAL frames:', err))
+      .finally(() => end.apply(res, args));
+    return res;
+  };
+  next();
+}
+
+// A read that turned out to need a write on a follower (e.g. creating a
+// first-time user) is retried on the primary
+function forwardReadOnlyErrors(err, req, res, next) {
+  if (err && err.code === READ_ONLY_REPLICA && !res.headersSent) {
+    return forwardToPrimary(req, res);
+  }
+  next(err);
+}
+
+module.exports = {
+  isReplicationPeer,
+  replicaRouting,
+  replicationPosition,
+  forwardReadOnlyErrors
+};
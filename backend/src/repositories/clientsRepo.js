@@ -0,0 +1,80 @@
+const { getDatabase, getArchive } = require('../database/init');
+const { STATEMENTS } = require('../database/statements');
+const query = require('../database/query');
+
+const CLIENT_COLUMNS = 'id, name, description, department, email, created_at, updated_at';
+const UPDATABLE_FIELDS = ['name', 'description', 'department', 'email'];
+
+// `user` is req.user: queries key on user.id, user.email picks the shard
+async function list(user) {
+  return query.all(getDatabase(user.email), STATEMENTS.listClients, [user.id]);
+}
+
+async function findById(id, user) {
+  return query.get(getDatabase(user.email), STATEMENTS.findClient, [id, user.id]);
+}
+
+async function create(user, { name, description, department, email }) {
+  return getDatabase(user.email).write(async (tx) => {
+    const rows = await query.all(tx, STATEMENTS.insertClient, [
+      name, description || null, department || null, email || null, user.id
+    ]);
+    return rows[0];
+  });
+}
+
+// Resolves to the updated client, or null when it doesn't belong to the user
+async function update(id, user, fields) {
+  const updates = [];
+  const values = [];
+
+  for (const field of UPDATABLE_FIELDS) {
+    if (fields[field] !== undefined) {
+      updates.push(`${field} = ?`);
+      values.push(field === 'name' ? fields[field] : fields[field] || null);
+    }
+  }
+
+  updates.push('updated_at = CURRENT_TIMESTAMP');
+  values.push(id, user.id);
+
+  const sql = `UPDATE clients SET ${updates.join(', ')} WHERE id = ? AND user_id = ? RETURNING ${CLIENT_COLUMNS}`;
+
+  return getDatabase(user.email).write(async (tx) => {
+    const rows = await query.all(tx, sql, values);
+    return rows[0] || null;
+  });
+}
+
+// Work entries go with the client through ON DELETE CASCADE; archived ones
+// have no foreign key and are deleted here
+async function remove(id, user) {
+  const archive = getArchive(user.email);
+  return getDatabase(user.email).write(async (tx) => {
+    const { changes } = await query.run(tx, STATEMENTS.deleteClient, [id, user.id]);
+    if (changes > 0 && archive) {
+      await query.run(tx, STATEMENTS.deleteArchivedEntriesForClient, [id, user.id]);
+    }
+    return changes > 0;
+  });
+}
+
+async function removeAll(user) {
+  const archive = getArchive(user.email);
+  return getDatabase(user.email).write(async (tx) => {
+    const { changes } = await query.run(tx, STATEMENTS.deleteAllClients, [user.id]);
+    if (archive) {
+      await query.run(tx, STATEMENTS.deleteAllArchivedEntries, [user.id]);
+    }
+    return changes;
+  });
+}
+
+module.exports = {
+  list,
+  findById,
+  create,
+  update,
+  remove,
+  removeAll
+};
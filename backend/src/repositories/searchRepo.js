@@ -0,0 +1,42 @@
+const { getDatabase } = require('../database/init');
+const { STATEMENTS } = require('../database/statements');
+const query = require('../database/query');
+
+// Statement and searched FTS5 columns for each result type
+const TYPES = {
+  entries: { sql: STATEMENTS.searchWorkEntries, columns: 'description' },
+  clients: { sql: STATEMENTS.searchClients, columns: 'name description' }
+};
+
+// FTS5 MATCH expression for the words in `text`, restricted to the user's
+// rows by their owner token (migration 10). Every word is a quoted string
+// and the last one a prefix, so results follow what is being typed and
+// nothing in the text is read as query syntax. Null when there are no words.
+function matchQuery(userId, columns, text) {
+  const words = text.match(/[\p{L}\p{N}]+/gu);
+  if (!words) {
+    return null;
+  }
+  const terms = words.map((word) => `"${word}"`);
+  terms[terms.length - 1] += '*';
+  return `owner : "u${userId}" AND {${columns}} : (${terms.join(' ')})`;
+}
+
+// `user` is req.user. Resolves to one page of rows, best match first, and
+// whether another page follows; highlighted columns carry \x02/\x03 marks.
+async function search(user, { q, type = 'entries', limit, offset = 0 }) {
+  const { sql, columns } = TYPES[type];
+  const match = matchQuery(user.id, columns, q);
+  if (!match) {
+    return { results: [], hasMore: false };
+  }
+
+  // One extra row tells whether there is a next page without counting
+  const rows = await query.all(getDatabase(user.email), sql, [match, user.id, limit + 1, offset]);
+  return { results: rows.slice(0, limit), hasMore: rows.length > limit };
+}
+
+module.exports = {
+  matchQuery,
+  search
+};
@@ -0,0 +1,166 @@
+const { getDatabase, getArchive } = require('../database/init');
+const { STATEMENTS } = require('../database/statements');
+const query = require('../database/query');
+const { toDayNumber, dayRange } = require('../database/days');
+const { entryQuery } = require('../database/archive');
+
+const CLIENT_NOT_FOUND = 'CLIENT_NOT_FOUND';
+const ENTRY_ARCHIVED = 'ENTRY_ARCHIVED';
+
+const RETURNING_COLUMNS = `
+  RETURNING id, client_id, hundredths / 100.0 AS hours, description,
+            date(day * 86400, 'unixepoch') AS date, created_at, updated_at,
+            (SELECT name FROM clients WHERE clients.id = work_entries.client_id) AS client_name`;
+
+// Hours are stored as whole hundredths (see migration 007); Joi has already
+// limited them to two decimals, so rounding only removes float noise
+function toHundredths(hours) {
+  return Math.round(hours * 100);
+}
+
+function clientNotFoundError() {
+  const error = new Error('Client not found or does not belong to user');
+  error.code = CLIENT_NOT_FOUND;
+  return error;
+}
+
+function entryArchivedError() {
+  const error = new Error('Work entry is archived');
+  error.code = ENTRY_ARCHIVED;
+  return error;
+}
+
+// Archived entries keep their ids but are read-only (see archive.js), so an
+// id missing from work_entries may still name one of the user's entries.
+// Rejects with code ENTRY_ARCHIVED when it does.
+async function rejectIfArchived(connection, id, user) {
+  if (!getArchive(user.email)) {
+    return;
+  }
+  const archived = await query.get(connection, STATEMENTS.findArchivedEntryId, [id, user.id]);
+  if (archived) {
+    throw entryArchivedError();
+  }
+}
+
+// `user` is req.user: queries key on user.id, user.email picks the shard.
+// `from`/`to` (Dates or YYYY-MM-DD) narrow the list to a day range. Only
+// hot entries are listed unless `archived` is set (see archive.js).
+function listQuery(user, { clientId, from, to, archived }) {
+  const range = dayRange({ from, to });
+  const [name, params] = clientId
+    ? ['listWorkEntriesForClient', [user.id, clientId, ...range]]
+    : ['listWorkEntries', [user.id, ...range]];
+  return entryQuery(archived ? getArchive(user.email) : null, name, params, range[0]);
+}
+
+async function list(user, options = {}) {
+  const [sql, params] = listQuery(user, options);
+  return query.all(getDatabase(user.email), sql, params);
+}
+
+// Same rows as list(), as a JSON array in a Buffer for routes that only
+// forward them (see query.allJson)
+async function listJson(user, options = {}) {
+  const [sql, params] = listQuery(user, options);
+  return query.allJson(getDatabase(user.email), sql, params);
+}
+
+async function findById(id, user) {
+  const db = getDatabase(user.email);
+  const entry = await query.get(db, STATEMENTS.findWorkEntry, [id, user.id]);
+  if (!entry) {
+    await rejectIfArchived(db, id, user);
+  }
+  return entry;
+}
+
+// Ownership check, insert and client-name lookup happen in one statement
+async function create(user, { clientId, hours, description, date }) {
+  return getDatabase(user.email).write(async (tx) => {
+    const rows = await query.all(tx, STATEMENTS.insertWorkEntry, [
+      toHundredths(hours), description || null, toDayNumber(date), clientId, user.id
+    ]);
+    if (!rows[0]) {
+      throw clientNotFoundError();
+    }
+    return rows[0];
+  });
+}
+
+// Resolves to the updated entry, or null when it doesn't belong to the user.
+// Rejects with code CLIENT_NOT_FOUND when moving it to someone else's client,
+// or ENTRY_ARCHIVED when it has been archived.
+async function update(id, user, fields) {
+  const updates = [];
+  const values = [];
+
+  if (fields.clientId !== undefined) {
+    updates.push('client_id = ?');
+    values.push(fields.clientId);
+  }
+
+  if (fields.hours !== undefined) {
+    updates.push('hundredths = ?');
+    values.push(toHundredths(fields.hours));
+  }
+
+  if (fields.description !== undefined) {
+    updates.push('description = ?');
+    values.push(fields.description || null);
+  }
+
+  if (fields.date !== undefined) {
+    updates.push('day = ?');
+    values.push(toDayNumber(fields.date));
+  }
+
+  updates.push('updated_at = CURRENT_TIMESTAMP');
+  values.push(id, user.id);
+
+  let where = 'id = ? AND user_id = ?';
+  if (fields.clientId !== undefined) {
+    where += ' AND EXISTS (SELECT 1 FROM clients c WHERE c.id = ? AND c.user_id = ?)';
+    values.push(fields.clientId, user.id);
+  }
+
+  const sql = `UPDATE work_entries SET ${updates.join(', ')} WHERE ${where} ${RETURNING_COLUMNS}`;
+
+  return getDatabase(user.email).write(async (tx) => {
+    const rows = await query.all(tx, sql, values);
+    if (rows[0]) {
+      return rows[0];
+    }
+
+    // Nothing updated: work out whether the entry or the client was missing
+    if (fields.clientId !== undefined) {
+      const entry = await query.get(tx, STATEMENTS.findOwnedWorkEntryId, [id, user.id]);
+      if (entry) {
+        throw clientNotFoundError();
+      }
+    }
+    await rejectIfArchived(tx, id, user);
+    return null;
+  });
+}
+
+async function remove(id, user) {
+  return getDatabase(user.email).write(async (tx) => {
+    const { changes } = await query.run(tx, STATEMENTS.deleteWorkEntry, [id, user.id]);
+    if (!changes) {
+      await rejectIfArchived(tx, id, user);
+    }
+    return changes > 0;
+  });
+}
+
+module.exports = {
+  CLIENT_NOT_FOUND,
+  ENTRY_ARCHIVED,
+  list,
+  listJson,
+  findById,
+  create,
+  update,
+  remove
+};
@@ -0,0 +1,17 @@
+const express = require('express');
+const { getQueryReport } = require('../database/init');
+const { authenticateUser, requireAdmin } = require('../middleware/auth');
+
+const router = express.Router();
+
+// Admin only: these expose SQL text and timings across all users
+router.use(authenticateUser);
+router.use(requireAdmin);
+
+// Statement timings bucketed by normalised SQL (p50/p95/max), slowest
+// total first, plus the most recent slow-query log entries
+router.get('/queries', (req, res) => {
+  res.json(getQueryReport());
+});
+
+module.exports = router;
@@ -1,69 +1,82 @@
 const express = require('express');
 const { getDatabase } = require('../database/init');
-const { emailSchema } = require('../validation/schemas');
+const { STATEMENTS } = require('../database/statements');
+const query = require('../database/query');
+const { emailSchema, refreshTokenSchema } = require('../validation/schemas');
 const { authenticateUser } = require('../middleware/auth');
+const { REFRESH, issueTokens, verifyToken } = require('../tokens');
 
 const router = express.Router();
 
-// Login endpoint - creates user if doesn't exist
+// Login endpoint - creates user if doesn't exist. With tokens this is the
+// only place users are created; INSERT OR IGNORE lets two first logins for
+// one email both succeed.
 router.post('/login', async (req, res, next) => {
+  const { error, value } = emailSchema.validate(req.body);
+  if (error) {
+    return next(error);
+  }
+
+  const { email } = value;
+
   try {
-    const { error, value } = emailSchema.validate(req.body);
-    if (error) {
-      return next(error);
+    const db = getDatabase(email);
+
+    let user = await query.get(db, STATEMENTS.findUser, [email]);
+    let created = false;
+    if (!user) {
+      user = await db.write(async (tx) => {
+        const { changes } = await query.run(tx, STATEMENTS.ensureUser, [email]);
+        created = changes > 0;
+        return query.get(tx, STATEMENTS.findUser, [email]);
+      });
     }
 
-    const { email } = value;
-    const db = getDatabase();
+    res.status(created ? 201 : 200).json({
+      message: created ? 'User created and logged in successfully' : 'Login successful',
+      user: {
+        email: user.email,
+        createdAt: user.created_at
+      },
+      ...issueTokens({ id: user.id, email: user.email })
+    });
+  } catch (err) {
+    next(err);
+  }
+});
 
-    // Check if user exists
-    db.get('SELECT email, created_at FROM users WHERE email = ?', [email], (err, row) => {
-      if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Internal server error' });
-      }
+// Trade a refresh token for a new token pair. Unlike access tokens this
+// checks the user still exists, so a deleted user stops at the next refresh.
+router.post('/refresh', async (req, res, next) => {
+  const { error, value } = refreshTokenSchema.validate(req.body);
+  if (error) {
+    return next(error);
+  }
 
-      if (row) {
-        // User exists
-        return res.json({
-          message: 'Login successful',
-          user: {
-            email: row.email,
-            createdAt: row.created_at
-          }
-        });
-      } else {
-        // Create new user
-        db.run('INSERT INTO users (email) VALUES (?)', [email], function(err) {
-          if (err) {
-            console.error('Error creating user:', err);
-            return res.status(500).json({ error: 'Failed to create user' });
-          }
+  let user;
+  try {
+    user = verifyToken(value.refreshToken, REFRESH);
+  } catch (err) {
+    return res.status(401).json({ error: 'Invalid or expired refresh token' });
+  }
 
-          res.status(201).json({
-            message: 'User created and logged in successfully',
-            user: {
-              email: email,
-              createdAt: new Date().toISOString()
-            }
-          });
-        });
-      }
-    });
-  } catch (error) {
-    next(error);
+  try {
+    const row = await query.get(getDatabase(user.email), STATEMENTS.findUserId, [user.email]);
+
+    if (!row || row.id !== user.id) {
+      return res.status(401).json({ error: 'Invalid or expired refresh token' });
+    }
+
+    res.json(issueTokens(user));
+  } catch (err) {
+    next(err);
   }
 });
 
 // Get current user info
-router.get('/me', authenticateUser, (req, res) => {
-  const db = getDatabase();
-  
-  db.get('SELECT email, created_at FROM users WHERE email = ?', [req.userEmail], (err, row) => {
-    if (err) {
-      console.error('Database error:', err);
-      return res.status(500).json({ error: 'Internal server error' });
-    }
+router.get('/me', authenticateUser, async (req, res, next) => {
+  try {
+    const row = await query.get(getDatabase(req.userEmail), STATEMENTS.findUser, [req.userEmail]);
 
     if (!row) {
       return res.status(404).json({ error: 'User not found' });
@@ -75,7 +88,9 @@ router.get('/me', authenticateUser, (req, res) => {
         createdAt: row.created_at
       }
     });
-  });
+  } catch (err) {
+    next(err);
+  }
 });
 
 module.exports = router;
@@ -1,5 +1,5 @@
 const express = require('express');
-const { getDatabase } = require('../database/init');
+const clientsRepo = require('../repositories/clientsRepo');
 const { authenticateUser } = require('../middleware/auth');
 const { clientSchema, updateClientSchema } = require('../validation/schemas');
 
@@ -9,243 +9,118 @@ const router = express.Router();
 router.use(authenticateUser);
 
 // Get all clients for authenticated user
-router.get('/', (req, res) => {
-  const db = getDatabase();
-  
-  db.all(
-    'SELECT id, name, description, department, email, created_at, updated_at FROM clients WHERE user_email = ? ORDER BY name',
-    [req.userEmail],
-    (err, rows) => {
-      if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Internal server error' });
-      }
-      
-      res.json({ clients: rows });
-    }
-  );
+router.get('/', async (req, res, next) => {
+  try {
+    const clients = await clientsRepo.list(req.user);
+    res.json({ clients });
+  } catch (err) {
+    next(err);
+  }
 });
 
 // Get specific client
-router.get('/:id', (req, res) => {
+router.get('/:id', async (req, res, next) => {
   const clientId = parseInt(req.params.id);
   
   if (isNaN(clientId)) {
     return res.status(400).json({ error: 'Invalid client ID' });
   }
   
-  const db = getDatabase();
-  
-  db.get(
-    'SELECT id, name, description, department, email, created_at, updated_at FROM clients WHERE id = ? AND user_email = ?',
-    [clientId, req.userEmail],
-    (err, row) => {
-      if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Internal server error' });
-      }
-      
-      if (!row) {
-        return res.status(404).json({ error: 'Client not found' });
-      }
-      
-      res.json({ client: row });
+  try {
+    const client = await clientsRepo.findById(clientId, req.user);
+    
+    if (!client) {
+      return res.status(404).json({ error: 'Client not found' });
     }
-  );
+    
+    res.json({ client });
+  } catch (err) {
+    next(err);
+  }
 });
 
 // Create new client
-router.post('/', (req, res, next) => {
-  try {
-    const { error, value } = clientSchema.validate(req.body);
-    if (error) {
-      return next(error);
-    }
-
-    const { name, description, department, email } = value;
-    const db = getDatabase();
-
-    db.run(
-      'INSERT INTO clients (name, description, department, email, user_email) VALUES (?, ?, ?, ?, ?)',
-      [name, description || null, department || null, email || null, req.userEmail],
-      function(err) {
-        if (err) {
-          console.error('Database error:', err);
-          return res.status(500).json({ error: 'Failed to create client' });
-        }
-
-        // Return the created client
-        db.get(
-          'SELECT id, name, description, department, email, created_at, updated_at FROM clients WHERE id = ?',
-          [this.lastID],
-          (err, row) => {
-            if (err) {
-              console.error('Database error:', err);
-              return res.status(500).json({ error: 'Client created but failed to retrieve' });
-            }
+router.post('/', async (req, res, next) => {
+  const { error, value } = clientSchema.validate(req.body);
+  if (error) {
+    return next(error);
+  }
 
-            res.status(201).json({ 
-              message: 'Client created successfully',
-              client: row 
-            });
-          }
-        );
-      }
-    );
-  } catch (error) {
-    next(error);
+  try {
+    const client = await clientsRepo.create(req.user, value);
+
+    res.status(201).json({ 
+      message: 'Client created successfully',
+      client
+    });
+  } catch (err) {
+    next(err);
   }
 });
 
 // Update client
-router.put('/:id', (req, res, next) => {
-  try {
-    const clientId = parseInt(req.params.id);
-    
-    if (isNaN(clientId)) {
-      return res.status(400).json({ error: 'Invalid client ID' });
-    }
-
-    const { error, value } = updateClientSchema.validate(req.body);
-    if (error) {
-      return next(error);
-    }
-
-    const db = getDatabase();
-
-    // Check if client exists and belongs to user
-    db.get(
-      'SELECT id FROM clients WHERE id = ? AND user_email = ?',
-      [clientId, req.userEmail],
-      (err, row) => {
-        if (err) {
-          console.error('Database error:', err);
-          return res.status(500).json({ error: 'Internal server error' });
-        }
-
-        if (!row) {
-          return res.status(404).json({ error: 'Client not found' });
-        }
-
-        // Build update query dynamically
-        const updates = [];
-        const values = [];
-
-        if (value.name !== undefined) {
-          updates.push('name = ?');
-          values.push(value.name);
-        }
-
-        if (value.description !== undefined) {
-          updates.push('description = ?');
-          values.push(value.description || null);
-        }
-
-        if (value.department !== undefined) {
-          updates.push('department = ?');
-          values.push(value.department || null);
-        }
-
-        if (value.email !== undefined) {
-          updates.push('email = ?');
-          values.push(value.email || null);
-        }
-
-        updates.push('updated_at = CURRENT_TIMESTAMP');
-        values.push(clientId, req.userEmail);
+router.put('/:id', async (req, res, next) => {
+  const clientId = parseInt(req.params.id);
+  
+  if (isNaN(clientId)) {
+    return res.status(400).json({ error: 'Invalid client ID' });
+  }
 
-        const query = `UPDATE clients SET ${updates.join(', ')} WHERE id = ? AND user_email = ?`;
+  const { error, value } = updateClientSchema.validate(req.body);
+  if (error) {
+    return next(error);
+  }
 
-        db.run(query, values, function(err) {
-          if (err) {
-            console.error('Database error:', err);
-            return res.status(500).json({ error: 'Failed to update client' });
-          }
+  try {
+    const client = await clientsRepo.update(clientId, req.user, value);
 
-          // Return updated client
-          db.get(
-            'SELECT id, name, description, department, email, created_at, updated_at FROM clients WHERE id = ?',
-            [clientId],
-            (err, row) => {
-              if (err) {
-                console.error('Database error:', err);
-                return res.status(500).json({ error: 'Client updated but failed to retrieve' });
-              }
+    if (!client) {
+      return res.status(404).json({ error: 'Client not found' });
+    }
 
-              res.json({
-                message: 'Client updated successfully',
-                client: row
-              });
-            }
-          );
-        });
-      }
-    );
-  } catch (error) {
-    next(error);
+    res.json({
+      message: 'Client updated successfully',
+      client
+    });
+  } catch (err) {
+    next(err);
   }
 });
 
 // Delete all clients for authenticated user
-router.delete('/', (req, res) => {
-  const db = getDatabase();
-  
-  db.run(
-    'DELETE FROM clients WHERE user_email = ?',
-    [req.userEmail],
-    function(err) {
-      if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Failed to delete clients' });
-      }
-      
-      res.json({ 
-        message: 'All clients deleted successfully',
-        deletedCount: this.changes
-      });
-    }
-  );
+router.delete('/', async (req, res, next) => {
+  try {
+    const deletedCount = await clientsRepo.removeAll(req.user);
+    
+    res.json({ 
+      message: 'All clients deleted successfully',
+      deletedCount
+    });
+  } catch (err) {
+    next(err);
+  }
 });
 
 // Delete client
-router.delete('/:id', (req, res) => {
+router.delete('/:id', async (req, res, next) => {
   const clientId = parseInt(req.params.id);
   
   if (isNaN(clientId)) {
     return res.status(400).json({ error: 'Invalid client ID' });
   }
   
-  const db = getDatabase();
-  
-  // Check if client exists and belongs to user
-  db.get(
-    'SELECT id FROM clients WHERE id = ? AND user_email = ?',
-    [clientId, req.userEmail],
-    (err, row) => {
-      if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Internal server error' });
-      }
-      
-      if (!row) {
-        return res.status(404).json({ error: 'Client not found' });
-      }
-      
-      // Delete client (work entries will be deleted due to CASCADE)
-      db.run(
-        'DELETE FROM clients WHERE id = ? AND user_email = ?',
-        [clientId, req.userEmail],
-        function(err) {
-          if (err) {
-            console.error('Database error:', err);
-            return res.status(500).json({ error: 'Failed to delete client' });
-          }
-          
-          res.json({ message: 'Client deleted successfully' });
-        }
-      );
+  try {
+    // Work entries are deleted along with the client (CASCADE)
+    const deleted = await clientsRepo.remove(clientId, req.user);
+    
+    if (!deleted) {
+      return res.status(404).json({ error: 'Client not found' });
     }
-  );
+    
+    res.json({ message: 'Client deleted successfully' });
+  } catch (err) {
+    next(err);
+  }
 });
 
 module.exports = router;
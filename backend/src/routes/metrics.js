@@ -0,0 +1,35 @@
+const crypto = require('crypto');
+const express = require('express');
+const { collectMetrics } = require('../metrics');
+const { authenticateUser, requireAdmin } = require('../middleware/auth');
+const { bearerToken } = require('../tokens');
+
+const router = express.Router();
+
+// A scraper sends METRICS_TOKEN as `Authorization: Bearer <token>`
+function isMetricsScraper(req) {
+  const token = process.env.METRICS_TOKEN;
+  const given = bearerToken(req);
+  if (!token || !given) {
+    return false;
+  }
+  const expected = Buffer.from(token);
+  const actual = Buffer.from(given);
+  return actual.length === expected.length && crypto.timingSafeEqual(actual, expected);
+}
+
+// Metrics name statements and SQL timings, and show cache, replication and
+// cluster state: the metrics scraper or admins only
+function metricsAccess(req, res, next) {
+  if (isMetricsScraper(req)) {
+    return next();
+  }
+  authenticateUser(req, res, (err) => (err ? next(err) : requireAdmin(req, res, next)));
+}
+
+// Runtime metrics (statement cache, etc.)
+router.get('/', metricsAccess, (req, res) => {
+  res.json(collectMetrics());
+});
+
+module.exports = router;
@@ -0,0 +1,101 @@
+const express = require('express');
+const fs = require('fs');
+const { pipeline } = require('stream/promises');
+const { getShippers } = require('../database/init');
+const { encodeBatches } = require('../database/walShipping');
+const { isReplicationPeer } = require('../middleware/replication');
+const { replicationChangesQuerySchema } = require('../validation/schemas');
+
+const router = express.Router();
+
+// Followers only, and only on a primary that ships its WAL
+router.use((req, res, next) => {
+  if (!getShippers().length) {
+    return res.status(404).json({ error: 'Replication is not enabled' });
+  }
+  if (!isReplicationPeer(req)) {
+    return res.status(401).json({ error: 'Replication token required' });
+  }
+  next();
+});
+
+function shipperFor(req, res) {
+  const shipper = getShippers()[parseInt(req.params.shard, 10)];
+  if (!shipper) {
+    res.status(404).json({ error: 'Shard not found' });
+  }
+  return shipper;
+}
+
+// A consistent copy of the shard's files, back to back in the body; the
+// headers give the position it was taken at and each file's size
+router.get('/snapshot/:shard', async (req, res) => {
+  const shipper = shipperFor(req, res);
+  if (!shipper) return;
+
+  let snapshot;
+  try {
+    snapshot = await shipper.snapshot();
+  } catch (err) {
+    console.error('Error taking replication snapshot:', err);
+    return res.status(500).json({ error: 'Internal server error' });
+  }
+
+  const files = Object.entries(snapshot.files);
+  res.set({
+    'Content-Type': 'application/octet-stream',
+    'Content-Length': String(files.reduce((total, [, file]) => total + file.size, 0)),
+    'X-Replication-Epoch': snapshot.epoch,
+    'X-Replication-Seq': String(snapshot.seq),
+    'X-Replication-Shards': String(getShippers().length),
+    'X-Replication-Files': files.map(([schema, file]) => `${schema}=${file.size}`).join(',')
+  });
+
+  try {
+    for (const [, file] of files) {
+      await pipeline(fs.createReadStream(file.path), res, { end: false });
+    }
+    res.end();
+  } catch (err) {
+    console.error('Error sending replication snapshot:', err);
+    res.destroy();
+  } finally {
+    for (const [, file] of files) {
+      await fs.promises.rm(file.path, { force: true });
+    }
+  }
+});
+
+// Batches after `after`, waiting up to `wait` ms for one when the follower
+// is caught up. 409 when the follower must take a new snapshot.
+router.get('/changes/:shard', async (req, res, next) => {
+  const shipper = shipperFor(req, res);
+  if (!shipper) return;
+
+  const { error, value } = replicationChangesQuerySchema.validate(req.query);
+  if (error) {
+    return next(error);
+  }
+
+  const { epoch, after, wait, follower } = value;
+  shipper.noteFollower(follower, after);
+
+  let batches = shipper.changesSince(epoch, after);
+  if (batches && !batches.length && wait > 0) {
+    await shipper.waitForChanges(after, wait);
+    batches = shipper.changesSince(epoch, after);
+  }
+
+  if (!batches) {
+    return res.status(409).json({ error: 'Snapshot required', epoch: shipper.epoch });
+  }
+
+  res.set({
+    'Content-Type': 'application/octet-stream',
+    'X-Replication-Epoch': shipper.epoch,
+    'X-Replication-Seq': String(shipper.seq)
+  });
+  res.send(encodeBatches(batches));
+});
+
+module.exports = router;
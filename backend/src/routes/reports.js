@@ -1,247 +1,321 @@
 const express = require('express');
-const { getDatabase } = require('../database/init');
+const { getDatabase, getArchive } = require('../database/init');
+const { STATEMENTS } = require('../database/statements');
+const query = require('../database/query');
 const { authenticateUser } = require('../middleware/auth');
-const createCsvWriter = require('csv-writer').createObjectCsvWriter;
+const { timeSeriesQuerySchema, dateRangeQuerySchema } = require('../validation/schemas');
+const { toDayNumber, fromDayNumber, dayRange } = require('../database/days');
+const { entryQuery } = require('../database/archive');
+const { createObjectCsvStringifier } = require('csv-writer');
 const PDFDocument = require('pdfkit');
-const path = require('path');
-const fs = require('fs');
+const { Readable, pipeline } = require('stream');
 
 const router = express.Router();
 
+// Longest range a single time-series request may cover
+const MAX_SERIES_DAYS = 3 * 366;
+// Entries encoded per chunk of a CSV export
+const CSV_CHUNK_ROWS = 500;
+
+function toDay(date) {
+  return date.toISOString().slice(0, 10);
+}
+
+// Rows carry whole hundredths of an hour; convert only in the response
+function toHours(hundredths) {
+  return hundredths / 100;
+}
+
+// First day of the day, week (Monday) or month that contains `day`
+function periodStart(day, interval) {
+  if (interval === 'month') {
+    return `${day.slice(0, 7)}-01`;
+  }
+  if (interval === 'week') {
+    const date = new Date(`${day}T00:00:00Z`);
+    date.setUTCDate(date.getUTCDate() - (date.getUTCDay() + 6) % 7);
+    return toDay(date);
+  }
+  return day;
+}
+
+// Optional ?from=&to= for the client report and exports
+function parseRange(req) {
+  return dateRangeQuerySchema.validate({ from: req.query.from, to: req.query.to });
+}
+
+// Client totals over the whole history (kept by triggers), or summed from
+// the daily rollup when the report covers a range
+function clientTotalsQuery(clientId, userId, range) {
+  if (range.from === undefined && range.to === undefined) {
+    return [STATEMENTS.findClientTotals, [clientId, userId]];
+  }
+  return [STATEMENTS.findClientTotalsInRange, [...dayRange(range), clientId, userId]];
+}
+
+// A client's entries for the report range; archived entries are included
+// when the range reaches back into the archive
+function clientEntriesQuery(name, req, clientId, range) {
+  const days = dayRange(range);
+  return entryQuery(getArchive(req.userEmail), name, [clientId, req.userId, ...days], days[0]);
+}
+
+// The CSV body a chunk of entries at a time, so the export streams to the
+// client (and through compression) rather than being built in full
+function* csvChunks(workEntries) {
+  const stringifier = createObjectCsvStringifier({
+    header: [
+      { id: 'date', title: 'Date' },
+      { id: 'hours', title: 'Hours' },
+      { id: 'description', title: 'Description' },
+      { id: 'created_at', title: 'Created At' }
+    ]
+  });
+  yield stringifier.getHeaderString();
+  for (let start = 0; start < workEntries.length; start += CSV_CHUNK_ROWS) {
+    yield stringifier.stringifyRecords(workEntries.slice(start, start + CSV_CHUNK_ROWS));
+  }
+}
+
 // All routes require authentication
 router.use(authenticateUser);
 
+// Get hour and entry totals across all of the user's clients
+router.get('/summary', async (req, res, next) => {
+  try {
+    const summary = await query.get(getDatabase(req.userEmail), STATEMENTS.reportSummary, [req.userId]);
+
+    res.json({
+      totalHours: summary.total_hours,
+      entryCount: summary.entry_count
+    });
+  } catch (err) {
+    next(err);
+  }
+});
+
+// Hours per day, week or month for charts and period summaries, read from the
+// daily rollup: one row per day (and client) in the range, however many
+// entries those days hold
+router.get('/timeseries', async (req, res, next) => {
+  const { error, value } = timeSeriesQuerySchema.validate(req.query);
+  if (error) {
+    return next(error);
+  }
+  
+  const { clientId, interval } = value;
+  const from = toDayNumber(value.from);
+  const to = toDayNumber(value.to);
+  
+  if (to - from >= MAX_SERIES_DAYS) {
+    return res.status(400).json({ error: 'Date range too large' });
+  }
+  
+  const [sql, params] = clientId
+    ? [STATEMENTS.dailyHoursForClient, [req.userId, clientId, from, to]]
+    : [STATEMENTS.dailyHours, [req.userId, from, to]];
+  
+  try {
+    const days = await query.all(getDatabase(req.userEmail), sql, params);
+    
+    // Include empty periods so charts get a continuous axis
+    const periods = new Map();
+    for (let day = from; day <= to; day++) {
+      const start = periodStart(fromDayNumber(day), interval);
+      if (!periods.has(start)) {
+        periods.set(start, { period: start, hundredths: 0, entries: 0 });
+      }
+    }
+    
+    // Integer sums, so periods and the total are exact
+    let totalHundredths = 0;
+    let entryCount = 0;
+    for (const day of days) {
+      const period = periods.get(periodStart(fromDayNumber(day.day), interval));
+      period.hundredths += day.hundredths;
+      period.entries += day.entries;
+      totalHundredths += day.hundredths;
+      entryCount += day.entries;
+    }
+    
+    res.json({
+      interval,
+      from: fromDayNumber(from),
+      to: fromDayNumber(to),
+      clientId: clientId || null,
+      totalHours: toHours(totalHundredths),
+      entryCount,
+      series: [...periods.values()].map(({ period, hundredths, entries }) => ({
+        period,
+        hours: toHours(hundredths),
+        entries
+      }))
+    });
+  } catch (err) {
+    next(err);
+  }
+});
+
 // Get hourly report for specific client
-router.get('/client/:clientId', (req, res) => {
+router.get('/client/:clientId', async (req, res, next) => {
   const clientId = parseInt(req.params.clientId);
   
   if (isNaN(clientId)) {
     return res.status(400).json({ error: 'Invalid client ID' });
   }
   
-  const db = getDatabase();
+  const { error, value: range } = parseRange(req);
+  if (error) {
+    return next(error);
+  }
   
-  // Verify client belongs to user
-  db.get(
-    'SELECT id, name FROM clients WHERE id = ? AND user_email = ?',
-    [clientId, req.userEmail],
-    (err, client) => {
-      if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Internal server error' });
-      }
-      
-      if (!client) {
-        return res.status(404).json({ error: 'Client not found' });
-      }
-      
-      // Get work entries for this client
-      db.all(
-        `SELECT id, hours, description, date, created_at, updated_at
-         FROM work_entries 
-         WHERE client_id = ? AND user_email = ? 
-         ORDER BY date DESC`,
-        [clientId, req.userEmail],
-        (err, workEntries) => {
-          if (err) {
-            console.error('Database error:', err);
-            return res.status(500).json({ error: 'Internal server error' });
-          }
-          
-          // Calculate total hours
-          const totalHours = workEntries.reduce((sum, entry) => sum + parseFloat(entry.hours), 0);
-          
-          res.json({
-            client: client,
-            workEntries: workEntries,
-            totalHours: totalHours,
-            entryCount: workEntries.length
-          });
-        }
-      );
+  try {
+    const db = getDatabase(req.userEmail);
+    
+    // Verify client belongs to user and read its totals
+    const totals = await query.get(db, ...clientTotalsQuery(clientId, req.userId, range));
+    
+    if (!totals) {
+      return res.status(404).json({ error: 'Client not found' });
     }
-  );
+    
+    // Get work entries for this client, forwarded without parsing them
+    const workEntries = await query.allJson(db, ...clientEntriesQuery('reportEntries', req, clientId, range));
+    
+    res.type('json').send(query.withJson({
+      client: { id: totals.id, name: totals.name },
+      totalHours: totals.total_hours,
+      entryCount: totals.entry_count,
+      firstDate: totals.first_date,
+      lastDate: totals.last_date
+    }, 'workEntries', workEntries));
+  } catch (err) {
+    next(err);
+  }
 });
 
 // Export client report as CSV
-router.get('/export/csv/:clientId', (req, res) => {
+router.get('/export/csv/:clientId', async (req, res, next) => {
   const clientId = parseInt(req.params.clientId);
   
   if (isNaN(clientId)) {
     return res.status(400).json({ error: 'Invalid client ID' });
   }
   
-  const db = getDatabase();
+  const { error, value: range } = parseRange(req);
+  if (error) {
+    return next(error);
+  }
   
-  // Verify client belongs to user and get data
-  db.get(
-    'SELECT id, name FROM clients WHERE id = ? AND user_email = ?',
-    [clientId, req.userEmail],
-    (err, client) => {
+  try {
+    const db = getDatabase(req.userEmail);
+    
+    // Verify client belongs to user and get data
+    const client = await query.get(db, STATEMENTS.findClientName, [clientId, req.userId]);
+    
+    if (!client) {
+      return res.status(404).json({ error: 'Client not found' });
+    }
+    
+    const workEntries = await query.all(db, ...clientEntriesQuery('exportEntries', req, clientId, range));
+    
+    const timestamp = new Date().toISOString().replace(/[:.]/g, '-');
+    const filename = `${client.name.replace(/[^a-zA-Z0-9]/g, '_')}_report_${timestamp}.csv`;
+    
+    res.attachment(filename);
+    pipeline(Readable.from(csvChunks(workEntries)), res, (err) => {
       if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Internal server error' });
-      }
-      
-      if (!client) {
-        return res.status(404).json({ error: 'Client not found' });
+        console.error('Error sending CSV report:', err);
       }
-      
-      // Get work entries
-      db.all(
-        `SELECT hours, description, date, created_at
-         FROM work_entries 
-         WHERE client_id = ? AND user_email = ? 
-         ORDER BY date DESC`,
-        [clientId, req.userEmail],
-        (err, workEntries) => {
-          if (err) {
-            console.error('Database error:', err);
-            return res.status(500).json({ error: 'Internal server error' });
-          }
-          
-          // Create temporary CSV file
-          const timestamp = new Date().toISOString().replace(/[:.]/g, '-');
-          const filename = `${client.name.replace(/[^a-zA-Z0-9]/g, '_')}_report_${timestamp}.csv`;
-          const tempPath = path.join(__dirname, '../../temp', filename);
-          
-          // Ensure temp directory exists
-          const tempDir = path.dirname(tempPath);
-          if (!fs.existsSync(tempDir)) {
-            fs.mkdirSync(tempDir, { recursive: true });
-          }
-          
-          const csvWriter = createCsvWriter({
-            path: tempPath,
-            header: [
-              { id: 'date', title: 'Date' },
-              { id: 'hours', title: 'Hours' },
-              { id: 'description', title: 'Description' },
-              { id: 'created_at', title: 'Created At' }
-            ]
-          });
-          
-          csvWriter.writeRecords(workEntries)
-            .then(() => {
-              // Send file and clean up
-              res.download(tempPath, filename, (err) => {
-                if (err) {
-                  console.error('Error sending file:', err);
-                }
-                // Clean up temp file
-                fs.unlink(tempPath, (unlinkErr) => {
-                  if (unlinkErr) {
-                    console.error('Error deleting temp file:', unlinkErr);
-                  }
-                });
-              });
-            })
-            .catch((error) => {
-              console.error('Error creating CSV:', error);
-              res.status(500).json({ error: 'Failed to generate CSV report' });
-            });
-        }
-      );
-    }
-  );
+    });
+  } catch (err) {
+    next(err);
+  }
 });
 
 // Export client report as PDF
-router.get('/export/pdf/:clientId', (req, res) => {
+router.get('/export/pdf/:clientId', async (req, res, next) => {
   const clientId = parseInt(req.params.clientId);
   
   if (isNaN(clientId)) {
     return res.status(400).json({ error: 'Invalid client ID' });
   }
   
-  const db = getDatabase();
+  const { error, value: range } = parseRange(req);
+  if (error) {
+    return next(error);
+  }
   
-  // Verify client belongs to user and get data
-  db.get(
-    'SELECT id, name FROM clients WHERE id = ? AND user_email = ?',
-    [clientId, req.userEmail],
-    (err, client) => {
-      if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Internal server error' });
-      }
-      
-      if (!client) {
-        return res.status(404).json({ error: 'Client not found' });
-      }
-      
-      // Get work entries
-      db.all(
-        `SELECT hours, description, date, created_at
-         FROM work_entries 
-         WHERE client_id = ? AND user_email = ? 
-         ORDER BY date DESC`,
-        [clientId, req.userEmail],
-        (err, workEntries) => {
-          if (err) {
-            console.error('Database error:', err);
-            return res.status(500).json({ error: 'Internal server error' });
-          }
-          
-          // Create PDF
-          const doc = new PDFDocument();
-          const timestamp = new Date().toISOString().replace(/[:.]/g, '-');
-          const filename = `${client.name.replace(/[^a-zA-Z0-9]/g, '_')}_report_${timestamp}.pdf`;
-          
-          // Set response headers
-          res.setHeader('Content-Type', 'application/pdf');
-          res.setHeader('Content-Disposition', `attachment; filename="${filename}"`);
-          
-          // Pipe PDF to response
-          doc.pipe(res);
-          
-          // Add content to PDF
-          doc.fontSize(20).text(`Time Report for ${client.name}`, { align: 'center' });
-          doc.moveDown();
-          
-          const totalHours = workEntries.reduce((sum, entry) => sum + parseFloat(entry.hours), 0);
-          doc.fontSize(14).text(`Total Hours: ${totalHours.toFixed(2)}`);
-          doc.text(`Total Entries: ${workEntries.length}`);
-          doc.text(`Generated: ${new Date().toLocaleString()}`);
-          doc.moveDown();
-          
-          // Add table header
-          doc.fontSize(12).text('Date', 50, doc.y, { width: 100 });
-          doc.text('Hours', 150, doc.y - 15, { width: 80 });
-          doc.text('Description', 230, doc.y - 15, { width: 300 });
-          doc.moveDown();
-          
-          // Add horizontal line
-          doc.moveTo(50, doc.y).lineTo(550, doc.y).stroke();
-          doc.moveDown(0.5);
-          
-          // Add work entries
-          workEntries.forEach((entry, index) => {
-            const y = doc.y;
-            
-            // Check if we need a new page
-            if (y > 700) {
-              doc.addPage();
-            }
-            
-            doc.text(entry.date, 50, doc.y, { width: 100 });
-            doc.text(entry.hours.toString(), 150, y, { width: 80 });
-            doc.text(entry.description || 'No description', 230, y, { width: 300 });
-            doc.moveDown();
-            
-            // Add separator line every 5 entries
-            if ((index + 1) % 5 === 0) {
-              doc.moveTo(50, doc.y).lineTo(550, doc.y).stroke();
-              doc.moveDown(0.5);
-            }
-          });
-          
-          // Finalize PDF
-          doc.end();
-        }
-      );
+  let client, workEntries;
+  try {
+    const db = getDatabase(req.userEmail);
+    
+    // Verify client belongs to user and get data
+    client = await query.get(db, ...clientTotalsQuery(clientId, req.userId, range));
+    
+    if (!client) {
+      return res.status(404).json({ error: 'Client not found' });
     }
-  );
+    
+    workEntries = await query.all(db, ...clientEntriesQuery('exportEntries', req, clientId, range));
+  } catch (err) {
+    return next(err);
+  }
+  
+  // Create PDF
+  const doc = new PDFDocument();
+  const timestamp = new Date().toISOString().replace(/[:.]/g, '-');
+  const filename = `${client.name.replace(/[^a-zA-Z0-9]/g, '_')}_report_${timestamp}.pdf`;
+  
+  // Set response headers
+  res.setHeader('Content-Type', 'application/pdf');
+  res.setHeader('Content-Disposition', `attachment; filename="${filename}"`);
+  
+  // Pipe PDF to response
+  doc.pipe(res);
+  
+  // Add content to PDF
+  doc.fontSize(20).text(`Time Report for ${client.name}`, { align: 'center' });
+  doc.moveDown();
+  
+  doc.fontSize(14).text(`Total Hours: ${client.total_hours.toFixed(2)}`);
+  doc.text(`Total Entries: ${client.entry_count}`);
+  doc.text(`Generated: ${new Date().toLocaleString()}`);
+  doc.moveDown();
+  
+  // Add table header
+  doc.fontSize(12).text('Date', 50, doc.y, { width: 100 });
+  doc.text('Hours', 150, doc.y - 15, { width: 80 });
+  doc.text('Description', 230, doc.y - 15, { width: 300 });
+  doc.moveDown();
+  
+  // Add horizontal line
+  doc.moveTo(50, doc.y).lineTo(550, doc.y).stroke();
+  doc.moveDown(0.5);
+  
+  // Add work entries
+  workEntries.forEach((entry, index) => {
+    const y = doc.y;
+    
+    // Check if we need a new page
+    if (y > 700) {
+      doc.addPage();
+    }
+    
+    doc.text(entry.date, 50, doc.y, { width: 100 });
+    doc.text(entry.hours.toString(), 150, y, { width: 80 });
+    doc.text(entry.description || 'No description', 230, y, { width: 300 });
+    doc.moveDown();
+    
+    // Add separator line every 5 entries
+    if ((index + 1) % 5 === 0) {
+      doc.moveTo(50, doc.y).lineTo(550, doc.y).stroke();
+      doc.moveDown(0.5);
+    }
+  });
+  
+  // Finalize PDF
+  doc.end();
 });
 
 module.exports = router;
@@ -0,0 +1,62 @@
+const express = require('express');
+const searchRepo = require('../repositories/searchRepo');
+const { authenticateUser } = require('../middleware/auth');
+const { searchQuerySchema } = require('../validation/schemas');
+
+const router = express.Router();
+
+// Columns returned with search highlights, per result type
+const HIGHLIGHTED = {
+  entries: ['description'],
+  clients: ['name', 'description']
+};
+
+const HTML_ESCAPES = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+
+// The statements mark matches with \x02 and \x03; the text itself is
+// escaped first, so the only markup in a highlight is <mark>
+function toHighlight(text) {
+  return text
+    .replace(/[&<>"']/g, (char) => HTML_ESCAPES[char])
+    .replace(/\x02/g, '<mark>')
+    .replace(/\x03/g, '</mark>');
+}
+
+function withHighlights(row, columns) {
+  const result = { ...row, highlights: {} };
+  for (const column of columns) {
+    const text = row[column];
+    result[column] = text === null ? null : text.replace(/[\x02\x03]/g, '');
+    result.highlights[column] = text === null ? null : toHighlight(text);
+  }
+  return result;
+}
+
+// All routes require authentication
+router.use(authenticateUser);
+
+// Search the user's work entry descriptions, or client names and
+// descriptions, best match first
+router.get('/', async (req, res, next) => {
+  const { error, value } = searchQuerySchema.validate(req.query);
+  if (error) {
+    return next(error);
+  }
+
+  try {
+    const { results, hasMore } = await searchRepo.search(req.user, value);
+
+    res.json({
+      query: value.q,
+      type: value.type,
+      limit: value.limit,
+      offset: value.offset,
+      hasMore,
+      results: results.map((row) => withHighlights(row, HIGHLIGHTED[value.type]))
+    });
+  } catch (err) {
+    next(err);
+  }
+});
+
+module.exports = router;
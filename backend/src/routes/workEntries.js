@@ -1,301 +1,144 @@
 const express = require('express');
-const { getDatabase } = require('../database/init');
+const workEntriesRepo = require('../repositories/workEntriesRepo');
+const { withJson } = require('../database/query');
 const { authenticateUser } = require('../middleware/auth');
-const { workEntrySchema, updateWorkEntrySchema } = require('../validation/schemas');
+const { workEntrySchema, updateWorkEntrySchema, workEntryListQuerySchema } = require('../validation/schemas');
 
 const router = express.Router();
 
 // All routes require authentication
 router.use(authenticateUser);
 
-// Get all work entries for authenticated user (with optional client filter)
-router.get('/', (req, res) => {
-  const { clientId } = req.query;
-  const db = getDatabase();
-  
-  let query = `
-    SELECT we.id, we.client_id, we.hours, we.description, we.date, 
-           we.created_at, we.updated_at, c.name as client_name
-    FROM work_entries we
-    JOIN clients c ON we.client_id = c.id
-    WHERE we.user_email = ?
-  `;
-  
-  const params = [req.userEmail];
+// Get all work entries for authenticated user (with optional client and
+// from/to day filters); archived entries only with ?archived=true
+router.get('/', async (req, res, next) => {
+  const { clientId, from, to, archived } = req.query;
+  let clientIdNum;
   
   if (clientId) {
-    const clientIdNum = parseInt(clientId);
+    clientIdNum = parseInt(clientId);
     if (isNaN(clientIdNum)) {
       return res.status(400).json({ error: 'Invalid client ID' });
     }
-    query += ' AND we.client_id = ?';
-    params.push(clientIdNum);
+  }
+
+  const { error, value: filters } = workEntryListQuerySchema.validate({ from, to, archived });
+  if (error) {
+    return next(error);
   }
   
-  query += ' ORDER BY we.date DESC, we.created_at DESC';
-  
-  db.all(query, params, (err, rows) => {
-    if (err) {
-      console.error('Database error:', err);
-      return res.status(500).json({ error: 'Internal server error' });
-    }
-    
-    res.json({ workEntries: rows });
-  });
+  try {
+    // Forwarded as encoded; the rows are never parsed on this thread
+    const workEntries = await workEntriesRepo.listJson(req.user, { clientId: clientIdNum, ...filters });
+    res.type('json').send(withJson({}, 'workEntries', workEntries));
+  } catch (err) {
+    next(err);
+  }
 });
 
 // Get specific work entry
-router.get('/:id', (req, res) => {
+router.get('/:id', async (req, res, next) => {
   const workEntryId = parseInt(req.params.id);
   
   if (isNaN(workEntryId)) {
     return res.status(400).json({ error: 'Invalid work entry ID' });
   }
   
-  const db = getDatabase();
-  
-  db.get(
-    `SELECT we.id, we.client_id, we.hours, we.description, we.date, 
-            we.created_at, we.updated_at, c.name as client_name
-     FROM work_entries we
-     JOIN clients c ON we.client_id = c.id
-     WHERE we.id = ? AND we.user_email = ?`,
-    [workEntryId, req.userEmail],
-    (err, row) => {
-      if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Internal server error' });
-      }
-      
-      if (!row) {
-        return res.status(404).json({ error: 'Work entry not found' });
-      }
-      
-      res.json({ workEntry: row });
+  try {
+    const workEntry = await workEntriesRepo.findById(workEntryId, req.user);
+    
+    if (!workEntry) {
+      return res.status(404).json({ error: 'Work entry not found' });
+    }
+    
+    res.json({ workEntry });
+  } catch (err) {
+    if (err.code === workEntriesRepo.ENTRY_ARCHIVED) {
+      return res.status(409).json({ error: 'Work entry is archived' });
     }
-  );
+    next(err);
+  }
 });
 
 // Create new work entry
-router.post('/', (req, res, next) => {
+router.post('/', async (req, res, next) => {
+  const { error, value } = workEntrySchema.validate(req.body);
+  if (error) {
+    return next(error);
+  }
+
   try {
-    const { error, value } = workEntrySchema.validate(req.body);
-    if (error) {
-      return next(error);
+    const workEntry = await workEntriesRepo.create(req.user, value);
+
+    res.status(201).json({
+      message: 'Work entry created successfully',
+      workEntry
+    });
+  } catch (err) {
+    if (err.code === workEntriesRepo.CLIENT_NOT_FOUND) {
+      return res.status(400).json({ error: 'Client not found or does not belong to user' });
     }
-
-    const { clientId, hours, description, date } = value;
-    const db = getDatabase();
-
-    // Verify client exists and belongs to user
-    db.get(
-      'SELECT id FROM clients WHERE id = ? AND user_email = ?',
-      [clientId, req.userEmail],
-      (err, row) => {
-        if (err) {
-          console.error('Database error:', err);
-          return res.status(500).json({ error: 'Internal server error' });
-        }
-
-        if (!row) {
-          return res.status(400).json({ error: 'Client not found or does not belong to user' });
-        }
-
-        // Create work entry
-        db.run(
-          'INSERT INTO work_entries (client_id, user_email, hours, description, date) VALUES (?, ?, ?, ?, ?)',
-          [clientId, req.userEmail, hours, description || null, date],
-          function(err) {
-            if (err) {
-              console.error('Database error:', err);
-              return res.status(500).json({ error: 'Failed to create work entry' });
-            }
-
-            // Return the created work entry with client name
-            db.get(
-              `SELECT we.id, we.client_id, we.hours, we.description, we.date, 
-                      we.created_at, we.updated_at, c.name as client_name
-               FROM work_entries we
-               JOIN clients c ON we.client_id = c.id
-               WHERE we.id = ?`,
-              [this.lastID],
-              (err, row) => {
-                if (err) {
-                  console.error('Database error:', err);
-                  return res.status(500).json({ error: 'Work entry created but failed to retrieve' });
-                }
-
-                res.status(201).json({
-                  message: 'Work entry created successfully',
-                  workEntry: row
-                });
-              }
-            );
-          }
-        );
-      }
-    );
-  } catch (error) {
-    next(error);
+    next(err);
   }
 });
 
 // Update work entry
-router.put('/:id', (req, res, next) => {
-  try {
-    const workEntryId = parseInt(req.params.id);
-    
-    if (isNaN(workEntryId)) {
-      return res.status(400).json({ error: 'Invalid work entry ID' });
-    }
-
-    const { error, value } = updateWorkEntrySchema.validate(req.body);
-    if (error) {
-      return next(error);
-    }
-
-    const db = getDatabase();
-
-    // Check if work entry exists and belongs to user
-    db.get(
-      'SELECT id FROM work_entries WHERE id = ? AND user_email = ?',
-      [workEntryId, req.userEmail],
-      (err, row) => {
-        if (err) {
-          console.error('Database error:', err);
-          return res.status(500).json({ error: 'Internal server error' });
-        }
-
-        if (!row) {
-          return res.status(404).json({ error: 'Work entry not found' });
-        }
-
-        // If clientId is being updated, verify it belongs to user
-        if (value.clientId) {
-          db.get(
-            'SELECT id FROM clients WHERE id = ? AND user_email = ?',
-            [value.clientId, req.userEmail],
-            (err, clientRow) => {
-              if (err) {
-                console.error('Database error:', err);
-                return res.status(500).json({ error: 'Internal server error' });
-              }
-
-              if (!clientRow) {
-                return res.status(400).json({ error: 'Client not found or does not belong to user' });
-              }
-
-              performUpdate();
-            }
-          );
-        } else {
-          performUpdate();
-        }
-
-        function performUpdate() {
-          // Build update query dynamically
-          const updates = [];
-          const values = [];
-
-          if (value.clientId !== undefined) {
-            updates.push('client_id = ?');
-            values.push(value.clientId);
-          }
-
-          if (value.hours !== undefined) {
-            updates.push('hours = ?');
-            values.push(value.hours);
-          }
-
-          if (value.description !== undefined) {
-            updates.push('description = ?');
-            values.push(value.description || null);
-          }
-
-          if (value.date !== undefined) {
-            updates.push('date = ?');
-            values.push(value.date);
-          }
-
-          updates.push('updated_at = CURRENT_TIMESTAMP');
-          values.push(workEntryId, req.userEmail);
+router.put('/:id', async (req, res, next) => {
+  const workEntryId = parseInt(req.params.id);
+  
+  if (isNaN(workEntryId)) {
+    return res.status(400).json({ error: 'Invalid work entry ID' });
+  }
 
-          const query = `UPDATE work_entries SET ${updates.join(', ')} WHERE id = ? AND user_email = ?`;
+  const { error, value } = updateWorkEntrySchema.validate(req.body);
+  if (error) {
+    return next(error);
+  }
 
-          db.run(query, values, function(err) {
-            if (err) {
-              console.error('Database error:', err);
-              return res.status(500).json({ error: 'Failed to update work entry' });
-            }
+  try {
+    const workEntry = await workEntriesRepo.update(workEntryId, req.user, value);
 
-            // Return updated work entry with client name
-            db.get(
-              `SELECT we.id, we.client_id, we.hours, we.description, we.date, 
-                      we.created_at, we.updated_at, c.name as client_name
-               FROM work_entries we
-               JOIN clients c ON we.client_id = c.id
-               WHERE we.id = ?`,
-              [workEntryId],
-              (err, row) => {
-                if (err) {
-                  console.error('Database error:', err);
-                  return res.status(500).json({ error: 'Work entry updated but failed to retrieve' });
-                }
+    if (!workEntry) {
+      return res.status(404).json({ error: 'Work entry not found' });
+    }
 
-                res.json({
-                  message: 'Work entry updated successfully',
-                  workEntry: row
-                });
-              }
-            );
-          });
-        }
-      }
-    );
-  } catch (error) {
-    next(error);
+    res.json({
+      message: 'Work entry updated successfully',
+      workEntry
+    });
+  } catch (err) {
+    if (err.code === workEntriesRepo.CLIENT_NOT_FOUND) {
+      return res.status(400).json({ error: 'Client not found or does not belong to user' });
+    }
+    if (err.code === workEntriesRepo.ENTRY_ARCHIVED) {
+      return res.status(409).json({ error: 'Work entry is archived' });
+    }
+    next(err);
   }
 });
 
 // Delete work entry
-router.delete('/:id', (req, res) => {
+router.delete('/:id', async (req, res, next) => {
   const workEntryId = parseInt(req.params.id);
   
   if (isNaN(workEntryId)) {
     return res.status(400).json({ error: 'Invalid work entry ID' });
   }
   
-  const db = getDatabase();
-  
-  // Check if work entry exists and belongs to user
-  db.get(
-    'SELECT id FROM work_entries WHERE id = ? AND user_email = ?',
-    [workEntryId, req.userEmail],
-    (err, row) => {
-      if (err) {
-        console.error('Database error:', err);
-        return res.status(500).json({ error: 'Internal server error' });
-      }
-      
-      if (!row) {
-        return res.status(404).json({ error: 'Work entry not found' });
-      }
-      
-      // Delete work entry
-      db.run(
-        'DELETE FROM work_entries WHERE id = ? AND user_email = ?',
-        [workEntryId, req.userEmail],
-        function(err) {
-          if (err) {
-            console.error('Database error:', err);
-            return res.status(500).json({ error: 'Failed to delete work entry' });
-          }
-          
-          res.json({ message: 'Work entry deleted successfully' });
-        }
-      );
+  try {
+    const deleted = await workEntriesRepo.remove(workEntryId, req.user);
+    
+    if (!deleted) {
+      return res.status(404).json({ error: 'Work entry not found' });
     }
-  );
+    
+    res.json({ message: 'Work entry deleted successfully' });
+  } catch (err) {
+    if (err.code === workEntriesRepo.ENTRY_ARCHIVED) {
+      return res.status(409).json({ error: 'Work entry is archived' });
+    }
+    next(err);
+  }
 });
 
 module.exports = router;
@@ -0,0 +1,28 @@
+// Moves work entries older than DB_ARCHIVE_AFTER_DAYS into the archive
+// database now, instead of waiting for the next scheduled run:
+//   DATABASE_PATH=/app/data/timesheet.db DB_ARCHIVE_PATH=/app/data/archive.db \
+//     node src/scripts/archiveEntries.js
+const { getArchives, initializeDatabase, closeDatabase } = require('../database/init');
+
+async function main() {
+  if (!process.env.DB_ARCHIVE_PATH) {
+    throw new Error('DB_ARCHIVE_PATH is not set');
+  }
+  await initializeDatabase();
+
+  const archives = getArchives();
+  for (const [index, archive] of archives.entries()) {
+    const moved = await archive.run();
+    const { lastDurationMs, newestDate } = archive.getStats();
+
+    const label = archives.length > 1 ? `shard ${index}: ` : '';
+    console.log(`${label}${moved} entries archived in ${lastDurationMs}ms (archive reaches ${newestDate || 'no entries'})`);
+  }
+}
+
+main()
+  .catch((error) => {
+    console.error('Failed to archive work entries:', error);
+    process.exitCode = 1;
+  })
+  .finally(() => closeDatabase());
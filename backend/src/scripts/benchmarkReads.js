@@ -0,0 +1,162 @@
+// Measures how large reads affect the latency of small requests. Seeds a file
+// database with one user's work entries, then for each read executor (main
+// thread, worker threads) starts the API in a child process and probes
+// /health and /api/auth/me while other clients keep fetching the full
+// work-entry list and client report.
+//   npm run bench:reads -- --entries 50000 --seconds 10 --exporters 4 --threads 2
+const { fork } = require('child_process');
+const fs = require('fs');
+const http = require('http');
+const os = require('os');
+const path = require('path');
+
+const USER_EMAIL = 'bench@example.com';
+const PORT = 3901;
+const PROBE_INTERVAL_MS = 5;
+
+function option(name, fallback) {
+  const index = process.argv.indexOf(`--${name}`);
+  return index === -1 ? fallback : parseInt(process.argv[index + 1], 10);
+}
+
+// Child process: the API without rate limiting or request logging, which
+// would otherwise dominate the numbers
+function serve() {
+  const express = require('express');
+  const { initializeDatabase } = require('../database/init');
+
+  const app = express();
+  app.get('/health', (req, res) => {
+    res.status(200).json({ status: 'OK', timestamp: new Date().toISOString() });
+  });
+  app.use('/api/auth', require('../routes/auth'));
+  app.use('/api/work-entries', require('../routes/workEntries'));
+  app.use('/api/reports', require('../routes/reports'));
+
+  initializeDatabase().then(() => {
+    app.listen(process.env.PORT, () => process.send('ready'));
+  });
+}
+
+async function seed(filename, entries) {
+  process.env.DATABASE_PATH = filename;
+  const { getDatabase, initializeDatabase, closeDatabase } = require('../database/init');
+  const query = require('../database/query');
+
+  await initializeDatabase();
+  const clientId = await getDatabase(USER_EMAIL).transaction(async (tx) => {
+    const user = await query.get(tx, 'INSERT INTO users (email) VALUES (?) RETURNING id', [USER_EMAIL]);
+    const client = await query.get(tx, "INSERT INTO clients (name, user_id) VALUES ('Benchmark', ?) RETURNING id", [user.id]);
+    await query.run(tx, `
+      WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+      INSERT INTO work_entries (client_id, user_id, hundredths, description, day)
+      SELECT ?, ?, (i % 8) * 100 + 50, 'Benchmark entry ' || i, 18262 + i % 1500
+      FROM n`, [entries, client.id, user.id]);
+    return client.id;
+  });
+  await closeDatabase();
+  return clientId;
+}
+
+const agent = new http.Agent({ keepAlive: true, maxSockets: 64 });
+
+function request(urlPath) {
+  return new Promise((resolve, reject) => {
+    const started = process.hrtime.bigint();
+    const req = http.get({ host: '127.0.0.1', port: PORT, path: urlPath, agent, headers: { 'x-user-email': USER_EMAIL } }, (res) => {
+      res.on('data', () => {});
+      res.on('end', () => {
+        if (res.statusCode !== 200) {
+          reject(new Error(`${urlPath} returned ${res.statusCode}`));
+          return;
+        }
+        resolve(Number(process.hrtime.bigint() - started) / 1e6);
+      });
+    });
+    req.on('error', reject);
+  });
+}
+
+function percentile(sorted, p) {
+  return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))] || 0;
+}
+
+function summarise(samples) {
+  const sorted = [...samples].sort((a, b) => a - b);
+  return {
+    count: sorted.length,
+    p50: percentile(sorted, 0.5).toFixed(1),
+    p99: percentile(sorted, 0.99).toFixed(1),
+    max: (sorted[sorted.length - 1] || 0).toFixed(1)
+  };
+}
+
+async function runMode(name, { filename, clientId, threads, seconds, exporters }) {
+  const child = fork(__filename, ['--serve'], {
+    env: { ...process.env, PORT: String(PORT), DATABASE_PATH: filename, DB_WORKER_THREADS: String(threads), AUTH_EMAIL_HEADER: 'on' },
+    stdio: ['ignore', 'ignore', 'inherit', 'ipc']
+  });
+  await new Promise((resolve) => child.once('message', resolve));
+
+  const deadline = Date.now() + seconds * 1000;
+  const probes = { '/health': [], '/api/auth/me': [] };
+  let exports = 0;
+
+  const exportLoop = async (index) => {
+    const paths = ['/api/work-entries', `/api/reports/client/${clientId}`];
+    for (let i = index; Date.now() < deadline; i++) {
+      await request(paths[i % paths.length]);
+      exports++;
+    }
+  };
+
+  const probeLoop = async () => {
+    const paths = Object.keys(probes);
+    for (let i = 0; Date.now() < deadline; i++) {
+      const urlPath = paths[i % paths.length];
+      probes[urlPath].push(await request(urlPath));
+      await new Promise((resolve) => setTimeout(resolve, PROBE_INTERVAL_MS));
+    }
+  };
+
+  try {
+    await Promise.all([probeLoop(), ...Array.from({ length: exporters }, (_, i) => exportLoop(i))]);
+  } finally {
+    child.kill();
+  }
+
+  console.log(`\n${name}: ${exports} large reads (${(exports / seconds).toFixed(1)}/s)`);
+  console.table(Object.fromEntries(Object.entries(probes).map(([urlPath, samples]) => [urlPath, summarise(samples)])));
+}
+
+async function main() {
+  const entries = option('entries', 50000);
+  const seconds = option('seconds', 10);
+  const exporters = option('exporters', 4);
+  const threads = option('threads', Math.min(4, os.cpus().length));
+
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'timesheet-bench-'));
+  const filename = path.join(dir, 'bench.db');
+
+  try {
+    console.log(`Seeding ${entries} work entries...`);
+    const clientId = await seed(filename, entries);
+    const shared = { filename, clientId, seconds, exporters };
+
+    await runMode('Main thread', { ...shared, threads: 0 });
+    await runMode(`Worker threads (${threads})`, { ...shared, threads });
+    console.log('\nLatencies in ms for the probe requests while large reads run.');
+  } finally {
+    agent.destroy();
+    fs.rmSync(dir, { recursive: true, force: true });
+  }
+}
+
+if (process.argv.includes('--serve')) {
+  serve();
+} else {
+  main().catch((error) => {
+    console.error('Benchmark failed:', error);
+    process.exitCode = 1;
+  });
+}
@@ -0,0 +1,29 @@
+// Recomputes the rollup tables (client_hour_totals, work_entry_daily) from
+// work_entries. Run against a file database, e.g. inside the container:
+//   DATABASE_PATH=/app/data/timesheet.db node src/scripts/rebuildRollups.js
+const { getShards, initializeDatabase, closeDatabase } = require('../database/init');
+const { rebuildRollups } = require('../database/rollups');
+
+async function main() {
+  await initializeDatabase();
+
+  // One shard at a time, so only that shard's writes wait on the rebuild
+  const shards = getShards();
+  for (const [index, database] of shards.entries()) {
+    const started = Date.now();
+    const counts = await rebuildRollups(database);
+
+    const label = shards.length > 1 ? `shard ${index}: ` : '';
+    for (const [table, rows] of Object.entries(counts)) {
+      console.log(`${label}${table}: ${rows} rows`);
+    }
+    console.log(`${label}Rollups rebuilt in ${Date.now() - started}ms`);
+  }
+}
+
+main()
+  .catch((error) => {
+    console.error('Failed to rebuild rollups:', error);
+    process.exitCode = 1;
+  })
+  .finally(() => closeDatabase());
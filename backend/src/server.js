@@ -2,15 +2,29 @@ const express = require('express');
 const cors = require('cors');
 const helmet = require('helmet');
 const morgan = require('morgan');
-const rateLimit = require('express-rate-limit');
 
 const authRoutes = require('./routes/auth');
 const clientRoutes = require('./routes/clients');
 const workEntryRoutes = require('./routes/workEntries');
 const reportRoutes = require('./routes/reports');
+const searchRoutes = require('./routes/search');
+const adminRoutes = require('./routes/admin');
+const metricsRoutes = require('./routes/metrics');
+const replicationRoutes = require('./routes/replication');
 
-const { initializeDatabase } = require('./database/init');
+const { initializeDatabase, closeDatabase, getReplicationStatus, noteRequest } = require('./database/init');
 const { errorHandler } = require('./middleware/errorHandler');
+const {
+  isReplicationPeer,
+  replicaRouting,
+  replicationPosition,
+  forwardReadOnlyErrors
+} = require('./middleware/replication');
+const { createRateLimiter, createBucketStore } = require('./middleware/rateLimit');
+const { compression } = require('./middleware/compression');
+const { registerMetrics } = require('./metrics');
+const { emailHeaderEnabled } = require('./tokens');
+const { runClustered } = require('./cluster');
 
 const app = express();
 const PORT = process.env.PORT || 3001;
@@ -19,26 +33,67 @@ const PORT = process.env.PORT || 3001;
 app.use(helmet());
 app.use(cors({
   origin: process.env.FRONTEND_URL || 'http://localhost:5173',
-  credentials: true
+  credentials: true,
+  // Lets clients pass it back to a follower to read their own writes, and
+  // see their remaining rate limit budget
+  exposedHeaders: [
+    'X-Replication-Position',
+    'RateLimit-Policy',
+    'RateLimit-Limit',
+    'RateLimit-Remaining',
+    'RateLimit-Reset',
+    'Retry-After'
+  ]
 }));
 
-// Rate limiting
-const limiter = rateLimit({
-  windowMs: 15 * 60 * 1000, // 15 minutes
-  max: 100 // limit each IP to 100 requests per windowMs
+// Negotiated brotli/gzip for responses above COMPRESSION_THRESHOLD bytes,
+// streamed exports included
+app.use(compression());
+
+// Request rate, so database maintenance waits for a quiet moment
+app.use((req, res, next) => {
+  noteRequest();
+  next();
+});
+
+// Rate limiting: token buckets per user for reads, writes, report exports
+// and logins (held by the primary in cluster mode). API and metrics only:
+// health checks and static assets are never limited.
+const limiter = createRateLimiter({
+  // Followers (and the writes they forward, already limited there)
+  skip: isReplicationPeer
 });
-app.use(limiter);
+registerMetrics('rateLimit', limiter.getStats);
+app.use(['/api', '/metrics'], limiter);
 
 // Logging
 app.use(morgan('combined'));
 
+// Replication: a follower (REPLICA_OF) forwards writes to the primary
+// before the body parsers read them; a primary tags write responses with
+// the position followers must reach to show them
+app.use('/api', replicaRouting);
+app.use('/api', replicationPosition);
+
 // Body parsing
 app.use(express.json({ limit: '10mb' }));
 app.use(express.urlencoded({ extended: true }));
 
 // Health check
 app.get('/health', (req, res) => {
-  res.status(200).json({ status: 'OK', timestamp: new Date().toISOString() });
+  const replication = getReplicationStatus();
+  if (replication.enabled === false) {
+    return res.status(200).json({ status: 'OK', timestamp: new Date().toISOString() });
+  }
+
+  // A follower that is disconnected or too far behind asks to be taken out
+  // of rotation
+  const healthy = (replication.shards || [replication]).every((shard) => shard.healthy !== false);
+  res.status(healthy ? 200 : 503).json({
+    status: healthy ? 'OK' : 'DEGRADED',
+    timestamp: new Date().toISOString(),
+    replication
+  });
 });
 
 // Routes
@@ -46,8 +101,13 @@ app.use('/api/auth', authRoutes);
 app.use('/api/clients', clientRoutes);
 app.use('/api/work-entries', workEntryRoutes);
 app.use('/api/reports', reportRoutes);
+app.use('/api/search', searchRoutes);
+app.use('/api/admin', adminRoutes);
+app.use('/metrics', metricsRoutes);
+app.use('/replication', replicationRoutes);
 
 // Error handling
+app.use(forwardReadOnlyErrors);
 app.use(errorHandler);
 
 // 404 handler
@@ -58,17 +118,40 @@ app.use('*', (req, res) => {
 // Initialize database and start server
 async function startServer() {
   try {
+    if (emailHeaderEnabled()) {
+      console.warn('AUTH_EMAIL_HEADER=on: any client can act as any user with the x-user-email header; use it only for development and tests');
+    }
     await initializeDatabase();
-    app.listen(PORT, () => {
+    const server = app.listen(PORT, () => {
       console.log(`Server running on port ${PORT}`);
       console.log(`Health check: http://localhost:${PORT}/health`);
     });
+    process.once('SIGTERM', () => shutdown(server));
+    process.once('SIGINT', () => shutdown(server));
   } catch (error) {
     console.error('Failed to start server:', error);
     process.exit(1);
   }
 }
 
-startServer();
+// Stop accepting requests, then close the database (which takes the final
+// snapshot when persistence is enabled) before exiting
+let shuttingDown = false;
+function shutdown(server) {
+  // A cluster worker can get both the terminal's SIGINT and the primary's
+  // SIGTERM
+  if (shuttingDown) return;
+  shuttingDown = true;
+  console.log('Shutting down...');
+  server.close(() => {
+    closeDatabase().finally(() => process.exit(0));
+  });
+}
+
+// CLUSTER_WORKERS > 1 forks that many workers, each running startServer();
+// see cluster.js
+runClustered(startServer, {
+  services: { rateLimit: () => createBucketStore() }
+});
 
 module.exports = app;
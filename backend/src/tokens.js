@@ -0,0 +1,93 @@
+const crypto = require('crypto');
+const jwt = require('jsonwebtoken');
+
+const ISSUER = 'time-tracking-api';
+const ACCESS = 'access';
+const REFRESH = 'refresh';
+const DEFAULT_ACCESS_TTL = '15m';
+const DEFAULT_REFRESH_TTL = '7d';
+
+let generatedSecret = null;
+
+// Every node behind a load balancer must share JWT_SECRET to accept each
+// other's tokens; without it this process signs with a random key, and
+// tokens stop working when it restarts. Cluster workers get one key from
+// the primary (see cluster.js).
+function secret() {
+  if (process.env.JWT_SECRET) {
+    return process.env.JWT_SECRET;
+  }
+  if (!generatedSecret) {
+    console.warn('JWT_SECRET is not set; signing tokens with a random per-process key');
+    generatedSecret = crypto.randomBytes(32).toString('hex');
+  }
+  return generatedSecret;
+}
+
+function sign(user, audience, expiresIn) {
+  return jwt.sign({ email: user.email }, secret(), {
+    algorithm: 'HS256',
+    subject: String(user.id),
+    issuer: ISSUER,
+    audience,
+    expiresIn
+  });
+}
+
+// A short-lived access token for API calls and a longer-lived refresh token
+// that trades for a new pair at POST /api/auth/refresh
+function issueTokens(user) {
+  const accessToken = sign(user, ACCESS, process.env.JWT_ACCESS_TTL || DEFAULT_ACCESS_TTL);
+  const refreshToken = sign(user, REFRESH, process.env.JWT_REFRESH_TTL || DEFAULT_REFRESH_TTL);
+  const { iat, exp } = jwt.decode(accessToken);
+  return { accessToken, refreshToken, expiresIn: exp - iat };
+}
+
+// Resolves the user a token was issued to, { id, email }, or throws
+// jsonwebtoken's TokenExpiredError / JsonWebTokenError. Signature and
+// expiry only: no database access.
+function verifyToken(token, audience = ACCESS) {
+  const claims = jwt.verify(token, secret(), { algorithms: ['HS256'], issuer: ISSUER, audience });
+  const id = Number(claims.sub);
+  if (!Number.isInteger(id) || typeof claims.email !== 'string') {
+    throw new jwt.JsonWebTokenError('Malformed token');
+  }
+  return { id, email: claims.email };
+}
+
+function bearerToken(req) {
+  const header = req.headers.authorization;
+  const match = typeof header === 'string' && header.match(/^Bearer (\S+)$/i);
+  return match ? match[1] : null;
+}
+
+// The plain x-user-email header identifies users without any proof, so it
+// is accepted only with AUTH_EMAIL_HEADER=on (development and tests)
+function emailHeaderEnabled() {
+  return process.env.AUTH_EMAIL_HEADER === 'on';
+}
+
+// The email a request acts for, from a valid access token or (when enabled)
+// the x-user-email header, without authenticating it: for routing by user
+// (shards, replica read positions) ahead of authenticateUser
+function requestEmail(req) {
+  const token = bearerToken(req);
+  if (token) {
+    try {
+      return verifyToken(token).email;
+    } catch (err) {
+      return null;
+    }
+  }
+  return (emailHeaderEnabled() && req.headers['x-user-email']) || null;
+}
+
+module.exports = {
+  ACCESS,
+  REFRESH,
+  issueTokens,
+  verifyToken,
+  bearerToken,
+  emailHeaderEnabled,
+  requestEmail
+};
@@ -28,14 +28,61 @@ const updateClientSchema = Joi.object({
   email: Joi.string().trim().email().max(255).optional().allow('')
 }).min(1); // At least one field must be provided
 
+const timeSeriesQuerySchema = Joi.object({
+  clientId: Joi.number().integer().positive().optional(),
+  interval: Joi.string().valid('day', 'week', 'month').default('day'),
+  from: Joi.date().iso().required(),
+  to: Joi.date().iso().min(Joi.ref('from')).required()
+});
+
+// Optional day range for entry lists and client reports
+const dateRangeQuerySchema = Joi.object({
+  from: Joi.date().iso().optional(),
+  to: Joi.date().iso().optional().when('from', {
+    is: Joi.exist(),
+    then: Joi.date().min(Joi.ref('from'))
+  })
+});
+
+// Entry list filters: the day range plus opting in to archived entries
+const workEntryListQuerySchema = dateRangeQuerySchema.keys({
+  archived: Joi.boolean().optional()
+});
+
+// Full-text search over entries or clients, one page at a time
+const searchQuerySchema = Joi.object({
+  q: Joi.string().trim().min(1).max(200).required(),
+  type: Joi.string().valid('entries', 'clients').default('entries'),
+  limit: Joi.number().integer().min(1).max(100).default(20),
+  offset: Joi.number().integer().min(0).max(10000).default(0)
+});
+
+// Follower requests for WAL batches (see routes/replication.js)
+const replicationChangesQuerySchema = Joi.object({
+  epoch: Joi.string().hex().max(32).required(),
+  after: Joi.number().integer().min(0).required(),
+  wait: Joi.number().integer().min(0).max(60000).default(0),
+  follower: Joi.string().max(128).default('unknown')
+});
+
 const emailSchema = Joi.object({
   email: Joi.string().email().required()
 });
 
+const refreshTokenSchema = Joi.object({
+  refreshToken: Joi.string().max(4096).required()
+});
+
 module.exports = {
   clientSchema,
   workEntrySchema,
   updateWorkEntrySchema,
   updateClientSchema,
-  emailSchema
+  timeSeriesQuerySchema,
+  dateRangeQuerySchema,
+  workEntryListQuerySchema,
+  searchQuerySchema,
+  replicationChangesQuerySchema,
+  emailSchema,
+  refreshTokenSchema
 };
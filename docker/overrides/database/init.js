@@ -1,138 +1,24 @@
-const sqlite3 = require('sqlite3').verbose();
-const path = require('path');
-const fs = require('fs');
-
-let db = null;
-let isClosing = false;
-let isClosed = false;
+// Production database setup: the shared backend init.js (renamed to
+// sharedInit.js by the Dockerfile) with defaults for a database file.
+// Settings given in the environment still win.
+const PRODUCTION_DEFAULTS = {
+  // WAL mode with one writer and a pool of read-only connections
+  DB_READ_POOL_SIZE: '4',
+  // Writes landing within this window share one COMMIT (and one fsync)
+  DB_GROUP_COMMIT_WINDOW_MS: '2'
+};
 
-function getDatabase() {
-  if (!db) {
-    // Reset state when creating a new database connection
-    isClosing = false;
-    isClosed = false;
-    // Use file-based database in production, in-memory for development/testing
-    const dbPath = process.env.DATABASE_PATH || ':memory:';
-    
-    // Ensure the directory exists for file-based database
-    if (dbPath !== ':memory:') {
-      const dbDir = path.dirname(dbPath);
-      if (!fs.existsSync(dbDir)) {
-        fs.mkdirSync(dbDir, { recursive: true });
-      }
-    }
-    
-    db = new sqlite3.Database(dbPath, (err) => {
-      if (err) {
-        console.error('Error opening database:', err);
-        throw err;
-      }
-      const dbType = dbPath === ':memory:' ? 'in-memory' : `file: ${dbPath}`;
-      console.log(`Connected to SQLite database (${dbType})`);
-    });
+for (const [name, value] of Object.entries(PRODUCTION_DEFAULTS)) {
+  if (process.env[name] === undefined) {
+    process.env[name] = value;
   }
-  return db;
 }
 
-async function initializeDatabase() {
-  const database = getDatabase();
-  
-  return new Promise((resolve, reject) => {
-    database.serialize(() => {
-      // Enable foreign keys
-      database.run('PRAGMA foreign_keys = ON');
-      
-      // Create users table
-      database.run(`
-        CREATE TABLE IF NOT EXISTS users (
-          email TEXT PRIMARY KEY,
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-      `);
-
-      // Create clients table
-      database.run(`
-        CREATE TABLE IF NOT EXISTS clients (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          name TEXT NOT NULL,
-          description TEXT,
-          user_email TEXT NOT NULL,
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY (user_email) REFERENCES users (email) ON DELETE CASCADE
-        )
-      `);
-
-      // Create work_entries table
-      database.run(`
-        CREATE TABLE IF NOT EXISTS work_entries (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          client_id INTEGER NOT NULL,
-          user_email TEXT NOT NULL,
-          hours DECIMAL(5,2) NOT NULL,
-          description TEXT,
-          date DATE NOT NULL,
-          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-          FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE,
-          FOREIGN KEY (user_email) REFERENCES users (email) ON DELETE CASCADE
-        )
-      `);
-
-      // Create indexes for better performance
-      database.run(`CREATE INDEX IF NOT EXISTS idx_clients_user_email ON clients (user_email)`);
-      database.run(`CREATE INDEX IF NOT EXISTS idx_work_entries_client_id ON work_entries (client_id)`);
-      database.run(`CREATE INDEX IF NOT EXISTS idx_work_entries_user_email ON work_entries (user_email)`);
-      database.run(`CREATE INDEX IF NOT EXISTS idx_work_entries_date ON work_entries (date)`);
-
-      console.log('Database tables created successfully');
-      resolve();
-    });
-  });
-}
-
-function closeDatabase() {
-  return new Promise((resolve, reject) => {
-    if (isClosed) {
-      // Already closed, resolve immediately
-      resolve();
-      return;
-    }
-    
-    if (isClosing) {
-      // Currently closing, wait for it to complete
-      const checkClosed = setInterval(() => {
-        if (isClosed) {
-          clearInterval(checkClosed);
-          resolve();
-        }
-      }, 10);
-      return;
-    }
-    
-    if (!db) {
-      // No database connection, resolve immediately
-      resolve();
-      return;
-    }
-    
-    isClosing = true;
-    db.close((err) => {
-      isClosed = true;
-      isClosing = false;
-      db = null;
-      if (err) {
-        console.error('Error closing database:', err);
-      } else {
-        console.log('Database connection closed');
-      }
-      resolve();
-    });
-  });
+// Snapshots keep the in-memory development database across restarts; the
+// database file persists on its own
+if (process.env.DB_SNAPSHOT_PATH) {
+  console.warn('DB_SNAPSHOT_PATH is ignored in production: the database file already persists');
+  delete process.env.DB_SNAPSHOT_PATH;
 }
 
-module.exports = {
-  getDatabase,
-  initializeDatabase,
-  closeDatabase
-};
+module.exports = require('./sharedInit');
@@ -1,11 +1,19 @@
-import axios, { type AxiosInstance, type AxiosResponse } from 'axios';
+import axios, { type AxiosInstance, type AxiosResponse, type InternalAxiosRequestConfig } from 'axios';
+import { type AuthTokens, type LoginResponse } from '../types/api';
 
 // Use empty string to make requests relative to the current origin
 // Vite proxy will forward /api requests to the backend
 const API_BASE_URL = '';
 
+const ACCESS_TOKEN_KEY = 'accessToken';
+const REFRESH_TOKEN_KEY = 'refreshToken';
+
+type RetriableRequest = InternalAxiosRequestConfig & { _retried?: boolean };
+
 class ApiClient {
   private client: AxiosInstance;
+  // One refresh in flight, shared by every request that got a 401 meanwhile
+  private refreshing: Promise<string> | null = null;
 
   constructor() {
     this.client = axios.create({
@@ -16,11 +24,15 @@ class ApiClient {
       },
     });
 
-    // Request interceptor to add email header
+    // Request interceptor to add the access token, or the email header for
+    // sessions from before tokens
     this.client.interceptors.request.use(
       (config) => {
+        const accessToken = localStorage.getItem(ACCESS_TOKEN_KEY);
         const userEmail = localStorage.getItem('userEmail');
-        if (userEmail) {
+        if (accessToken) {
+          config.headers.Authorization = `Bearer ${accessToken}`;
+        } else if (userEmail) {
           config.headers['x-user-email'] = userEmail;
         }
         return config;
@@ -30,13 +42,25 @@ class ApiClient {
       }
     );
 
-    // Response interceptor for error handling
+    // Response interceptor for error handling: refresh the tokens once and
+    // retry on a 401, and sign out if that fails too
     this.client.interceptors.response.use(
       (response: AxiosResponse) => response,
-      (error) => {
+      async (error) => {
         if (error.response?.status === 401) {
-          // Clear stored email on auth error
-          localStorage.removeItem('userEmail');
+          const request = error.config as RetriableRequest | undefined;
+          const refreshToken = localStorage.getItem(REFRESH_TOKEN_KEY);
+          if (request && refreshToken && !request._retried) {
+            request._retried = true;
+            try {
+              const accessToken = await this.refreshTokens(refreshToken);
+              request.headers.Authorization = `Bearer ${accessToken}`;
+              return this.client(request);
+            } catch {
+              // Fall through and sign out
+            }
+          }
+          this.logout();
           window.location.href = '/login';
         }
         return Promise.reject(error);
@@ -44,9 +68,42 @@ class ApiClient {
     );
   }
 
+  // Plain axios, so a rejected refresh does not come back through the
+  // interceptors above
+  private refreshTokens(refreshToken: string): Promise<string> {
+    if (!this.refreshing) {
+      this.refreshing = axios
+        .post<AuthTokens>(`${API_BASE_URL}/api/auth/refresh`, { refreshToken }, { timeout: 10000 })
+        .then((response) => {
+          this.storeTokens(response.data);
+          return response.data.accessToken;
+        })
+        .finally(() => {
+          this.refreshing = null;
+        });
+    }
+    return this.refreshing;
+  }
+
+  private storeTokens(tokens: AuthTokens) {
+    localStorage.setItem(ACCESS_TOKEN_KEY, tokens.accessToken);
+    localStorage.setItem(REFRESH_TOKEN_KEY, tokens.refreshToken);
+  }
+
+  hasSession() {
+    return !!(localStorage.getItem(ACCESS_TOKEN_KEY) || localStorage.getItem('userEmail'));
+  }
+
+  logout() {
+    localStorage.removeItem(ACCESS_TOKEN_KEY);
+    localStorage.removeItem(REFRESH_TOKEN_KEY);
+    localStorage.removeItem('userEmail');
+  }
+
   // Auth endpoints
-  async login(email: string) {
-    const response = await this.client.post('/api/auth/login', { email });
+  async login(email: string): Promise<LoginResponse> {
+    const response = await this.client.post<LoginResponse>('/api/auth/login', { email });
+    this.storeTokens(response.data);
     return response.data;
   }
 
@@ -114,6 +171,16 @@ class ApiClient {
   }
 
   // Report endpoints
+  async getReportSummary() {
+    const response = await this.client.get('/api/reports/summary');
+    return response.data;
+  }
+
+  async getTimeSeries(params: { from: string; to: string; interval?: 'day' | 'week' | 'month'; clientId?: number }) {
+    const response = await this.client.get('/api/reports/timeseries', { params });
+    return response.data;
+  }
+
   async getClientReport(clientId: number) {
     const response = await this.client.get(`/api/reports/client/${clientId}`);
     return response.data;
@@ -31,10 +31,15 @@ const DashboardPage: React.FC = () => {
     queryFn: () => apiClient.getWorkEntries(),
   });
 
+  const { data: summary } = useQuery({
+    queryKey: ['reportSummary'],
+    queryFn: () => apiClient.getReportSummary(),
+  });
+
   const clients = clientsData?.clients || [];
   const workEntries = workEntriesData?.workEntries || [];
 
-  const totalHours = workEntries.reduce((sum: number, entry: { hours: number }) => sum + entry.hours, 0);
+  const totalHours = summary?.totalHours ?? 0;
   const recentEntries = workEntries.slice(0, 5);
 
   const statsCards = [
@@ -47,7 +52,7 @@ const DashboardPage: React.FC = () => {
     },
     {
       title: 'Total Work Entries',
-      value: workEntries.length,
+      value: summary?.entryCount ?? workEntries.length,
       icon: <AssignmentIcon />,
       color: '#388e3c',
       action: () => navigate('/work-entries'),
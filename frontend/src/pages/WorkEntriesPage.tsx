@@ -64,6 +64,7 @@ const WorkEntriesPage: React.FC = () => {
       apiClient.createWorkEntry(entryData),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['workEntries'] });
+      queryClient.invalidateQueries({ queryKey: ['reportSummary'] });
       handleClose();
     },
     onError: (err: unknown) => {
@@ -77,6 +78,7 @@ const WorkEntriesPage: React.FC = () => {
       apiClient.updateWorkEntry(id, data),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['workEntries'] });
+      queryClient.invalidateQueries({ queryKey: ['reportSummary'] });
       handleClose();
     },
     onError: (err: unknown) => {
@@ -89,6 +91,7 @@ const WorkEntriesPage: React.FC = () => {
     mutationFn: (id: number) => apiClient.deleteWorkEntry(id),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['workEntries'] });
+      queryClient.invalidateQueries({ queryKey: ['reportSummary'] });
     },
     onError: (err: unknown) => {
       const error = err as { response?: { data?: { error?: string } } };
@@ -33,6 +33,29 @@ export interface ClientReport {
   workEntries: WorkEntry[];
   totalHours: number;
   entryCount: number;
+  firstDate: string | null;
+  lastDate: string | null;
+}
+
+export interface ReportSummary {
+  totalHours: number;
+  entryCount: number;
+}
+
+export interface TimeSeriesPoint {
+  period: string;
+  hours: number;
+  entries: number;
+}
+
+export interface TimeSeries {
+  interval: 'day' | 'week' | 'month';
+  from: string;
+  to: string;
+  clientId: number | null;
+  totalHours: number;
+  entryCount: number;
+  series: TimeSeriesPoint[];
 }
 
 export interface CreateClientRequest {
@@ -67,7 +90,13 @@ export interface LoginRequest {
   email: string;
 }
 
-export interface LoginResponse {
+export interface AuthTokens {
+  accessToken: string;
+  refreshToken: string;
+  expiresIn: number;
+}
+
+export interface LoginResponse extends AuthTokens {
   message: string;
   user: User;
 }
@@ -1,9 +1,50 @@
-import { defineConfig } from 'vite'
+import { defineConfig, type Plugin } from 'vite'
 import react from '@vitejs/plugin-react'
+import { readdirSync, readFileSync, statSync, writeFileSync } from 'node:fs'
+import { join, resolve } from 'node:path'
+import { brotliCompressSync, gzipSync, constants } from 'node:zlib'
+
+// Files worth compressing, and the size below which it is not worth it
+// (matches the backend's COMPRESSION_THRESHOLD default)
+const COMPRESSIBLE = /\.(js|mjs|css|html|svg|json|txt|map)$/
+const MIN_SIZE = 1024
+
+// Writes a .br and a .gz next to every compressible file in the build, at
+// maximum compression, for the production server to send as they are
+function precompress(): Plugin {
+  let outDir = 'dist'
+
+  const files = (dir: string): string[] => readdirSync(dir).flatMap((name) => {
+    const file = join(dir, name)
+    return statSync(file).isDirectory() ? files(file) : [file]
+  })
+
+  return {
+    name: 'precompress',
+    apply: 'build',
+    configResolved(config) {
+      outDir = resolve(config.root, config.build.outDir)
+    },
+    closeBundle() {
+      for (const file of files(outDir)) {
+        if (!COMPRESSIBLE.test(file)) continue
+        const source = readFileSync(file)
+        if (source.length < MIN_SIZE) continue
+        writeFileSync(`${file}.br`, brotliCompressSync(source, {
+          params: {
+            [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+            [constants.BROTLI_PARAM_SIZE_HINT]: source.length,
+          },
+        }))
+        writeFileSync(`${file}.gz`, gzipSync(source, { level: constants.Z_BEST_COMPRESSION }))
+      }
+    },
+  }
+}
 
 // https://vite.dev/config/
 export default defineConfig({
-  plugins: [react()],
+  plugins: [react(), precompress()],
   server: {
     proxy: {
       '/api': {